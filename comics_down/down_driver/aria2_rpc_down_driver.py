@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# Copyright 2019 黎慧剑
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+aria2 RPC服务的下载驱动
+@module aria2_rpc_down_driver
+@file aria2_rpc_down_driver.py
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import threading
+import subprocess
+import urllib.request
+import concurrent.futures
+from urllib.parse import urlparse
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(
+    os.path.dirname(__file__), os.path.pardir, os.path.pardir)))
+from comics_down.lib.core import BaseDownDriverFW, Tools
+
+
+__MOUDLE__ = 'aria2_rpc_down_driver'  # 模块名
+__DESCRIPT__ = u'aria2 RPC服务的下载驱动'  # 模块描述
+__VERSION__ = '0.1.0'  # 版本
+__AUTHOR__ = u'黎慧剑'  # 作者
+__PUBLISH__ = '2021.07.01'  # 发布日期
+
+
+class Aria2RpcSession(object):
+    """
+    aria2 RPC服务的下载会话(一个下载任务共用)
+    注：1、连接已启动的aria2c RPC服务, 连接不上且aria2_rpc_start为y时自动启动 aria2c --enable-rpc
+        2、下载线程提交的下载请求由提交线程合并后通过 system.multicall 批量调用 aria2.addUri
+        3、状态线程定期通过 system.multicall 批量调用 aria2.tellStatus 获取结果, 并通知等待的下载线程
+    """
+
+    # 批量提交的最大请求数及等待合并的时间(秒)
+    BATCH_SIZE = 100
+    BATCH_INTERVAL = 0.02
+
+    # 查询下载状态的间隔时间(秒), 有新提交的下载时会提前查询
+    POLL_INTERVAL = 0.2
+
+    # 可重试的aria2错误码: 2-超时, 6-网络问题, 19-域名解析失败
+    TIMEOUT_ERROR_CODES = ('2', )
+    NETWORK_ERROR_CODES = ('6', '19')
+
+    def __init__(self, **para_dict):
+        """
+        构造函数
+
+        @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来, 使用参数如下:
+            aria2_rpc_url : aria2 RPC服务地址, 默认为 http://127.0.0.1:6800/jsonrpc
+            aria2_rpc_secret : aria2 RPC服务的访问令牌
+            aria2_rpc_start : 连接不上RPC服务时是否自动启动aria2c(y/n), 默认为y
+            以及 down_overtime/overtime/connect_retry/down_cookie/down_proxy
+        """
+        self.rpc_url = para_dict.get('aria2_rpc_url', '') or 'http://127.0.0.1:6800/jsonrpc'
+        self.rpc_secret = para_dict.get('aria2_rpc_secret', '')
+        self.auto_start = (para_dict.get('aria2_rpc_start', 'y') == 'y')
+        self.overtime = float(para_dict.get('overtime', '30'))
+
+        # 所有下载共用的选项
+        self.options = {
+            'auto-file-renaming': 'false',
+            'allow-overwrite': 'true',
+            'check-certificate': 'false',
+            'timeout': para_dict.get('down_overtime', '300'),
+            'connect-timeout': para_dict.get('overtime', '30'),
+            'max-tries': para_dict.get('connect_retry', '3')
+        }
+        self.headers = list()
+        if para_dict.get('down_cookie', '') != '':
+            _cookies = Tools.get_cookie_from_file(para_dict['down_cookie'])
+            _items = _cookies.items() if isinstance(_cookies, dict) else _cookies
+            self.headers.append(
+                'Cookie: %s' % '; '.join(['%s=%s' % (_key, _val) for _key, _val in _items])
+            )
+        if para_dict.get('down_proxy', '') != '':
+            _proxy = Tools.get_proxy(para_dict['down_proxy'])
+            if len(_proxy) == 1:
+                self.options['all-proxy'] = list(_proxy.values())[0]
+            else:
+                for _key, _val in _proxy.items():
+                    self.options['%s-proxy' % _key.lower()] = _val
+
+        self._process = None  # 自动启动的aria2c进程
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._submit_list = list()  # 待提交的请求, 每个元素为(uri, options, future)
+        self._running = dict()  # 已提交的下载, key为gid, value为future
+        self._stop = False
+        self._threads = list()
+
+    #############################
+    # 公共方法
+    #############################
+    def start(self):
+        """
+        连接(或启动)aria2 RPC服务并启动提交和状态线程
+
+        @returns {Aria2RpcSession} - 返回会话自身
+        """
+        try:
+            self.call('aria2.getVersion')
+        except OSError:
+            if not self.auto_start:
+                raise
+            self._start_daemon()
+
+        for _fun, _name in ((self._submit_fun, 'Aria2RpcSubmit'), (self._poll_fun, 'Aria2RpcPoll')):
+            _thread = threading.Thread(target=_fun, name=_name, daemon=True)
+            _thread.start()
+            self._threads.append(_thread)
+
+        return self
+
+    def submit(self, file_url: str, save_file: str, headers: dict = None) -> concurrent.futures.Future:
+        """
+        提交下载请求(不等待)
+
+        @param {str} file_url - 要下载的文件url
+        @param {str} save_file - 要保存的文件路径及文件名
+        @param {dict} headers=None - 要设置的http头字典
+
+        @returns {concurrent.futures.Future} - 下载结果, 下载失败时设置异常
+        """
+        _options = dict(self.options)
+        _options['dir'] = os.path.split(save_file)[0]
+        _options['out'] = os.path.split(save_file)[1]
+        _headers = list(self.headers)
+        for _key, _val in ({} if headers is None else headers).items():
+            _headers.append('%s: %s' % (_key, _val))
+        if len(_headers) > 0:
+            _options['header'] = _headers
+
+        _future = concurrent.futures.Future()
+        with self._lock:
+            if self._stop:
+                raise RuntimeError('aria2 rpc session closed')
+            self._submit_list.append((file_url, _options, _future))
+            self._wakeup.notify_all()
+
+        return _future
+
+    def cancel(self, future: concurrent.futures.Future):
+        """
+        取消下载请求, 已提交到aria2的下载通过 aria2.forceRemove 删除并不再查询状态
+
+        @param {concurrent.futures.Future} future - submit返回的下载结果对象
+        """
+        with self._lock:
+            future.cancel()
+            self._submit_list = [_item for _item in self._submit_list if _item[2] is not future]
+            _gids = [_gid for _gid, _future in self._running.items() if _future is future]
+            for _gid in _gids:
+                self._running.pop(_gid)
+
+        self._force_remove(_gids)
+
+    def close(self):
+        """
+        关闭会话, 未完成的下载设置为失败, 如果是自动启动的aria2c则关闭服务
+        """
+        with self._lock:
+            self._stop = True
+            self._wakeup.notify_all()
+
+        for _thread in self._threads:
+            _thread.join()
+
+        with self._lock:
+            _futures = [_item[2] for _item in self._submit_list] + list(self._running.values())
+            self._submit_list.clear()
+            self._running.clear()
+
+        for _future in _futures:
+            if not _future.done():
+                _future.set_exception(RuntimeError('aria2 rpc session closed'))
+
+        if self._process is not None:
+            try:
+                self.call('aria2.shutdown')
+                self._process.wait(timeout=self.overtime)
+            except Exception:
+                self._process.kill()
+            self._process = None
+
+    def call(self, method: str, *params):
+        """
+        调用aria2 RPC方法
+
+        @param {str} method - 方法名
+        @param {list} params - 方法参数(不含令牌)
+
+        @returns {object} - 调用结果
+
+        @throws {OSError} - 连接失败时抛出
+        @throws {RuntimeError} - RPC返回错误时抛出
+        """
+        _params = list(params)
+        if self.rpc_secret != '' and not method.startswith('system.'):
+            _params.insert(0, 'token:%s' % self.rpc_secret)
+
+        _data = json.dumps({
+            'jsonrpc': '2.0', 'id': str(uuid.uuid1()), 'method': method, 'params': _params
+        }).encode('utf-8')
+        _request = urllib.request.Request(
+            self.rpc_url, data=_data, headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(_request, timeout=self.overtime) as _res:
+            _ret = json.loads(_res.read().decode('utf-8'))
+
+        if _ret.get('error', None) is not None:
+            raise RuntimeError('aria2 rpc error: %s' % str(_ret['error']))
+
+        return _ret['result']
+
+    def multicall(self, calls: list) -> list:
+        """
+        通过 system.multicall 批量调用aria2 RPC方法
+
+        @param {list} calls - 调用清单, 每个元素为(方法名, 参数列表)
+
+        @returns {list} - 每个调用的结果, 成功为[结果], 失败为错误信息字典
+        """
+        _calls = list()
+        for _method, _params in calls:
+            _params = list(_params)
+            if self.rpc_secret != '':
+                _params.insert(0, 'token:%s' % self.rpc_secret)
+            _calls.append({'methodName': _method, 'params': _params})
+
+        return self.call('system.multicall', _calls)
+
+    #############################
+    # 内部函数
+    #############################
+    def _start_daemon(self):
+        """
+        启动本地的aria2c RPC服务, 并等待服务可用
+        """
+        _url_info = urlparse(self.rpc_url)
+        _cmd = [
+            'aria2c', '--enable-rpc', '--rpc-listen-port=%d' % (_url_info.port or 6800),
+            '--max-concurrent-downloads=%d' % self.BATCH_SIZE
+        ]
+        if self.rpc_secret != '':
+            _cmd.append('--rpc-secret=%s' % self.rpc_secret)
+
+        self._process = subprocess.Popen(
+            _cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        _end_time = time.time() + self.overtime
+        while True:
+            try:
+                self.call('aria2.getVersion')
+                return
+            except OSError:
+                if time.time() > _end_time or self._process.poll() is not None:
+                    raise
+                time.sleep(0.1)
+
+    def _submit_fun(self):
+        """
+        提交线程函数, 合并下载请求后批量提交
+        """
+        while True:
+            with self._lock:
+                while len(self._submit_list) == 0 and not self._stop:
+                    self._wakeup.wait()
+                if self._stop:
+                    return
+
+            # 等待合并更多的请求
+            time.sleep(self.BATCH_INTERVAL)
+            with self._lock:
+                _batch = self._submit_list[0: self.BATCH_SIZE]
+                del self._submit_list[0: self.BATCH_SIZE]
+
+            try:
+                _results = self.multicall(
+                    [('aria2.addUri', [[_item[0]], _item[1]]) for _item in _batch]
+                )
+            except Exception as _e:
+                for _item in _batch:
+                    if not _item[2].done():
+                        _item[2].set_exception(_e)
+                continue
+
+            _cancelled = list()
+            with self._lock:
+                for _item, _result in zip(_batch, _results):
+                    if _item[2].done():
+                        # 提交过程中已被取消
+                        if isinstance(_result, list):
+                            _cancelled.append(_result[0])
+                    elif isinstance(_result, list):
+                        self._running[_result[0]] = _item[2]
+                    else:
+                        _item[2].set_exception(RuntimeError('aria2 addUri error: %s' % str(_result)))
+                self._wakeup.notify_all()
+
+            self._force_remove(_cancelled)
+
+    def _poll_fun(self):
+        """
+        状态线程函数, 批量查询已提交下载的状态并通知结果
+        """
+        while True:
+            with self._lock:
+                if self._stop:
+                    return
+                _gids = list(self._running.keys())
+                if len(_gids) == 0:
+                    self._wakeup.wait(self.POLL_INTERVAL)
+                    continue
+
+            try:
+                _results = self.multicall([
+                    ('aria2.tellStatus', [_gid, ['gid', 'status', 'errorCode', 'errorMessage']])
+                    for _gid in _gids
+                ])
+            except Exception:
+                # 服务暂时不可用, 下次再查询
+                time.sleep(self.POLL_INTERVAL)
+                continue
+
+            _finished = list()
+            for _gid, _result in zip(_gids, _results):
+                if not isinstance(_result, list):
+                    _finished.append((_gid, RuntimeError('aria2 tellStatus error: %s' % str(_result))))
+                    continue
+
+                _status = _result[0]
+                if _status['status'] == 'complete':
+                    _finished.append((_gid, None))
+                elif _status['status'] in ('error', 'removed'):
+                    _finished.append((_gid, self._get_error(_status)))
+
+            if len(_finished) > 0:
+                with self._lock:
+                    _futures = [(self._running.pop(_gid, None), _error) for _gid, _error in _finished]
+
+                for _future, _error in _futures:
+                    if _future is None or _future.done():
+                        continue
+                    if _error is None:
+                        _future.set_result(True)
+                    else:
+                        _future.set_exception(_error)
+
+                # 释放aria2中的下载结果
+                try:
+                    self.multicall([
+                        ('aria2.removeDownloadResult', [_gid]) for _gid, _error in _finished
+                    ])
+                except Exception:
+                    pass
+
+            with self._lock:
+                if not self._stop:
+                    self._wakeup.wait(self.POLL_INTERVAL)
+
+    def _force_remove(self, gids: list):
+        """
+        强制删除aria2中的下载(忽略删除失败的情况)
+
+        @param {list} gids - 要删除的下载gid清单
+        """
+        if len(gids) == 0:
+            return
+
+        try:
+            self.multicall([('aria2.forceRemove', [_gid]) for _gid in gids])
+        except Exception:
+            pass
+
+    def _get_error(self, status: dict) -> Exception:
+        """
+        将aria2的下载错误转换为异常对象(超时及网络错误转换为可重试的异常)
+
+        @param {dict} status - tellStatus返回的状态
+
+        @returns {Exception} - 异常对象
+        """
+        _code = str(status.get('errorCode', ''))
+        _msg = 'aria2 download error [%s]: %s' % (_code, status.get('errorMessage', status['status']))
+        if _code in self.TIMEOUT_ERROR_CODES:
+            return TimeoutError(_msg)
+        elif _code in self.NETWORK_ERROR_CODES:
+            return ConnectionError(_msg)
+
+        return RuntimeError(_msg)
+
+
+class Aria2RpcDriver(BaseDownDriverFW):
+    """
+    使用aria2 RPC服务的下载驱动(需安装aria2, 或启动可访问的aria2c RPC服务)
+    注：同一个下载任务共用一个RPC会话, 所有下载请求批量提交, 适合大量小文件的下载
+    """
+    #############################
+    # 需实现类继承的方法
+    #############################
+    @classmethod
+    def get_down_type(cls):
+        """
+        返回该驱动对应的下载类型
+        (需继承类实现)
+
+        @returns {str} - 下载类型字符串，如http/ftp
+            注：系统加载的下载类型名不能重复
+        """
+        return 'aria2-rpc'
+
+    @classmethod
+    def download(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        """
+        下载文件
+        (需继承类实现，如果下载失败应抛出异常, 正常执行完成代表下载成功)
+
+        @param {str} file_url - 要下载的文件url
+        @param {str} save_file - 要保存的文件路径及文件名
+        @param {dict} extend_json=None - 要送入下载驱动的扩展信息
+            headers {dict} - 要设置的http头字典
+        @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来, 参考Aria2RpcSession
+            down_session : 下载管理器送入的会话对象, 没有送入时为本次下载单独创建会话
+                注：单独创建会话时每个文件都要连接(或启动及关闭)一次aria2c服务,
+                    直接调用下载驱动下载多个文件时应通过create_session创建会话并送入
+
+        @throws {TimeoutError} - 超过down_overtime未完成时抛出, 同时删除aria2中的下载
+        """
+        _session = para_dict.get('down_session', None)
+        _own_session = _session is None
+        if _own_session:
+            _session = cls.create_session(**para_dict)
+
+        try:
+            _future = _session.submit(
+                file_url, os.path.realpath(save_file),
+                headers=(None if extend_json is None else extend_json.get('headers', None))
+            )
+            try:
+                _future.result(timeout=float(para_dict.get('down_overtime', '300')))
+            except concurrent.futures.TimeoutError:
+                # 超时不再等待, 避免aria2中的下载继续占用连接及状态查询
+                _session.cancel(_future)
+                raise
+        finally:
+            if _own_session:
+                cls.close_session(_session)
+
+    @classmethod
+    async def download_async(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        """
+        异步下载文件(down_engine=async时使用)
+
+        @param {str} file_url - 要下载的文件url
+        @param {str} save_file - 要保存的文件路径及文件名
+        @param {dict} extend_json=None - 要送入下载驱动的扩展信息
+        @param {dict} para_dict - 扩展参数, 参考download
+        """
+        _session = para_dict.get('down_session', None)
+        if _session is None:
+            await super().download_async(file_url, save_file, extend_json=extend_json, **para_dict)
+            return
+
+        _future = _session.submit(
+            file_url, os.path.realpath(save_file),
+            headers=(None if extend_json is None else extend_json.get('headers', None))
+        )
+        try:
+            await asyncio.wrap_future(_future)
+        except asyncio.CancelledError:
+            _session.cancel(_future)
+            raise
+
+    @classmethod
+    def create_session(cls, **para_dict):
+        """
+        创建下载任务的会话对象
+
+        @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来
+
+        @returns {Aria2RpcSession} - 会话对象
+        """
+        return Aria2RpcSession(**para_dict).start()
+
+    @classmethod
+    def close_session(cls, session):
+        """
+        关闭会话对象并释放资源
+
+        @param {Aria2RpcSession} session - 会话对象
+        """
+        session.close()
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    # 打印版本信息
+    print(('模块名：%s  -  %s\n'
+           '作者：%s\n'
+           '发布日期：%s\n'
+           '版本：%s' % (__MOUDLE__, __DESCRIPT__, __AUTHOR__, __PUBLISH__, __VERSION__)))
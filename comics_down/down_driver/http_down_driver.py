@@ -15,18 +15,468 @@ http通用下载驱动
 import os
 import sys
 import ssl
+import json
+import asyncio
+import threading
+import concurrent.futures
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
 from HiveNetLib.base_tools.net_tool import NetTool
 from HiveNetLib.base_tools.file_tool import FileTool
 # 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
 sys.path.append(os.path.abspath(os.path.join(
     os.path.dirname(__file__), os.path.pardir, os.path.pardir)))
 from comics_down.lib.core import BaseDownDriverFW, Tools
+from comics_down.lib.async_http import AsyncHttpClient, AsyncConnectionPool
 
 
 # 取消全局ssl验证
 ssl._create_default_https_context = ssl._create_unverified_context
 
 
+class HttpSession(object):
+    """
+    http下载会话(一个下载任务共用)
+    注：1、代理和cookie只在创建时加载一次, 通过requests的连接池对每个主机保持长连接, 供所有下载线程共用,
+            异步下载(download_async)也使用同一份代理和cookie, 并通过异步连接池对每个主机保持长连接
+        2、segment_num大于1时, 支持Range的大文件拆分为多个分段并发下载到预分配的临时文件,
+            分段进度保存在 save_file + '.dt.seg' 文件中, 中断后可以按分段续传
+    """
+
+    # 每次读取的数据块大小
+    BLOCK_SIZE = 65536
+
+    # 分段下载时每下载多少数据保存一次分段进度
+    SEGMENT_SAVE_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, **para_dict):
+        """
+        构造函数
+
+        @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来, 使用参数参考HttpDownDriver.download
+        """
+        self.timeout = float(para_dict.get('overtime', '30'))
+        self.is_resume = (para_dict.get('use_break_down', 'y') == 'y')
+        self.segment_num = max(int(para_dict.get('segment_num', '4')), 1)
+        self.segment_min_size = int(float(para_dict.get('segment_min_size', '16')) * 1024 * 1024)
+        self.hash_name = para_dict.get('down_hash', 'sha1')
+        Tools.get_hasher(self.hash_name)  # 提前检查哈希算法是否支持
+        self._local = threading.local()  # 每个下载线程重用的读取缓存
+
+        self.session = requests.Session()
+        # 不压缩传输, 保证应答长度与文件大小一致
+        self.session.headers.update({'User-agent': 'Mozilla/5.0', 'Accept-Encoding': 'identity'})
+        self.verify = (para_dict.get('verify', 'y') == 'y')
+        self.session.verify = self.verify
+
+        # 每个主机的连接池大小: 每个下载线程都可能同时分段下载, 需要 下载线程数 * 分段数 个连接
+        _adapter = HTTPAdapter(
+            pool_maxsize=int(para_dict.get('down_worker', '10')) * self.segment_num,
+            max_retries=int(para_dict.get('connect_retry', '3'))
+        )
+        self.session.mount('http://', _adapter)
+        self.session.mount('https://', _adapter)
+
+        # 异步下载的连接池, 每个主机最多保持 下载协程数 个空闲连接
+        self.async_pool = AsyncConnectionPool(max_idle=int(para_dict.get('down_worker', '10')))
+
+        # 代理服务器设置
+        self.proxies = {}
+        if para_dict.get('down_proxy', '') != '':
+            self.proxies = Tools.get_proxy(para_dict['down_proxy'])
+            self.session.proxies.update(self.proxies)
+
+        # cookie
+        self.cookies = {}
+        if para_dict.get('down_cookie', '') != '':
+            self.cookies = Tools.get_cookie_from_file(para_dict['down_cookie'])
+            self.session.cookies.update(self.cookies)
+
+    def download(self, file_url: str, save_file: str) -> dict:
+        """
+        下载文件(断点续传方式先下载到 save_file + '.dt' 临时文件)
+        注：1、允许分段下载时通过 Range: bytes=0- 请求探测文件大小, 服务器支持Range且文件足够大时转为分段下载,
+            否则直接使用该请求的应答按单连接下载
+            2、单连接下载使用固定大小的缓存直接写入文件, 同时计算文件大小和哈希值, 文件大小与应答长度不一致时抛出异常
+
+        @param {str} file_url - 要下载的文件url
+        @param {str} save_file - 要保存的文件路径及文件名
+
+        @returns {dict} - 文件完整性信息(size/hash), 分段下载的文件不计算哈希值
+
+        @throws {requests.HTTPError} - 应答状态码异常时抛出
+        @throws {ConnectionError} - 下载的文件不完整时抛出
+        """
+        _temp_file = save_file + '.dt'
+        if self.segment_num > 1 and self.is_resume:
+            _state = self._load_segment_state(_temp_file)
+            if _state is not None:
+                # 继续未完成的分段下载
+                return self._download_segments(file_url, save_file, _state)
+
+        _down_size = 0
+        if self.is_resume and os.path.exists(_temp_file):
+            _down_size = os.path.getsize(_temp_file)
+
+        _headers = {}
+        if _down_size > 0:
+            _headers['Range'] = 'bytes=%d-' % _down_size
+        elif self.segment_num > 1:
+            _headers['Range'] = 'bytes=0-'
+
+        _state = None
+        with self.session.get(file_url, headers=_headers, stream=True, timeout=self.timeout) as _res:
+            if _res.status_code == 416 and _down_size > 0:
+                # 临时文件已是完整文件(Content-Range: bytes */文件大小)
+                _total = _res.headers.get('Content-Range', '').rpartition('/')[2].strip()
+                if _total != str(_down_size):
+                    os.remove(_temp_file)
+                    raise ConnectionError('temp file size not match, will download again: %s' % file_url)
+                _meta = self._hash_file(_temp_file)
+                os.replace(_temp_file, save_file)
+                return _meta
+
+            _res.raise_for_status()
+            if _down_size == 0 and self.segment_num > 1:
+                _total = self._get_range_total(_res)
+                if _total is not None and _total >= self.segment_min_size:
+                    _state = self._new_segment_state(_total, _res)
+
+            if _state is None:
+                _meta = self._save_stream(
+                    _res, _temp_file, _down_size if _res.status_code == 206 else 0
+                )
+
+        if _state is not None:
+            return self._download_segments(file_url, save_file, _state)
+
+        os.replace(_temp_file, save_file)
+        return _meta
+
+    async def download_async(self, file_url: str, save_file: str) -> dict:
+        """
+        异步下载文件
+        注：异步http客户端不支持代理服务器, 设置了代理的情况通过线程池执行同步下载(download)
+
+        @param {str} file_url - 要下载的文件url
+        @param {str} save_file - 要保存的文件路径及文件名
+
+        @returns {dict} - 文件完整性信息(size/hash)
+        """
+        if len(self.proxies) > 0:
+            return await asyncio.get_event_loop().run_in_executor(
+                None, self.download, file_url, save_file
+            )
+
+        return await AsyncHttpClient.download_file(
+            file_url, save_file,
+            headers={'User-agent': 'Mozilla/5.0'},
+            timeout=self.timeout, verify=self.verify, cookies=self.cookies,
+            is_resume=self.is_resume, hash_name=self.hash_name, pool=self.async_pool
+        )
+
+    def close(self):
+        """
+        关闭会话, 释放所有连接
+        """
+        self.session.close()
+        self.async_pool.close()
+
+    #############################
+    # 流式写入及完整性检查
+    #############################
+    def _get_buffer(self) -> memoryview:
+        """
+        获取当前线程重用的读取缓存
+
+        @returns {memoryview} - 缓存对象
+        """
+        _buffer = getattr(self._local, 'buffer', None)
+        if _buffer is None:
+            _buffer = memoryview(bytearray(self.BLOCK_SIZE))
+            self._local.buffer = _buffer
+
+        return _buffer
+
+    def _save_stream(self, res, temp_file: str, down_size: int) -> dict:
+        """
+        将应答体写入临时文件, 同时计算文件大小和哈希值
+
+        @param {requests.Response} res - 应答对象(stream方式)
+        @param {str} temp_file - 临时文件
+        @param {int} down_size - 续传时临时文件已下载的大小, 0代表重新下载
+
+        @returns {dict} - 文件完整性信息(size/hash)
+
+        @throws {ConnectionError} - 下载的文件不完整时抛出
+        """
+        _hasher = Tools.get_hasher(self.hash_name)
+        if _hasher is not None and down_size > 0:
+            # 续传的情况需要先计算已下载部分的哈希值
+            self._update_hash(_hasher, temp_file)
+
+        # 应答的文件总大小
+        _total = None
+        if res.status_code == 206:
+            _total = self._get_range_total(res)
+        elif res.headers.get('Content-Length', '').isdigit():
+            _total = int(res.headers['Content-Length'])
+
+        _raw = res.raw
+        _raw.decode_content = True
+        _buffer = self._get_buffer()
+        _size = down_size
+        with open(temp_file, 'ab' if down_size > 0 else 'wb') as _file:
+            while True:
+                # 与requests的iter_content一致, 将urllib3的异常转换为requests的异常
+                try:
+                    _len = _raw.readinto(_buffer)
+                except ProtocolError as _e:
+                    raise requests.exceptions.ChunkedEncodingError(_e)
+                except ReadTimeoutError as _e:
+                    raise requests.exceptions.ConnectionError(_e)
+
+                if not _len:
+                    break
+                _file.write(_buffer[0: _len])
+                if _hasher is not None:
+                    _hasher.update(_buffer[0: _len])
+                _size += _len
+
+        if _total is not None and _size != _total and res.headers.get('Content-Encoding', 'identity') == 'identity':
+            if _size > _total:
+                # 临时文件已损坏, 删除后重新下载
+                os.remove(temp_file)
+            raise ConnectionError('file size [%d] not match content length [%d]: %s' % (
+                _size, _total, res.url
+            ))
+
+        return {
+            'size': _size, 'hash': '' if _hasher is None else '%s:%s' % (self.hash_name, _hasher.hexdigest())
+        }
+
+    def _update_hash(self, hasher, file: str):
+        """
+        将文件内容加入哈希计算
+
+        @param {object} hasher - 哈希对象
+        @param {str} file - 文件路径
+        """
+        _buffer = self._get_buffer()
+        with open(file, 'rb') as _file:
+            while True:
+                _len = _file.readinto(_buffer)
+                if not _len:
+                    break
+                hasher.update(_buffer[0: _len])
+
+    def _hash_file(self, file: str) -> dict:
+        """
+        计算已下载完成的文件的完整性信息
+
+        @param {str} file - 文件路径
+
+        @returns {dict} - 文件完整性信息(size/hash)
+        """
+        _hasher = Tools.get_hasher(self.hash_name)
+        if _hasher is not None:
+            self._update_hash(_hasher, file)
+
+        return {
+            'size': os.path.getsize(file),
+            'hash': '' if _hasher is None else '%s:%s' % (self.hash_name, _hasher.hexdigest())
+        }
+
+    #############################
+    # 分段下载
+    #############################
+    def _get_range_total(self, res) -> int:
+        """
+        从Range请求的应答中获取文件总大小
+
+        @param {requests.Response} res - 应答对象
+
+        @returns {int} - 文件总大小, 服务器不支持Range或获取不到返回None
+        """
+        if res.status_code != 206:
+            return None
+
+        # Content-Range: bytes 0-1023/1024
+        _range = res.headers.get('Content-Range', '')
+        _total = _range.rpartition('/')[2].strip()
+        return int(_total) if _total.isdigit() else None
+
+    def _new_segment_state(self, total: int, res) -> dict:
+        """
+        创建分段下载的进度信息
+
+        @param {int} total - 文件总大小
+        @param {requests.Response} res - 探测请求的应答对象
+
+        @returns {dict} - 分段进度信息
+            size {int} - 文件总大小
+            validator {str} - 文件校验标识(ETag或Last-Modified), 续传时通过If-Range确保文件未变化
+            segments {list} - 分段清单, 每个元素为[开始位置, 结束位置(含), 已下载大小]
+        """
+        _seg_size = -(-total // self.segment_num)
+        _segments = list()
+        for _start in range(0, total, _seg_size):
+            _segments.append([_start, min(_start + _seg_size, total) - 1, 0])
+
+        return {
+            'size': total,
+            'validator': res.headers.get('ETag', res.headers.get('Last-Modified', '')),
+            'segments': _segments
+        }
+
+    def _load_segment_state(self, temp_file: str) -> dict:
+        """
+        装载分段下载的进度信息
+        注：进度文件无效时删除进度文件和临时文件, 避免预分配的临时文件被当作单连接下载的已下载数据
+
+        @param {str} temp_file - 临时文件
+
+        @returns {dict} - 分段进度信息, 没有有效的进度信息时返回None
+        """
+        _seg_file = temp_file + '.seg'
+        if not os.path.exists(_seg_file):
+            return None
+
+        try:
+            with open(_seg_file, 'r', encoding='utf-8') as _file:
+                _state = json.loads(_file.read())
+            if os.path.exists(temp_file) and os.path.getsize(temp_file) == _state['size']:
+                return _state
+        except (ValueError, KeyError):
+            pass
+
+        self._remove_segment_files(temp_file)
+        return None
+
+    def _remove_segment_files(self, temp_file: str):
+        """
+        删除分段下载的进度文件和临时文件
+
+        @param {str} temp_file - 临时文件
+        """
+        for _file in (temp_file + '.seg', temp_file):
+            if os.path.exists(_file):
+                os.remove(_file)
+
+    def _save_segment_state(self, temp_file: str, state: dict):
+        """
+        保存分段下载的进度信息
+
+        @param {str} temp_file - 临时文件
+        @param {dict} state - 分段进度信息
+        """
+        _seg_file = temp_file + '.seg'
+        with open(_seg_file + '.tmp', 'w', encoding='utf-8') as _file:
+            _file.write(json.dumps(state))
+        os.replace(_seg_file + '.tmp', _seg_file)
+
+    def _download_segments(self, file_url: str, save_file: str, state: dict):
+        """
+        并发下载未完成的分段
+
+        @param {str} file_url - 要下载的文件url
+        @param {str} save_file - 要保存的文件路径及文件名
+        @param {dict} state - 分段进度信息
+
+        @returns {dict} - 文件完整性信息(size, 分段乱序写入无法在下载过程中计算哈希值, hash为'')
+        """
+        _temp_file = save_file + '.dt'
+        if not os.path.exists(_temp_file) or os.path.getsize(_temp_file) != state['size']:
+            # 预分配文件空间(稀疏文件)
+            with open(_temp_file, 'wb') as _file:
+                _file.truncate(state['size'])
+        self._save_segment_state(_temp_file, state)
+
+        _lock = threading.Lock()
+        _restart = threading.Event()  # 文件已变化或服务器不再支持Range, 通知其他分段停止下载
+        _pending = [
+            _i for _i, _seg in enumerate(state['segments']) if _seg[2] < _seg[1] - _seg[0] + 1
+        ]
+        _error = None
+        if len(_pending) > 0:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(_pending)) as _pool:
+                _futures = [
+                    _pool.submit(self._download_segment, file_url, _temp_file, state, _i, _lock, _restart)
+                    for _i in _pending
+                ]
+                for _future in _futures:
+                    if _future.exception() is not None and _error is None:
+                        _error = _future.exception()
+
+        if _restart.is_set():
+            # 所有分段线程已结束, 删除进度文件和临时文件后重新下载
+            self._remove_segment_files(_temp_file)
+            raise ConnectionError('server not support range or file changed: %s' % file_url)
+
+        if _error is not None:
+            with _lock:
+                self._save_segment_state(_temp_file, state)
+            raise _error
+
+        os.replace(_temp_file, save_file)
+        os.remove(_temp_file + '.seg')
+        return {'size': state['size'], 'hash': ''}
+
+    def _download_segment(self, file_url: str, temp_file: str, state: dict, index: int, lock, restart):
+        """
+        下载单个分段到临时文件的对应位置
+
+        @param {str} file_url - 要下载的文件url
+        @param {str} temp_file - 临时文件
+        @param {dict} state - 分段进度信息
+        @param {int} index - 分段序号
+        @param {threading.Lock} lock - 更新分段进度的锁
+        @param {threading.Event} restart - 需要重新下载的通知, 任一分段发现文件变化时设置, 其他分段停止下载
+        """
+        _segment = state['segments'][index]
+        _start = _segment[0] + _segment[2]
+        _headers = {'Range': 'bytes=%d-%d' % (_start, _segment[1])}
+        if state.get('validator', '') != '':
+            _headers['If-Range'] = state['validator']
+
+        with self.session.get(file_url, headers=_headers, stream=True, timeout=self.timeout) as _res:
+            _res.raise_for_status()
+            if _res.status_code != 206:
+                # 文件已变化或服务器不再支持Range, 由_download_segments在所有分段结束后删除临时文件
+                restart.set()
+                raise ConnectionError('server not support range or file changed: %s' % file_url)
+
+            _left = _segment[1] - _start + 1
+            _unsaved = 0
+            with open(temp_file, 'r+b') as _file:
+                _file.seek(_start)
+                try:
+                    for _data in _res.iter_content(chunk_size=self.BLOCK_SIZE):
+                        if restart.is_set():
+                            raise ConnectionError('segment download stopped for restart: %s' % file_url)
+                        _data = _data[0: _left]
+                        _file.write(_data)
+                        _left -= len(_data)
+                        _unsaved += len(_data)
+                        if _unsaved >= self.SEGMENT_SAVE_SIZE:
+                            _file.flush()
+                            with lock:
+                                _segment[2] += _unsaved
+                                self._save_segment_state(temp_file, state)
+                            _unsaved = 0
+                        if _left <= 0:
+                            break
+                finally:
+                    # 出现异常时也记录已写入的数据, 续传时从该位置开始
+                    _file.flush()
+                    with lock:
+                        _segment[2] += _unsaved
+
+        if _left > 0:
+            raise ConnectionError('connection closed before segment end: %s' % file_url)
+
+
 class HttpDownDriver(BaseDownDriverFW):
     """
     普通http连接的图片下载驱动
@@ -61,11 +511,28 @@ class HttpDownDriver(BaseDownDriverFW):
             overtime
             connect_retry
             verify
-            show_rate
+            show_rate : 没有送入会话时是否显示下载进度(显示进度时不检查文件完整性)
+            segment_num : 大文件分段下载的分段数, 1代表不分段(仅使用会话下载时有效)
+            segment_min_size : 分段下载的最小文件大小, 单位为MB
+            down_hash : 边下载边计算的哈希算法, 默认为sha1
+            down_session : 下载管理器送入的会话对象(HttpSession), 送入时使用会话的连接池下载
+
+        @returns {dict} - 文件完整性信息(size/hash), 显示下载进度时返回None
         """
         _save_file = os.path.realpath(save_file)
+        _session = para_dict.get('down_session', None)
+        if _session is not None:
+            return _session.download(file_url, _save_file)
 
-        # 代理服务器设置
+        if para_dict.get('show_rate', 'n') != 'y':
+            # 单独创建会话进行下载, 检查文件完整性
+            _session = cls.create_session(**para_dict)
+            try:
+                return _session.download(file_url, _save_file)
+            finally:
+                cls.close_session(_session)
+
+        # 需要显示下载进度的情况, 代理服务器设置
         _proxy = {}
         if para_dict.get('down_proxy', '') != '':
             _proxy = Tools.get_proxy(para_dict['down_proxy'])
@@ -87,3 +554,49 @@ class HttpDownDriver(BaseDownDriverFW):
             cookies=_cookies,
             show_rate=(para_dict.get('show_rate', 'n') == 'y')
         )
+
+    @classmethod
+    def create_session(cls, **para_dict):
+        """
+        创建下载任务的会话对象
+
+        @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来
+
+        @returns {HttpSession} - 会话对象
+        """
+        return HttpSession(**para_dict)
+
+    @classmethod
+    def close_session(cls, session):
+        """
+        关闭会话对象并释放资源
+
+        @param {HttpSession} session - 会话对象
+        """
+        session.close()
+
+    @classmethod
+    async def download_async(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        """
+        异步下载文件(down_engine=async时使用)
+        注：使用标准库asyncio的http客户端, 设置了下载代理的情况通过线程池执行同步下载;
+            下载管理器会送入任务共用的会话(down_session), 代理和cookie只在创建会话时加载一次,
+            直接调用时应自行通过create_session创建会话并送入, 否则每个文件都会重新创建会话
+
+        @param {str} file_url - 要下载的文件url
+        @param {str} save_file - 要保存的文件路径及文件名
+        @param {dict} extend_json=None - 要送入下载驱动的扩展信息
+        @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来, 参考download
+
+        @returns {dict} - 文件完整性信息(size/hash)
+        """
+        _save_file = os.path.realpath(save_file)
+        _session = para_dict.get('down_session', None)
+        if _session is not None:
+            return await _session.download_async(file_url, _save_file)
+
+        _session = cls.create_session(**para_dict)
+        try:
+            return await _session.download_async(file_url, _save_file)
+        finally:
+            cls.close_session(_session)
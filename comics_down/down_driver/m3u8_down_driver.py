@@ -55,6 +55,11 @@ class M3u8Driver(BaseDownDriverFW):
             auto_retry {int} - 下载小文件的自动重试次数，默认为0
             down_task_overtime {float} - 下载小文件的超时时间，0代表不超时，默认为0
             down_driver_type {str} - 指定下载驱动的类型，默认为http
+            merge_mode {str} - 分片文件的合并方式, ffmpeg-通过ffmpeg合并, native-直接拼接MPEG-TS分片(无需ffmpeg), 默认为ffmpeg
+            merge_window {int} - native合并方式下边下载边合并的乱序窗口大小(分片数), 0代表全部下载完成后再合并, 默认为0
+            variant_policy {str} - 多码率时选择子播放列表的策略, first/max_bandwidth/min_bandwidth/resolution, 默认为first
+            variant_resolution {str} - resolution 策略的目标分辨率, 例如'854x480'或'480'
+            variant_codec {str} - 只选择编码包含该字符串的子播放列表, 例如'avc1'
         @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来
         """
         if extend_json is None:
@@ -74,6 +79,11 @@ class M3u8Driver(BaseDownDriverFW):
             auto_retry=extend_json.get('auto_retry', 0),
             down_driver=_down_driver,
             down_task_overtime=extend_json.get('down_task_overtime', 0),
+            merge_mode=extend_json.get('merge_mode', 'ffmpeg'),
+            merge_window=extend_json.get('merge_window', 0),
+            variant_policy=extend_json.get('variant_policy', 'first'),
+            variant_resolution=extend_json.get('variant_resolution', ''),
+            variant_codec=extend_json.get('variant_codec', ''),
             down_extend_json=extend_json,  # 共用同一个扩展信息字典
             **para_dict
         )
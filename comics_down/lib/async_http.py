@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# Copyright 2019 黎慧剑
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+基于asyncio的http文件下载模块
+@module async_http
+@file async_http.py
+"""
+
+import os
+import sys
+import ssl
+import asyncio
+import threading
+import urllib.error
+from email.message import Message
+from urllib.parse import urlparse, urljoin, quote
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(
+    os.path.dirname(__file__), os.path.pardir, os.path.pardir)))
+from comics_down.lib.core import Tools
+
+
+__MOUDLE__ = 'async_http'  # 模块名
+__DESCRIPT__ = u'基于asyncio的http文件下载模块'  # 模块描述
+__VERSION__ = '0.1.0'  # 版本
+__AUTHOR__ = u'黎慧剑'  # 作者
+__PUBLISH__ = '2021.07.01'  # 发布日期
+
+
+class AsyncConnectionPool(object):
+    """
+    异步http的空闲连接池, 按(协议, 主机, 端口)保存可重用的长连接
+    注：连接与创建时的事件循环绑定, 只有在同一个事件循环中才会被重用
+    """
+
+    def __init__(self, max_idle: int = 32):
+        """
+        构造函数
+
+        @param {int} max_idle=32 - 每个主机最多保存的空闲连接数量
+        """
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._closed = False
+        # 空闲连接, key为(协议, 主机, 端口), value为[(事件循环, StreamReader, StreamWriter), ...]
+        self._idle = dict()
+
+    def get(self, url: str) -> tuple:
+        """
+        获取url所在主机的空闲连接
+
+        @param {str} url - 访问url
+
+        @returns {tuple} - (StreamReader, StreamWriter), 没有可用的空闲连接返回None
+        """
+        _loop = asyncio.get_event_loop()
+        _key = self._get_key(url)
+        while True:
+            with self._lock:
+                _conns = self._idle.get(_key, None)
+                if not _conns:
+                    return None
+                _conn_loop, _reader, _writer = _conns.pop()
+
+            if _conn_loop is _loop and not _reader.at_eof() and not _writer.is_closing():
+                return _reader, _writer
+
+            # 服务端已关闭或不属于当前事件循环的连接直接丢弃
+            self._close_writer(_writer)
+
+    def put(self, url: str, reader, writer):
+        """
+        将应答已完整读取的连接放回连接池
+
+        @param {str} url - 访问url
+        @param {StreamReader} reader - 连接读取对象
+        @param {StreamWriter} writer - 连接写入对象
+        """
+        _key = self._get_key(url)
+        with self._lock:
+            _conns = self._idle.setdefault(_key, list())
+            if not self._closed and len(_conns) < self.max_idle:
+                _conns.append((asyncio.get_event_loop(), reader, writer))
+                return
+
+        self._close_writer(writer)
+
+    def close(self):
+        """
+        关闭连接池的所有空闲连接
+        注：应在连接所属的事件循环关闭前调用
+        """
+        with self._lock:
+            self._closed = True
+            _conns = [_conn for _list in self._idle.values() for _conn in _list]
+            self._idle.clear()
+
+        for _conn_loop, _reader, _writer in _conns:
+            self._close_writer(_writer)
+
+    #############################
+    # 内部函数
+    #############################
+    def _get_key(self, url: str) -> tuple:
+        """
+        获取url对应的连接池key
+
+        @param {str} url - 访问url
+
+        @returns {tuple} - (协议, 主机, 端口)
+        """
+        _url_info = urlparse(url)
+        _port = _url_info.port
+        if _port is None:
+            _port = 443 if _url_info.scheme == 'https' else 80
+
+        return _url_info.scheme, _url_info.hostname, _port
+
+    def _close_writer(self, writer):
+        """
+        关闭连接(事件循环已关闭时忽略异常)
+
+        @param {StreamWriter} writer - 连接写入对象
+        """
+        try:
+            writer.close()
+        except RuntimeError:
+            pass
+
+
+class AsyncHttpClient(object):
+    """
+    基于asyncio的HTTP/1.1文件下载客户端(仅使用标准库)
+    注：1、送入连接池时重用应答已完整读取的长连接, 否则每次下载使用独立的连接, 不支持代理服务器
+        2、应答体分块写入文件, 内存占用与文件大小无关, 写入的同时计算文件大小和哈希值
+        3、应答状态码大于等于400时抛出urllib.error.HTTPError, 与同步下载的异常处理保持一致
+        4、文件写入及哈希计算(包括续传时对已下载部分的哈希计算)在事件循环的线程池中执行, 不阻塞其他下载
+        5、重定向到其他主机时不再送出Cookie和Authorization协议头
+    """
+
+    # 每次读取的数据块大小
+    BLOCK_SIZE = 65536
+
+    # 每次写入文件的数据大小(累积到该大小再提交到线程池写入)
+    WRITE_SIZE = 1024 * 1024
+
+    # 重定向到其他主机时要去掉的协议头
+    REDIRECT_STRIP_HEADERS = ('cookie', 'authorization')
+
+    # 重新编码请求路径时不需要编码的字符(保留已编码的%xx)
+    PATH_SAFE_CHARS = "/%:@!$&'()*+,;=?~"
+
+    # 最大重定向次数
+    MAX_REDIRECTS = 5
+
+    # 为重用连接读取并丢弃的非成功应答体的最大大小, 超过该大小直接关闭连接
+    MAX_DRAIN_SIZE = 65536
+
+    #############################
+    # 公共方法
+    #############################
+    @classmethod
+    async def download_file(cls, url: str, save_file: str, headers: dict = None, timeout: float = 30,
+                            verify: bool = True, cookies: dict = None, is_resume: bool = False,
+                            hash_name: str = 'sha1', pool: AsyncConnectionPool = None) -> dict:
+        """
+        下载文件
+
+        @param {str} url - 要下载的文件url
+        @param {str} save_file - 要保存的文件路径及文件名
+        @param {dict} headers=None - 要带上的http协议头
+        @param {float} timeout=30 - 连接及每次读取数据的超时时间, 单位为秒
+        @param {bool} verify=True - 是否进行ssl证书验证
+        @param {dict} cookies=None - cookies参数
+        @param {bool} is_resume=False - 是否使用断点续传(下载到 save_file + '.dt' 临时文件)
+        @param {str} hash_name='sha1' - 边下载边计算的哈希算法, 传''或none代表不计算
+        @param {AsyncConnectionPool} pool=None - 连接池, 不送入时每次请求使用独立的连接
+
+        @returns {dict} - 文件完整性信息(size/hash)
+
+        @throws {urllib.error.HTTPError} - 应答状态码异常时抛出
+        @throws {ConnectionError} - 下载的文件不完整时抛出
+        """
+        _headers = dict() if headers is None else dict(headers)
+        if cookies is not None and len(cookies) > 0:
+            _items = cookies.items() if isinstance(cookies, dict) else cookies
+            _headers['Cookie'] = '; '.join(['%s=%s' % (_key, _val) for _key, _val in _items])
+
+        _temp_file = save_file + '.dt'
+        _down_size = 0
+        if is_resume and os.path.exists(_temp_file):
+            _down_size = os.path.getsize(_temp_file)
+        if _down_size > 0:
+            _headers['Range'] = 'bytes=%d-' % _down_size
+
+        _loop = asyncio.get_event_loop()
+        _url = url
+        for _i in range(cls.MAX_REDIRECTS + 1):
+            _conn_url = _url
+            _reader, _writer, _status, _reason, _res_headers = await cls._request(
+                _conn_url, _headers, timeout, verify, pool
+            )
+            _reusable = False  # 应答是否已完整读取, 连接可以重用
+            try:
+                if _status in (301, 302, 303, 307, 308) and _res_headers.get('Location', None):
+                    # 重定向, 跳转到其他主机时不送出身份信息
+                    _reusable = await cls._drain_body(_reader, _res_headers, timeout)
+                    _new_url = urljoin(_url, _res_headers['Location'])
+                    if urlparse(_new_url).netloc != urlparse(_url).netloc:
+                        _headers = dict([
+                            (_key, _val) for _key, _val in _headers.items()
+                            if _key.lower() not in cls.REDIRECT_STRIP_HEADERS
+                        ])
+                    _url = _new_url
+                    continue
+
+                _hasher = Tools.get_hasher(hash_name)
+                if _status >= 400:
+                    _reusable = await cls._drain_body(_reader, _res_headers, timeout)
+
+                if _status == 416 and _down_size > 0:
+                    # 临时文件已是完整文件(Content-Range: bytes */文件大小)
+                    _total = _res_headers.get('Content-Range', '').rpartition('/')[2].strip()
+                    if _total != str(_down_size):
+                        os.remove(_temp_file)
+                        raise ConnectionError('temp file size not match, will download again: %s' % url)
+                    if _hasher is not None:
+                        await _loop.run_in_executor(None, cls._update_hash, _hasher, _temp_file)
+                    os.replace(_temp_file, save_file)
+                    return cls._get_meta(_down_size, _hasher, hash_name)
+
+                if _status >= 400:
+                    raise urllib.error.HTTPError(_url, _status, _reason, _res_headers, None)
+
+                # 写入文件, 不支持续传的情况重新下载
+                _size = 0
+                if _status == 206 and _down_size > 0:
+                    _mode = 'ab'
+                    _size = _down_size
+                    if _hasher is not None:
+                        await _loop.run_in_executor(None, cls._update_hash, _hasher, _temp_file)
+                else:
+                    _mode = 'wb'
+
+                with open(_temp_file, _mode) as _file:
+                    _buffer = bytearray()
+                    async for _data in cls._iter_body(_reader, _res_headers, timeout):
+                        _buffer += _data
+                        _size += len(_data)
+                        if len(_buffer) >= cls.WRITE_SIZE:
+                            await _loop.run_in_executor(None, cls._write_block, _file, _hasher, bytes(_buffer))
+                            _buffer.clear()
+
+                    if len(_buffer) > 0:
+                        await _loop.run_in_executor(None, cls._write_block, _file, _hasher, bytes(_buffer))
+
+                _reusable = cls._is_length_known(_res_headers)
+                os.replace(_temp_file, save_file)
+                return cls._get_meta(_size, _hasher, hash_name)
+            finally:
+                if pool is not None and _reusable and cls._is_keep_alive(_res_headers):
+                    pool.put(_conn_url, _reader, _writer)
+                else:
+                    _writer.close()
+
+        raise urllib.error.HTTPError(url, 310, 'Too many redirects', Message(), None)
+
+    #############################
+    # 内部函数
+    #############################
+    @classmethod
+    def _update_hash(cls, hasher, file: str):
+        """
+        将已下载的文件内容加入哈希计算(续传的情况)
+
+        @param {object} hasher - 哈希对象
+        @param {str} file - 文件路径
+        """
+        with open(file, 'rb') as _file:
+            while True:
+                _data = _file.read(cls.BLOCK_SIZE)
+                if not _data:
+                    break
+                hasher.update(_data)
+
+    @classmethod
+    def _write_block(cls, file, hasher, data: bytes):
+        """
+        写入数据块并加入哈希计算(在线程池中执行)
+
+        @param {object} file - 文件对象
+        @param {object} hasher - 哈希对象, 不计算哈希值时为None
+        @param {bytes} data - 数据块
+        """
+        file.write(data)
+        if hasher is not None:
+            hasher.update(data)
+
+    @classmethod
+    def _get_meta(cls, size: int, hasher, hash_name: str) -> dict:
+        """
+        生成文件完整性信息
+
+        @param {int} size - 文件大小
+        @param {object} hasher - 哈希对象, 不计算哈希值时为None
+        @param {str} hash_name - 哈希算法
+
+        @returns {dict} - 文件完整性信息(size/hash)
+        """
+        return {
+            'size': size, 'hash': '' if hasher is None else '%s:%s' % (hash_name, hasher.hexdigest())
+        }
+
+    @classmethod
+    async def _open_connection(cls, url: str, timeout: float, verify: bool):
+        """
+        建立到url所在主机的连接
+
+        @param {str} url - 访问url
+        @param {float} timeout - 连接超时时间
+        @param {bool} verify - 是否进行ssl证书验证
+
+        @returns {tuple} - (StreamReader, StreamWriter)
+        """
+        _url_info = urlparse(url)
+        _ssl = None
+        if _url_info.scheme == 'https':
+            _ssl = ssl.create_default_context()
+            if not verify:
+                _ssl.check_hostname = False
+                _ssl.verify_mode = ssl.CERT_NONE
+
+        _port = _url_info.port
+        if _port is None:
+            _port = 443 if _url_info.scheme == 'https' else 80
+
+        return await asyncio.wait_for(
+            asyncio.open_connection(_url_info.hostname, _port, ssl=_ssl), timeout=timeout
+        )
+
+    @classmethod
+    async def _request(cls, url: str, headers: dict, timeout: float, verify: bool,
+                       pool: AsyncConnectionPool) -> tuple:
+        """
+        发送请求并读取应答头, 有连接池时优先使用空闲连接
+
+        @param {str} url - 访问url
+        @param {dict} headers - http协议头
+        @param {float} timeout - 连接及读取超时时间
+        @param {bool} verify - 是否进行ssl证书验证
+        @param {AsyncConnectionPool} pool - 连接池, 为None时使用独立的连接
+
+        @returns {tuple} - (StreamReader, StreamWriter, 状态码, 状态说明, 协议头Message对象)
+        """
+        _conn = None if pool is None else pool.get(url)
+        while True:
+            if _conn is None:
+                _reader, _writer = await cls._open_connection(url, timeout, verify)
+            else:
+                _reader, _writer = _conn
+
+            try:
+                cls._send_request(_writer, url, headers, keep_alive=(pool is not None))
+                _status, _reason, _res_headers = await cls._read_head(_reader, timeout)
+                return _reader, _writer, _status, _reason, _res_headers
+            except OSError:
+                _writer.close()
+                if _conn is None:
+                    raise
+
+                # 重用的空闲连接可能已被服务端关闭, 使用新连接重试
+                _conn = None
+            except:
+                _writer.close()
+                raise
+
+    @classmethod
+    def _send_request(cls, writer, url: str, headers: dict, keep_alive: bool = False):
+        """
+        发送GET请求
+
+        @param {StreamWriter} writer - 连接写入对象
+        @param {str} url - 访问url
+        @param {dict} headers - http协议头
+        @param {bool} keep_alive=False - 是否保持长连接
+        """
+        _url_info = urlparse(url)
+        # 路径中可能有中文等非ASCII字符, 按RFC 3986重新编码(已编码的部分保持不变)
+        _path = quote(_url_info.path or '/', safe=cls.PATH_SAFE_CHARS)
+        if _url_info.query != '':
+            _path = '%s?%s' % (_path, quote(_url_info.query, safe=cls.PATH_SAFE_CHARS))
+
+        # 主机名使用IDNA编码
+        _host = _url_info.hostname.encode('idna').decode('ascii')
+        if _host.find(':') >= 0:
+            _host = '[%s]' % _host  # IPv6地址
+        if _url_info.port is not None:
+            _host = '%s:%d' % (_host, _url_info.port)
+
+        _headers = {
+            'Host': _host,
+            'Accept-Encoding': 'identity',
+            'Connection': 'keep-alive' if keep_alive else 'close'
+        }
+        _headers.update(headers)
+        _lines = ['GET %s HTTP/1.1' % _path]
+        for _key, _val in _headers.items():
+            _lines.append('%s: %s' % (_key, _val))
+
+        writer.write(('\r\n'.join(_lines) + '\r\n\r\n').encode('latin-1'))
+
+    @classmethod
+    async def _read_head(cls, reader, timeout: float) -> tuple:
+        """
+        读取应答状态行及协议头
+
+        @param {StreamReader} reader - 连接读取对象
+        @param {float} timeout - 读取超时时间
+
+        @returns {tuple} - (状态码, 状态说明, 协议头Message对象)
+        """
+        _line = await asyncio.wait_for(reader.readline(), timeout=timeout)
+        _parts = _line.decode('latin-1').strip().split(' ', 2)
+        if len(_parts) < 2 or not _parts[0].startswith('HTTP/'):
+            raise ConnectionError('bad http status line: %s' % _line)
+
+        _headers = Message()
+        while True:
+            _line = await asyncio.wait_for(reader.readline(), timeout=timeout)
+            _line = _line.decode('latin-1').strip()
+            if _line == '':
+                break
+            _key, _, _val = _line.partition(':')
+            _headers[_key.strip()] = _val.strip()
+
+        if _parts[0] == 'HTTP/1.0' and _headers.get('Connection', '').lower() != 'keep-alive':
+            # HTTP/1.0默认不保持长连接
+            _headers['Connection'] = 'close'
+
+        return int(_parts[1]), (_parts[2] if len(_parts) > 2 else ''), _headers
+
+    @classmethod
+    def _is_length_known(cls, headers: Message) -> bool:
+        """
+        判断应答体是否有明确的结束位置(Content-Length或chunked), 读取到结束位置后连接可以重用
+
+        @param {Message} headers - 应答协议头
+
+        @returns {bool} - 是否有明确的结束位置
+        """
+        return (
+            headers.get('Transfer-Encoding', '').lower() == 'chunked'
+            or headers.get('Content-Length', None) is not None
+        )
+
+    @classmethod
+    def _is_keep_alive(cls, headers: Message) -> bool:
+        """
+        判断服务端是否保持长连接
+
+        @param {Message} headers - 应答协议头
+
+        @returns {bool} - 是否保持长连接
+        """
+        return headers.get('Connection', '').lower() != 'close'
+
+    @classmethod
+    async def _drain_body(cls, reader, headers: Message, timeout: float) -> bool:
+        """
+        读取并丢弃不需要的应答体(重定向及错误应答), 以便重用连接
+
+        @param {StreamReader} reader - 连接读取对象
+        @param {Message} headers - 应答协议头
+        @param {float} timeout - 每次读取的超时时间
+
+        @returns {bool} - 是否已完整读取应答体, 应答体过大或读取失败返回False
+        """
+        if not cls._is_length_known(headers):
+            return False
+
+        _length = headers.get('Content-Length', None)
+        if _length is not None and int(_length) > cls.MAX_DRAIN_SIZE:
+            return False
+
+        _size = 0
+        try:
+            async for _data in cls._iter_body(reader, headers, timeout):
+                _size += len(_data)
+                if _size > cls.MAX_DRAIN_SIZE:
+                    return False
+        except (OSError, asyncio.TimeoutError, ValueError):
+            return False
+
+        return True
+
+    @classmethod
+    async def _iter_body(cls, reader, headers: Message, timeout: float):
+        """
+        逐块读取应答体
+
+        @param {StreamReader} reader - 连接读取对象
+        @param {Message} headers - 应答协议头
+        @param {float} timeout - 每次读取的超时时间
+
+        @returns {async_generator} - 每次返回一块数据
+        """
+        if headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                _line = await asyncio.wait_for(reader.readline(), timeout=timeout)
+                _size = int(_line.split(b';')[0].strip(), 16)
+                if _size == 0:
+                    # 读取结尾的trailer协议头直到空行, 保证连接可以重用
+                    while True:
+                        _line = await asyncio.wait_for(reader.readline(), timeout=timeout)
+                        if _line.strip() == b'':
+                            break
+                    break
+                _left = _size
+                while _left > 0:
+                    _data = await asyncio.wait_for(
+                        reader.read(min(_left, cls.BLOCK_SIZE)), timeout=timeout
+                    )
+                    if not _data:
+                        raise ConnectionError('connection closed before body end')
+                    _left -= len(_data)
+                    yield _data
+                await asyncio.wait_for(reader.readline(), timeout=timeout)  # 块结尾的换行
+            return
+
+        _length = headers.get('Content-Length', None)
+        _left = None if _length is None else int(_length)
+        while _left is None or _left > 0:
+            _data = await asyncio.wait_for(
+                reader.read(cls.BLOCK_SIZE if _left is None else min(_left, cls.BLOCK_SIZE)),
+                timeout=timeout
+            )
+            if not _data:
+                if _left is None:
+                    break
+                raise ConnectionError('connection closed before body end')
+            if _left is not None:
+                _left -= len(_data)
+            yield _data
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    # 打印版本信息
+    print(('模块名：%s  -  %s\n'
+           '作者：%s\n'
+           '发布日期：%s\n'
+           '版本：%s' % (__MOUDLE__, __DESCRIPT__, __AUTHOR__, __PUBLISH__, __VERSION__)))
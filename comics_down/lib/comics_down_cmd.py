@@ -472,8 +472,10 @@ class ComicsDownCmd(CmdBaseFW):
         # 根据参数启动下载任务
         _job_manager: JobManager = self._console_global_para['job_manager']
         try:
-            _infos = _job_manager.get_down_index_info(_para_dict['name'], _para_dict['path'])
             _type = _para_dict.get('type', 'info')
+            _infos = _job_manager.get_down_index_info(
+                _para_dict['name'], _para_dict['path'], with_files=(_type == 'files')
+            )
             if _type == 'vols':
                 # 显示卷信息
                 for _vol_num, _vol_info in _infos['down_list'].items():
@@ -21,10 +21,21 @@ import threading
 import traceback
 import subprocess
 import uuid
+import queue
+import heapq
+import random
+import asyncio
+import hashlib
+import functools
+import concurrent.futures
 try:
     import chardet
 except:
     pass
+try:
+    import xxhash
+except:
+    xxhash = None
 from urllib.parse import urlparse
 from HiveNetLib.simple_webdriver import EnumWebDriverType
 from HiveNetLib.base_tools.run_tool import RunTool
@@ -37,6 +48,9 @@ from HiveNetLib.simple_parallel import ParallelPool, ThreadParallel, ThreadParal
 # 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
 sys.path.append(os.path.abspath(os.path.join(
     os.path.dirname(__file__), os.path.pardir, os.path.pardir)))
+from comics_down.lib.task_store import BaseTaskStoreFW, XmlTaskStore, TaskStoreManager, TaskStatusFile
+from comics_down.lib.host_limiter import HostRateLimiter
+from comics_down.lib.dedup_store import DedupStore
 
 
 __MOUDLE__ = 'core'  # 模块名
@@ -73,12 +87,15 @@ __PUBLISH__ = '2020.02.29'  # 发布日期
 #         vol_num : 最大卷号
 #         vol_num_dict : 卷名和卷id的对应关系字典字符串（json格式字符串）
 #         vol_next_url : 处理卷目录时如果存在多页的情况，在一页成功后传入下一页的url
+#         pending_vols : 未完成下载的卷id清单（json格式字符串）, 续传和重试时只处理这些卷
 #     down_list : 下载清单
 #         vol_[num] : 卷id
 #             name : 卷名(也是卷目录名)
 #             url : 目录对应的浏览url
 #             status : 下载状态, listing-正在获取清单, downloading-正在下载, done-下载完成
 #             file_num : 最大文件号
+#             page_fingerprint : 上次成功解析时卷页面(或页面相关区域)的指纹, 网站驱动不支持时为空
+#             files_fingerprint : 上次成功解析时文件清单的指纹, 刷新时指纹一致将跳过该卷的处理
 #             files : 要下载的文件清单
 #                 file_[num] : 文件标识
 #                     name : 文件名
@@ -86,6 +103,8 @@ __PUBLISH__ = '2020.02.29'  # 发布日期
 #                     status : 下载状态, err, done
 #                     downtype : 下载类型，目前支持：http, ftp
 #                     extend_json : 与下载相关的扩展json字典
+#                     size : 下载完成的文件大小(下载驱动返回时登记)
+#                     hash : 下载完成的文件哈希值, 格式为 算法:值, 例如 sha1:xxx(下载驱动返回时登记)
 #     error : 本次处理的异常信息（每次启动会删除）
 #         vol_[num]
 #             name : 卷名(也是卷目录名)
@@ -94,6 +113,15 @@ __PUBLISH__ = '2020.02.29'  # 发布日期
 #                 file_[num] : 文件标识
 #                     name : 文件名
 #                     url : 下载的url
+#
+# 下载过程中文件的状态变更先追加到同目录的 down.progress.log 进度日志中,
+# 定期(journal_compact_interval)及下载结束时再合并到 down.xml, 格式参考 task_journal 模块
+#
+# 可以通过 task_store_type 参数指定下载任务状态的存储方式(xml/sqlite), 使用sqlite时保存为同目录的
+# down.db, 数据结构与 down.xml 一致, 参考 task_store 模块
+#
+# 任务状态的汇总信息(name/url/status/files/success)同时保存在同目录的 down.status.json 中,
+# 用于快速查询任务状态
 #############################
 
 
@@ -156,7 +184,24 @@ class Tools(object):
             'downtype_mapping': '',
             'down_proxy': '',
             'down_cookie': '',
-            'debug_path': ''
+            'debug_path': '',
+            'journal_compact_interval': '60',
+            'task_store_type': '',
+            'save_interval': '1000',
+            'max_attempts': '3',
+            'retry_delay': '1000',
+            'host_rate': '0',
+            'host_burst': '0',
+            'host_max_conn': '0',
+            'down_engine': 'thread',
+            'aria2_rpc_url': 'http://127.0.0.1:6800/jsonrpc',
+            'aria2_rpc_secret': '',
+            'aria2_rpc_start': 'y',
+            'segment_num': '4',
+            'segment_min_size': '16',
+            'down_hash': 'sha1',
+            'dedup_store': 'n',
+            'page_cache': 'n'
         }
         _para_dict.update(para_dict)
         return _para_dict
@@ -238,6 +283,26 @@ class Tools(object):
 
         return _cookie
 
+    @classmethod
+    def get_hasher(cls, name: str):
+        """
+        获取边下载边计算文件哈希值的哈希对象
+
+        @param {str} name - 哈希算法, 支持hashlib的算法(如sha1/md5)及xxhash的算法(如xxh64, 需安装xxhash),
+            传''或none代表不计算哈希值
+
+        @returns {object} - 哈希对象(支持update/hexdigest), 不计算时返回None
+        """
+        if name in ('', 'none'):
+            return None
+
+        if name.startswith('xxh'):
+            if xxhash is None:
+                raise ImportError('xxhash not installed, can not use hash algorithm: %s' % name)
+            return getattr(xxhash, name)()
+
+        return hashlib.new(name)
+
     #############################
     # 通用网站驱动配置相关函数
     #############################
@@ -364,6 +429,10 @@ class Tools(object):
 
             _infos['subsite'] = _subsite
 
+            # 下载主机的限制参数
+            if _infos.get('down_limits', None) in (None, ''):
+                _infos['down_limits'] = {}
+
             for _site in _subsite:
                 _configs['mapping'][_site.upper()] = [_uuid, 'n']
 
@@ -400,6 +469,30 @@ class Tools(object):
             with open(_configs_file, 'w', encoding='utf-8') as _f:
                 _f.write(json.dumps(_configs, ensure_ascii=False, indent=2))
 
+    @classmethod
+    def get_common_website_down_limits(cls) -> dict:
+        """
+        获取通用网站配置中指定的下载主机限制参数
+
+        @returns {dict} - key为下载主机名(小写), value为限制参数字典(rate/burst/max_conn)
+        """
+        _limits = dict()
+        _configs = cls.get_common_website_configs()
+        for _key, _value in _configs.items():
+            if _key == 'mapping':
+                continue
+
+            for _infos in _value.values():
+                _down_limits = _infos.get('down_limits', None)
+                if _down_limits is None or _down_limits == '':
+                    continue
+
+                for _host, _host_limits in _down_limits.items():
+                    if isinstance(_host_limits, dict):
+                        _limits[_host.lower()] = _host_limits
+
+        return _limits
+
     #############################
     # 内部函数
     #############################
@@ -651,10 +744,173 @@ class DriverManager(object):
         return _down_driver_dict[_downtype]
 
 
+class DownTask(object):
+    """
+    下载队列中的下载任务记录
+    注：使用__slots__减少超大任务时队列的内存占用, 卷标识、卷名、下载类型等重复值使用驻留字符串,
+        扩展信息在入队前解析为字典并在相同内容的任务间共用(驱动不应修改该字典)
+    """
+
+    __slots__ = (
+        'vol_num', 'file_num', 'vol_name', 'file_name', 'url', 'downtype', 'extend_json', 'attempts'
+    )
+
+    def __init__(self, vol_num: str, file_num: str, vol_name: str, file_name: str, url: str,
+                 downtype: str, extend_json: dict = None):
+        """
+        构造函数
+
+        @param {str} vol_num - 卷标识
+        @param {str} file_num - 文件标识
+        @param {str} vol_name - 卷名
+        @param {str} file_name - 文件名
+        @param {str} url - 文件下载url
+        @param {str} downtype - 下载类型
+        @param {dict} extend_json=None - 已解析的下载扩展信息
+        """
+        self.vol_num = vol_num
+        self.file_num = file_num
+        self.vol_name = vol_name
+        self.file_name = file_name
+        self.url = url
+        self.downtype = downtype
+        self.extend_json = extend_json
+        self.attempts = 0  # 已执行下载的次数
+
+
+class DownTaskQueue(MemoryQueue):
+    """
+    下载任务队列
+    注：1、在下载任务生产线程遍历下载清单的过程中保持队列长度非0, 避免并发池在任务尚未全部放入队列时自动停止
+        2、支持延迟放入的任务(失败重试), 到期后在获取任务时放回队列, 存在延迟任务时同样保持队列长度非0
+        3、取出的任务在调用task_done前视为正在处理, 同样保持队列长度非0(处理失败可能放入延迟任务)
+    """
+
+    def __init__(self, **kwargs):
+        """
+        构造函数
+
+        @param {**kwargs} kwargs - 队列初始化参数, 参考MemoryQueue
+        """
+        super().__init__(**kwargs)
+        self.producing = False  # 是否正在生产下载任务
+        self._delayed = list()  # 延迟任务的堆, 元素为(到期时间, 序号, 任务)
+        self._delayed_seq = 0
+
+    @property
+    def delayed_num(self) -> int:
+        """
+        等待放回队列的延迟任务数
+
+        @property {int}
+        """
+        return len(self._delayed)
+
+    def qsize(self, **kwargs):
+        """
+        返回队列长度(生产任务过程中、存在延迟任务或正在处理的任务时额外加1)
+
+        @returns {int} - 返回当前队列长度
+        """
+        with self.mutex:
+            _size = self._qsize(**kwargs)
+            if self.producing or len(self._delayed) > 0 or self.unfinished_tasks > _size:
+                _size += 1
+
+        return _size
+
+    def put_delayed(self, item, delay: float):
+        """
+        延迟指定时间后将对象放入队列
+
+        @param {object} item - 要放进队列中的对象
+        @param {float} delay - 延迟时间, 单位为秒
+        """
+        with self.mutex:
+            heapq.heappush(self._delayed, (time.time() + delay, self._delayed_seq, item))
+            self._delayed_seq += 1
+
+    def get(self, block=True, timeout=None, **kwargs):
+        """
+        从队列中获取对象(先将已到期的延迟任务放回队列)
+        注：阻塞等待过程中如果有延迟任务到期, 会在到期时放回队列并返回
+
+        @param {bool} block=True - 是否阻塞，如果为True则待真正获取到数据才返回
+        @param {number} timeout=None - 阻塞超时时间，单位为秒
+        @param {**kwargs} kwargs - 其他获取参数，参考MemoryQueue
+
+        @throws {queue.Empty} - 遇到队列为空时，非阻塞模式直接抛出异常，阻塞模式超时后抛出异常
+        """
+        if not block:
+            self._move_due_items(**kwargs)
+            return super().get(block=False, **kwargs)
+
+        _endtime = None if timeout is None else time.time() + timeout
+        while True:
+            self._move_due_items(**kwargs)
+            _wait = None if _endtime is None else max(_endtime - time.time(), 0)
+            if len(self._delayed) > 0:
+                _due_wait = max(self._delayed[0][0] - time.time(), 0)
+                _wait = _due_wait if _wait is None else min(_wait, _due_wait)
+
+            try:
+                return super().get(block=True, timeout=_wait, **kwargs)
+            except queue.Empty:
+                if _endtime is not None and time.time() >= _endtime:
+                    raise
+
+    def clear(self, **kwargs):
+        """
+        清空队列(包括延迟任务和未完成任务计数)
+        """
+        with self.mutex:
+            self._delayed.clear()
+            self.unfinished_tasks = 0
+
+        super().clear(**kwargs)
+
+    def is_all_done(self) -> bool:
+        """
+        判断所有任务是否已处理完成
+        注：要求处理完每个任务后调用task_done, 需在放入延迟任务后再调用task_done
+
+        @returns {bool} - 生产结束、没有延迟任务且所有放入的任务都已调用task_done时返回True
+        """
+        with self.mutex:
+            return not self.producing and len(self._delayed) == 0 and self.unfinished_tasks == 0
+
+    def _move_due_items(self, **kwargs):
+        """
+        将已到期的延迟任务放回队列
+        注：延迟任务数量不超过下载线程数, 放回时不受队列最大长度限制
+        """
+        if len(self._delayed) == 0:
+            return
+
+        with self.mutex:
+            _now = time.time()
+            while len(self._delayed) > 0 and self._delayed[0][0] <= _now:
+                self._put(heapq.heappop(self._delayed)[2], **kwargs)
+                self.unfinished_tasks += 1
+                self.not_empty.notify()
+
+
 class DownloadManager(object):
     """
     下载管理器（下载已完成资源下载清单获取的内容）
     """
+
+    # 下载队列的最大长度, 生产线程在队列满时等待, 控制超大任务的内存占用
+    QUEUE_MAXSIZE = 5000
+
+    # 失败重试的最大延迟时间, 单位为秒
+    RETRY_MAX_DELAY = 60.0
+
+    # 下载工作线程获取任务的阻塞等待时间, 单位为秒
+    QUEUE_GET_TIMEOUT = 0.5
+
+    # 异步下载引擎执行同步下载驱动的最大线程数
+    ASYNC_EXECUTOR_MAXSIZE = 32
     #############################
     # 静态方法
     #############################
@@ -682,102 +938,47 @@ class DownloadManager(object):
         @return {SimpleXml} - 返回配置文件
         """
         _path = os.path.realpath(os.path.join(path, name))
-        _conf_file = os.path.join(_path, 'down.xml')
-        _xml_doc = None
-        if os.path.exists(_conf_file):
-            # 配置文件已存在，直接获取
-            _xml_doc = SimpleXml(
-                _conf_file, obj_type=EnumXmlObjType.File,
-                encoding='utf-8', use_chardet=False,
-                remove_blank_text=True
-            )
-        else:
-            # 配置不存在，新增配置文件
-            _xml_str = u"""
-            <down_task>
-            </down_task>
-            """
-
-            _xml_doc = SimpleXml(
-                _xml_str, obj_type=EnumXmlObjType.String, encoding='utf-8', use_chardet=False,
-                remove_blank_text=True
-            )
-            _xml_doc.set_value('/down_task/info/name', name)
-            _xml_doc.set_value('/down_task/info/url', url)
-            _xml_doc.set_value('/down_task/info/status', 'downloading')
-            _xml_doc.set_value('/down_task/info/vol_info_ok', 'n')
-            _xml_doc.set_value('/down_task/info/file_info_ok', 'n')
-            _xml_doc.set_value('/down_task/info/files', '0')
-            _xml_doc.set_value('/down_task/info/success', '0')
-            _xml_doc.set_value('/down_task/info/vol_num', '0')
-            _xml_doc.set_value('/down_task/info/vol_num_dict', '{}')
-            _xml_doc.set_value('/down_task/info/vol_next_url', '')
-
-            # 保存文件
-            if not os.path.exists(_path):
-                FileTool.create_dir(_path, exist_ok=True)
-
-            _xml_doc.save(
-                file=_conf_file, encoding='utf-8', pretty_print=True
-            )
+        return XmlTaskStore.open_store(_path, name, url=url).xml_doc
 
-            # 重新加载
-            _xml_doc = SimpleXml(
-                _conf_file, obj_type=EnumXmlObjType.File,
-                encoding='utf-8', use_chardet=False,
-                remove_blank_text=True
-            )
+    @staticmethod
+    def get_down_task_store(path: str, name, url='', store_type: str = '', para_dict: dict = None) -> BaseTaskStoreFW:
+        """
+        创建或获取下载任务状态存储对象
+
+        @param {str} path - 保存目录, 不含漫画名(漫画目录)
+        @param {str} name - 漫画名(实际的漫画目录名)
+        @param {string} url='' - 漫画所在目录索引的url
+        @param {str} store_type='' - 存储类型, xml/sqlite, 不传代表使用已存在的存储类型(新任务默认为xml)
+        @param {dict} para_dict=None - 扩展参数, 任务的执行参数都会传进来
 
-        # 返回获取到的配置文件对象
-        return _xml_doc
+        @return {BaseTaskStoreFW} - 返回任务状态存储对象
+        """
+        _path = os.path.realpath(os.path.join(path, name))
+        return TaskStoreManager.open_store(
+            _path, name, url=url, store_type=store_type, para_dict=para_dict
+        )
 
     @staticmethod
-    def add_vol_to_down_task_conf(xml_doc: SimpleXml, vol_name: str, url: str, status='listing'):
+    def add_vol_to_down_task_conf(task_store: BaseTaskStoreFW, vol_name: str, url: str, status='listing'):
         """
-        将卷信息加入到任务配置文件
+        将卷信息加入到任务配置（注意该方法不保存配置）
 
-        @param {SimpleXml} xml_doc - 配置文件对象
+        @param {BaseTaskStoreFW} task_store - 任务状态存储对象
         @param {str} vol_name - 卷名
         @param {str} url - 浏览该卷漫画的url
         @param {str} status='listing' - 状态
 
         @return {str} - 返回配置中的卷标识（vol_num）
         """
-        # 获取卷标识, 并将卷最大数字+1
-        _current_vol_num = int(xml_doc.get_value('/down_task/info/vol_num'))
-        _vol_num = 'vol_%d' % _current_vol_num
-        _current_vol_num += 1
-        xml_doc.set_value('/down_task/info/vol_num', str(_current_vol_num))
-
-        # 设置卷配置
-        _xpath = '/down_task/down_list/%s' % _vol_num
-        xml_doc.set_value('%s/name' % _xpath, vol_name)
-        xml_doc.set_value('%s/url' % _xpath, url)
-        xml_doc.set_value('%s/status' % _xpath, status)
-        xml_doc.set_value('%s/file_num' % _xpath, '0')
-
-        # 设置字典映射关系
-        _vol_num_dict = json.loads(xml_doc.get_value('/down_task/info/vol_num_dict', default='{}'))
-
-        _vol_num_dict[vol_name] = _vol_num
-        xml_doc.set_value(
-            '/down_task/info/vol_num_dict',
-            json.dumps(_vol_num_dict, ensure_ascii=False)
-        )
-
-        # 保存
-        xml_doc.save(pretty_print=True)
-
-        # 返回处理结果
-        return _vol_num
+        return task_store.add_vol(vol_name, url, status=status)
 
     @staticmethod
-    def add_file_to_down_task_conf(xml_doc: SimpleXml, vol_num: str, file_num: str,
+    def add_file_to_down_task_conf(task_store: BaseTaskStoreFW, vol_num: str, file_num: str,
                                    file_name: str, url: str, downtype: str, extend_json: dict = None):
         """
-        将文件信息加入到任务配置文件（注意该方法不保存配置）
+        将文件信息加入到任务配置（注意该方法不保存配置）
 
-        @param {SimpleXml} xml_doc - 配置文件对象
+        @param {BaseTaskStoreFW} task_store - 任务状态存储对象
         @param {str} vol_num - 卷标识
         @param {str} file_num - 文件标识
         @param {str} file_name - 文件名
@@ -785,24 +986,48 @@ class DownloadManager(object):
         @param {str} downtype - 下载类型
         @param {dict} extend_json=None - 要送入下载驱动的扩展信息
         """
-        _xpath = '/down_task/down_list/%s/files/%s' % (vol_num, file_num)
-        xml_doc.set_value('%s/name' % _xpath, file_name)
-        xml_doc.set_value('%s/url' % _xpath, url)
-        xml_doc.set_value('%s/status' % _xpath, '')
-        xml_doc.set_value('%s/downtype' % _xpath, downtype)
-        if extend_json is not None:
-            xml_doc.set_value(
-                '%s/extend_json' % _xpath, json.dumps(extend_json, ensure_ascii=False)
-            )
+        task_store.add_file(
+            vol_num, file_num, file_name, url, downtype, extend_json=extend_json
+        )
+
+    @staticmethod
+    def is_retryable_error(error: Exception) -> bool:
+        """
+        判断下载异常是否为可重试的临时性异常(超时、连接失败、5xx或429应答)
+
+        @param {Exception} error - 下载驱动抛出的异常对象
+
+        @returns {bool} - 是否可重试
+        """
+        if error is None:
+            return False
+
+        # 带http状态码的异常(urllib的HTTPError/requests的HTTPError)
+        _status_code = HostRateLimiter.get_status_code(error)
+        if _status_code is not None:
+            return _status_code >= 500 or _status_code == 429
+
+        # 超时及连接异常(包括urllib的URLError包装的异常)
+        if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)) or isinstance(
+            getattr(error, 'reason', None), (TimeoutError, ConnectionError)
+        ):
+            return True
+
+        # requests等第三方库的超时、连接及传输中断异常, 按类名判断避免引入依赖
+        for _class in type(error).__mro__:
+            if _class.__name__.endswith(('Timeout', 'ConnectionError', 'ChunkedEncodingError', 'IncompleteRead')):
+                return True
+
+        return False
 
     #############################
     # 需要初始化处理的方法
     #############################
-    def __init__(self, xml_doc, **para_dict):
+    def __init__(self, task_store: BaseTaskStoreFW, **para_dict):
         """
         构造函数
 
-        @param {SimpleXml} xml_doc - 下载配置文件的操作对象
+        @param {BaseTaskStoreFW} task_store - 下载任务状态存储对象
         @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来
         """
         # 尝试获取全局的打印函数，用于兼容命令行的情况，如果获取不到则采用系统自带打印函数
@@ -811,7 +1036,7 @@ class DownloadManager(object):
             self.print = print
 
         # 参数处理
-        self.xml_doc = xml_doc
+        self.task_store = task_store
         self.para_dict = para_dict
         _downtype_mapping = para_dict.get('downtype_mapping', '{}')
         if _downtype_mapping == '':
@@ -822,7 +1047,34 @@ class DownloadManager(object):
         self.listing_vol = 0  # 没有正确获取到文件清单的卷数
 
         self.down_vol_info = dict()  # 用于登记每个卷下载图片数的字典
-        self.down_queue = MemoryQueue()  # 下载下载任务的队列
+        self.down_queue = DownTaskQueue(maxsize=self.QUEUE_MAXSIZE)  # 下载下载任务的队列
+        self._producer_thread = None  # 下载任务生产线程
+        self._producer_started = threading.Event()  # 已放入第一个任务或已遍历完成的通知
+        self._stop_producer = False  # 通知生产线程停止
+        self._extend_json_cache = dict()  # 扩展信息字符串与解析后字典的对应关系, 相同内容共用一个字典
+
+        # 失败重试参数
+        self.max_attempts = max(1, int(para_dict.get('max_attempts', '3')))  # 每个文件的最大下载次数
+        self.retry_delay = float(para_dict.get('retry_delay', '1000')) / 1000.0  # 首次重试的延迟秒数
+
+        # 按主机的限速及并发连接控制(可选), 特定主机的参数在通用网站配置的down_limits中指定
+        self.host_limiter = HostRateLimiter(
+            rate=float(para_dict.get('host_rate', '0')),
+            burst=int(para_dict.get('host_burst', '0')),
+            max_conn=int(para_dict.get('host_max_conn', '0')),
+            host_limits=Tools.get_common_website_down_limits()
+        )
+
+        # 下载驱动的会话对象(在任务所有下载线程间共用), key为驱动类
+        self._driver_sessions = dict()
+
+        # 内容寻址的去重存储(可选), 放在下载保存目录下, 所有下载任务共用
+        self.dedup_store = None
+        if para_dict.get('dedup_store', 'n') == 'y':
+            self.dedup_store = DedupStore(para_dict['path'], hash_name=para_dict.get('down_hash', 'sha1'))
+
+        # 任务全部处理完成的通知
+        self._down_finished = threading.Event()
         self.down_info = {
             'name': '',  # 漫画名
             'status': 'downloading',  # 状态包括 downloading-正在下载,done-完成下载, error-出现异常
@@ -834,6 +1086,8 @@ class DownloadManager(object):
         }  # 下载信息
 
         self.down_driver_dict = RunTool.get_global_var('DOWN_DRIVER_DICT')
+        self.status_file_interval = 1.0  # 下载过程中更新状态摘要文件的最小间隔时间(秒)
+        self._last_status_file_time = 0
 
     def start_download(self):
         """
@@ -848,11 +1102,11 @@ class DownloadManager(object):
             'task': 0,
             'task_fail': 0
         })
-        self.down_info['name'] = self.xml_doc.get_value('/down_task/info/name')
-        self.down_info['files'] = int(self.xml_doc.get_value('/down_task/info/files'))
-        self.down_info['success'] = int(self.xml_doc.get_value('/down_task/info/success'))
+        self.down_info['name'] = self.task_store.get_info('name')
+        self.down_info['files'] = int(self.task_store.get_info('files'))
+        self.down_info['success'] = int(self.task_store.get_info('success'))
 
-        # 将下载任务放入队列
+        # 启动线程将下载任务放入队列, 放入第一个任务即可开始下载
         self._add_down_task_to_queue()
 
         # 检查下载队列情况
@@ -860,6 +1114,17 @@ class DownloadManager(object):
             # 没有待下载数据
             return
 
+        if self.para_dict.get('down_engine', 'thread') == 'async':
+            # 异步下载引擎
+            try:
+                self._run_async_engine()
+            finally:
+                self._close_driver_sessions()
+                self.task_store.save()
+
+            self._check_down_status()
+            return
+
         # 创建进程池
         self.pool = ParallelPool(
             deal_fun=self._down_worker_fun,
@@ -877,8 +1142,16 @@ class DownloadManager(object):
         self.pool.start()
 
         # 等待任务结束
-        while not self.pool.is_stop:
-            time.sleep(1)
+        try:
+            while not self.pool.is_stop:
+                if self._down_finished.wait(timeout=1):
+                    # 所有任务已处理完成, 直接停止并发池
+                    self.stop_download(overtime=float(self.para_dict['down_overtime']))
+                    break
+        finally:
+            # 释放下载驱动会话, 将下载过程中的状态变更保存到存储
+            self._close_driver_sessions()
+            self.task_store.save()
 
         # 再次检查任务
         self._check_down_status()
@@ -892,6 +1165,7 @@ class DownloadManager(object):
 
         @returns {bool} - 停止结果，True-成功，False-停止失败，超时返回
         """
+        self._stop_producer = True
         if self.pool is None:
             return True
 
@@ -914,12 +1188,12 @@ class DownloadManager(object):
         """
         if self.down_queue.empty():
             # 已经没有下载文件了，先更新数据
-            self.xml_doc.set_value('/down_task/info/success', str(self.down_info['success']))
+            self.task_store.set_info('success', str(self.down_info['success']))
 
             if self.down_info['files'] == self.down_info['success'] and self.listing_vol == 0:
                 # 任务已完成
                 self.down_info['status'] = 'done'
-                self.xml_doc.set_value('/down_task/info/status', 'done')
+                self.task_store.set_info('status', 'done')
 
                 # 看是否删除wget临时文件
                 if self.para_dict['remove_wget_tmp'] == 'y':
@@ -930,11 +1204,25 @@ class DownloadManager(object):
                 self.down_info['msg'] = _('no files for download, but job not done!')
 
             # 保存
-            self.xml_doc.save(pretty_print=True)
+            self.task_store.save()
             return False
         else:
             return True
 
+    def _update_status_file(self):
+        """
+        按间隔时间更新状态摘要文件(down.status.json), 供状态查询使用
+        """
+        _now = time.time()
+        if _now - self._last_status_file_time < self.status_file_interval:
+            return
+
+        self._last_status_file_time = _now
+        _status = self.task_store.get_status_dict()
+        _status['status'] = self.down_info['status']
+        _status['success'] = self.down_info['success']
+        TaskStatusFile.write(self.task_store.task_path, _status)
+
     def _remove_wget_tmp(self):
         """
         删除wget下载失败时的临时文件
@@ -945,173 +1233,512 @@ class DownloadManager(object):
             with_sub_path=True
         )
 
+    def _get_shared_extend_json(self, extend_json: str):
+        """
+        获取解析后的下载扩展信息(相同内容的扩展信息共用同一个字典)
+
+        @param {str} extend_json - 下载扩展信息json字符串
+
+        @returns {dict} - 解析后的扩展信息, 无扩展信息时返回None
+        """
+        if extend_json is None or extend_json == '':
+            return None
+
+        _json = self._extend_json_cache.get(extend_json, None)
+        if _json is None:
+            _json = json.loads(extend_json)
+            self._extend_json_cache[extend_json] = _json
+
+        return _json
+
     def _add_down_task_to_queue(self):
         """
-        将下载任务放入队列
+        启动下载任务生产线程, 边遍历下载清单边将下载任务放入队列
+        注：等待放入第一个任务或遍历完成后返回
         """
         # 清除队列
         self.down_queue.clear()
         self.down_vol_info.clear()
         self.listing_vol = 0
+        self._down_finished.clear()
+
+        # 启动生产线程
+        self._stop_producer = False
+        self._producer_started.clear()
+        self.down_queue.producing = True
+        self._producer_thread = threading.Thread(
+            target=self._down_task_producer_fun, name='DownTaskProducer', daemon=True
+        )
+        self._producer_thread.start()
+        self._producer_started.wait()
 
-        # 遍历所有卷加入下载任务
-        _vol_num_dict = self.xml_doc.get_value('/down_task/info/vol_num_dict')
-        if _vol_num_dict == '':
-            _vol_num_dict = dict()
-        else:
-            _vol_num_dict = eval(_vol_num_dict)
+    def _down_task_producer_fun(self):
+        """
+        下载任务生产线程函数, 遍历下载清单将待下载文件放入队列
+        """
+        try:
+            for _vol_num, _vol_info, _file, _file_info in self.task_store.iter_pending_tasks():
+                if self._stop_producer:
+                    break
 
-        for _vol_name in _vol_num_dict.keys():
-            _vol_num = _vol_num_dict[_vol_name]
-            _vol_status = self.xml_doc.get_value('/down_task/down_list/%s/status' % _vol_num)
+                if _file is None:
+                    # 卷遍历结束
+                    self._deal_vol_listed(_vol_num, _vol_info)
+                    continue
 
-            if _vol_status == 'listing':
-                # 文件清单没有完成处理
-                self.listing_vol += 1
-                continue
+                # 添加到任务统计及卷的统计信息中
+                self.lock.acquire()
+                try:
+                    self.down_vol_info.setdefault(
+                        _vol_num, {'down': 0, 'success': 0, 'listed': False}
+                    )['down'] += 1
+                    self.down_info['task'] += 1
+                finally:
+                    self.lock.release()
+
+                _task = DownTask(
+                    sys.intern(_vol_num), sys.intern(_file), sys.intern(_vol_info['name']),
+                    _file_info['name'], _file_info['url'], sys.intern(_file_info['downtype']),
+                    extend_json=self._get_shared_extend_json(_file_info['extend_json'])
+                )
+                while not self._stop_producer:
+                    try:
+                        self.down_queue.put(_task, timeout=1)
+                        break
+                    except queue.Full:
+                        continue
 
-            elif _vol_status == 'done':
-                # 已完成，不处理
-                continue
+                self._producer_started.set()
+        except:
+            self.print('%s:\n%s' % (_('Add down task to queue error'), traceback.format_exc()))
+        finally:
+            self.down_queue.producing = False
+            self._producer_started.set()
+            if self.down_queue.is_all_done():
+                self._down_finished.set()
 
-            _file_list = self.xml_doc.to_dict('/down_task/down_list/%s/files' % _vol_num)['files']
-            if type(_file_list) == str:
-                # 没有要下载的文件
-                continue
+    def _deal_vol_listed(self, vol_num: str, vol_info: dict):
+        """
+        卷的待下载文件全部放入队列后的处理
 
-            self.down_vol_info[_vol_num] = {
-                'down': 0,
-                'success': 0
-            }
+        @param {str} vol_num - 卷标识
+        @param {dict} vol_info - 卷信息字典
+        """
+        if vol_info['status'] == 'listing':
+            # 文件清单没有完成处理
+            self.listing_vol += 1
+            return
+        elif vol_info['status'] == 'done' or vol_info['file_num'] in ('', '0'):
+            # 已完成或没有要下载的文件，不处理
+            return
 
-            # 添加文件到队列
-            for _file in _file_list.keys():
-                if _file_list[_file]['status'] == 'done':
-                    continue
+        self.lock.acquire()
+        try:
+            _vol_stat = self.down_vol_info.setdefault(
+                vol_num, {'down': 0, 'success': 0, 'listed': False}
+            )
+            _vol_stat['listed'] = True
+            if _vol_stat['success'] == _vol_stat['down']:
+                # 没有待下载文件或已全部下载完成
+                self.task_store.set_vol_status(vol_num, 'done')
+        finally:
+            self.lock.release()
+
+    def _get_retry_delay(self, attempts: int) -> float:
+        """
+        获取失败重试的延迟时间(指数退避并加入随机抖动, 避免同时失败的任务同时重试)
+
+        @param {int} attempts - 已执行下载的次数
+
+        @returns {float} - 延迟时间, 单位为秒
+        """
+        _delay = min(self.retry_delay * (2 ** (attempts - 1)), self.RETRY_MAX_DELAY)
+        return random.uniform(_delay / 2, _delay)
 
-                # 0-卷id，1-文件id，2-卷名，3-文件名，4-文件下载url，5-下载类型, 6-下载扩展json字符串
-                _file_name = _file_list[_file]['name']
-                self.down_queue.put([
-                    _vol_num, _file, _vol_name, _file_name,
-                    _file_list[_file]['url'], _file_list[_file]['downtype'],
-                    _file_list[_file].get('extend_json', '')
-                ])
+    def _acquire_host(self, url: str) -> float:
+        """
+        获取向下载主机发起请求的许可, 等待时间较短时直接等待
 
-                # 添加到任务统计
-                self.down_info['task'] += 1
+        @param {str} url - 下载url
 
-                # 添加到卷的统计信息中
-                self.down_vol_info[_vol_num]['down'] += 1
+        @returns {float} - 0代表已获得许可, 大于0代表需要延迟处理的秒数
+        """
+        while True:
+            _wait = self.host_limiter.try_acquire(url)
+            if _wait <= 0 or _wait > self.QUEUE_GET_TIMEOUT:
+                return _wait
 
-            # 再次判断一下是否全部完成
-            if self.down_vol_info[_vol_num]['down'] == 0:
-                self.xml_doc.set_value('/down_task/down_list/%s/status' % _vol_num, 'done')
-                self.xml_doc.save(pretty_print=True)
+            time.sleep(_wait)
 
     def _down_worker_fun(self, q, ):
         """
         下载工作函数
         """
-        # 0-卷id，1-文件id，2-卷名，3-文件名，4-文件下载url，5-下载类型, 6-下载扩展json字符串
-        _task = None
-        _url = ''
-
         try:
-            _task = q.get(block=False)
-        except:
+            _task = q.get(block=True, timeout=self.QUEUE_GET_TIMEOUT)
+        except queue.Empty:
             # 没有取到任务
-            time.sleep(1)
             return None
 
         try:
-            _url = _task[4]
-            _file_name = _task[3]
-            if _file_name == '':
-                _file_name = os.path.split(_url)[1]
-
-            _save_file = os.path.join(
-                self.para_dict['path'], self.para_dict['name'], _task[2].replace(
-                    '{$path_split$}', '/'), _file_name
-            )
-            _save_path = os.path.split(_save_file)[0]
-            if os.path.exists(_save_file) and os.path.isfile(_save_file):
-                FileTool.remove_file(_save_file)
+            return self._down_task_fun(q, _task)
+        finally:
+            # 任务处理完成(包括放入延迟重试), 检查是否所有任务已处理完成
+            q.task_done()
+            if q.is_all_done():
+                self._down_finished.set()
 
-            if not os.path.exists(_save_path):
-                FileTool.create_dir(_save_path, exist_ok=True)
+    def _down_task_fun(self, q, task):
+        """
+        执行单个文件的下载
 
-            # 执行下载
-            _down_class = DriverManager.get_down_driver(
-                _task[5], self.downtype_mapping
-            )
-            _extend_json = None
-            if _task[6] != '':
-                _extend_json = json.loads(_task[6])
-            _down_class.download(
-                _url, _save_file, extend_json=_extend_json, **self.para_dict
-            )
+        @param {DownTaskQueue} q - 下载任务队列
+        @param {DownTask} task - 下载任务
 
-            # 下载成功，更新下载结果
-            self.lock.acquire()
+        @returns {bool} - 是否下载成功
+        """
+        try:
+            _save_file, _down_class, _kwargs = self._prepare_down_task(task)
+            if self.dedup_store is not None:
+                # 已下载过的url直接从去重存储链接, 无需访问网络
+                _meta = self.dedup_store.link_by_url(task.url, _save_file)
+                if _meta is not None:
+                    self._deal_down_success(task, meta=_meta)
+                    return True
+
+            _wait = self._acquire_host(task.url)
+            if _wait > 0:
+                # 主机被限速或暂停的时间较长, 放入延迟队列后处理其他主机的任务, 不计入下载次数
+                q.put_delayed(task, _wait)
+                return None
+
+            _error = None
             try:
-                self.xml_doc.set_value(
-                    '/down_task/down_list/%s/files/%s/status' % (_task[0], _task[1]),
-                    'done', debug=True
-                )
-                self.down_info['success'] += 1
-                self.down_vol_info[_task[0]]['success'] += 1
-                self.xml_doc.set_value(
-                    '/down_task/info/success',
-                    str(self.down_info['success']), debug=True
+                _meta = _down_class.download(
+                    task.url, _save_file, extend_json=task.extend_json, **_kwargs
                 )
-                self.xml_doc.save(pretty_print=True)
-
-                if self.down_vol_info[_task[0]]['success'] == self.down_vol_info[_task[0]]['down']:
-                    # 当前卷下载任务已经处理完成
-                    self.xml_doc.set_value(
-                        '/down_task/down_list/%s/status' % _task[0],
-                        'done', debug=True
-                    )
-                    self.xml_doc.save(pretty_print=True)
+            except Exception as _e:
+                _error = _e
+                raise
             finally:
-                self.lock.release()
+                self.host_limiter.release(task.url, error=_error)
+
+            if self.dedup_store is not None:
+                _meta = self._add_to_dedup_store(task, _save_file, _meta)
+
+            self._deal_down_success(task, meta=_meta)
+            return True
+        except:
+            return self._deal_down_failed(q, task)
+
+    def _add_to_dedup_store(self, task, save_file: str, meta: dict) -> dict:
+        """
+        将下载完成的文件登记到去重存储(登记失败不影响下载结果)
+
+        @param {DownTask} task - 下载任务
+        @param {str} save_file - 下载完成的文件
+        @param {dict} meta - 下载驱动返回的文件完整性信息
 
+        @returns {dict} - 文件完整性信息
+        """
+        try:
+            return self.dedup_store.add(task.url, save_file, meta=(meta if isinstance(meta, dict) else None))
+        except:
+            self.print('%s:\n%s' % (_('Add to dedup store error'), traceback.format_exc()))
+            return meta
+
+    def _prepare_down_task(self, task) -> tuple:
+        """
+        下载前的准备(确定保存文件、创建目录并获取下载驱动)
+
+        @param {DownTask} task - 下载任务
+
+        @returns {tuple} - (保存文件路径, 下载驱动类, 下载驱动的扩展参数)
+        """
+        _file_name = task.file_name
+        if _file_name == '':
+            _file_name = os.path.split(task.url)[1]
+
+        _save_file = os.path.join(
+            self.para_dict['path'], self.para_dict['name'], task.vol_name.replace(
+                '{$path_split$}', '/'), _file_name
+        )
+        _save_path = os.path.split(_save_file)[0]
+        if os.path.exists(_save_file) and os.path.isfile(_save_file):
+            FileTool.remove_file(_save_file)
+
+        if not os.path.exists(_save_path):
+            FileTool.create_dir(_save_path, exist_ok=True)
+
+        _down_class = DriverManager.get_down_driver(
+            task.downtype, self.downtype_mapping
+        )
+        return _save_file, _down_class, self._get_down_kwargs(_down_class)
+
+    def _get_down_kwargs(self, down_class) -> dict:
+        """
+        获取调用下载驱动的扩展参数(任务参数, 驱动支持会话时加上down_session)
+
+        @param {BaseDownDriverFW} down_class - 下载驱动类
+
+        @returns {dict} - 扩展参数字典
+        """
+        if down_class not in self._driver_sessions:
+            with self.lock:
+                if down_class not in self._driver_sessions:
+                    self._driver_sessions[down_class] = down_class.create_session(**self.para_dict)
+
+        _session = self._driver_sessions[down_class]
+        if _session is None:
+            return self.para_dict
+
+        _kwargs = dict(self.para_dict)
+        _kwargs['down_session'] = _session
+        return _kwargs
+
+    def _close_driver_sessions(self):
+        """
+        关闭下载驱动的会话对象
+        """
+        with self.lock:
+            for _down_class, _session in self._driver_sessions.items():
+                if _session is None:
+                    continue
+                try:
+                    _down_class.close_session(_session)
+                except:
+                    self.print('%s:\n%s' % (_('Close down session error'), traceback.format_exc()))
+
+            self._driver_sessions.clear()
+
+    def _deal_down_success(self, task, meta: dict = None):
+        """
+        下载成功的处理, 更新任务状态
+
+        @param {DownTask} task - 下载任务
+        @param {dict} meta=None - 下载驱动返回的文件完整性信息(size/hash), 一并登记到任务存储
+        """
+        self.lock.acquire()
+        try:
+            self.task_store.set_file_status(
+                task.vol_num, task.file_num, 'done', meta=(meta if isinstance(meta, dict) else None)
+            )
+            self.down_info['success'] += 1
+            _vol_stat = self.down_vol_info[task.vol_num]
+            _vol_stat['success'] += 1
+            if _vol_stat['listed'] and _vol_stat['success'] == _vol_stat['down']:
+                # 当前卷下载任务已经处理完成
+                self.task_store.set_vol_status(task.vol_num, 'done')
+
+            self._update_status_file()
+        finally:
+            self.lock.release()
+
+        self.print(
+            '%s[%s -> %s -> %s]: %s' % (
+                _('DownLoad Sucess'),
+                self.para_dict['name'], task.vol_num, task.file_num, task.url
+            )
+        )
+
+    def _deal_down_failed(self, q, task) -> bool:
+        """
+        下载失败的处理(需在except中调用), 临时性异常放入延迟队列重试, 否则登记为失败
+
+        @param {DownTaskQueue} q - 下载任务队列
+        @param {DownTask} task - 下载任务
+
+        @returns {bool} - 固定返回False
+        """
+        # 临时性异常放入延迟队列重试, 不中断其他下载任务
+        task.attempts += 1
+        _error = sys.exc_info()[1]
+        if task.attempts < self.max_attempts and self.is_retryable_error(_error):
+            _delay = max(
+                self._get_retry_delay(task.attempts),
+                HostRateLimiter.get_retry_after(_error) or 0
+            )
+            q.put_delayed(task, _delay)
             self.print(
-                '%s[%s -> %s -> %s]: %s' % (
-                    _('DownLoad Sucess'),
-                    self.para_dict['name'], _task[0], _task[1], _url
+                '%s[%s -> %s -> %s]: %s, %s\n%s' % (
+                    _('Download Failed, retry later'), self.para_dict['name'],
+                    task.vol_num, task.file_num, task.url, _('retry after [$1] seconds', '%.1f' % _delay),
+                    traceback.format_exc()
                 )
             )
-            time.sleep(1)
-            return True
+            return False
+
+        # 下载失败
+        self.print(traceback.format_exc())
+        self.lock.acquire()
+        try:
+            self.down_info['task_fail'] += 1
+            self.task_store.set_file_status(task.vol_num, task.file_num, 'err', error_url=task.url)
         except:
-            # 下载失败
-            self.print(traceback.format_exc())
-            self.lock.acquire()
+            self.print('%s:\n%s' % (_('Update down config file error'), traceback.format_exc()))
+        finally:
+            self.lock.release()
+
+        self.print(
+            '%s[%s -> %s -> %s]: %s\n%s' % (
+                _('Download Failed'), self.para_dict['name'],
+                task.vol_num, task.file_num, task.url, traceback.format_exc()
+            )
+        )
+        return False
+
+    #############################
+    # 异步下载引擎(down_engine=async)
+    #############################
+    def _run_async_engine(self):
+        """
+        使用asyncio事件循环执行下载(阻塞直到所有任务处理完成或被停止)
+        注：down_worker为并发的协程数量, 没有实现异步下载的驱动通过线程池执行, 线程数不超过ASYNC_EXECUTOR_MAXSIZE
+        """
+        _loop = asyncio.new_event_loop()
+        _executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(int(self.para_dict['down_worker']), self.ASYNC_EXECUTOR_MAXSIZE)
+        )
+        _loop.set_default_executor(_executor)
+        try:
+            _loop.run_until_complete(self._async_main())
+        finally:
+            # 异步连接池的连接与事件循环绑定, 在事件循环关闭前释放会话, 并执行一次事件循环完成连接的关闭
+            self._close_driver_sessions()
+            _loop.run_until_complete(asyncio.sleep(0))
+            _loop.close()
+            _executor.shutdown(wait=True)
+
+    async def _async_main(self):
+        """
+        异步下载主函数, 由一个协程从下载队列获取任务分发给下载协程
+        """
+        _worker_num = int(self.para_dict['down_worker'])
+        _task_queue = asyncio.Queue(maxsize=_worker_num)
+        _workers = [
+            asyncio.ensure_future(self._async_worker(_task_queue)) for _i in range(_worker_num)
+        ]
+        _loop = asyncio.get_event_loop()
+        try:
+            while not self._stop_producer:
+                # 下载队列为线程队列, 在线程池中阻塞获取, 避免阻塞事件循环
+                _task = await _loop.run_in_executor(None, self._get_task_for_async)
+                if _task is not None:
+                    await _task_queue.put(_task)
+                elif self._down_finished.is_set():
+                    break
+        finally:
+            # 通知下载协程结束
+            for _i in range(_worker_num):
+                await _task_queue.put(None)
+            await asyncio.gather(*_workers, return_exceptions=True)
+
+    def _get_task_for_async(self):
+        """
+        从下载队列获取任务(在线程池中执行)
+
+        @returns {DownTask} - 下载任务, 超时没有获取到返回None
+        """
+        try:
+            return self.down_queue.get(block=True, timeout=self.QUEUE_GET_TIMEOUT)
+        except queue.Empty:
+            if self.down_queue.is_all_done():
+                self._down_finished.set()
+            return None
+
+    async def _async_worker(self, task_queue):
+        """
+        异步下载协程
+
+        @param {asyncio.Queue} task_queue - 分发任务的异步队列, 获取到None时结束
+        """
+        while True:
+            _task = await task_queue.get()
+            if _task is None:
+                return
+
             try:
-                self.down_info['task_fail'] += 1
-                self.xml_doc.set_value(
-                    '/down_task/down_list/%s/files/%s/status' % (_task[0], _task[1]),
-                    'err'
+                await self._async_down_task_fun(self.down_queue, _task)
+            finally:
+                self.down_queue.task_done()
+                if self.down_queue.is_all_done():
+                    self._down_finished.set()
+
+    async def _async_down_task_fun(self, q, task):
+        """
+        异步执行单个文件的下载
+
+        @param {DownTaskQueue} q - 下载任务队列
+        @param {DownTask} task - 下载任务
+
+        @returns {bool} - 是否下载成功
+        """
+        # 文件操作、创建会话及更新任务存储均为阻塞操作, 在线程池中执行, 避免阻塞事件循环
+        _loop = asyncio.get_event_loop()
+        try:
+            _save_file, _down_class, _kwargs = await _loop.run_in_executor(
+                None, self._prepare_down_task, task
+            )
+            if self.dedup_store is not None:
+                # 已下载过的url直接从去重存储链接, 无需访问网络
+                _meta = await _loop.run_in_executor(
+                    None, self.dedup_store.link_by_url, task.url, _save_file
                 )
-                self.xml_doc.set_value(
-                    '/down_task/error/%s/files/%s/url' % (_task[0], _task[1]),
-                    _url, debug=True
+                if _meta is not None:
+                    await _loop.run_in_executor(None, self._deal_down_success, task, _meta)
+                    return True
+
+            while True:
+                _wait = self.host_limiter.try_acquire(task.url)
+                if _wait <= 0:
+                    break
+                elif _wait > self.QUEUE_GET_TIMEOUT:
+                    # 主机被限速或暂停的时间较长, 放入延迟队列, 不计入下载次数
+                    q.put_delayed(task, _wait)
+                    return None
+                await asyncio.sleep(_wait)
+
+            _error = None
+            # 超时时间小于等于0代表不超时(与线程下载的worker_overtime一致)
+            _overtime = float(self.para_dict['down_overtime'])
+            try:
+                _meta = await asyncio.wait_for(
+                    _down_class.download_async(
+                        task.url, _save_file, extend_json=task.extend_json, **_kwargs
+                    ),
+                    timeout=(_overtime if _overtime > 0 else None)
                 )
-                self.xml_doc.save(pretty_print=True)
-            except:
-                self.print('%s:\n%s' % (_('Update down config file error'), traceback.format_exc()))
+            except Exception as _e:
+                _error = _e
+                raise
             finally:
-                self.lock.release()
+                self.host_limiter.release(task.url, error=_error)
 
-            self.print(
-                '%s[%s -> %s -> %s]: %s\n%s' % (
-                    _('Download Failed'), self.para_dict['name'],
-                    _task[0], _task[1], _url, traceback.format_exc()
+            if self.dedup_store is not None:
+                # 登记时可能需要计算哈希值, 在线程池中执行
+                _meta = await _loop.run_in_executor(
+                    None, self._add_to_dedup_store, task, _save_file, _meta
                 )
-            )
-            time.sleep(1)
-            return False
+
+            await _loop.run_in_executor(None, self._deal_down_success, task, _meta)
+            return True
+        except Exception as _e:
+            return await _loop.run_in_executor(None, self._deal_async_down_failed, q, task, _e)
+
+    def _deal_async_down_failed(self, q, task, error: Exception) -> bool:
+        """
+        异步下载失败的处理(在线程池中执行), 重新抛出异常以便_deal_down_failed获取异常信息
+
+        @param {DownTaskQueue} q - 下载任务队列
+        @param {DownTask} task - 下载任务
+        @param {Exception} error - 下载过程中的异常
+
+        @returns {bool} - 固定返回False
+        """
+        try:
+            raise error
+        except:
+            return self._deal_down_failed(q, task)
 
 
 class JobManager(object):
@@ -1181,42 +1808,41 @@ class JobManager(object):
                 'success': '下载成功数'
             }
         """
+        _task_path = os.path.join(path, name)
+        _status = None if TaskStatusFile.is_stale(_task_path) else TaskStatusFile.read(_task_path)
+        if _status is not None:
+            # 优先使用未过期的状态摘要文件
+            _status['name'] = name
+            _status.pop('update_time', None)
+            return _status
+
         _status = dict()
-        _conf_file = os.path.join(path, name, 'down.xml')
-        _xml_doc = SimpleXml(
-            _conf_file, obj_type=EnumXmlObjType.File,
-            encoding='utf-8', use_chardet=False,
-            remove_blank_text=True
-        )
+        _info = TaskStoreManager.get_down_index_info(_task_path)
         _status['name'] = name
-        _status['url'] = _xml_doc.get_value('/down_task/info/url')
-        _status['status'] = _xml_doc.get_value('/down_task/info/status')
-        _status['files'] = _xml_doc.get_value('/down_task/info/files')
-        _status['success'] = _xml_doc.get_value('/down_task/info/success')
+        _status['url'] = _info.get('url', '')
+        _status['status'] = _info.get('status', '')
+        _status['files'] = _info.get('files', '0')
+        _status['success'] = _info.get('success', '0')
 
         return _status
 
     @classmethod
-    def get_down_index_info(cls, name: str, path: str) -> dict:
+    def get_down_index_info(cls, name: str, path: str, with_files: bool = True) -> dict:
         """
         获取下载索引信息
 
         @param {str} name - 下载漫画名
         @param {str} path - 保存路径
+        @param {bool} with_files=True - 下载列表是否包含文件清单
 
         @returns {dict} - 信息字典, 结构与文件保存结构一致
             info : 基础信息
             down_list : 下载列表
         """
-        _conf_file = os.path.join(path, name, 'down.xml')
-        _xml_doc = SimpleXml(
-            _conf_file, obj_type=EnumXmlObjType.File,
-            encoding='utf-8', use_chardet=False,
-            remove_blank_text=True
-        )
+        _task_path = os.path.join(path, name)
         _info = {
-            'info': _xml_doc.to_dict('/down_task/info')['info'],
-            'down_list': _xml_doc.to_dict('/down_task/down_list')['down_list'],
+            'info': TaskStoreManager.get_down_index_info(_task_path),
+            'down_list': dict(TaskStoreManager.iter_down_index(_task_path, with_files=with_files)),
         }
         return _info
 
@@ -1337,16 +1963,11 @@ class JobManager(object):
         }
         _info = self.running_jobs.get(job_id, {}).get(task_id, None)
         if _info is not None:
-            _conf_file = os.path.join(_info['path'], _info['name'], 'down.xml')
-            _xml_doc = SimpleXml(
-                _conf_file, obj_type=EnumXmlObjType.File,
-                encoding='utf-8', use_chardet=False,
-                remove_blank_text=True
-            )
+            _index_status = self.get_down_index_status(_info['name'], _info['path'])
             _status['name'] = _info['name']
-            _status['status'] = _xml_doc.get_value('/down_task/info/status')
-            _status['files'] = _xml_doc.get_value('/down_task/info/files')
-            _status['success'] = _xml_doc.get_value('/down_task/info/success')
+            _status['status'] = _index_status['status']
+            _status['files'] = _index_status['files']
+            _status['success'] = _index_status['success']
 
         return _status
 
@@ -1404,17 +2025,19 @@ class JobManager(object):
         # 获取下载文件配置
         _path = os.path.realpath(para_dict.get('path', ''))
         _url = para_dict.get('url', '')
-        _xml_doc = DownloadManager.get_down_task_conf(_path, name, url=_url)
+        _task_store = DownloadManager.get_down_task_store(
+            _path, name, url=_url, store_type=para_dict.get('task_store_type', ''), para_dict=para_dict
+        )
 
         # 获取部分配置信息
         para_dict['path'] = _path
         para_dict['name'] = name
         if _url == '':
-            _url = _xml_doc.get_value('/down_task/info/url')
+            _url = _task_store.get_info('url')
             para_dict['url'] = _url
 
-        _vol_info_ok = _xml_doc.get_value('/down_task/info/vol_info_ok')
-        _file_info_ok = _xml_doc.get_value('/down_task/info/file_info_ok')
+        _vol_info_ok = _task_store.get_info('vol_info_ok')
+        _file_info_ok = _task_store.get_info('file_info_ok')
 
         # 获取网站驱动
         _webdriver = DriverManager.get_website_driver(
@@ -1423,16 +2046,18 @@ class JobManager(object):
 
         # 解析网页获取卷信息 - 在驱动框架已处理了自动重试
         if para_dict.get('force_update', 'n') == 'y' or para_dict.get('search_mode', 'n') == 'y' or _vol_info_ok != 'y':
-            if not _webdriver.update_vol_info(_xml_doc, **para_dict):
+            if not _webdriver.update_vol_info(_task_store, **para_dict):
+                _task_store.close()
                 raise RuntimeError(_('Update vol info error'))
 
         # 解析网页获取每个卷的文件
         if para_dict.get('force_update', 'n') == 'y' or para_dict.get('search_mode', 'n') == 'y' or _file_info_ok != 'y':
-            if not _webdriver.update_file_info(_xml_doc, **para_dict):
+            if not _webdriver.update_file_info(_task_store, **para_dict):
+                _task_store.close()
                 raise RuntimeError(_('Update files info error'))
 
         # 保存信息并返回
-        _xml_doc.save()
+        _task_store.close()
 
         return {'name': name, 'path': _path, 'url': _url}
 
@@ -1457,10 +2082,12 @@ class JobManager(object):
             'task_fail': 本次处理任务失败数
         """
         # 获取配置信息
-        _xml_doc = DownloadManager.get_down_task_conf(path, name, url=url)
+        _task_store = DownloadManager.get_down_task_store(
+            path, name, url=url, store_type=para_dict.get('task_store_type', ''), para_dict=para_dict
+        )
 
         # 循环处理下载任务, 在有失败的情况重新执行
-        _down_manager = DownloadManager(_xml_doc, **para_dict)
+        _down_manager = DownloadManager(_task_store, **para_dict)
         _auto_redo = int(para_dict.get('auto_redo', '0'))
         _redo_time = 0
         while _redo_time <= _auto_redo:
@@ -1486,6 +2113,9 @@ class JobManager(object):
                 time.sleep(0.01)
                 continue
 
+        # 关闭任务状态存储
+        _task_store.close()
+
         # 返回处理结果
         return copy.deepcopy(_down_manager.down_info)
 
@@ -1676,11 +2306,11 @@ class BaseWebSiteDriverFW(object):
         return str(uuid.uuid1())
 
     @classmethod
-    def update_vol_info(cls, xml_doc, **para_dict):
+    def update_vol_info(cls, task_store: BaseTaskStoreFW, **para_dict):
         """
         解析网页获取并更新下载配置文件的卷信息
 
-        @param {SimpleXml} xml_doc - 下载配置文件的操作对象
+        @param {BaseTaskStoreFW} task_store - 下载任务状态存储对象
         @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来
             关键参数包括:
             url - 漫画所在目录索引页面的url
@@ -1696,15 +2326,15 @@ class BaseWebSiteDriverFW(object):
             _url = ''
             try:
                 # 更新卷信息及文件信息处理为未完成
-                xml_doc.set_value('/down_task/info/vol_info_ok', 'n')
-                xml_doc.set_value('/down_task/info/file_info_ok', 'n')
-                xml_doc.save(pretty_print=True)
+                task_store.set_info('vol_info_ok', 'n')
+                task_store.set_info('file_info_ok', 'n')
+                task_store.request_save()
 
                 _url = para_dict['url']
                 _vol_next_url = ''
                 if not (para_dict['search_mode'] == 'y'):
                     # 如果是搜索模式，从头开始找卷信息
-                    _vol_next_url = xml_doc.get_value('/down_task/info/vol_next_url')
+                    _vol_next_url = task_store.get_info('vol_next_url')
 
                 if _vol_next_url is not None and _vol_next_url != '':
                     _url = _vol_next_url
@@ -1712,15 +2342,14 @@ class BaseWebSiteDriverFW(object):
                 # 循环获取索引页面并更新下载配置文件
                 while True:
                     _vol_info = cls._get_vol_info(_url, **para_dict)
+
+                    # 每页只获取一次已登记的卷字典
+                    _vol_num_dict = dict(task_store.get_vol_num_dict())
                     for _vol in _vol_info['vols'].keys():
                         _vol_name = DownloadManager.path_char_replace(_vol)
                         _vol_url = _vol_info['vols'][_vol]['url']
 
                         # 判断卷是否已经处理过
-                        _vol_num_dict = json.loads(
-                            xml_doc.get_value('/down_task/info/vol_num_dict', '{}')
-                        )
-
                         if _vol_name in _vol_num_dict.keys():
                             # 卷已经存在
                             if not (para_dict['search_mode'] == 'y'):
@@ -1728,20 +2357,19 @@ class BaseWebSiteDriverFW(object):
                                 continue
                             else:
                                 # 将卷信息重新打开为listing
-                                xml_doc.set_value(
-                                    '/down_task/down_list/%s/status' % _vol_num_dict[_vol_name],
-                                    'listing'
+                                task_store.set_vol_value(
+                                    _vol_num_dict[_vol_name], 'status', 'listing'
                                 )
-                                xml_doc.save(pretty_print=True)
+                                task_store.request_save()
                         else:
-                            DownloadManager.add_vol_to_down_task_conf(
-                                xml_doc, _vol_name, _vol_url, status='listing'
+                            _vol_num_dict[_vol_name] = DownloadManager.add_vol_to_down_task_conf(
+                                task_store, _vol_name, _vol_url, status='listing'
                             )
 
-                    # 保存下一页信息
+                    # 保存下一页信息(同时保存本页登记的卷)
                     _vol_next_url = _vol_info.get('vol_next_url', '')
-                    xml_doc.set_value('/down_task/info/vol_next_url', _vol_next_url)
-                    xml_doc.save(pretty_print=True)
+                    task_store.set_info('vol_next_url', _vol_next_url)
+                    task_store.request_save()
 
                     # 检查是否有下一个url
                     if _vol_next_url != '':
@@ -1752,10 +2380,16 @@ class BaseWebSiteDriverFW(object):
                         break
 
                 # 正常执行下来，更新卷信息处理完成的标记
-                xml_doc.set_value('/down_task/info/vol_info_ok', 'y')
-                xml_doc.save()
+                task_store.set_info('vol_info_ok', 'y')
+                task_store.save()
                 return True
             except:
+                try:
+                    # 出现异常时先将已获取的信息保存
+                    task_store.save()
+                except:
+                    _print(traceback.format_exc())
+
                 _print('%s[%s][%s]:\n%s' % (
                     _('Get vol info error'), para_dict['name'], _url,
                     traceback.format_exc()
@@ -1767,11 +2401,11 @@ class BaseWebSiteDriverFW(object):
                     return False
 
     @classmethod
-    def update_file_info(cls, xml_doc, **para_dict):
+    def update_file_info(cls, task_store: BaseTaskStoreFW, **para_dict):
         """
         解析网页获取并更新下载配置文件的文件信息
 
-        @param {SimpleXml} xml_doc - 下载配置文件的操作对象
+        @param {BaseTaskStoreFW} task_store - 下载任务状态存储对象
         @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来
             关键参数包括:
             auto_redo - 是否失败自动重做(y/n)
@@ -1782,7 +2416,7 @@ class BaseWebSiteDriverFW(object):
         _print = Tools.get_print_fun()
 
         # 一开始就要获取文件数量
-        _files = int(xml_doc.get_value('/down_task/info/files'))
+        _files = int(task_store.get_info('files'))
 
         # 通过循环支持持续执行
         while True:
@@ -1791,43 +2425,60 @@ class BaseWebSiteDriverFW(object):
             _last_tran_para = None
             try:
                 # 更新文件信息处理为未完成
-                xml_doc.set_value('/down_task/info/file_info_ok', 'n')
-                xml_doc.save(pretty_print=True)
+                task_store.set_info('file_info_ok', 'n')
+                task_store.request_save()
 
                 # 遍历所有卷，发现未完成的进行处理
-                _vol_num_dict = json.loads(xml_doc.get_value('/down_task/info/vol_num_dict', '{}'))
+                _vol_num_dict = task_store.get_vol_num_dict()
 
                 for _vol_name in _vol_num_dict.keys():
                     _vol_num = _vol_num_dict[_vol_name]
-                    if xml_doc.get_value('/down_task/down_list/%s/status' % _vol_num) != 'listing':
+                    _vol_info = task_store.get_vol_info(_vol_num)
+                    if _vol_info['status'] != 'listing':
                         # 已经处理完成
                         continue
 
+                    # 先获取卷页面指纹, 与上次成功解析时一致则无需执行脚本解析文件清单
+                    _vol_url = _vol_info['url']
+                    _fingerprint = task_store.get_vol_fingerprint(_vol_num)
+                    _page_fingerprint, _last_tran_para = cls._get_vol_fingerprint(
+                        _vol_url, _last_tran_para, **para_dict
+                    )
+                    if _page_fingerprint != '' and _page_fingerprint == _fingerprint['page']:
+                        _last_tran_para = None
+                        task_store.set_vol_value(_vol_num, 'status', 'downloading')
+                        task_store.request_save()
+                        continue
+
                     # 按卷url解析获取下载文件清单
-                    _vol_url = xml_doc.get_value('/down_task/down_list/%s/url' % _vol_num)
                     _file_info = cls._get_file_info(
                         _vol_url, _last_tran_para, **para_dict
                     )
                     if len(_file_info['files']) == 0:
                         raise RuntimeError(_('Get file info error: no file found!'))
 
+                    # 文件清单与上次成功解析时一致, 无需逐个文件检查
+                    _files_fingerprint = cls.get_files_fingerprint(_file_info['files'])
+                    _file_list = _file_info['files'].items()
+                    if _files_fingerprint == _fingerprint['files']:
+                        _file_list = []
+
                     # 将下载文件清单加入配置
-                    _file_num = int(xml_doc.get_value(
-                        '/down_task/down_list/%s/file_num' % _vol_num))
+                    _file_num = int(_vol_info['file_num'])
                     _file_add_num = 0
-                    for _file, _down_info in _file_info['files'].items():
-                        # 检查文件url是否已经存在
+                    for _file, _down_info in _file_list:
+                        # 检查文件url是否已经存在(通过存储的url索引查找)
                         _file_exist = False
                         _real_file_name = 'file_%d' % _file_num
 
                         if para_dict['search_mode'] == 'y':
                             # 搜索模式，从所有文件url判断
-                            if xml_doc.get_value("//url[text()='%s']" % _down_info['url']) != '':
+                            if task_store.find_file_by_url(_down_info['url']) is not None:
                                 # 找到文件已存在
                                 _file_exist = True
                         else:
                             # 非搜索模式，仅判断当前卷
-                            if xml_doc.get_value("/down_task/down_list/%s/files/%s/url[text()='%s']" % (_vol_num, _real_file_name, _down_info['url'])) != '':
+                            if task_store.find_file_by_url(_down_info['url'], vol_num=_vol_num) is not None:
                                 # 找到文件已存在
                                 _file_exist = True
 
@@ -1842,7 +2493,7 @@ class BaseWebSiteDriverFW(object):
                                 _fix_file_name = _fix_file_name[0: 99 - len(_ext)] + '.' + _ext
 
                             DownloadManager.add_file_to_down_task_conf(
-                                xml_doc, _vol_num, _real_file_name,
+                                task_store, _vol_num, _real_file_name,
                                 _fix_file_name,
                                 _down_info['url'],
                                 _down_info['downtype'],
@@ -1852,19 +2503,26 @@ class BaseWebSiteDriverFW(object):
                     # 更新_last_tran_para
                     _last_tran_para = _file_info.get('next_tran_para', None)
 
-                    # 处理完更新卷状态及文件总数
-                    xml_doc.set_value('/down_task/down_list/%s/file_num' % _vol_num, str(_file_num))
-                    xml_doc.set_value('/down_task/down_list/%s/status' % _vol_num, 'downloading')
+                    # 处理完更新卷状态、指纹及文件总数
+                    task_store.set_vol_value(_vol_num, 'file_num', str(_file_num))
+                    task_store.set_vol_fingerprint(_vol_num, _page_fingerprint, _files_fingerprint)
+                    task_store.set_vol_value(_vol_num, 'status', 'downloading')
                     _files += _file_add_num
-                    xml_doc.set_value('/down_task/info/files', str(_files))
-                    xml_doc.save(pretty_print=True)
+                    task_store.set_info('files', str(_files))
+                    task_store.request_save()
 
                 # 全部文件清单处理完成
-                xml_doc.set_value('/down_task/info/files', str(_files))
-                xml_doc.set_value('/down_task/info/file_info_ok', 'y')
-                xml_doc.save(pretty_print=True)
+                task_store.set_info('files', str(_files))
+                task_store.set_info('file_info_ok', 'y')
+                task_store.save()
                 return True
             except:
+                try:
+                    # 出现异常时先将已获取的信息保存
+                    task_store.save()
+                except:
+                    _print(traceback.format_exc())
+
                 _print('%s[%s][%s][%s]:\n%s' % (
                     _('Get file info error'), para_dict['name'], _vol_name, _vol_url,
                     traceback.format_exc()
@@ -1875,6 +2533,23 @@ class BaseWebSiteDriverFW(object):
                 else:
                     return False
 
+    @classmethod
+    def get_files_fingerprint(cls, files: dict) -> str:
+        """
+        计算文件清单的指纹
+
+        @param {dict} files - _get_file_info 返回的下载文件信息字典
+
+        @returns {str} - 指纹, 格式为 sha1:值
+        """
+        _list = [
+            [_name, _info['url'], _info['downtype'], _info.get('extend_json', None)]
+            for _name, _info in files.items()
+        ]
+        return 'sha1:%s' % hashlib.sha1(
+            json.dumps(_list, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+        ).hexdigest()
+
     #############################
     # 需实现类继承的方法
     #############################
@@ -1946,6 +2621,22 @@ class BaseWebSiteDriverFW(object):
         """
         raise NotImplementedError
 
+    @classmethod
+    def _get_vol_fingerprint(cls, vol_url: str, last_tran_para: object = None, **para_dict) -> tuple:
+        """
+        获取卷页面(或页面中文件清单相关区域)的指纹
+        (实现类可选重载, 默认不支持)
+        注：刷新时指纹与上次成功解析时一致将直接跳过该卷, 不再执行 _get_file_info
+
+        @param {str} vol_url - 浏览该卷漫画的url
+        @param {object} last_tran_para=None - 上一次文件信息获取完成后传递的自定义参数对象
+        @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来
+
+        @returns {tuple} - (指纹, 传入 _get_file_info 的 last_tran_para), 不支持时指纹返回''
+            注：可以通过返回的 last_tran_para 将获取指纹时已取得的页面对象传给 _get_file_info, 避免重复获取
+        """
+        return '', last_tran_para
+
 
 class BaseDownDriverFW(object):
     """
@@ -1975,9 +2666,54 @@ class BaseDownDriverFW(object):
         @param {str} save_file - 要保存的文件路径及文件名
         @param {dict} extend_json=None - 要送入下载驱动的扩展信息
         @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来
+            注：如果驱动实现了create_session, 下载管理器会通过down_session参数送入会话对象
+
+        @returns {dict} - 可选返回下载文件的完整性信息, 下载管理器将登记到任务存储, 不支持时返回None
+            size {int} - 文件大小
+            hash {str} - 文件哈希值, 格式为 算法:值, 例如 sha1:xxx, 没有计算时为''
         """
         raise NotImplementedError()
 
+    @classmethod
+    def create_session(cls, **para_dict):
+        """
+        创建下载任务的会话对象(例如连接池), 在同一个下载任务的所有下载线程间共用
+        注：默认不使用会话, 驱动可重载该方法, 会话对象通过down_session参数送入download
+
+        @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来
+
+        @returns {object} - 会话对象, 返回None代表不使用会话
+        """
+        return None
+
+    @classmethod
+    def close_session(cls, session):
+        """
+        关闭会话对象并释放资源(下载任务结束时调用)
+
+        @param {object} session - create_session创建的会话对象
+        """
+        pass
+
+    @classmethod
+    async def download_async(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        """
+        异步下载文件(down_engine=async时使用)
+        注：默认在事件循环的线程池中执行download, 驱动可以重载该方法实现真正的异步下载
+
+        @param {str} file_url - 要下载的文件url
+        @param {str} save_file - 要保存的文件路径及文件名
+        @param {dict} extend_json=None - 要送入下载驱动的扩展信息
+        @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来
+
+        @returns {dict} - 可选返回下载文件的完整性信息, 参考download
+        """
+        return await asyncio.get_event_loop().run_in_executor(
+            None, functools.partial(
+                cls.download, file_url, save_file, extend_json=extend_json, **para_dict
+            )
+        )
+
 
 if __name__ == '__main__':
     # 当程序自己独立运行时执行的操作
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# Copyright 2019 黎慧剑
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+下载文件的内容寻址去重存储模块
+@module dedup_store
+@file dedup_store.py
+"""
+
+import os
+import sys
+import shutil
+import hashlib
+import sqlite3
+import threading
+try:
+    import fcntl
+except:
+    fcntl = None
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(
+    os.path.dirname(__file__), os.path.pardir, os.path.pardir)))
+
+
+__MOUDLE__ = 'dedup_store'  # 模块名
+__DESCRIPT__ = u'下载文件的内容寻址去重存储模块'  # 模块描述
+__VERSION__ = '0.1.0'  # 版本
+__AUTHOR__ = u'黎慧剑'  # 作者
+__PUBLISH__ = '2021.07.01'  # 发布日期
+
+
+#############################
+# 去重存储的目录结构, 统一放在下载保存目录(path参数)的 .dedup_store 目录下, 所有下载任务共用:
+#     blobs/[哈希值前2位]/[算法]_[哈希值] : 按内容哈希值保存的文件(与下载文件为硬链接)
+#     index.db : url索引(sqlite), 登记下载url对应的内容哈希值
+#############################
+
+
+class DedupStore(object):
+    """
+    内容寻址的去重存储
+    注：1、下载完成的文件按内容哈希值登记到存储, 内容相同的文件只保存一份(通过硬链接共用)
+        2、同时登记下载url与内容哈希值的对应关系, 已下载过的url直接从存储链接到保存文件, 无需访问网络
+        3、优先使用硬链接, 不支持时(例如跨文件系统)尝试reflink, 最后才复制文件
+    """
+
+    # 去重存储的目录名
+    STORE_DIR_NAME = '.dedup_store'
+
+    # 建表语句
+    CREATE_SQLS = [
+        'CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, hash TEXT, size INTEGER)'
+    ]
+
+    # Linux的reflink(FICLONE)指令
+    FICLONE = 0x40049409
+
+    #############################
+    # 静态方法
+    #############################
+    @classmethod
+    def get_store_path(cls, path: str) -> str:
+        """
+        获取下载保存目录对应的去重存储目录
+
+        @param {str} path - 下载保存目录
+
+        @returns {str} - 去重存储目录
+        """
+        return os.path.join(path, cls.STORE_DIR_NAME)
+
+    @classmethod
+    def link_file(cls, src: str, dest: str):
+        """
+        将源文件链接到目标文件(目标文件已存在时覆盖)
+        注：优先使用硬链接, 失败时尝试reflink, 都失败时复制文件
+
+        @param {str} src - 源文件
+        @param {str} dest - 目标文件
+        """
+        _temp_file = dest + '.lnk'
+        if os.path.exists(_temp_file):
+            os.remove(_temp_file)
+
+        try:
+            os.link(src, _temp_file)
+        except OSError:
+            if not cls._reflink(src, _temp_file):
+                shutil.copyfile(src, _temp_file)
+
+        os.replace(_temp_file, dest)
+
+    @classmethod
+    def _reflink(cls, src: str, dest: str) -> bool:
+        """
+        通过reflink复制文件(仅支持Linux的btrfs/xfs等文件系统)
+
+        @param {str} src - 源文件
+        @param {str} dest - 目标文件
+
+        @returns {bool} - 是否成功
+        """
+        if fcntl is None:
+            return False
+
+        try:
+            with open(src, 'rb') as _src, open(dest, 'wb') as _dest:
+                fcntl.ioctl(_dest.fileno(), cls.FICLONE, _src.fileno())
+            return True
+        except OSError:
+            if os.path.exists(dest):
+                os.remove(dest)
+            return False
+
+    #############################
+    # 实例方法
+    #############################
+    def __init__(self, path: str, hash_name: str = 'sha1'):
+        """
+        构造函数
+
+        @param {str} path - 下载保存目录, 去重存储放在该目录的 .dedup_store 目录下
+        @param {str} hash_name='sha1' - 内容哈希算法(hashlib支持的算法), 与下载驱动计算的算法一致时可以直接使用
+            驱动返回的哈希值, 不支持的算法使用sha1
+        """
+        self.store_path = self.get_store_path(path)
+        self.blob_path = os.path.join(self.store_path, 'blobs')
+        self.hash_name = hash_name if hash_name in hashlib.algorithms_available else 'sha1'
+        os.makedirs(self.blob_path, exist_ok=True)
+
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(
+            os.path.join(self.store_path, 'index.db'), check_same_thread=False, timeout=30
+        )
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        for _sql in self.CREATE_SQLS:
+            self.conn.execute(_sql)
+        self.conn.commit()
+
+    def link_by_url(self, url: str, save_file: str) -> dict:
+        """
+        如果url已下载过, 直接从存储链接到保存文件
+
+        @param {str} url - 下载url
+        @param {str} save_file - 要保存的文件路径及文件名
+
+        @returns {dict} - 链接成功返回文件完整性信息(size/hash), url未登记或存储文件已丢失返回None
+        """
+        with self.lock:
+            _row = self.conn.execute('SELECT hash, size FROM urls WHERE url = ?', (url, )).fetchone()
+
+        if _row is None:
+            return None
+
+        _blob_file = self._get_blob_file(_row[0])
+        if not os.path.exists(_blob_file) or os.path.getsize(_blob_file) != _row[1]:
+            return None
+
+        self.link_file(_blob_file, save_file)
+        return {'size': _row[1], 'hash': _row[0]}
+
+    def add(self, url: str, save_file: str, meta: dict = None) -> dict:
+        """
+        将下载完成的文件登记到存储
+        注：存储中已有相同内容的文件时, 保存文件替换为存储文件的链接
+
+        @param {str} url - 下载url
+        @param {str} save_file - 下载完成的文件
+        @param {dict} meta=None - 下载驱动返回的文件完整性信息(size/hash), 哈希算法不一致时重新计算
+
+        @returns {dict} - 文件完整性信息(size/hash)
+        """
+        _hash = '' if meta is None else meta.get('hash', '')
+        if not _hash.startswith(self.hash_name + ':'):
+            _hash = self._hash_file(save_file)
+
+        _size = os.path.getsize(save_file)
+        _blob_file = self._get_blob_file(_hash)
+        with self.lock:
+            if os.path.exists(_blob_file) and os.path.getsize(_blob_file) == _size:
+                # 已有相同内容的文件, 共用存储文件
+                if not os.path.samefile(_blob_file, save_file):
+                    self.link_file(_blob_file, save_file)
+            else:
+                os.makedirs(os.path.split(_blob_file)[0], exist_ok=True)
+                self.link_file(save_file, _blob_file)
+
+            self.conn.execute(
+                'INSERT OR REPLACE INTO urls (url, hash, size) VALUES (?, ?, ?)', (url, _hash, _size)
+            )
+            self.conn.commit()
+
+        return {'size': _size, 'hash': _hash}
+
+    def close(self):
+        """
+        关闭存储
+        """
+        with self.lock:
+            self.conn.close()
+
+    #############################
+    # 内部函数
+    #############################
+    def _get_blob_file(self, hash_str: str) -> str:
+        """
+        获取内容哈希值对应的存储文件路径
+
+        @param {str} hash_str - 哈希值, 格式为 算法:值
+
+        @returns {str} - 存储文件路径
+        """
+        _name, _, _value = hash_str.partition(':')
+        return os.path.join(self.blob_path, _value[0: 2], '%s_%s' % (_name, _value))
+
+    def _hash_file(self, file: str) -> str:
+        """
+        计算文件的哈希值
+
+        @param {str} file - 文件路径
+
+        @returns {str} - 哈希值, 格式为 算法:值
+        """
+        _hasher = hashlib.new(self.hash_name)
+        with open(file, 'rb') as _file:
+            while True:
+                _data = _file.read(65536)
+                if not _data:
+                    break
+                _hasher.update(_data)
+
+        return '%s:%s' % (self.hash_name, _hasher.hexdigest())
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    # 打印版本信息
+    print(('模块名：%s  -  %s\n'
+           '作者：%s\n'
+           '发布日期：%s\n'
+           '版本：%s' % (__MOUDLE__, __DESCRIPT__, __AUTHOR__, __PUBLISH__, __VERSION__)))
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# Copyright 2019 黎慧剑
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+下载主机限速模块
+@module host_limiter
+@file host_limiter.py
+"""
+
+import os
+import sys
+import time
+import datetime
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(
+    os.path.dirname(__file__), os.path.pardir, os.path.pardir)))
+
+
+__MOUDLE__ = 'host_limiter'  # 模块名
+__DESCRIPT__ = u'下载主机限速模块'  # 模块描述
+__VERSION__ = '0.1.0'  # 版本
+__AUTHOR__ = u'黎慧剑'  # 作者
+__PUBLISH__ = '2021.07.01'  # 发布日期
+
+
+class HostState(object):
+    """
+    单个下载主机的限速状态(令牌桶 + 并发连接数 + 限流暂停)
+    注：该对象不加锁, 由HostRateLimiter统一加锁访问
+    """
+
+    def __init__(self, rate: float = 0, burst: int = 0, max_conn: int = 0):
+        """
+        构造函数
+
+        @param {float} rate=0 - 每秒允许的请求数, 0代表不限速
+        @param {int} burst=0 - 令牌桶容量(允许的突发请求数), 0代表取max(1, rate)
+        @param {int} max_conn=0 - 最大并发连接数, 0代表不限制
+        """
+        self.config_rate = rate  # 配置的请求速率
+        self.rate = rate  # 当前的请求速率(遇到限流时降低, 成功后逐步恢复)
+        self.burst = burst if burst > 0 else max(1, int(rate))
+        self.max_conn = max_conn
+        self.tokens = float(self.burst)
+        self.last_time = time.time()
+        self.running = 0  # 正在执行的请求数
+        self.pause_until = 0  # 限流暂停的结束时间
+        self.throttled = 0  # 连续被限流的次数
+
+    def get_wait(self, now: float) -> float:
+        """
+        获取需要等待的时间, 无需等待时占用令牌和连接
+
+        @param {float} now - 当前时间
+
+        @returns {float} - 需要等待的秒数, 返回0代表已获得请求许可
+        """
+        if self.pause_until > now:
+            return self.pause_until - now
+
+        if self.max_conn > 0 and self.running >= self.max_conn:
+            return HostRateLimiter.CONN_WAIT
+
+        if self.rate > 0:
+            self.tokens = min(float(self.burst), self.tokens + (now - self.last_time) * self.rate)
+            self.last_time = now
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+            self.tokens -= 1
+
+        self.running += 1
+        return 0
+
+    def on_success(self):
+        """
+        请求成功的处理, 逐步恢复被降低的请求速率
+        """
+        self.throttled = 0
+        if self.rate < self.config_rate:
+            self.rate = min(self.config_rate, self.rate + self.config_rate * 0.1)
+
+    def on_throttled(self, now: float, retry_after: float = None):
+        """
+        请求被限流(429/503)的处理, 暂停请求并降低请求速率
+
+        @param {float} now - 当前时间
+        @param {float} retry_after=None - 服务端要求的等待秒数(Retry-After)
+        """
+        self.throttled += 1
+        if retry_after is None:
+            retry_after = min(
+                HostRateLimiter.THROTTLE_BASE_DELAY * (2 ** (self.throttled - 1)),
+                HostRateLimiter.THROTTLE_MAX_DELAY
+            )
+        self.pause_until = max(self.pause_until, now + retry_after)
+        if self.rate > 0:
+            self.rate = max(self.rate / 2, self.config_rate / 16)
+
+
+class HostRateLimiter(object):
+    """
+    按下载主机控制请求的调度器
+    注：1、每个主机使用令牌桶控制请求速率(rate/burst), 并限制最大并发连接数(max_conn), 不同主机之间互不影响
+        2、主机返回429或带Retry-After的503时, 暂停该主机的请求并将速率减半, 后续请求成功后逐步恢复
+        3、可以通过通用网站配置的down_limits为特定主机指定独立的限制参数
+    """
+
+    # 达到最大并发连接数时的重新检查间隔, 单位为秒
+    CONN_WAIT = 0.05
+
+    # 没有Retry-After时的限流暂停时间, 单位为秒
+    THROTTLE_BASE_DELAY = 1.0
+    THROTTLE_MAX_DELAY = 60.0
+
+    #############################
+    # 静态方法
+    #############################
+    @staticmethod
+    def get_host(url: str) -> str:
+        """
+        获取url对应的主机名
+
+        @param {str} url - 下载url
+
+        @returns {str} - 主机名(小写), 解析不到返回''
+        """
+        return (urlparse(url).hostname or '').lower()
+
+    @staticmethod
+    def get_status_code(error: Exception) -> int:
+        """
+        获取异常对象中的http状态码(urllib的HTTPError/requests的HTTPError)
+
+        @param {Exception} error - 异常对象
+
+        @returns {int} - http状态码, 获取不到返回None
+        """
+        _status_code = getattr(error, 'code', None)
+        if not isinstance(_status_code, int):
+            _status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+
+        return _status_code if isinstance(_status_code, int) else None
+
+    @staticmethod
+    def get_retry_after(error: Exception) -> float:
+        """
+        获取异常对象中http应答的Retry-After等待时间
+
+        @param {Exception} error - 异常对象
+
+        @returns {float} - 等待秒数, 获取不到返回None
+        """
+        _headers = getattr(error, 'headers', None)
+        if _headers is None:
+            _headers = getattr(getattr(error, 'response', None), 'headers', None)
+        if _headers is None:
+            return None
+
+        _value = _headers.get('Retry-After', None)
+        if _value is None or str(_value).strip() == '':
+            return None
+
+        _value = str(_value).strip()
+        try:
+            return max(float(_value), 0)
+        except ValueError:
+            pass
+
+        # http日期格式
+        try:
+            _date = parsedate_to_datetime(_value)
+            if _date.tzinfo is None:
+                _date = _date.replace(tzinfo=datetime.timezone.utc)
+            return max((_date - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0)
+        except (TypeError, ValueError):
+            return None
+
+    #############################
+    # 实例方法
+    #############################
+    def __init__(self, rate: float = 0, burst: int = 0, max_conn: int = 0, host_limits: dict = None):
+        """
+        构造函数
+
+        @param {float} rate=0 - 每个主机每秒允许的请求数, 0代表不限速
+        @param {int} burst=0 - 每个主机允许的突发请求数, 0代表取max(1, rate)
+        @param {int} max_conn=0 - 每个主机的最大并发连接数, 0代表不限制
+        @param {dict} host_limits=None - 特定主机的限制参数, key为主机名, value为dict(rate/burst/max_conn),
+            未指定的参数使用默认值
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_conn = max_conn
+        self.host_limits = dict()
+        for _host, _limits in ({} if host_limits is None else host_limits).items():
+            self.host_limits[_host.lower()] = _limits
+
+        self._lock = threading.Lock()
+        self._hosts = dict()  # key为主机名, value为HostState
+
+    def try_acquire(self, url: str) -> float:
+        """
+        尝试获取向url所在主机发起请求的许可(不等待)
+        注：获取成功后, 请求结束时必须调用release释放
+
+        @param {str} url - 下载url
+
+        @returns {float} - 需要等待的秒数, 返回0代表已获得许可
+        """
+        _host = self.get_host(url)
+        with self._lock:
+            return self._get_host_state(_host).get_wait(time.time())
+
+    def release(self, url: str, error: Exception = None):
+        """
+        请求结束, 释放许可并根据结果调整主机的请求速率
+
+        @param {str} url - 下载url
+        @param {Exception} error=None - 请求失败时的异常对象, 成功传None
+        """
+        _host = self.get_host(url)
+        with self._lock:
+            _state = self._get_host_state(_host)
+            _state.running = max(_state.running - 1, 0)
+            if error is None:
+                _state.on_success()
+                return
+
+            _status_code = self.get_status_code(error)
+            _retry_after = self.get_retry_after(error)
+            if _status_code == 429 or (_status_code == 503 and _retry_after is not None):
+                _state.on_throttled(time.time(), retry_after=_retry_after)
+
+    #############################
+    # 内部函数
+    #############################
+    def _get_host_state(self, host: str) -> HostState:
+        """
+        获取主机的限速状态对象(不存在则创建)
+
+        @param {str} host - 主机名
+
+        @returns {HostState} - 限速状态对象
+        """
+        _state = self._hosts.get(host, None)
+        if _state is None:
+            _limits = self.host_limits.get(host, {})
+            _state = HostState(
+                rate=float(_limits.get('rate', self.rate)),
+                burst=int(_limits.get('burst', self.burst)),
+                max_conn=int(_limits.get('max_conn', self.max_conn))
+            )
+            self._hosts[host] = _state
+
+        return _state
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    # 打印版本信息
+    print(('模块名：%s  -  %s\n'
+           '作者：%s\n'
+           '发布日期：%s\n'
+           '版本：%s' % (__MOUDLE__, __DESCRIPT__, __AUTHOR__, __PUBLISH__, __VERSION__)))
@@ -15,7 +15,9 @@ import threading
 import traceback
 import subprocess
 import time
-from urllib.parse import urlparse
+import hashlib
+from urllib.parse import urljoin
+from Crypto.Cipher import AES
 from HiveNetLib.base_tools.file_tool import FileTool
 from HiveNetLib.simple_queue import MemoryQueue
 from HiveNetLib.simple_parallel import ParallelPool, ThreadParallel, ThreadParallelLock, ThreadParallelShareDict
@@ -42,9 +44,23 @@ class M3u8DownLoader(object):
     m3u8视频下载工具
     """
 
+    # 解密时每次处理的数据大小(必须为AES块大小的整数倍)
+    DECRYPT_CHUNK_SIZE = 1024 * 1024
+
+    # 原生合并时每次复制的数据大小
+    MERGE_CHUNK_SIZE = 4 * 1024 * 1024
+
+    # 下载进度日志的刷新间隔, 单位为秒
+    STATUS_FLUSH_INTERVAL = 1.0
+
+    # 支持的子播放列表选择策略
+    VARIANT_POLICIES = ('first', 'max_bandwidth', 'min_bandwidth', 'resolution')
+
     def __init__(self, url: str, save_file: str, worker_num: int = 3, auto_retry: int = 0,
                  down_driver: BaseDownDriverFW = HttpDownDriver, down_extend_json: dict = {},
-                 down_task_overtime: float = 0, **kwargs):
+                 down_task_overtime: float = 0, merge_mode: str = 'ffmpeg', merge_window: int = 0,
+                 variant_policy: str = 'first', variant_resolution: str = '', variant_codec: str = '',
+                 **kwargs):
         """
         初始化下载工具
 
@@ -55,6 +71,21 @@ class M3u8DownLoader(object):
         @param {BaseDownDriverFW} down_driver=HttpDownDriver - 指定使用的下载驱动
         @param {dict} down_extend_json={} - 送入下载驱动的扩展参数，以下载驱动定义为准
         @param {float} down_task_overtime=0 - 下载任务的超时时间，超时视为失败
+        @param {str} merge_mode='ffmpeg' - 分片文件的合并方式
+            ffmpeg - 通过ffmpeg合并(需安装ffmpeg), 会按保存文件的扩展名转换封装格式
+            native - 按播放顺序直接拼接MPEG-TS分片(无需ffmpeg), 每拼接一个分片就删除该分片文件,
+                注意保存文件内容为MPEG-TS格式, 保存文件的扩展名不是.ts时会打印警告
+        @param {int} merge_window=0 - 边下载边合并的乱序窗口大小(分片数), 仅native合并方式有效
+            大于0时分片按播放顺序下载完成即拼接到输出文件, 只有处于[已拼接分片数, 已拼接分片数+窗口大小)
+            范围内的分片才会开始下载, 临时分片文件数量不超过窗口大小; 0代表全部下载完成后再合并
+            注意: 边下载边合并时有分片最终下载失败将停止所有分片的下载
+        @param {str} variant_policy='first' - m3u8为多码率的主播放列表时选择子播放列表的策略
+            first - 选择第一个子播放列表
+            max_bandwidth - 选择码率最高的子播放列表
+            min_bandwidth - 选择码率最低的子播放列表
+            resolution - 选择不超过 variant_resolution 的最高分辨率(都超过时选择最低分辨率), 分辨率相同时选择码率最高的
+        @param {str} variant_resolution='' - resolution 策略的目标分辨率, 格式为'宽x高'(例如'854x480')或只送高度(例如'480'或'480p')
+        @param {str} variant_codec='' - 只选择编码(CODECS)包含该字符串的子播放列表, 例如'avc1', 没有匹配的子播放列表时忽略该条件
         @param {dict} kwargs - 可送入下载驱动的下载任务参数，以下载驱动定义为准
         """
         # 初始化参数
@@ -65,6 +96,11 @@ class M3u8DownLoader(object):
         self.down_driver = down_driver
         self.down_extend_json = down_extend_json
         self.down_task_overtime = down_task_overtime
+        self.merge_mode = merge_mode
+        self.merge_window = int(merge_window)
+        self.variant_policy = variant_policy
+        self.variant_resolution = variant_resolution
+        self.variant_codec = variant_codec
         self.kwargs = kwargs
 
         # 下载处理临时参数
@@ -78,9 +114,23 @@ class M3u8DownLoader(object):
         # 临时目录参数
         self._down_status_file = os.path.join(self._temp_path, 'down_status.json')  # 下载记录文件
         self._down_status = None
+        self._status_log_file = os.path.join(self._temp_path, 'down_status.log')  # 下载进度日志文件
+        self._status_log = None  # 下载进度日志的文件对象
+        self._status_log_flush_time = 0  # 下载进度日志的最后刷新时间
+        self._done = bytearray()  # 分片是否已下载完成的位图, 下标为分片的播放顺序
         self._m3u8_file = os.path.join(self._temp_path, 'playlist.m3u8')
         self._m3u8_url = self.url  # m3u8的真实下载地址（可能处理过程中会发生变化）
         self._list_file = os.path.join(self._temp_path, 'list.txt')  # 要下载的文件清单
+        self._key_path = os.path.join(self._temp_path, 'keys')  # 解密秘钥的保存目录
+        self._key_cache = dict()  # 已获取的解密秘钥, key为秘钥url, value为秘钥
+        self._key_lock = threading.Lock()  # 获取秘钥的锁, 同一秘钥只获取一次
+        self._merge_file = os.path.join(self._temp_path, 'merge.ts')  # 原生合并的临时输出文件
+        self._merge_cond = threading.Condition(self._lock)  # 分片下载完成及合并进度的通知
+        self._merge_stop = False  # 边下载边合并时是否停止处理
+
+        if self.merge_mode == 'native' and FileTool.get_file_ext(self.save_file).lower() != 'ts':
+            # 原生合并不转换封装格式, 其他扩展名的文件内容与扩展名不一致
+            print('Warning: native merge writes MPEG-TS data, but save file extension is not .ts: %s' % self.save_file)
 
     #############################
     # 公共工具函数
@@ -100,10 +150,11 @@ class M3u8DownLoader(object):
 
         @returns {tuple} - 返回 flist, key
             flist {list} - 下载文件清单
-            keys {list} - 解密key信息列表, None代表无加密
+            keys {list} - 与下载文件清单一一对应的解密信息列表, 项为None代表该文件无加密, 加密时为
+                [秘钥url, iv的十六进制字符串]
         """
         flist = []
-        keys = None
+        keys = []
 
         # 检查要不要重新下载
         if not os.path.exists(self._m3u8_file):
@@ -111,18 +162,12 @@ class M3u8DownLoader(object):
 
         # 借助第三方库解析文件
         _m3u8_obj = m3u8.load(self._m3u8_file)
-        keys = _m3u8_obj.keys
-
-        _base_url_info = urlparse(self._m3u8_url)
-        if len(_m3u8_obj.files) == 0:
-            # 文件中没有实际文件信息，需要根据信息获取新的url再下载真正的文件
-            _new_url = _m3u8_obj.playlists[0].uri
-            if not _new_url.startswith('http') and _new_url.startswith('/'):
-                _new_url = '%s://%s/%s' % (
-                    _base_url_info.scheme, _base_url_info.netloc, _new_url
-                )
-            else:
-                _new_url = os.path.split(self._m3u8_url)[0] + '/' + _new_url
+
+        if len(_m3u8_obj.segments) == 0:
+            # 文件中没有实际文件信息，需要按策略选择子播放列表的url再下载真正的文件
+            if len(_m3u8_obj.playlists) == 0:
+                raise RuntimeError('no media file found in m3u8 [%s]' % self._m3u8_url)
+            _new_url = urljoin(self._m3u8_url, self.select_variant(_m3u8_obj.playlists).uri)
 
             # 重新下载
             FileTool.remove_file(self._m3u8_file)
@@ -135,42 +180,137 @@ class M3u8DownLoader(object):
             return self.get_playlist()
 
         # 解析文件
-        for _file in _m3u8_obj.files:
-            if _file.startswith('http://') or _file.startswith('https://'):
-                _base_url_info = urlparse(_file)
-                flist.append(_file)
-            elif _file.find('/') < 0:
-                # 只有文件名
-                flist.append('%s://%s/%s/%s' % (
-                    _base_url_info.scheme, _base_url_info.netloc,
-                    os.path.split(_base_url_info.path)[0], _file
-                ))
-            else:
-                # 有文件路径，缺域名
-                flist.append('%s://%s/%s' % (
-                    _base_url_info.scheme, _base_url_info.netloc, _file
-                ))
+        _media_sequence = _m3u8_obj.media_sequence or 0
+        for _index, _segment in enumerate(_m3u8_obj.segments):
+            keys.append(self._get_segment_key_info(_segment, _media_sequence + _index))
+            # 按 RFC 3986 相对m3u8文件的真实地址解析
+            flist.append(urljoin(self._m3u8_url, _segment.uri))
 
         # 返回处理结果
         return flist, keys
 
+    def select_variant(self, playlists: list):
+        """
+        按选择策略从主播放列表中选择子播放列表
+
+        @param {list} playlists - 子播放列表清单(m3u8.Playlist对象清单)
+
+        @returns {m3u8.Playlist} - 选中的子播放列表
+
+        @throws {ValueError} - 选择策略不支持或目标分辨率格式错误时抛出
+        """
+        if self.variant_policy not in self.VARIANT_POLICIES:
+            raise ValueError('variant policy [%s] not support, must be one of: %s' % (
+                self.variant_policy, ', '.join(self.VARIANT_POLICIES)
+            ))
+
+        _playlists = list(playlists)
+        if self.variant_codec != '':
+            _match = [
+                _playlist for _playlist in _playlists
+                if (_playlist.stream_info.codecs or '').find(self.variant_codec) >= 0
+            ]
+            if len(_match) > 0:
+                _playlists = _match
+
+        def _bandwidth(playlist):
+            return playlist.stream_info.bandwidth or 0
+
+        def _height(playlist):
+            _resolution = playlist.stream_info.resolution
+            return 0 if _resolution is None else _resolution[1]
+
+        if self.variant_policy == 'max_bandwidth':
+            return max(_playlists, key=_bandwidth)
+        elif self.variant_policy == 'min_bandwidth':
+            return min(_playlists, key=_bandwidth)
+        elif self.variant_policy == 'resolution':
+            _target = self._get_target_height()
+            _fit = [_playlist for _playlist in _playlists if _height(_playlist) <= _target]
+            if len(_fit) > 0:
+                return max(_fit, key=lambda _playlist: (_height(_playlist), _bandwidth(_playlist)))
+            return min(_playlists, key=lambda _playlist: (_height(_playlist), -_bandwidth(_playlist)))
+
+        return _playlists[0]
+
+    def get_key(self, key_url: str) -> bytes:
+        """
+        获取解密秘钥(同一秘钥url只获取一次)
+
+        @param {str} key_url - 秘钥url
+
+        @returns {bytes} - 秘钥
+        """
+        with self._key_lock:
+            _key = self._key_cache.get(key_url, None)
+            if _key is not None:
+                return _key
+
+            # 秘钥保存在临时目录, 续传时无需再次获取
+            _key_file = os.path.join(
+                self._key_path, '%s.key' % hashlib.sha1(key_url.encode('utf-8')).hexdigest()
+            )
+            if not os.path.exists(_key_file):
+                FileTool.create_dir(self._key_path, exist_ok=True)
+                self.down_driver.download(
+                    key_url, _key_file + '.tmp',
+                    extend_json=self.down_extend_json, **self.kwargs
+                )
+                os.replace(_key_file + '.tmp', _key_file)
+
+            with open(_key_file, 'rb') as f:
+                _key = f.read()
+
+            if len(_key) != 16:
+                FileTool.remove_file(_key_file)
+                raise RuntimeError('key [%s] length error: %d' % (key_url, len(_key)))
+
+            self._key_cache[key_url] = _key
+            return _key
+
+    def decrypt_file(self, src_file: str, dest_file: str, key: bytes, iv: bytes):
+        """
+        按AES-128-CBC流式解密文件(去除PKCS7填充)
+
+        @param {str} src_file - 加密文件
+        @param {str} dest_file - 解密后的文件
+        @param {bytes} key - 秘钥
+        @param {bytes} iv - 初始向量
+        """
+        _cipher = AES.new(key, AES.MODE_CBC, iv=iv)
+        _last = b''  # 最后一个块需要去除填充, 因此总是保留到下一次处理
+        with open(src_file, 'rb') as _src, open(dest_file + '.tmp', 'wb') as _dest:
+            while True:
+                _data = _src.read(self.DECRYPT_CHUNK_SIZE)
+                if not _data:
+                    break
+
+                _data = _last + _data
+                _len = len(_data) - len(_data) % AES.block_size
+                if _len == len(_data):
+                    _len -= AES.block_size
+                _dest.write(_cipher.decrypt(_data[0: _len]))
+                _last = _data[_len:]
+
+            if len(_last) != AES.block_size:
+                raise RuntimeError('encrypted file [%s] size error' % src_file)
+
+            _last = _cipher.decrypt(_last)
+            _pad = _last[-1]
+            if _pad < 1 or _pad > AES.block_size or _last[-_pad:] != bytes([_pad]) * _pad:
+                raise RuntimeError('decrypt file [%s] padding error' % src_file)
+            _dest.write(_last[0: -_pad])
+
+        os.replace(dest_file + '.tmp', dest_file)
+
     def merge_file(self):
         """
         合并视频文件
         """
-        _call_para = {
-            'shell': True, 'close_fds': True
-        }
-        if sys.platform == 'win32':
-            _call_para['creationflags'] = subprocess.CREATE_NEW_CONSOLE
-
-        _shell = subprocess.call(
-            'ffmpeg -f concat -safe 0 -i "%s" -c copy "%s"' % (
-                os.path.realpath(self._list_file), os.path.realpath(self.save_file)
-            ), **_call_para
-        )
-        if _shell != 0:
-            raise RuntimeError('merge file error')
+        if self.merge_mode == 'native':
+            self._merge_by_native()
+        else:
+            self._merge_by_ffmpeg()
 
     #############################
     # 处理函数
@@ -200,23 +340,204 @@ class M3u8DownLoader(object):
         # 处理m3u8文件的文件列表
         if not os.path.exists(self._list_file):
             _flist, _keys = self.get_playlist()
-            self._down_status['key'] = ''
+            self._down_status['files'] = _flist  # 登记到状态表
+            self._down_status['keys'] = dict()
 
             # 保存到list_file文件，用于后续合并
             with open(self._list_file, 'w') as f:
-                for _file in _flist:
+                for _index, _file in enumerate(_flist):
                     f.write('file %s\r\n' % (
                         os.path.join(
                             self._temp_path, os.path.split(_file)[1]
                         ).replace('\\', '/')
                     ))
-                    self._down_status['files'][_file] = 'downloading'  # 登记到状态表
+                    if _keys[_index] is not None:
+                        self._down_status['keys'][str(_index)] = _keys[_index]
 
             self._save_down_status(self._down_status)
+            self._done = bytearray(len(_flist))
 
         # 执行下载操作
         self._download()
 
+    #############################
+    # 内部函数-子播放列表选择
+    #############################
+    def _get_target_height(self) -> int:
+        """
+        获取 resolution 策略的目标高度
+
+        @returns {int} - 目标高度
+
+        @throws {ValueError} - 目标分辨率格式错误时抛出
+        """
+        _height = str(self.variant_resolution).strip().lower().split('x')[-1].strip()
+        if _height.endswith('p'):
+            _height = _height[0: -1]
+
+        if not _height.isdigit():
+            raise ValueError('variant resolution [%s] format error, must be like 854x480, 480 or 480p' % str(
+                self.variant_resolution
+            ))
+
+        return int(_height)
+
+    #############################
+    # 内部函数-解密处理
+    #############################
+    def _get_segment_key_info(self, segment, sequence: int) -> list:
+        """
+        获取分片文件的解密信息
+
+        @param {m3u8.Segment} segment - 分片对象
+        @param {int} sequence - 分片的媒体序号, 没有指定iv时以此作为iv
+
+        @returns {list} - 解密信息[秘钥url, iv的十六进制字符串], 无加密返回None
+        """
+        _key = segment.key
+        if _key is None or _key.method is None or _key.method.upper() == 'NONE':
+            return None
+
+        if _key.method.upper() != 'AES-128':
+            raise RuntimeError('key method [%s] not support' % _key.method)
+
+        if _key.iv is None or _key.iv == '':
+            _iv = '%032x' % sequence
+        else:
+            _iv = _key.iv[2:] if _key.iv.lower().startswith('0x') else _key.iv
+            _iv = _iv.rjust(32, '0')
+
+        return [urljoin(self._m3u8_url, _key.uri), _iv]
+
+    #############################
+    # 内部函数-合并处理
+    #############################
+    def _merge_by_ffmpeg(self):
+        """
+        通过ffmpeg合并视频文件
+        """
+        _call_para = {
+            'shell': True, 'close_fds': True
+        }
+        if sys.platform == 'win32':
+            _call_para['creationflags'] = subprocess.CREATE_NEW_CONSOLE
+
+        _shell = subprocess.call(
+            'ffmpeg -f concat -safe 0 -i "%s" -c copy "%s"' % (
+                os.path.realpath(self._list_file), os.path.realpath(self.save_file)
+            ), **_call_para
+        )
+        if _shell != 0:
+            raise RuntimeError('merge file error')
+
+    def _merge_by_native(self, wait_down: bool = False) -> bool:
+        """
+        按播放顺序直接拼接MPEG-TS分片文件
+        注：已拼接的分片数和输出大小登记在下载状态中, 中断后可从已拼接的位置继续
+
+        @param {bool} wait_down=False - 是否等待分片下载完成(边下载边合并)
+
+        @returns {bool} - 是否已完成合并, 等待分片下载时被停止返回False
+        """
+        _files = []
+        with open(self._list_file, 'r') as f:
+            for _line in f:
+                _line = _line.strip()
+                if _line.startswith('file '):
+                    _files.append(_line[5:])
+
+        _merge_index = self._down_status.get('merge_index', 0)
+        _merge_size = self._down_status.get('merge_size', 0)
+        if not os.path.exists(self._merge_file):
+            open(self._merge_file, 'wb').close()
+
+        # 不能用追加方式打开, 否则无法使用 copy_file_range/sendfile
+        with open(self._merge_file, 'r+b', buffering=0) as _dest:
+            # 去掉上次中断时未登记的部分
+            _dest.truncate(_merge_size)
+            _dest.seek(_merge_size)
+            for _index in range(_merge_index, len(_files)):
+                if wait_down:
+                    with self._merge_cond:
+                        while not self._done[_index]:
+                            if self._merge_stop:
+                                return False
+                            self._merge_cond.wait()
+
+                _merge_size += self._append_file(_files[_index], _dest)
+
+                # 先登记合并进度(立即刷新)再删除分片文件, 保证中断时可以重新拼接
+                with self._merge_cond:
+                    self._down_status['merge_index'] = _index + 1
+                    self._down_status['merge_size'] = _merge_size
+                    self._write_status_log('m %d %d' % (_index + 1, _merge_size), flush=True)
+                    self._merge_cond.notify_all()
+                FileTool.remove_file(_files[_index])
+
+        os.replace(self._merge_file, self.save_file)
+        return True
+
+    def _progressive_merge_fun(self, result: dict):
+        """
+        边下载边合并的合并线程函数
+
+        @param {dict} result - 合并结果, 处理完成后登记 done(是否完成合并) 和 error(异常对象)
+        """
+        try:
+            result['done'] = self._merge_by_native(wait_down=True)
+        except Exception as _e:
+            result['error'] = _e
+            print('Merge error: %s' % self.save_file)
+            print(traceback.format_exc())
+            with self._merge_cond:
+                self._merge_stop = True
+                self._merge_cond.notify_all()
+
+    def _append_file(self, src_file: str, dest) -> int:
+        """
+        将文件内容追加到输出文件
+        注：优先使用 copy_file_range/sendfile 在内核中复制数据, 不支持时使用大块顺序读写
+
+        @param {str} src_file - 要追加的文件
+        @param {io.FileIO} dest - 输出文件对象(以无缓存方式打开, 当前位置为追加位置)
+
+        @returns {int} - 追加的数据大小
+        """
+        _size = os.path.getsize(src_file)
+        _copied = 0
+        with open(src_file, 'rb', buffering=0) as _src:
+            for _fun_name in ('copy_file_range', 'sendfile'):
+                _fun = getattr(os, _fun_name, None)
+                if _fun is None:
+                    continue
+
+                try:
+                    while _copied < _size:
+                        if _fun_name == 'copy_file_range':
+                            _len = _fun(_src.fileno(), dest.fileno(), _size - _copied)
+                        else:
+                            _len = _fun(dest.fileno(), _src.fileno(), _copied, _size - _copied)
+                        if _len == 0:
+                            break
+                        _copied += _len
+                    break
+                except OSError:
+                    # 不支持的文件系统或平台, 从已复制的位置继续使用其他方式
+                    continue
+
+            _src.seek(_copied)
+            while _copied < _size:
+                _data = _src.read(self.MERGE_CHUNK_SIZE)
+                if not _data:
+                    break
+                dest.write(_data)
+                _copied += len(_data)
+
+        if _copied != _size:
+            raise RuntimeError('append file [%s] size error' % src_file)
+
+        return _copied
+
     #############################
     # 内部函数-下载状态文件处理
     #############################
@@ -230,9 +551,12 @@ class M3u8DownLoader(object):
         @returns {dict} - 当前下载状态字典
             {
                 'status': 'downloading',  # 下载状态，downloading-正在下载，done-已完成，failed-失败, existed-文件已存在
-                'files': {},
-                'key': ''  # 秘钥
+                'files': [],  # 按播放顺序的分片url清单, 分片通过在清单中的下标标识
+                'keys': {},  # 加密分片的解密信息, key为分片下标字符串, value为[秘钥url, iv的十六进制字符串]
+                'merge_index': 0,  # 原生合并方式已拼接的分片数(从进度日志恢复)
+                'merge_size': 0  # 原生合并方式已拼接的输出大小(从进度日志恢复)
             }
+            注：分片的完成情况从进度日志恢复到 self._done 位图
         """
         if os.path.exists(self._down_status_file):
             with open(self._down_status_file, 'rb') as f:
@@ -241,26 +565,97 @@ class M3u8DownLoader(object):
         else:
             _down_status = {
                 'status': 'downloading',
-                'files': {},
-                'key': ''
+                'files': [],
+                'keys': {}
             }
             if auto_create:
                 # 自动创建
                 FileTool.create_dir(self._temp_path, exist_ok=True)
                 self._save_down_status(_down_status)
 
+        self._done = bytearray(len(_down_status['files']))
+        if type(_down_status['files']) == dict:
+            # 旧版本以url为key登记状态的格式, 转换为按下标登记
+            _urls = list(_down_status['files'].keys())
+            _url_index = dict()
+            for _index, _url in enumerate(_urls):
+                _url_index[_url] = _index
+                if _down_status['files'][_url] == 'done':
+                    self._done[_index] = 1
+            _down_status['keys'] = dict([
+                (str(_url_index[_url]), _info) for _url, _info in _down_status.get('keys', {}).items()
+                if _url in _url_index
+            ])
+            _down_status['files'] = _urls
+            if auto_create:
+                self._save_down_status(_down_status)
+
+        self._load_status_log(_down_status)
         return _down_status
 
     def _save_down_status(self, down_status: dict):
         """
         保存下载状态文件
+        注：只在登记分片清单时保存, 下载过程中的进度登记到进度日志
 
         @param {dict} down_status - 当前状态字典
         """
-        _json = json.dumps(down_status, ensure_ascii=False, indent=2)
+        _json = json.dumps(down_status, ensure_ascii=False, separators=(',', ':'))
         with open(self._down_status_file, 'wb') as f:
             f.write(str.encode(_json, encoding='utf-8'))
 
+    #############################
+    # 内部函数-下载进度日志处理
+    # 日志每行一条记录:
+    #     d [分片下标] : 分片下载完成
+    #     m [已拼接分片数] [已拼接输出大小] : 原生合并方式的合并进度
+    #############################
+    def _load_status_log(self, down_status: dict):
+        """
+        装载下载进度日志, 恢复分片完成位图和合并进度
+
+        @param {dict} down_status - 当前状态字典
+        """
+        if not os.path.exists(self._status_log_file):
+            return
+
+        with open(self._status_log_file, 'r') as f:
+            for _line in f:
+                _item = _line.split()
+                try:
+                    if len(_item) == 2 and _item[0] == 'd':
+                        self._done[int(_item[1])] = 1
+                    elif len(_item) == 3 and _item[0] == 'm':
+                        down_status['merge_index'] = int(_item[1])
+                        down_status['merge_size'] = int(_item[2])
+                except (ValueError, IndexError):
+                    # 中断时未写完整的记录
+                    continue
+
+    def _write_status_log(self, entry: str, flush: bool = False):
+        """
+        追加下载进度日志(调用方需持有 self._lock)
+
+        @param {str} entry - 日志记录
+        @param {bool} flush=False - 是否立即刷新, 否则按刷新间隔定期刷新
+        """
+        if self._status_log is None:
+            self._status_log = open(self._status_log_file, 'a')
+
+        self._status_log.write(entry + '\n')
+        if flush or time.time() - self._status_log_flush_time >= self.STATUS_FLUSH_INTERVAL:
+            self._status_log.flush()
+            self._status_log_flush_time = time.time()
+
+    def _close_status_log(self):
+        """
+        刷新并关闭下载进度日志
+        """
+        with self._lock:
+            if self._status_log is not None:
+                self._status_log.close()
+                self._status_log = None
+
     #############################
     # 内部函数-下载操作
     #############################
@@ -270,9 +665,19 @@ class M3u8DownLoader(object):
         """
         # 装载下载清单
         self._down_queue.clear()
-        for _file in self._down_status['files'].keys():
-            if self._down_status['files'][_file] != 'done':
-                self._down_queue.put(_file)
+        for _index in range(len(self._done)):
+            if not self._done[_index]:
+                self._down_queue.put(_index)
+
+        # 边下载边合并, 启动合并线程
+        _merge_thread = None
+        _merge_result = {'done': False, 'error': None}
+        if self.merge_mode == 'native' and self.merge_window > 0:
+            self._merge_stop = False
+            _merge_thread = threading.Thread(
+                target=self._progressive_merge_fun, args=(_merge_result, ), daemon=True
+            )
+            _merge_thread.start()
 
         # 创建进程池
         _pool = ParallelPool(
@@ -287,20 +692,33 @@ class M3u8DownLoader(object):
             parallel_lock_class=ThreadParallelLock,
             auto_stop=True
         )
-        # 启动线程池
-        _pool.start()
-
-        # 等待任务结束
-        while not _pool.is_stop:
-            time.sleep(1)
-
-        # 检查是否全部完成了
-        for _file in self._down_status['files'].keys():
-            if self._down_status['files'][_file] != 'done':
+        try:
+            # 启动线程池
+            _pool.start()
+
+            # 等待任务结束
+            while not _pool.is_stop:
+                time.sleep(1)
+
+            if _merge_thread is not None:
+                # 下载已结束, 等待合并线程处理完已下载的分片
+                with self._merge_cond:
+                    if 0 in self._done:
+                        self._merge_stop = True
+                    self._merge_cond.notify_all()
+                _merge_thread.join()
+                if _merge_result['error'] is not None:
+                    raise _merge_result['error']
+
+            # 检查是否全部完成了
+            if 0 in self._done:
                 raise RuntimeError('not finished')
 
-        # 全部完成了，合并文件
-        self.merge_file()
+            # 全部完成了，合并文件
+            if _merge_thread is None:
+                self.merge_file()
+        finally:
+            self._close_status_log()
 
         # 合并成功，删除临时目录
         FileTool.remove_dir(self._temp_path)
@@ -312,22 +730,47 @@ class M3u8DownLoader(object):
         _url = ''
 
         try:
-            _url = q.get(block=False)
+            _index = q.get(block=False)
+            _url = self._down_status['files'][_index]
         except:
             # 没有取到任务
             time.sleep(0.5)
             return None
 
+        if self.merge_mode == 'native' and self.merge_window > 0:
+            # 边下载边合并, 等待分片进入合并窗口
+            with self._merge_cond:
+                while _index >= self._down_status.get('merge_index', 0) + self.merge_window:
+                    if self._merge_stop:
+                        return False
+                    self._merge_cond.wait(1)
+                if self._merge_stop:
+                    return False
+
         try:
             _file_name = os.path.split(_url)[1]
+            _save_file = os.path.join(self._temp_path, _file_name)
+            _key_info = self._down_status.get('keys', {}).get(str(_index), None)
 
             _retry_time = 0
             while True:
                 try:
-                    self.down_driver.download(
-                        _url, os.path.join(self._temp_path, _file_name),
-                        extend_json=self.down_extend_json, **self.kwargs
-                    )
+                    if _key_info is None:
+                        self.down_driver.download(
+                            _url, _save_file,
+                            extend_json=self.down_extend_json, **self.kwargs
+                        )
+                    else:
+                        # 加密文件, 下载后解密为分片文件
+                        self.down_driver.download(
+                            _url, _save_file + '.enc',
+                            extend_json=self.down_extend_json, **self.kwargs
+                        )
+                        self.decrypt_file(
+                            _save_file + '.enc', _save_file, self.get_key(_key_info[0]),
+                            bytes.fromhex(_key_info[1])
+                        )
+                        FileTool.remove_file(_save_file + '.enc')
                     break  # 下载成功退出
                 except:
                     if _retry_time <= self.auto_retry:
@@ -337,18 +780,21 @@ class M3u8DownLoader(object):
                         raise
 
             # 下载成功，更新下载结果
-            self._lock.acquire()
-            try:
-                self._down_status['files'][_url] = 'done'
-                self._save_down_status(self._down_status)
-            finally:
-                self._lock.release()
+            with self._merge_cond:
+                self._done[_index] = 1
+                self._write_status_log('d %d' % _index)
+                self._merge_cond.notify_all()
 
             return True
         except:
             # 下载失败
             print('Download error: %s' % _url)
             print(traceback.format_exc())
+            if self.merge_mode == 'native' and self.merge_window > 0:
+                # 边下载边合并时后续分片已无法合并, 停止处理
+                with self._merge_cond:
+                    self._merge_stop = True
+                    self._merge_cond.notify_all()
             time.sleep(0.5)
             return False
 
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# Copyright 2019 黎慧剑
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+网页的http条件请求缓存模块
+@module page_cache
+@file page_cache.py
+"""
+
+import os
+import sys
+import json
+import hashlib
+import threading
+import urllib.error
+import urllib.request
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(
+    os.path.dirname(__file__), os.path.pardir, os.path.pardir)))
+
+
+__MOUDLE__ = 'page_cache'  # 模块名
+__DESCRIPT__ = u'网页的http条件请求缓存模块'  # 模块描述
+__VERSION__ = '0.1.0'  # 版本
+__AUTHOR__ = u'黎慧剑'  # 作者
+__PUBLISH__ = '2021.07.01'  # 发布日期
+
+
+#############################
+# 缓存的目录结构, 统一放在下载保存目录(path参数)的 .page_cache 目录下, 所有下载任务共用:
+#     [缓存key前2位]/[缓存key].json : 缓存信息, 缓存key为url及请求协议头的sha1值, 内容为json字典:
+#         url : 网页url
+#         etag : 应答的ETag
+#         last_modified : 应答的Last-Modified
+#         html : 网页代码
+#############################
+
+
+class PageCache(object):
+    """
+    网页的http条件请求缓存
+    注：1、只缓存带ETag或Last-Modified应答头的网页
+        2、再次访问时带上If-None-Match/If-Modified-Since请求头, 服务器返回304时直接使用缓存的网页代码
+    """
+
+    # 缓存的目录名
+    CACHE_DIR_NAME = '.page_cache'
+
+    #############################
+    # 静态方法
+    #############################
+    @classmethod
+    def get_cache_path(cls, path: str) -> str:
+        """
+        获取下载保存目录对应的缓存目录
+
+        @param {str} path - 下载保存目录
+
+        @returns {str} - 缓存目录
+        """
+        return os.path.join(os.path.realpath(path), cls.CACHE_DIR_NAME)
+
+    @classmethod
+    def get_cache_key(cls, url: str, headers: dict = None) -> str:
+        """
+        获取url及请求协议头对应的缓存key
+
+        @param {str} url - 网页url
+        @param {dict} headers=None - 请求协议头
+
+        @returns {str} - 缓存key
+        """
+        _headers = dict()
+        for _key, _val in ({} if headers is None else headers).items():
+            _headers[_key.lower()] = str(_val)
+
+        return hashlib.sha1(
+            json.dumps([url, _headers], sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+
+    #############################
+    # 实例方法
+    #############################
+    def __init__(self, path: str):
+        """
+        构造函数
+
+        @param {str} path - 下载保存目录, 缓存放在该目录的 .page_cache 目录下
+        """
+        self.cache_path = self.get_cache_path(path)
+
+    def get_web_page_code(self, url: str, headers: dict = None, timeout: float = 30,
+                          encoding: str = 'utf-8', retry: int = 0, proxy: dict = None) -> str:
+        """
+        获取网页代码(静态代码), 使用条件请求缓存
+
+        @param {str} url - 网页url
+        @param {dict} headers=None - 请求协议头
+        @param {float} timeout=30 - 超时时间, 单位为秒
+        @param {str} encoding='utf-8' - 解析网页内容的编码
+        @param {int} retry=0 - 出现http异常时的重试次数
+        @param {dict} proxy=None - 访问代理, 例如{'http': 'http://61.135.217.7:80'}
+
+        @returns {str} - 网页的静态代码
+        """
+        _key = self.get_cache_key(url, headers)
+        _entry = self._load(_key)
+
+        _headers = dict() if headers is None else dict(headers)
+        if _entry is not None:
+            if _entry.get('etag', '') != '':
+                _headers['If-None-Match'] = _entry['etag']
+            if _entry.get('last_modified', '') != '':
+                _headers['If-Modified-Since'] = _entry['last_modified']
+
+        _opener = urllib.request.build_opener(
+            *([] if proxy is None else [urllib.request.ProxyHandler(proxy)])
+        )
+        _retry_time = 1
+        while True:
+            try:
+                with _opener.open(urllib.request.Request(url, headers=_headers), timeout=timeout) as _res:
+                    _html = _res.read().decode(encoding)
+                    _etag = _res.headers.get('ETag', '')
+                    _last_modified = _res.headers.get('Last-Modified', '')
+                break
+            except urllib.error.HTTPError as _e:
+                if _e.code == 304 and _entry is not None:
+                    # 网页未变化, 使用缓存
+                    return _entry['html']
+                if _retry_time <= retry:
+                    _retry_time += 1
+                    continue
+                raise
+
+        if _etag != '' or _last_modified != '':
+            self._save(_key, {
+                'url': url, 'etag': _etag, 'last_modified': _last_modified, 'html': _html
+            })
+
+        return _html
+
+    #############################
+    # 内部函数
+    #############################
+    def _get_cache_file(self, key: str) -> str:
+        """
+        获取缓存key对应的缓存文件
+
+        @param {str} key - 缓存key
+
+        @returns {str} - 缓存文件路径
+        """
+        return os.path.join(self.cache_path, key[0: 2], '%s.json' % key)
+
+    def _load(self, key: str) -> dict:
+        """
+        装载缓存信息
+
+        @param {str} key - 缓存key
+
+        @returns {dict} - 缓存信息, 没有缓存或缓存文件损坏返回None
+        """
+        _file = self._get_cache_file(key)
+        if not os.path.exists(_file):
+            return None
+
+        try:
+            with open(_file, 'r', encoding='utf-8') as _f:
+                return json.loads(_f.read())
+        except ValueError:
+            return None
+
+    def _save(self, key: str, entry: dict):
+        """
+        保存缓存信息
+
+        @param {str} key - 缓存key
+        @param {dict} entry - 缓存信息
+        """
+        _file = self._get_cache_file(key)
+        os.makedirs(os.path.split(_file)[0], exist_ok=True)
+        _temp_file = '%s.%d.tmp' % (_file, threading.get_ident())
+        with open(_temp_file, 'w', encoding='utf-8') as _f:
+            _f.write(json.dumps(entry, ensure_ascii=False))
+        os.replace(_temp_file, _file)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    # 打印版本信息
+    print(('模块名：%s  -  %s\n'
+           '作者：%s\n'
+           '发布日期：%s\n'
+           '版本：%s' % (__MOUDLE__, __DESCRIPT__, __AUTHOR__, __PUBLISH__, __VERSION__)))
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# Copyright 2019 黎慧剑
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+下载进度日志模块
+@module task_journal
+@file task_journal.py
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(
+    os.path.dirname(__file__), os.path.pardir, os.path.pardir)))
+
+
+__MOUDLE__ = 'task_journal'  # 模块名
+__DESCRIPT__ = u'下载进度日志模块'  # 模块描述
+__VERSION__ = '0.1.0'  # 版本
+__AUTHOR__ = u'黎慧剑'  # 作者
+__PUBLISH__ = '2021.07.01'  # 发布日期
+
+
+#############################
+# 进度日志文件格式, 统一命名 down.progress.log, 与down.xml放在同一目录
+# 每行为一个json数组, 代表一次状态变更:
+#     ["vol_[num]", "file_[num]", "status"] : 文件下载状态变更, status为done/err
+#     ["vol_[num]", "file_[num]", "err", "url"] : 文件下载失败, 同时登记到down.xml的error节点
+#     ["vol_[num]", "file_[num]", "done", {"size": 1024, "hash": "sha1:..."}] : 文件下载完成,
+#         同时登记文件的完整性信息(大小及哈希值)
+#     ["vol_[num]", "", "status"] : 卷下载状态变更
+# 日志只追加不修改, 在压缩(compact)时统一写入down.xml并清空
+#############################
+
+
+class TaskProgressJournal(object):
+    """
+    下载进度的预写日志(write-ahead journal)
+    注：用于替代每个文件下载完成后整体重写down.xml的处理，每次状态变更只追加一行日志，
+        定期或任务结束时再将日志内容合并到down.xml
+    """
+
+    #############################
+    # 静态方法
+    #############################
+    @staticmethod
+    def get_journal_file(conf_file: str) -> str:
+        """
+        根据下载配置文件获取对应的进度日志文件路径
+
+        @param {str} conf_file - 下载配置文件(down.xml)路径
+
+        @returns {str} - 进度日志文件路径
+        """
+        return os.path.join(os.path.split(conf_file)[0], 'down.progress.log')
+
+    @staticmethod
+    def load_entries(journal_file: str) -> list:
+        """
+        读取进度日志文件的所有记录
+
+        @param {str} journal_file - 进度日志文件路径
+
+        @returns {list} - 记录清单，每个记录为一个数组
+            注：程序中断可能导致最后一行不完整，不完整的记录将被忽略
+        """
+        _entries = list()
+        if not os.path.exists(journal_file):
+            return _entries
+
+        with open(journal_file, 'r', encoding='utf-8') as _f:
+            for _line in _f:
+                _line = _line.strip()
+                if _line == '':
+                    continue
+                try:
+                    _entries.append(json.loads(_line))
+                except ValueError:
+                    # 写入中断的残缺行
+                    continue
+
+        return _entries
+
+    @staticmethod
+    def apply_entries(xml_doc, entries: list) -> int:
+        """
+        将日志记录应用到下载配置文件对象(不保存)
+
+        @param {SimpleXml} xml_doc - 下载配置文件对象
+        @param {list} entries - 日志记录清单
+
+        @returns {int} - 应用的记录数
+        """
+        _success = int(xml_doc.get_value('/down_task/info/success', default='0'))
+        for _entry in entries:
+            _vol_num, _file_num, _status = _entry[0], _entry[1], _entry[2]
+            if _file_num == '':
+                # 卷状态
+                xml_doc.set_value('/down_task/down_list/%s/status' % _vol_num, _status)
+                continue
+
+            _xpath = '/down_task/down_list/%s/files/%s/status' % (_vol_num, _file_num)
+            if _status == 'done' and xml_doc.get_value(_xpath) != 'done':
+                _success += 1
+
+            xml_doc.set_value(_xpath, _status)
+            if len(_entry) > 3 and isinstance(_entry[3], dict):
+                # 登记文件完整性信息
+                for _key, _value in _entry[3].items():
+                    xml_doc.set_value(
+                        '/down_task/down_list/%s/files/%s/%s' % (_vol_num, _file_num, _key), str(_value)
+                    )
+            elif len(_entry) > 3:
+                # 登记异常信息
+                xml_doc.set_value(
+                    '/down_task/error/%s/files/%s/url' % (_vol_num, _file_num), _entry[3]
+                )
+
+        xml_doc.set_value('/down_task/info/success', str(_success))
+        return len(entries)
+
+    @classmethod
+    def replay(cls, xml_doc, conf_file: str) -> int:
+        """
+        重放遗留的进度日志(上次处理异常中断的情况)，合并到配置文件并删除日志
+
+        @param {SimpleXml} xml_doc - 下载配置文件对象
+        @param {str} conf_file - 下载配置文件(down.xml)路径
+
+        @returns {int} - 重放的记录数
+        """
+        _journal_file = cls.get_journal_file(conf_file)
+        _entries = cls.load_entries(_journal_file)
+        if len(_entries) > 0:
+            cls.apply_entries(xml_doc, _entries)
+            xml_doc.save(file=conf_file, encoding='utf-8', pretty_print=True)
+
+        if os.path.exists(_journal_file):
+            os.remove(_journal_file)
+
+        return len(_entries)
+
+    #############################
+    # 实例方法
+    #############################
+    def __init__(self, xml_doc, sync_batch: int = 100, sync_interval: float = 1.0,
+                 compact_interval: float = 60.0):
+        """
+        构造函数
+
+        @param {SimpleXml} xml_doc - 下载配置文件对象(必须为文件方式装载)
+        @param {int} sync_batch=100 - 累计多少条记录执行一次fsync
+        @param {float} sync_interval=1.0 - 距离上次fsync超过多少秒执行一次fsync
+        @param {float} compact_interval=60.0 - 每隔多少秒将日志合并到down.xml, 0代表只在任务结束时合并
+        """
+        self.xml_doc = xml_doc
+        self.conf_file = xml_doc.file
+        self.journal_file = self.get_journal_file(self.conf_file)
+        self.sync_batch = sync_batch
+        self.sync_interval = sync_interval
+        self.compact_interval = compact_interval
+
+        self._lock = threading.RLock()
+        self._file = None  # 打开的日志文件对象
+        self._pending = list()  # 尚未合并到down.xml的记录
+        self._unsync_num = 0  # 尚未fsync的记录数
+        self._last_sync = time.time()
+        self._last_compact = time.time()
+
+    def append(self, vol_num: str, file_num: str, status: str, url: str = None, meta: dict = None):
+        """
+        追加一条状态变更记录
+
+        @param {str} vol_num - 卷标识
+        @param {str} file_num - 文件标识, 传''代表变更卷状态
+        @param {str} status - 状态
+        @param {str} url=None - 下载失败时登记的url
+        @param {dict} meta=None - 下载完成时登记的文件完整性信息(size/hash)
+        """
+        _entry = [vol_num, file_num, status]
+        if url is not None:
+            _entry.append(url)
+        elif meta is not None:
+            _entry.append(meta)
+
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.journal_file, 'a', encoding='utf-8')
+
+            self._file.write(json.dumps(_entry, ensure_ascii=False) + '\n')
+            self._pending.append(_entry)
+            self._unsync_num += 1
+
+            _now = time.time()
+            if self._unsync_num >= self.sync_batch or _now - self._last_sync >= self.sync_interval:
+                self.sync()
+
+            if self.compact_interval > 0 and _now - self._last_compact >= self.compact_interval:
+                self.compact()
+
+    def sync(self):
+        """
+        将日志刷新到磁盘
+        """
+        with self._lock:
+            if self._file is not None and self._unsync_num > 0:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+            self._unsync_num = 0
+            self._last_sync = time.time()
+
+    def compact(self):
+        """
+        将日志记录合并到down.xml并清空日志
+        """
+        with self._lock:
+            self._last_compact = time.time()
+            if len(self._pending) == 0:
+                return
+
+            # 先确保日志落盘，保存down.xml成功后才能删除日志
+            self.sync()
+            self.apply_entries(self.xml_doc, self._pending)
+            self.xml_doc.save(pretty_print=True)
+            self._pending.clear()
+            self.close()
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+
+    def close(self):
+        """
+        关闭日志文件(不合并)
+        """
+        with self._lock:
+            if self._file is not None:
+                self.sync()
+                self._file.close()
+                self._file = None
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    # 打印版本信息
+    print(('模块名：%s  -  %s\n'
+           '作者：%s\n'
+           '发布日期：%s\n'
+           '版本：%s' % (__MOUDLE__, __DESCRIPT__, __AUTHOR__, __PUBLISH__, __VERSION__)))
@@ -0,0 +1,2207 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+# Copyright 2019 黎慧剑
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+下载任务状态存储模块
+@module task_store
+@file task_store.py
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+import urllib.request
+from lxml import etree
+from HiveNetLib.base_tools.file_tool import FileTool
+from HiveNetLib.base_tools.run_tool import RunTool
+from HiveNetLib.simple_xml import SimpleXml, EnumXmlObjType
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(
+    os.path.dirname(__file__), os.path.pardir, os.path.pardir)))
+from comics_down.lib.task_journal import TaskProgressJournal
+
+
+__MOUDLE__ = 'task_store'  # 模块名
+__DESCRIPT__ = u'下载任务状态存储模块'  # 模块描述
+__VERSION__ = '0.1.0'  # 版本
+__AUTHOR__ = u'黎慧剑'  # 作者
+__PUBLISH__ = '2021.07.01'  # 发布日期
+
+
+#############################
+# 任务状态存储的数据结构与 down.xml 的结构一致(参考core模块的说明):
+#     info : 基本信息, key-value形式
+#     down_list : 卷清单, 每个卷下包含文件清单
+#     error : 下载异常的文件清单
+# 支持的存储类型:
+#     xml : 默认存储方式, 保存为任务目录下的 down.xml
+#     sqlite : 保存为任务目录下的 down.db, 对卷、文件、异常建立索引表，适合超大任务
+#############################
+
+
+class SaveCoalescer(object):
+    """
+    存储保存的合并控制器
+    注：登记变更时只标记为脏数据，距离上次保存超过指定时间或累计变更达到指定次数才真正执行保存，
+        用于减少获取卷和文件清单过程中反复整体保存存储文件的开销
+    """
+
+    def __init__(self, interval: float = 1.0, batch: int = 100):
+        """
+        构造函数
+
+        @param {float} interval=1.0 - 两次保存的最大间隔时间, 单位为秒, 0代表每次变更都保存
+        @param {int} batch=100 - 累计多少次变更执行一次保存
+        """
+        self.interval = interval
+        self.batch = batch
+        self._lock = threading.RLock()
+        self._dirty_num = 0  # 未保存的变更次数
+        self._last_save = time.time()
+
+    @property
+    def dirty(self) -> bool:
+        """
+        是否有未保存的变更
+
+        @property {bool}
+        """
+        return self._dirty_num > 0
+
+    def mark_dirty(self) -> bool:
+        """
+        登记一次变更
+
+        @returns {bool} - 是否需要执行保存
+        """
+        with self._lock:
+            self._dirty_num += 1
+            return (
+                self.interval <= 0 or self._dirty_num >= self.batch
+                or time.time() - self._last_save >= self.interval
+            )
+
+    def reset(self):
+        """
+        执行保存后重置状态
+        """
+        with self._lock:
+            self._dirty_num = 0
+            self._last_save = time.time()
+
+
+class TaskStatusFile(object):
+    """
+    下载任务状态摘要文件(down.status.json)
+    注：仅保存状态查询所需的几个汇总信息，通过临时文件替换的方式原子更新,
+        查询任务状态时优先读取该文件，无需装载整个任务状态存储
+    """
+
+    # 摘要信息项
+    STATUS_KEYS = ('name', 'url', 'status', 'files', 'success')
+
+    # 任务状态存储相关的文件, 修改时间晚于摘要文件代表摘要文件可能已过期
+    STORE_FILES = ('down.xml', 'down.progress.log', 'down.db', 'down.db-wal')
+
+    # 判断摘要文件过期的容差时间(秒), 下载过程中摘要文件按间隔更新, 允许落后于存储文件的时间
+    STALE_TOLERANCE = 3.0
+
+    @staticmethod
+    def get_status_file(task_path: str) -> str:
+        """
+        获取任务目录下的状态摘要文件路径
+
+        @param {str} task_path - 任务目录
+
+        @returns {str} - 状态摘要文件路径
+        """
+        return os.path.join(task_path, 'down.status.json')
+
+    @classmethod
+    def write(cls, task_path: str, status: dict):
+        """
+        原子更新状态摘要文件
+
+        @param {str} task_path - 任务目录
+        @param {dict} status - 状态信息字典, 参考 STATUS_KEYS
+        """
+        _file = cls.get_status_file(task_path)
+        _tmp_file = '%s.%d.tmp' % (_file, threading.get_ident())
+        _status = dict()
+        for _key in cls.STATUS_KEYS:
+            _status[_key] = str(status.get(_key, ''))
+        _status['update_time'] = time.time()
+
+        with open(_tmp_file, 'w', encoding='utf-8') as _f:
+            _f.write(json.dumps(_status, ensure_ascii=False))
+
+        os.replace(_tmp_file, _file)
+
+    @classmethod
+    def read(cls, task_path: str) -> dict:
+        """
+        读取状态摘要文件
+
+        @param {str} task_path - 任务目录
+
+        @returns {dict} - 状态信息字典, 文件不存在或无法解析返回None
+        """
+        _file = cls.get_status_file(task_path)
+        if not os.path.exists(_file):
+            return None
+
+        try:
+            with open(_file, 'r', encoding='utf-8') as _f:
+                return json.loads(_f.read())
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def is_stale(cls, task_path: str) -> bool:
+        """
+        判断状态摘要文件是否已过期
+        注：异常中断或使用不更新摘要文件的旧版本执行后, 存储文件会比摘要文件新
+
+        @param {str} task_path - 任务目录
+
+        @returns {bool} - 摘要文件不存在或比存储文件旧(超过容差时间)返回True
+        """
+        try:
+            _status_time = os.path.getmtime(cls.get_status_file(task_path))
+        except OSError:
+            return True
+
+        for _name in cls.STORE_FILES:
+            try:
+                if os.path.getmtime(os.path.join(task_path, _name)) > _status_time + cls.STALE_TOLERANCE:
+                    return True
+            except OSError:
+                # 文件不存在
+                continue
+
+        return False
+
+
+class BaseTaskStoreFW(object):
+    """
+    下载任务状态存储框架
+    """
+
+    # 任务基本信息的默认值
+    DEFAULT_INFO = {
+        'name': '',
+        'url': '',
+        'status': 'downloading',
+        'vol_info_ok': 'n',
+        'file_info_ok': 'n',
+        'files': '0',
+        'success': '0',
+        'vol_num': '0',
+        'vol_num_dict': '{}',
+        'vol_next_url': ''
+    }
+
+    #############################
+    # 公共方法
+    #############################
+    @classmethod
+    def open_store(cls, task_path: str, name: str, url: str = '', para_dict: dict = None):
+        """
+        创建或获取任务状态存储对象
+
+        @param {str} task_path - 任务目录(保存目录 + 漫画名)
+        @param {str} name - 漫画名
+        @param {str} url='' - 漫画所在目录索引的url
+        @param {dict} para_dict=None - 扩展参数, 任务的执行参数都会传进来
+
+        @returns {BaseTaskStoreFW} - 存储对象
+        """
+        if os.path.exists(cls.get_store_file(task_path)):
+            return cls.load_store(task_path, para_dict=para_dict)
+        else:
+            if not os.path.exists(task_path):
+                FileTool.create_dir(task_path, exist_ok=True)
+
+            return cls.create_store(task_path, name, url=url, para_dict=para_dict)
+
+    #############################
+    # 需实现类继承的方法
+    #############################
+    @classmethod
+    def get_store_type(cls) -> str:
+        """
+        返回存储类型
+        (需继承类实现)
+
+        @returns {str} - 存储类型, 如xml/sqlite
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def get_store_file(cls, task_path: str) -> str:
+        """
+        返回任务目录下的存储文件路径
+        (需继承类实现)
+
+        @param {str} task_path - 任务目录
+
+        @returns {str} - 存储文件路径
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def create_store(cls, task_path: str, name: str, url: str = '', para_dict: dict = None):
+        """
+        新建任务状态存储
+        (需继承类实现)
+
+        @param {str} task_path - 任务目录
+        @param {str} name - 漫画名
+        @param {str} url='' - 漫画所在目录索引的url
+        @param {dict} para_dict=None - 扩展参数
+
+        @returns {BaseTaskStoreFW} - 存储对象
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def load_store(cls, task_path: str, read_only: bool = False, para_dict: dict = None):
+        """
+        装载已存在的任务状态存储
+        (需继承类实现)
+
+        @param {str} task_path - 任务目录
+        @param {bool} read_only=False - 是否只读方式装载(用于查询正在下载的任务状态, 不会修改存储文件)
+        @param {dict} para_dict=None - 扩展参数
+
+        @returns {BaseTaskStoreFW} - 存储对象
+        """
+        raise NotImplementedError()
+
+    def get_info(self, key: str, default: str = '') -> str:
+        """
+        获取任务基本信息
+        (需继承类实现)
+
+        @param {str} key - 信息项, 参考 DEFAULT_INFO
+        @param {str} default='' - 取不到值时的默认值
+
+        @returns {str} - 信息值
+        """
+        raise NotImplementedError()
+
+    def set_info(self, key: str, value: str):
+        """
+        设置任务基本信息
+        (需继承类实现)
+
+        @param {str} key - 信息项, 参考 DEFAULT_INFO
+        @param {str} value - 信息值
+        """
+        raise NotImplementedError()
+
+    def get_info_dict(self) -> dict:
+        """
+        获取任务基本信息字典
+        (需继承类实现)
+
+        @returns {dict} - 基本信息字典
+        """
+        raise NotImplementedError()
+
+    def get_vol_num_dict(self) -> dict:
+        """
+        获取卷名和卷标识的对应字典
+        (需继承类实现)
+
+        @returns {dict} - key为卷名, value为卷标识(vol_num), 按添加顺序排列
+        """
+        raise NotImplementedError()
+
+    def add_vol(self, vol_name: str, url: str, status: str = 'listing') -> str:
+        """
+        添加卷信息
+        (需继承类实现)
+
+        @param {str} vol_name - 卷名
+        @param {str} url - 浏览该卷漫画的url
+        @param {str} status='listing' - 状态
+
+        @returns {str} - 卷标识(vol_num)
+        """
+        raise NotImplementedError()
+
+    def get_vol_info(self, vol_num: str) -> dict:
+        """
+        获取卷信息
+        (需继承类实现)
+
+        @param {str} vol_num - 卷标识
+
+        @returns {dict} - 卷信息字典, 包括name/url/status/file_num, 卷不存在返回None
+        """
+        raise NotImplementedError()
+
+    def set_vol_value(self, vol_num: str, key: str, value: str):
+        """
+        设置卷信息项
+        (需继承类实现)
+
+        @param {str} vol_num - 卷标识
+        @param {str} key - 信息项, name/url/status/file_num
+        @param {str} value - 信息值
+        """
+        raise NotImplementedError()
+
+    def set_vol_status(self, vol_num: str, status: str):
+        """
+        更新下载过程中的卷状态
+        (需继承类实现, 下载过程中频繁调用, 实现类应保证处理成本不随任务规模增长)
+
+        @param {str} vol_num - 卷标识
+        @param {str} status - 状态
+        """
+        raise NotImplementedError()
+
+    def get_vol_fingerprint(self, vol_num: str) -> dict:
+        """
+        获取卷上次成功解析时登记的指纹
+        (需继承类实现)
+
+        @param {str} vol_num - 卷标识
+
+        @returns {dict} - 指纹字典, 没有登记时值为'':
+            page {str} - 卷页面(或页面相关区域)的指纹
+            files {str} - 解析得到的文件清单的指纹
+        """
+        raise NotImplementedError()
+
+    def set_vol_fingerprint(self, vol_num: str, page: str, files: str):
+        """
+        登记卷解析成功时的指纹
+        (需继承类实现)
+
+        @param {str} vol_num - 卷标识
+        @param {str} page - 卷页面(或页面相关区域)的指纹, 网站驱动不支持时传''
+        @param {str} files - 解析得到的文件清单的指纹
+        """
+        raise NotImplementedError()
+
+    def add_file(self, vol_num: str, file_num: str, file_name: str, url: str, downtype: str,
+                 extend_json: dict = None):
+        """
+        添加文件信息
+        (需继承类实现)
+
+        @param {str} vol_num - 卷标识
+        @param {str} file_num - 文件标识
+        @param {str} file_name - 文件名
+        @param {str} url - 下载url
+        @param {str} downtype - 下载类型
+        @param {dict} extend_json=None - 要送入下载驱动的扩展信息
+        """
+        raise NotImplementedError()
+
+    def get_files(self, vol_num: str) -> dict:
+        """
+        获取卷的文件清单
+        (需继承类实现)
+
+        @param {str} vol_num - 卷标识
+
+        @returns {dict} - key为文件标识, value为文件信息字典(name/url/status/downtype/extend_json)
+            注：extend_json为json字符串, 没有则为''
+        """
+        raise NotImplementedError()
+
+    def set_file_status(self, vol_num: str, file_num: str, status: str, error_url: str = None,
+                        meta: dict = None):
+        """
+        更新下载过程中的文件状态
+        (需继承类实现, 下载过程中频繁调用, 实现类应保证处理成本不随任务规模增长)
+        注：文件状态变为done时同步增加info中的success数量
+
+        @param {str} vol_num - 卷标识
+        @param {str} file_num - 文件标识
+        @param {str} status - 状态, done/err
+        @param {str} error_url=None - 下载失败时要登记到异常清单的url
+        @param {dict} meta=None - 下载完成时要登记的文件完整性信息
+            size {int} - 文件大小
+            hash {str} - 文件哈希值, 格式为 算法:值, 没有计算哈希值时为''
+        """
+        raise NotImplementedError()
+
+    def get_files_meta(self, vol_num: str) -> dict:
+        """
+        获取卷中已登记的文件完整性信息
+        (需继承类实现)
+
+        @param {str} vol_num - 卷标识
+
+        @returns {dict} - key为文件标识, value为dict(size/hash), 没有登记的文件不返回
+        """
+        raise NotImplementedError()
+
+    def find_file_by_url(self, url: str, vol_num: str = None) -> tuple:
+        """
+        通过下载url查找文件
+        (需继承类实现)
+
+        @param {str} url - 下载url
+        @param {str} vol_num=None - 指定只在该卷中查找, 不传代表查找所有卷
+
+        @returns {tuple} - 找到返回(vol_num, file_num), 找不到返回None
+        """
+        raise NotImplementedError()
+
+    def get_errors(self) -> dict:
+        """
+        获取下载异常清单
+        (需继承类实现)
+
+        @returns {dict} - key为卷标识, value为dict(key为文件标识, value为url)
+        """
+        raise NotImplementedError()
+
+    def save(self):
+        """
+        将所有变更保存到存储文件
+        (需继承类实现)
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        """
+        保存并关闭存储
+        (需继承类实现)
+        """
+        raise NotImplementedError()
+
+    #############################
+    # 通用处理
+    #############################
+    def request_save(self):
+        """
+        登记变更并按合并策略保存(save_interval参数控制)
+        注：获取卷和文件清单过程中使用, 完成或出现异常时应调用save保存全部变更
+        """
+        if self.save_coalescer.mark_dirty():
+            self.save()
+
+    def get_status_dict(self) -> dict:
+        """
+        获取任务状态摘要信息
+
+        @returns {dict} - 状态信息字典, 参考 TaskStatusFile.STATUS_KEYS
+        """
+        _status = dict()
+        for _key in TaskStatusFile.STATUS_KEYS:
+            _status[_key] = self.get_info(_key)
+
+        return _status
+
+    def _write_status_file(self):
+        """
+        更新任务目录下的状态摘要文件(由实现类的save函数调用)
+        """
+        TaskStatusFile.write(self.task_path, self.get_status_dict())
+
+    def _init_save_coalescer(self, para_dict: dict = None):
+        """
+        初始化保存合并控制器(由实现类的构造函数调用)
+
+        @param {dict} para_dict=None - 扩展参数, 使用save_interval参数(毫秒)
+        """
+        _para_dict = dict() if para_dict is None else para_dict
+        self.save_coalescer = SaveCoalescer(
+            interval=float(_para_dict.get('save_interval', '1000')) / 1000.0
+        )
+
+    def get_down_list(self, with_files: bool = True) -> dict:
+        """
+        获取下载清单(结构与down.xml的down_list一致)
+
+        @param {bool} with_files=True - 是否包含文件清单
+
+        @returns {dict} - key为卷标识, value为卷信息字典(包含files文件清单字典)
+        """
+        _down_list = dict()
+        for _vol_num, _vol_info in self.iter_down_list(with_files=with_files):
+            _down_list[_vol_num] = _vol_info
+
+        return _down_list
+
+    def iter_down_list(self, with_files: bool = True):
+        """
+        逐个卷遍历下载清单
+
+        @param {bool} with_files=True - 是否包含文件清单
+
+        @returns {generator} - 每次返回(vol_num, vol_info), vol_info为卷信息字典(包含files文件清单字典)
+        """
+        for _vol_num in list(self.get_vol_num_dict().values()):
+            _vol_info = self.get_vol_info(_vol_num)
+            if with_files:
+                _vol_info['files'] = self.get_files(_vol_num)
+            yield _vol_num, _vol_info
+
+    def get_pending_vols(self) -> list:
+        """
+        获取未完成下载的卷清单(状态不为done的卷, 包括正在获取文件清单的卷)
+        注：实现类应通过持久化的待处理索引获取, 避免遍历所有卷
+
+        @returns {list} - 卷标识清单, 按卷添加顺序排列
+        """
+        _vols = list()
+        for _vol_num in list(self.get_vol_num_dict().values()):
+            if self.get_vol_info(_vol_num)['status'] != 'done':
+                _vols.append(_vol_num)
+
+        return _vols
+
+    def iter_pending_tasks(self):
+        """
+        逐个遍历待下载的文件
+        注：只遍历未完成下载的卷(参考get_pending_vols), 每个卷的待下载文件遍历完成后,
+            会返回一个file_num为None的记录代表卷结束, 状态为listing的卷只返回卷结束记录
+
+        @returns {generator} - 每次返回(vol_num, vol_info, file_num, file_info)
+            vol_info为卷信息字典(name/url/status/file_num), file_info为文件信息字典(name/url/status/downtype/extend_json)
+        """
+        for _vol_num in self.get_pending_vols():
+            _vol_info = self.get_vol_info(_vol_num)
+            if _vol_info['status'] not in ('listing', 'done'):
+                for _file_num, _file_info in self.get_files(_vol_num).items():
+                    if _file_info['status'] != 'done':
+                        yield _vol_num, _vol_info, _file_num, _file_info
+
+            yield _vol_num, _vol_info, None, None
+
+
+class TaskModel(object):
+    """
+    下载任务的内存模型
+    注：持有卷名与卷标识的映射、卷计数、文件总数以及每个卷的文件数，避免在处理过程中反复解析和序列化配置,
+        由存储对象在保存时统一写回
+    """
+
+    def __init__(self, vol_num_dict: dict = None, vol_num: int = 0, files: int = 0,
+                 vol_file_num: dict = None, pending_vols: list = None):
+        """
+        构造函数
+
+        @param {dict} vol_num_dict=None - 卷名与卷标识的映射字典(key为卷名, value为卷标识)
+        @param {int} vol_num=0 - 下一个卷的序号
+        @param {int} files=0 - 文件总数
+        @param {dict} vol_file_num=None - 每个卷的文件数(key为卷标识, value为文件数)
+        @param {list} pending_vols=None - 未完成下载的卷标识清单
+        """
+        self.vol_num_dict = dict() if vol_num_dict is None else vol_num_dict
+        self.vol_num = vol_num
+        self.files = files
+        self.vol_file_num = dict() if vol_file_num is None else vol_file_num
+        self.pending_vols = set() if pending_vols is None else set(pending_vols)
+
+        # 需要写回的变更标记
+        self.info_dirty = False
+        self.dirty_vols = set()
+        self.pending_dirty = False
+
+    @property
+    def dirty(self) -> bool:
+        """
+        是否有未写回的变更
+
+        @property {bool}
+        """
+        return self.info_dirty or self.pending_dirty or len(self.dirty_vols) > 0
+
+    def add_vol(self, vol_name: str) -> str:
+        """
+        登记新卷
+
+        @param {str} vol_name - 卷名
+
+        @returns {str} - 卷标识(vol_num)
+        """
+        _vol_num = 'vol_%d' % self.vol_num
+        self.vol_num += 1
+        self.vol_num_dict[vol_name] = _vol_num
+        self.vol_file_num[_vol_num] = 0
+        self.info_dirty = True
+        self.dirty_vols.add(_vol_num)
+        self.set_vol_pending(_vol_num, True)
+        return _vol_num
+
+    def set_files(self, files: int):
+        """
+        设置文件总数
+
+        @param {int} files - 文件总数
+        """
+        self.files = files
+        self.info_dirty = True
+
+    def set_vol_file_num(self, vol_num: str, file_num: int):
+        """
+        设置卷的文件数
+
+        @param {str} vol_num - 卷标识
+        @param {int} file_num - 文件数
+        """
+        self.vol_file_num[vol_num] = file_num
+        self.dirty_vols.add(vol_num)
+
+    def set_vol_pending(self, vol_num: str, pending: bool):
+        """
+        登记卷是否未完成下载
+
+        @param {str} vol_num - 卷标识
+        @param {bool} pending - 是否未完成下载
+        """
+        if pending and vol_num not in self.pending_vols:
+            self.pending_vols.add(vol_num)
+            self.pending_dirty = True
+        elif not pending and vol_num in self.pending_vols:
+            self.pending_vols.discard(vol_num)
+            self.pending_dirty = True
+
+    def get_pending_vols(self) -> list:
+        """
+        获取未完成下载的卷清单
+
+        @returns {list} - 卷标识清单, 按卷序号排列
+        """
+        return sorted(self.pending_vols, key=lambda _vol_num: int(_vol_num[4:]))
+
+    def get_info_values(self) -> dict:
+        """
+        获取模型持有的基本信息项(与down.xml的info节点对应)
+
+        @returns {dict} - 信息字典, value为字符串
+        """
+        return {
+            'files': str(self.files),
+            'vol_num': str(self.vol_num),
+            'vol_num_dict': json.dumps(self.vol_num_dict, ensure_ascii=False)
+        }
+
+    def clear_dirty(self):
+        """
+        清除变更标记(写回后调用)
+        """
+        self.info_dirty = False
+        self.dirty_vols.clear()
+        self.pending_dirty = False
+
+
+class XmlTaskStore(BaseTaskStoreFW):
+    """
+    基于down.xml的任务状态存储
+    注：下载过程中的状态变更通过进度日志(down.progress.log)追加登记, 定期合并到down.xml
+    """
+
+    # 由内存模型维护的基本信息项
+    MODEL_INFO_KEYS = ('files', 'vol_num', 'vol_num_dict')
+
+    #############################
+    # 静态方法
+    #############################
+    @classmethod
+    def get_store_type(cls) -> str:
+        """
+        返回存储类型
+
+        @returns {str} - 存储类型
+        """
+        return 'xml'
+
+    @classmethod
+    def get_store_file(cls, task_path: str) -> str:
+        """
+        返回任务目录下的存储文件路径
+
+        @param {str} task_path - 任务目录
+
+        @returns {str} - 存储文件路径
+        """
+        return os.path.join(task_path, 'down.xml')
+
+    @classmethod
+    def create_store(cls, task_path: str, name: str, url: str = '', para_dict: dict = None):
+        """
+        新建任务状态存储
+
+        @param {str} task_path - 任务目录
+        @param {str} name - 漫画名
+        @param {str} url='' - 漫画所在目录索引的url
+        @param {dict} para_dict=None - 扩展参数
+
+        @returns {XmlTaskStore} - 存储对象
+        """
+        _xml_str = u"""
+        <down_task>
+        </down_task>
+        """
+        _xml_doc = SimpleXml(
+            _xml_str, obj_type=EnumXmlObjType.String, encoding='utf-8', use_chardet=False,
+            remove_blank_text=True
+        )
+        for _key, _value in cls.DEFAULT_INFO.items():
+            _xml_doc.set_value('/down_task/info/%s' % _key, _value)
+
+        _xml_doc.set_value('/down_task/info/name', name)
+        _xml_doc.set_value('/down_task/info/url', url)
+
+        # 保存文件
+        _xml_doc.save(
+            file=cls.get_store_file(task_path), encoding='utf-8', pretty_print=True
+        )
+
+        # 重新加载
+        return cls.load_store(task_path, para_dict=para_dict)
+
+    @classmethod
+    def load_store(cls, task_path: str, read_only: bool = False, para_dict: dict = None):
+        """
+        装载已存在的任务状态存储
+
+        @param {str} task_path - 任务目录
+        @param {bool} read_only=False - 是否只读方式装载(用于查询正在下载的任务状态, 不会修改存储文件)
+        @param {dict} para_dict=None - 扩展参数
+
+        @returns {XmlTaskStore} - 存储对象
+        """
+        _conf_file = cls.get_store_file(task_path)
+        _xml_doc = SimpleXml(
+            _conf_file, obj_type=EnumXmlObjType.File,
+            encoding='utf-8', use_chardet=False,
+            remove_blank_text=True
+        )
+
+        if read_only:
+            # 只读方式仅在内存中应用进度日志, 进度日志可能正在被下载任务写入
+            TaskProgressJournal.apply_entries(
+                _xml_doc, TaskProgressJournal.load_entries(
+                    TaskProgressJournal.get_journal_file(_conf_file)
+                )
+            )
+        else:
+            # 合并上次未完成合并的下载进度日志
+            TaskProgressJournal.replay(_xml_doc, _conf_file)
+
+        return cls(_xml_doc, read_only=read_only, para_dict=para_dict)
+
+    #############################
+    # 实例方法
+    #############################
+    def __init__(self, xml_doc: SimpleXml, read_only: bool = False, para_dict: dict = None):
+        """
+        构造函数
+
+        @param {SimpleXml} xml_doc - 下载配置文件对象
+        @param {bool} read_only=False - 是否只读, 只读情况保存和关闭都不会修改文件
+        @param {dict} para_dict=None - 扩展参数, 任务的执行参数都会传进来
+        """
+        self.xml_doc = xml_doc
+        self.task_path = os.path.split(xml_doc.file)[0]
+        self.read_only = read_only
+        self.lock = threading.RLock()
+
+        # 下载url索引, key为url, value为dict(key为卷标识, value为文件标识), 首次查找时建立
+        self._url_index = None
+
+        # 任务内存模型
+        self.model = self._load_model()
+
+        # 保存合并控制
+        self._init_save_coalescer(para_dict)
+
+        # 下载进度日志，文件状态变更只追加日志，定期合并到配置文件
+        self.journal = TaskProgressJournal(
+            self.xml_doc,
+            compact_interval=float(
+                ({} if para_dict is None else para_dict).get('journal_compact_interval', '60')
+            )
+        )
+
+    def get_info(self, key: str, default: str = '') -> str:
+        """
+        获取任务基本信息
+
+        @param {str} key - 信息项, 参考 DEFAULT_INFO
+        @param {str} default='' - 取不到值时的默认值
+
+        @returns {str} - 信息值
+        """
+        if key in self.MODEL_INFO_KEYS:
+            return self.model.get_info_values()[key]
+
+        return self.xml_doc.get_value('/down_task/info/%s' % key, default=default)
+
+    def set_info(self, key: str, value: str):
+        """
+        设置任务基本信息
+
+        @param {str} key - 信息项, 参考 DEFAULT_INFO
+        @param {str} value - 信息值
+        """
+        with self.lock:
+            if key == 'files':
+                self.model.set_files(int(value))
+                return
+            elif key in self.MODEL_INFO_KEYS:
+                raise KeyError('info key [%s] is maintained by task model' % key)
+
+            self.journal.compact()  # 保证状态变更的先后顺序
+            self.xml_doc.set_value('/down_task/info/%s' % key, value)
+
+    def get_info_dict(self) -> dict:
+        """
+        获取任务基本信息字典
+
+        @returns {dict} - 基本信息字典
+        """
+        _info = dict()
+        _node = self.xml_doc.root.find('info')
+        if _node is not None:
+            for _child in _node:
+                _info[_child.tag] = '' if _child.text is None else _child.text
+
+        _info.update(self.model.get_info_values())
+        return _info
+
+    def get_vol_num_dict(self) -> dict:
+        """
+        获取卷名和卷标识的对应字典
+        注：直接返回内存模型持有的字典, 调用方不应修改
+
+        @returns {dict} - key为卷名, value为卷标识(vol_num), 按添加顺序排列
+        """
+        return self.model.vol_num_dict
+
+    def add_vol(self, vol_name: str, url: str, status: str = 'listing') -> str:
+        """
+        添加卷信息
+
+        @param {str} vol_name - 卷名
+        @param {str} url - 浏览该卷漫画的url
+        @param {str} status='listing' - 状态
+
+        @returns {str} - 卷标识(vol_num)
+        """
+        with self.lock:
+            # 在内存模型中登记卷, 卷映射关系和计数在保存时统一写回
+            _vol_num = self.model.add_vol(vol_name)
+
+            # 设置卷配置
+            _xpath = '/down_task/down_list/%s' % _vol_num
+            self.xml_doc.set_value('%s/name' % _xpath, vol_name)
+            self.xml_doc.set_value('%s/url' % _xpath, url)
+            self.xml_doc.set_value('%s/status' % _xpath, status)
+
+            return _vol_num
+
+    def get_vol_info(self, vol_num: str) -> dict:
+        """
+        获取卷信息
+
+        @param {str} vol_num - 卷标识
+
+        @returns {dict} - 卷信息字典, 包括name/url/status/file_num, 卷不存在返回None
+        """
+        _node = self.xml_doc.root.find('down_list/%s' % vol_num)
+        if _node is None:
+            return None
+
+        _info = dict()
+        for _key in ('name', 'url', 'status'):
+            _info[_key] = _node.findtext(_key, default='')
+        _info['file_num'] = str(self.model.vol_file_num.get(vol_num, 0))
+
+        return _info
+
+    def set_vol_value(self, vol_num: str, key: str, value: str):
+        """
+        设置卷信息项
+
+        @param {str} vol_num - 卷标识
+        @param {str} key - 信息项, name/url/status/file_num
+        @param {str} value - 信息值
+        """
+        with self.lock:
+            if key == 'file_num':
+                self.model.set_vol_file_num(vol_num, int(value))
+                return
+
+            self.journal.compact()  # 保证状态变更的先后顺序
+            self.xml_doc.set_value('/down_task/down_list/%s/%s' % (vol_num, key), value)
+            if key == 'status':
+                self.model.set_vol_pending(vol_num, value != 'done')
+
+    def set_vol_status(self, vol_num: str, status: str):
+        """
+        更新下载过程中的卷状态(登记到进度日志)
+
+        @param {str} vol_num - 卷标识
+        @param {str} status - 状态
+        """
+        with self.lock:
+            self.journal.append(vol_num, '', status)
+            self.model.set_vol_pending(vol_num, status != 'done')
+
+    def get_vol_fingerprint(self, vol_num: str) -> dict:
+        """
+        获取卷上次成功解析时登记的指纹
+
+        @param {str} vol_num - 卷标识
+
+        @returns {dict} - 指纹字典(page/files), 没有登记时值为''
+        """
+        _node = self.xml_doc.root.find('down_list/%s' % vol_num)
+        if _node is None:
+            return {'page': '', 'files': ''}
+
+        return {
+            'page': _node.findtext('page_fingerprint', default=''),
+            'files': _node.findtext('files_fingerprint', default='')
+        }
+
+    def set_vol_fingerprint(self, vol_num: str, page: str, files: str):
+        """
+        登记卷解析成功时的指纹
+
+        @param {str} vol_num - 卷标识
+        @param {str} page - 卷页面(或页面相关区域)的指纹, 网站驱动不支持时传''
+        @param {str} files - 解析得到的文件清单的指纹
+        """
+        with self.lock:
+            self.xml_doc.set_value('/down_task/down_list/%s/page_fingerprint' % vol_num, page)
+            self.xml_doc.set_value('/down_task/down_list/%s/files_fingerprint' % vol_num, files)
+
+    def add_file(self, vol_num: str, file_num: str, file_name: str, url: str, downtype: str,
+                 extend_json: dict = None):
+        """
+        添加文件信息
+
+        @param {str} vol_num - 卷标识
+        @param {str} file_num - 文件标识
+        @param {str} file_name - 文件名
+        @param {str} url - 下载url
+        @param {str} downtype - 下载类型
+        @param {dict} extend_json=None - 要送入下载驱动的扩展信息
+        """
+        with self.lock:
+            _xpath = '/down_task/down_list/%s/files/%s' % (vol_num, file_num)
+            self.xml_doc.set_value('%s/name' % _xpath, file_name)
+            self.xml_doc.set_value('%s/url' % _xpath, url)
+            self.xml_doc.set_value('%s/status' % _xpath, '')
+            self.xml_doc.set_value('%s/downtype' % _xpath, downtype)
+            if extend_json is not None:
+                self.xml_doc.set_value(
+                    '%s/extend_json' % _xpath, json.dumps(extend_json, ensure_ascii=False)
+                )
+
+            if self._url_index is not None:
+                self._url_index.setdefault(url, dict()).setdefault(vol_num, file_num)
+
+    def get_files(self, vol_num: str) -> dict:
+        """
+        获取卷的文件清单
+
+        @param {str} vol_num - 卷标识
+
+        @returns {dict} - key为文件标识, value为文件信息字典(name/url/status/downtype/extend_json)
+        """
+        _files = dict()
+        _node = self.xml_doc.root.find('down_list/%s/files' % vol_num)
+        if _node is None:
+            return _files
+
+        for _file_node in _node:
+            _files[_file_node.tag] = {
+                'name': _file_node.findtext('name', default=''),
+                'url': _file_node.findtext('url', default=''),
+                'status': _file_node.findtext('status', default=''),
+                'downtype': _file_node.findtext('downtype', default=''),
+                'extend_json': _file_node.findtext('extend_json', default='')
+            }
+
+        return _files
+
+    def set_file_status(self, vol_num: str, file_num: str, status: str, error_url: str = None,
+                        meta: dict = None):
+        """
+        更新下载过程中的文件状态(登记到进度日志)
+
+        @param {str} vol_num - 卷标识
+        @param {str} file_num - 文件标识
+        @param {str} status - 状态, done/err
+        @param {str} error_url=None - 下载失败时要登记到异常清单的url
+        @param {dict} meta=None - 下载完成时要登记的文件完整性信息(size/hash)
+        """
+        with self.lock:
+            self.journal.append(vol_num, file_num, status, url=error_url, meta=meta)
+
+    def get_files_meta(self, vol_num: str) -> dict:
+        """
+        获取卷中已登记的文件完整性信息
+
+        @param {str} vol_num - 卷标识
+
+        @returns {dict} - key为文件标识, value为dict(size/hash), 没有登记的文件不返回
+        """
+        with self.lock:
+            self.journal.compact()
+
+        _metas = dict()
+        for _file_node in self.xml_doc.root.iterfind('down_list/%s/files/*' % vol_num):
+            _size = _file_node.findtext('size', default='')
+            if _size != '':
+                _metas[_file_node.tag] = {
+                    'size': int(_size), 'hash': _file_node.findtext('hash', default='')
+                }
+
+        return _metas
+
+    def get_pending_vols(self) -> list:
+        """
+        获取未完成下载的卷清单(从内存模型的待处理卷索引获取)
+
+        @returns {list} - 卷标识清单, 按卷序号排列
+        """
+        with self.lock:
+            return self.model.get_pending_vols()
+
+    def iter_pending_tasks(self):
+        """
+        逐个遍历待下载的文件
+        注：只遍历待处理卷索引中的卷, 每次只在锁内收集一个卷的待下载文件, 不转换整个下载清单
+
+        @returns {generator} - 每次返回(vol_num, vol_info, file_num, file_info), 参考基础类说明
+        """
+        for _vol_num in self.get_pending_vols():
+            _pending = list()
+            with self.lock:
+                _vol_node = self.xml_doc.root.find('down_list/%s' % _vol_num)
+                if _vol_node is None:
+                    continue
+
+                _vol_info = self.get_vol_info(_vol_num)
+                if _vol_info['status'] not in ('listing', 'done'):
+                    for _file_node in _vol_node.iterfind('files/*'):
+                        if _file_node.findtext('status', default='') == 'done':
+                            continue
+                        _pending.append((_file_node.tag, {
+                            'name': _file_node.findtext('name', default=''),
+                            'url': _file_node.findtext('url', default=''),
+                            'status': _file_node.findtext('status', default=''),
+                            'downtype': _file_node.findtext('downtype', default=''),
+                            'extend_json': _file_node.findtext('extend_json', default='')
+                        }))
+
+            for _file_num, _file_info in _pending:
+                yield _vol_num, _vol_info, _file_num, _file_info
+
+            yield _vol_num, _vol_info, None, None
+
+    def find_file_by_url(self, url: str, vol_num: str = None) -> tuple:
+        """
+        通过下载url查找文件
+
+        @param {str} url - 下载url
+        @param {str} vol_num=None - 指定只在该卷中查找, 不传代表查找所有卷
+
+        @returns {tuple} - 找到返回(vol_num, file_num), 找不到返回None
+        """
+        with self.lock:
+            if self._url_index is None:
+                self._build_url_index()
+
+            _vols = self._url_index.get(url, None)
+
+        if _vols is None:
+            return None
+
+        if vol_num is None:
+            # 取第一个登记的卷
+            _vol_num = next(iter(_vols))
+            return (_vol_num, _vols[_vol_num])
+
+        _file_num = _vols.get(vol_num, None)
+        return None if _file_num is None else (vol_num, _file_num)
+
+    def get_errors(self) -> dict:
+        """
+        获取下载异常清单
+
+        @returns {dict} - key为卷标识, value为dict(key为文件标识, value为url)
+        """
+        with self.lock:
+            self.journal.compact()
+
+        _errors = dict()
+        _node = self.xml_doc.root.find('error')
+        if _node is None:
+            return _errors
+
+        for _vol_node in _node:
+            _errors[_vol_node.tag] = dict()
+            for _file_node in _vol_node.iterfind('files/*'):
+                _errors[_vol_node.tag][_file_node.tag] = _file_node.findtext('url', default='')
+
+        return _errors
+
+    def save(self):
+        """
+        将所有变更保存到存储文件
+        """
+        if self.read_only:
+            return
+
+        with self.lock:
+            self.journal.compact()
+            self._dump_model()
+            self.xml_doc.save(pretty_print=True)
+            self.save_coalescer.reset()
+            self._write_status_file()
+
+    def close(self):
+        """
+        保存并关闭存储
+        """
+        self.save()
+        self.journal.close()
+
+    #############################
+    # 内部函数
+    #############################
+    def _load_model(self) -> TaskModel:
+        """
+        从配置文件装载任务内存模型(只解析一次)
+
+        @returns {TaskModel} - 任务内存模型
+        """
+        _vol_num_dict = self.xml_doc.get_value('/down_task/info/vol_num_dict', default='{}')
+        _vol_file_num = dict()
+        for _vol_node in self.xml_doc.root.iterfind('down_list/*'):
+            _vol_file_num[_vol_node.tag] = int(_vol_node.findtext('file_num', default='0') or '0')
+
+        # 待处理卷索引, 进度日志合并后卷的完成状态可能比索引新, 剔除已完成的卷
+        _pending_str = self.xml_doc.get_value('/down_task/info/pending_vols', default=None)
+        _pending_vols = list()
+        if _pending_str is None:
+            # 旧版本的配置文件没有索引, 遍历一次建立
+            _candidates = list(_vol_file_num.keys())
+        else:
+            _candidates = json.loads(_pending_str) if _pending_str != '' else list()
+
+        for _vol_num in _candidates:
+            if self.xml_doc.get_value(
+                '/down_task/down_list/%s/status' % _vol_num, default='done'
+            ) != 'done':
+                _pending_vols.append(_vol_num)
+
+        _model = TaskModel(
+            vol_num_dict=json.loads(_vol_num_dict) if _vol_num_dict != '' else dict(),
+            vol_num=int(self.xml_doc.get_value('/down_task/info/vol_num', default='0') or '0'),
+            files=int(self.xml_doc.get_value('/down_task/info/files', default='0') or '0'),
+            vol_file_num=_vol_file_num,
+            pending_vols=_pending_vols
+        )
+        _model.pending_dirty = (_pending_str is None or len(_pending_vols) != len(_candidates))
+        return _model
+
+    def _dump_model(self):
+        """
+        将任务内存模型的变更写回配置文件对象(不保存文件)
+        """
+        if not self.model.dirty:
+            return
+
+        if self.model.info_dirty:
+            for _key, _value in self.model.get_info_values().items():
+                self.xml_doc.set_value('/down_task/info/%s' % _key, _value)
+
+        for _vol_num in self.model.dirty_vols:
+            self.xml_doc.set_value(
+                '/down_task/down_list/%s/file_num' % _vol_num,
+                str(self.model.vol_file_num[_vol_num])
+            )
+
+        if self.model.pending_dirty:
+            self.xml_doc.set_value(
+                '/down_task/info/pending_vols', json.dumps(self.model.get_pending_vols())
+            )
+
+        self.model.clear_dirty()
+
+    def _build_url_index(self):
+        """
+        遍历一次下载清单建立下载url索引
+        """
+        self._url_index = dict()
+        for _vol_node in self.xml_doc.root.iterfind('down_list/*'):
+            for _file_node in _vol_node.iterfind('files/*'):
+                self._url_index.setdefault(
+                    _file_node.findtext('url', default=''), dict()
+                ).setdefault(_vol_node.tag, _file_node.tag)
+
+
+class XmlTaskStreamLoader(object):
+    """
+    基于lxml iterparse的down.xml流式装载
+    注：用于只读查询, 逐个卷解析并释放已处理的节点, 不需要在内存中构建整个文档,
+        同时叠加尚未合并的进度日志中的状态变更
+    """
+
+    def __init__(self, xml_file: str):
+        """
+        构造函数
+
+        @param {str} xml_file - down.xml文件路径
+        """
+        self.xml_file = xml_file
+
+        # 叠加进度日志中的状态变更
+        self._vol_status = dict()
+        self._file_status = dict()
+        self._file_entries = list()  # 按日志顺序的文件状态变更, 每个元素为(vol_num, file_num, status)
+        for _entry in TaskProgressJournal.load_entries(TaskProgressJournal.get_journal_file(xml_file)):
+            if _entry[1] == '':
+                self._vol_status[_entry[0]] = _entry[2]
+            else:
+                self._file_status[(_entry[0], _entry[1])] = _entry[2]
+                self._file_entries.append((_entry[0], _entry[1], _entry[2]))
+
+    def get_info_dict(self) -> dict:
+        """
+        获取任务基本信息字典(解析到info节点结束即停止)
+        注：成功数会加上进度日志中尚未合并的完成数, 与TaskProgressJournal.apply_entries一致,
+            down.xml中已是done的文件不重复计算(合并保存后、删除日志前中断的情况)
+
+        @returns {dict} - 基本信息字典
+        """
+        _info = dict()
+        for _event, _elem in etree.iterparse(self.xml_file, events=('end', ), remove_blank_text=True):
+            if _elem.tag == 'info' and _elem.getparent() is not None and _elem.getparent().getparent() is None:
+                for _child in _elem:
+                    _info[_child.tag] = '' if _child.text is None else _child.text
+                break
+
+        if len(self._file_entries) > 0:
+            # 获取日志涉及的文件在down.xml中的状态
+            _status_dict = dict()
+            for _vol_num, _elem in self._iter_vol_nodes():
+                for _file_node in _elem.iterfind('files/*'):
+                    if (_vol_num, _file_node.tag) in self._file_status:
+                        _status_dict[(_vol_num, _file_node.tag)] = _file_node.findtext('status', default='')
+
+            _done = 0
+            for _vol_num, _file_num, _status in self._file_entries:
+                if _status == 'done' and _status_dict.get((_vol_num, _file_num), '') != 'done':
+                    _done += 1
+                _status_dict[(_vol_num, _file_num)] = _status
+
+            _info['success'] = str(int(_info.get('success', '0') or '0') + _done)
+
+        return _info
+
+    def iter_down_list(self, with_files: bool = True):
+        """
+        逐个卷遍历下载清单
+
+        @param {bool} with_files=True - 是否包含文件清单
+
+        @returns {generator} - 每次返回(vol_num, vol_info), vol_info为卷信息字典(包含files文件清单字典)
+        """
+        for _vol_num, _elem in self._iter_vol_nodes():
+            _vol_info = dict()
+            for _key in ('name', 'url', 'status', 'file_num'):
+                _vol_info[_key] = _elem.findtext(_key, default='')
+            _vol_info['status'] = self._vol_status.get(_vol_num, _vol_info['status'])
+
+            if with_files:
+                _vol_info['files'] = dict()
+                for _file_node in _elem.iterfind('files/*'):
+                    _vol_info['files'][_file_node.tag] = {
+                        'name': _file_node.findtext('name', default=''),
+                        'url': _file_node.findtext('url', default=''),
+                        'status': self._file_status.get(
+                            (_vol_num, _file_node.tag), _file_node.findtext('status', default='')
+                        ),
+                        'downtype': _file_node.findtext('downtype', default=''),
+                        'extend_json': _file_node.findtext('extend_json', default='')
+                    }
+
+            yield _vol_num, _vol_info
+
+    #############################
+    # 内部函数
+    #############################
+    def _iter_vol_nodes(self):
+        """
+        逐个卷遍历down.xml中的卷节点(不叠加进度日志), 处理完成后释放节点
+
+        @returns {generator} - 每次返回(vol_num, 卷节点)
+        """
+        _depth = 0
+        _in_down_list = False
+        for _event, _elem in etree.iterparse(
+            self.xml_file, events=('start', 'end'), remove_blank_text=True
+        ):
+            if _event == 'start':
+                _depth += 1
+                if _depth == 2 and _elem.tag == 'down_list':
+                    _in_down_list = True
+                continue
+
+            _depth -= 1
+            if _depth == 1 and _in_down_list:
+                # down_list结束, 后续没有卷信息
+                break
+
+            if not (_in_down_list and _depth == 2):
+                continue
+
+            # 一个卷节点结束, 调用方处理完成后释放已处理的节点
+            yield _elem.tag, _elem
+            _elem.clear()
+            while _elem.getprevious() is not None:
+                del _elem.getparent()[0]
+
+
+class SqliteTaskStore(BaseTaskStoreFW):
+    """
+    基于sqlite的任务状态存储
+    注：卷、文件、异常信息分别保存在带索引的表中, 查找和更新的成本不随任务规模线性增长
+    """
+
+    # 建表语句
+    CREATE_SQLS = [
+        'CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)',
+        'CREATE TABLE IF NOT EXISTS vols (vol_num TEXT PRIMARY KEY, seq INTEGER, name TEXT, '
+        'url TEXT, status TEXT, file_num TEXT)',
+        'CREATE INDEX IF NOT EXISTS idx_vols_seq ON vols (seq)',
+        'CREATE INDEX IF NOT EXISTS idx_vols_status ON vols (status)',
+        "CREATE INDEX IF NOT EXISTS idx_vols_pending ON vols (seq) WHERE status != 'done'",
+        'CREATE TABLE IF NOT EXISTS files (vol_num TEXT, file_num TEXT, seq INTEGER, name TEXT, '
+        'url TEXT, status TEXT, downtype TEXT, extend_json TEXT, PRIMARY KEY (vol_num, file_num))',
+        'CREATE INDEX IF NOT EXISTS idx_files_url ON files (url)',
+        'CREATE INDEX IF NOT EXISTS idx_files_seq ON files (vol_num, seq)',
+        "CREATE INDEX IF NOT EXISTS idx_files_pending ON files (vol_num, seq) WHERE status != 'done'",
+        'CREATE TABLE IF NOT EXISTS errors (vol_num TEXT, file_num TEXT, url TEXT, '
+        'PRIMARY KEY (vol_num, file_num))',
+        'CREATE TABLE IF NOT EXISTS file_meta (vol_num TEXT, file_num TEXT, size INTEGER, hash TEXT, '
+        'PRIMARY KEY (vol_num, file_num))',
+        'CREATE TABLE IF NOT EXISTS vol_fingerprint (vol_num TEXT PRIMARY KEY, page TEXT, files TEXT)'
+    ]
+
+    #############################
+    # 静态方法
+    #############################
+    @classmethod
+    def get_store_type(cls) -> str:
+        """
+        返回存储类型
+
+        @returns {str} - 存储类型
+        """
+        return 'sqlite'
+
+    @classmethod
+    def get_store_file(cls, task_path: str) -> str:
+        """
+        返回任务目录下的存储文件路径
+
+        @param {str} task_path - 任务目录
+
+        @returns {str} - 存储文件路径
+        """
+        return os.path.join(task_path, 'down.db')
+
+    @classmethod
+    def create_store(cls, task_path: str, name: str, url: str = '', para_dict: dict = None):
+        """
+        新建任务状态存储
+
+        @param {str} task_path - 任务目录
+        @param {str} name - 漫画名
+        @param {str} url='' - 漫画所在目录索引的url
+        @param {dict} para_dict=None - 扩展参数
+
+        @returns {SqliteTaskStore} - 存储对象
+        """
+        _store = cls(cls.get_store_file(task_path), para_dict=para_dict)
+        for _key, _value in cls.DEFAULT_INFO.items():
+            if _key != 'vol_num_dict':
+                _store.set_info(_key, _value)
+
+        _store.set_info('name', name)
+        _store.set_info('url', url)
+        _store.save()
+        return _store
+
+    @classmethod
+    def load_store(cls, task_path: str, read_only: bool = False, para_dict: dict = None):
+        """
+        装载已存在的任务状态存储
+
+        @param {str} task_path - 任务目录
+        @param {bool} read_only=False - 是否只读方式装载(用于查询正在下载的任务状态, 不会修改存储文件)
+        @param {dict} para_dict=None - 扩展参数
+
+        @returns {SqliteTaskStore} - 存储对象
+        """
+        return cls(cls.get_store_file(task_path), read_only=read_only, para_dict=para_dict)
+
+    @classmethod
+    def import_from_xml(cls, xml_file: str, db_file: str):
+        """
+        将down.xml导入为sqlite存储
+
+        @param {str} xml_file - down.xml文件路径
+        @param {str} db_file - 要生成的sqlite文件路径(如果已存在将被覆盖)
+        """
+        _xml_doc = SimpleXml(
+            xml_file, obj_type=EnumXmlObjType.File,
+            encoding='utf-8', use_chardet=False,
+            remove_blank_text=True
+        )
+        TaskProgressJournal.replay(_xml_doc, xml_file)
+
+        if os.path.exists(db_file):
+            os.remove(db_file)
+
+        _store = cls(db_file)
+        with _store.lock:
+            _conn = _store.conn
+            _info_node = _xml_doc.root.find('info')
+            for _child in ([] if _info_node is None else _info_node):
+                if _child.tag in ('vol_num_dict', 'pending_vols'):
+                    continue
+                _conn.execute(
+                    'INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)',
+                    (_child.tag, '' if _child.text is None else _child.text)
+                )
+
+            # 按卷名字典的顺序导入卷
+            _vol_num_dict = json.loads(_xml_doc.get_value('/down_task/info/vol_num_dict', default='{}') or '{}')
+            for _vol_name, _vol_num in _vol_num_dict.items():
+                _vol_node = _xml_doc.root.find('down_list/%s' % _vol_num)
+                if _vol_node is None:
+                    continue
+                _conn.execute(
+                    'INSERT OR REPLACE INTO vols (vol_num, seq, name, url, status, file_num) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (
+                        _vol_num, cls._num_seq(_vol_num), _vol_name,
+                        _vol_node.findtext('url', default=''),
+                        _vol_node.findtext('status', default=''),
+                        _vol_node.findtext('file_num', default='0')
+                    )
+                )
+                if _vol_node.findtext('files_fingerprint', default='') != '':
+                    _conn.execute(
+                        'INSERT OR REPLACE INTO vol_fingerprint (vol_num, page, files) VALUES (?, ?, ?)',
+                        (
+                            _vol_num, _vol_node.findtext('page_fingerprint', default=''),
+                            _vol_node.findtext('files_fingerprint', default='')
+                        )
+                    )
+                _conn.executemany(
+                    'INSERT OR REPLACE INTO files (vol_num, file_num, seq, name, url, status, '
+                    'downtype, extend_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    [
+                        (
+                            _vol_num, _file_node.tag, cls._num_seq(_file_node.tag),
+                            _file_node.findtext('name', default=''),
+                            _file_node.findtext('url', default=''),
+                            _file_node.findtext('status', default=''),
+                            _file_node.findtext('downtype', default=''),
+                            _file_node.findtext('extend_json', default='')
+                        ) for _file_node in _vol_node.iterfind('files/*')
+                    ]
+                )
+                _conn.executemany(
+                    'INSERT OR REPLACE INTO file_meta (vol_num, file_num, size, hash) VALUES (?, ?, ?, ?)',
+                    [
+                        (
+                            _vol_num, _file_node.tag, int(_file_node.findtext('size')),
+                            _file_node.findtext('hash', default='')
+                        ) for _file_node in _vol_node.iterfind('files/*')
+                        if _file_node.findtext('size', default='') != ''
+                    ]
+                )
+
+            # 异常信息
+            for _file_node in _xml_doc.root.iterfind('error/*/files/*'):
+                _conn.execute(
+                    'INSERT OR REPLACE INTO errors (vol_num, file_num, url) VALUES (?, ?, ?)',
+                    (
+                        _file_node.getparent().getparent().tag, _file_node.tag,
+                        _file_node.findtext('url', default='')
+                    )
+                )
+
+        _store.close()
+
+    @classmethod
+    def export_to_xml(cls, db_file: str, xml_file: str):
+        """
+        将sqlite存储导出为down.xml
+
+        @param {str} db_file - sqlite文件路径
+        @param {str} xml_file - 要生成的down.xml文件路径(如果已存在将被覆盖)
+        """
+        _store = cls(db_file)
+        try:
+            _root = etree.Element('down_task')
+            _info_node = etree.SubElement(_root, 'info')
+            _info = _store.get_info_dict()
+            for _key in cls.DEFAULT_INFO.keys():
+                etree.SubElement(_info_node, _key).text = _info.get(_key, '')
+
+            _down_list_node = etree.SubElement(_root, 'down_list')
+            for _vol_num, _vol_info in _store.get_down_list(with_files=True).items():
+                _vol_node = etree.SubElement(_down_list_node, _vol_num)
+                for _key in ('name', 'url', 'status', 'file_num'):
+                    etree.SubElement(_vol_node, _key).text = _vol_info[_key]
+                _fingerprint = _store.get_vol_fingerprint(_vol_num)
+                if _fingerprint['files'] != '':
+                    etree.SubElement(_vol_node, 'page_fingerprint').text = _fingerprint['page']
+                    etree.SubElement(_vol_node, 'files_fingerprint').text = _fingerprint['files']
+
+                _files_node = etree.SubElement(_vol_node, 'files')
+                _metas = _store.get_files_meta(_vol_num)
+                for _file_num, _file_info in _vol_info['files'].items():
+                    _file_node = etree.SubElement(_files_node, _file_num)
+                    for _key in ('name', 'url', 'status', 'downtype'):
+                        etree.SubElement(_file_node, _key).text = _file_info[_key]
+                    if _file_info['extend_json'] != '':
+                        etree.SubElement(_file_node, 'extend_json').text = _file_info['extend_json']
+                    if _file_num in _metas:
+                        etree.SubElement(_file_node, 'size').text = str(_metas[_file_num]['size'])
+                        etree.SubElement(_file_node, 'hash').text = _metas[_file_num]['hash']
+
+            _errors = _store.get_errors()
+            if len(_errors) > 0:
+                _error_node = etree.SubElement(_root, 'error')
+                for _vol_num, _files in _errors.items():
+                    _files_node = etree.SubElement(etree.SubElement(_error_node, _vol_num), 'files')
+                    for _file_num, _url in _files.items():
+                        etree.SubElement(etree.SubElement(_files_node, _file_num), 'url').text = _url
+
+            etree.ElementTree(_root).write(xml_file, encoding='utf-8', pretty_print=True)
+        finally:
+            _store.close()
+
+    #############################
+    # 实例方法
+    #############################
+    def __init__(self, db_file: str, read_only: bool = False, para_dict: dict = None):
+        """
+        构造函数
+
+        @param {str} db_file - sqlite文件路径
+        @param {bool} read_only=False - 是否只读
+        @param {dict} para_dict=None - 扩展参数, 任务的执行参数都会传进来
+        """
+        self.db_file = db_file
+        self.task_path = os.path.split(os.path.abspath(db_file))[0]
+        self.read_only = read_only
+        self.lock = threading.RLock()
+        if read_only:
+            # 路径中可能有#?%等uri特殊字符, 需转换为uri路径格式
+            self.conn = sqlite3.connect(
+                'file:%s?mode=ro' % urllib.request.pathname2url(os.path.abspath(db_file)),
+                uri=True, check_same_thread=False
+            )
+        else:
+            # 使用WAL模式, 下载过程中可以同时查询任务状态
+            self.conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level='DEFERRED')
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            for _sql in self.CREATE_SQLS:
+                self.conn.execute(_sql)
+            self.conn.commit()
+
+        # 保存合并控制
+        self._init_save_coalescer(para_dict)
+
+        # 下载过程中的批量提交控制
+        self.commit_batch = 100
+        self.commit_interval = 1.0
+        self._uncommit_num = 0
+        self._last_commit = time.time()
+
+    def get_info(self, key: str, default: str = '') -> str:
+        """
+        获取任务基本信息
+
+        @param {str} key - 信息项, 参考 DEFAULT_INFO
+        @param {str} default='' - 取不到值时的默认值
+
+        @returns {str} - 信息值
+        """
+        if key == 'vol_num_dict':
+            return json.dumps(self.get_vol_num_dict(), ensure_ascii=False)
+
+        with self.lock:
+            _row = self.conn.execute('SELECT value FROM info WHERE key = ?', (key, )).fetchone()
+
+        return default if _row is None else _row[0]
+
+    def set_info(self, key: str, value: str):
+        """
+        设置任务基本信息
+
+        @param {str} key - 信息项, 参考 DEFAULT_INFO
+        @param {str} value - 信息值
+        """
+        if key == 'vol_num_dict':
+            # 卷对应关系由vols表维护
+            return
+
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)', (key, value)
+            )
+
+    def get_info_dict(self) -> dict:
+        """
+        获取任务基本信息字典
+
+        @returns {dict} - 基本信息字典
+        """
+        with self.lock:
+            _rows = dict(self.conn.execute('SELECT key, value FROM info').fetchall())
+
+        # 按默认信息项的顺序返回
+        _info = dict()
+        for _key in self.DEFAULT_INFO.keys():
+            if _key == 'vol_num_dict':
+                _info[_key] = self.get_info('vol_num_dict')
+            elif _key in _rows.keys():
+                _info[_key] = _rows.pop(_key)
+        _info.update(_rows)
+
+        return _info
+
+    def get_vol_num_dict(self) -> dict:
+        """
+        获取卷名和卷标识的对应字典
+
+        @returns {dict} - key为卷名, value为卷标识(vol_num), 按添加顺序排列
+        """
+        with self.lock:
+            _rows = self.conn.execute('SELECT name, vol_num FROM vols ORDER BY seq').fetchall()
+
+        return dict(_rows)
+
+    def add_vol(self, vol_name: str, url: str, status: str = 'listing') -> str:
+        """
+        添加卷信息
+
+        @param {str} vol_name - 卷名
+        @param {str} url - 浏览该卷漫画的url
+        @param {str} status='listing' - 状态
+
+        @returns {str} - 卷标识(vol_num)
+        """
+        with self.lock:
+            _current_vol_num = int(self.get_info('vol_num', default='0'))
+            _vol_num = 'vol_%d' % _current_vol_num
+            self.set_info('vol_num', str(_current_vol_num + 1))
+            self.conn.execute(
+                'INSERT OR REPLACE INTO vols (vol_num, seq, name, url, status, file_num) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (_vol_num, _current_vol_num, vol_name, url, status, '0')
+            )
+            return _vol_num
+
+    def get_vol_info(self, vol_num: str) -> dict:
+        """
+        获取卷信息
+
+        @param {str} vol_num - 卷标识
+
+        @returns {dict} - 卷信息字典, 包括name/url/status/file_num, 卷不存在返回None
+        """
+        with self.lock:
+            _row = self.conn.execute(
+                'SELECT name, url, status, file_num FROM vols WHERE vol_num = ?', (vol_num, )
+            ).fetchone()
+
+        if _row is None:
+            return None
+
+        return dict(zip(('name', 'url', 'status', 'file_num'), _row))
+
+    def set_vol_value(self, vol_num: str, key: str, value: str):
+        """
+        设置卷信息项
+
+        @param {str} vol_num - 卷标识
+        @param {str} key - 信息项, name/url/status/file_num
+        @param {str} value - 信息值
+        """
+        if key not in ('name', 'url', 'status', 'file_num'):
+            raise KeyError('vol key [%s] not support' % key)
+
+        with self.lock:
+            self.conn.execute(
+                'UPDATE vols SET %s = ? WHERE vol_num = ?' % key, (value, vol_num)
+            )
+
+    def set_vol_status(self, vol_num: str, status: str):
+        """
+        更新下载过程中的卷状态
+
+        @param {str} vol_num - 卷标识
+        @param {str} status - 状态
+        """
+        with self.lock:
+            self.set_vol_value(vol_num, 'status', status)
+            self._batch_commit()
+
+    def get_vol_fingerprint(self, vol_num: str) -> dict:
+        """
+        获取卷上次成功解析时登记的指纹
+
+        @param {str} vol_num - 卷标识
+
+        @returns {dict} - 指纹字典(page/files), 没有登记时值为''
+        """
+        with self.lock:
+            try:
+                _row = self.conn.execute(
+                    'SELECT page, files FROM vol_fingerprint WHERE vol_num = ?', (vol_num, )
+                ).fetchone()
+            except sqlite3.OperationalError:
+                # 只读方式打开的旧版本存储没有该表
+                _row = None
+
+        if _row is None:
+            return {'page': '', 'files': ''}
+
+        return {'page': _row[0], 'files': _row[1]}
+
+    def set_vol_fingerprint(self, vol_num: str, page: str, files: str):
+        """
+        登记卷解析成功时的指纹
+
+        @param {str} vol_num - 卷标识
+        @param {str} page - 卷页面(或页面相关区域)的指纹, 网站驱动不支持时传''
+        @param {str} files - 解析得到的文件清单的指纹
+        """
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO vol_fingerprint (vol_num, page, files) VALUES (?, ?, ?)',
+                (vol_num, page, files)
+            )
+
+    def add_file(self, vol_num: str, file_num: str, file_name: str, url: str, downtype: str,
+                 extend_json: dict = None):
+        """
+        添加文件信息
+
+        @param {str} vol_num - 卷标识
+        @param {str} file_num - 文件标识
+        @param {str} file_name - 文件名
+        @param {str} url - 下载url
+        @param {str} downtype - 下载类型
+        @param {dict} extend_json=None - 要送入下载驱动的扩展信息
+        """
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO files (vol_num, file_num, seq, name, url, status, '
+                'downtype, extend_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    vol_num, file_num, self._num_seq(file_num), file_name, url, '', downtype,
+                    '' if extend_json is None else json.dumps(extend_json, ensure_ascii=False)
+                )
+            )
+
+    def get_files(self, vol_num: str) -> dict:
+        """
+        获取卷的文件清单
+
+        @param {str} vol_num - 卷标识
+
+        @returns {dict} - key为文件标识, value为文件信息字典(name/url/status/downtype/extend_json)
+        """
+        with self.lock:
+            _rows = self.conn.execute(
+                'SELECT file_num, name, url, status, downtype, extend_json FROM files '
+                'WHERE vol_num = ? ORDER BY seq', (vol_num, )
+            ).fetchall()
+
+        _files = dict()
+        for _row in _rows:
+            _files[_row[0]] = dict(zip(('name', 'url', 'status', 'downtype', 'extend_json'), _row[1:]))
+
+        return _files
+
+    def get_pending_vols(self) -> list:
+        """
+        获取未完成下载的卷清单(通过未完成卷的部分索引查询)
+
+        @returns {list} - 卷标识清单, 按卷添加顺序排列
+        """
+        with self.lock:
+            return [
+                _row[0] for _row in self.conn.execute(
+                    "SELECT vol_num FROM vols WHERE status != 'done' ORDER BY seq"
+                ).fetchall()
+            ]
+
+    def iter_pending_tasks(self):
+        """
+        逐个遍历待下载的文件
+        注：通过未完成卷和文件的部分索引查询, 每次只查询一个卷中未完成的文件
+
+        @returns {generator} - 每次返回(vol_num, vol_info, file_num, file_info), 参考基础类说明
+        """
+        with self.lock:
+            _vols = self.conn.execute(
+                "SELECT vol_num, name, url, status, file_num FROM vols WHERE status != 'done' "
+                "ORDER BY seq"
+            ).fetchall()
+
+        for _row in _vols:
+            _vol_num = _row[0]
+            _vol_info = dict(zip(('name', 'url', 'status', 'file_num'), _row[1:]))
+            if _vol_info['status'] not in ('listing', 'done'):
+                with self.lock:
+                    _files = self.conn.execute(
+                        "SELECT file_num, name, url, status, downtype, extend_json FROM files "
+                        "WHERE vol_num = ? AND status != 'done' ORDER BY seq", (_vol_num, )
+                    ).fetchall()
+
+                for _file in _files:
+                    yield _vol_num, _vol_info, _file[0], dict(
+                        zip(('name', 'url', 'status', 'downtype', 'extend_json'), _file[1:])
+                    )
+
+            yield _vol_num, _vol_info, None, None
+
+    def set_file_status(self, vol_num: str, file_num: str, status: str, error_url: str = None,
+                        meta: dict = None):
+        """
+        更新下载过程中的文件状态
+
+        @param {str} vol_num - 卷标识
+        @param {str} file_num - 文件标识
+        @param {str} status - 状态, done/err
+        @param {str} error_url=None - 下载失败时要登记到异常清单的url
+        @param {dict} meta=None - 下载完成时要登记的文件完整性信息(size/hash)
+        """
+        with self.lock:
+            _cursor = self.conn.execute(
+                'UPDATE files SET status = ? WHERE vol_num = ? AND file_num = ? AND status != ?',
+                (status, vol_num, file_num, status)
+            )
+            if status == 'done' and _cursor.rowcount > 0:
+                self.conn.execute(
+                    "UPDATE info SET value = CAST(CAST(value AS INTEGER) + 1 AS TEXT) WHERE key = 'success'"
+                )
+
+            if error_url is not None:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO errors (vol_num, file_num, url) VALUES (?, ?, ?)',
+                    (vol_num, file_num, error_url)
+                )
+
+            if meta is not None:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO file_meta (vol_num, file_num, size, hash) VALUES (?, ?, ?, ?)',
+                    (vol_num, file_num, int(meta.get('size', 0)), meta.get('hash', ''))
+                )
+
+            self._batch_commit()
+
+    def get_files_meta(self, vol_num: str) -> dict:
+        """
+        获取卷中已登记的文件完整性信息
+
+        @param {str} vol_num - 卷标识
+
+        @returns {dict} - key为文件标识, value为dict(size/hash), 没有登记的文件不返回
+        """
+        with self.lock:
+            try:
+                _rows = self.conn.execute(
+                    'SELECT file_num, size, hash FROM file_meta WHERE vol_num = ?', (vol_num, )
+                ).fetchall()
+            except sqlite3.OperationalError:
+                # 只读方式打开的旧版本存储没有该表
+                return dict()
+
+        return dict([(_row[0], {'size': _row[1], 'hash': _row[2]}) for _row in _rows])
+
+    def find_file_by_url(self, url: str, vol_num: str = None) -> tuple:
+        """
+        通过下载url查找文件
+
+        @param {str} url - 下载url
+        @param {str} vol_num=None - 指定只在该卷中查找, 不传代表查找所有卷
+
+        @returns {tuple} - 找到返回(vol_num, file_num), 找不到返回None
+        """
+        with self.lock:
+            if vol_num is None:
+                _row = self.conn.execute(
+                    'SELECT vol_num, file_num FROM files WHERE url = ? LIMIT 1', (url, )
+                ).fetchone()
+            else:
+                _row = self.conn.execute(
+                    'SELECT vol_num, file_num FROM files WHERE url = ? AND vol_num = ? LIMIT 1',
+                    (url, vol_num)
+                ).fetchone()
+
+        return None if _row is None else tuple(_row)
+
+    def get_errors(self) -> dict:
+        """
+        获取下载异常清单
+
+        @returns {dict} - key为卷标识, value为dict(key为文件标识, value为url)
+        """
+        with self.lock:
+            _rows = self.conn.execute('SELECT vol_num, file_num, url FROM errors').fetchall()
+
+        _errors = dict()
+        for _row in _rows:
+            _errors.setdefault(_row[0], dict())[_row[1]] = _row[2]
+
+        return _errors
+
+    def save(self):
+        """
+        将所有变更保存到存储文件
+        """
+        if self.read_only:
+            return
+
+        with self.lock:
+            self.conn.commit()
+            self._uncommit_num = 0
+            self._last_commit = time.time()
+            self.save_coalescer.reset()
+            self._write_status_file()
+
+    def close(self):
+        """
+        保存并关闭存储
+        """
+        with self.lock:
+            self.save()
+            self.conn.close()
+
+    #############################
+    # 内部函数
+    #############################
+    def _batch_commit(self):
+        """
+        下载过程中的批量提交(按数量或时间间隔)
+        """
+        self._uncommit_num += 1
+        if self._uncommit_num >= self.commit_batch or time.time() - self._last_commit >= self.commit_interval:
+            self.save()
+
+    @staticmethod
+    def _num_seq(num_str: str) -> int:
+        """
+        获取标识(vol_[num]/file_[num])中的序号, 用于排序
+
+        @param {str} num_str - 标识
+
+        @returns {int} - 序号
+        """
+        try:
+            return int(num_str.split('_')[-1])
+        except ValueError:
+            return 0
+
+
+class TaskStoreManager(object):
+    """
+    任务状态存储管理
+    """
+
+    # 支持的存储类型
+    STORE_CLASS = {
+        'xml': XmlTaskStore,
+        'sqlite': SqliteTaskStore
+    }
+
+    # 转换存储类型后原存储文件的备份扩展名
+    BACKUP_EXT = '.bak'
+
+    # 已提示过同时存在多种存储文件的任务目录
+    _warned_paths = set()
+
+    @classmethod
+    def get_store_class(cls, store_type: str):
+        """
+        获取存储类型对应的存储类
+
+        @param {str} store_type - 存储类型, xml/sqlite
+
+        @returns {BaseTaskStoreFW} - 存储类
+        """
+        if store_type not in cls.STORE_CLASS.keys():
+            raise RuntimeError('not support task store type [%s]' % store_type)
+
+        return cls.STORE_CLASS[store_type]
+
+    @classmethod
+    def get_exists_store_type(cls, task_path: str) -> str:
+        """
+        获取任务目录下已存在的存储类型
+
+        @param {str} task_path - 任务目录
+
+        @returns {str} - 存储类型, 不存在返回''
+        """
+        _types = [
+            _type for _type in ('sqlite', 'xml')
+            if os.path.exists(cls.STORE_CLASS[_type].get_store_file(task_path))
+        ]
+        if len(_types) == 0:
+            return ''
+
+        if len(_types) > 1 and task_path not in cls._warned_paths:
+            # 旧版本从xml导入后会保留原xml文件, 该文件不是当前状态, 以sqlite为准
+            cls._warned_paths.add(task_path)
+            _print = RunTool.get_global_var('CONSOLE_PRINT_FUNCTION')
+            (print if _print is None else _print)(
+                'Warning: both down.db and down.xml exist in [%s], use down.db, down.xml is stale' % task_path
+            )
+
+        return _types[0]
+
+    @classmethod
+    def backup_store_files(cls, files: list):
+        """
+        将转换存储类型后不再使用的存储文件改名为备份文件(扩展名为.bak)
+
+        @param {list} files - 要备份的文件清单, 不存在的文件忽略
+        """
+        for _file in files:
+            if os.path.exists(_file):
+                os.replace(_file, _file + cls.BACKUP_EXT)
+
+    @classmethod
+    def load_exists_store(cls, task_path: str, read_only: bool = True, para_dict: dict = None):
+        """
+        装载任务目录下已存在的存储(不会新建)
+
+        @param {str} task_path - 任务目录(保存目录 + 漫画名)
+        @param {bool} read_only=True - 是否只读方式装载
+        @param {dict} para_dict=None - 扩展参数
+
+        @returns {BaseTaskStoreFW} - 存储对象
+
+        @throws {FileNotFoundError} - 任务目录下没有存储文件时抛出异常
+        """
+        _store_type = cls.get_exists_store_type(task_path)
+        if _store_type == '':
+            raise FileNotFoundError('task store not found in path [%s]' % task_path)
+
+        return cls.STORE_CLASS[_store_type].load_store(task_path, read_only=read_only, para_dict=para_dict)
+
+    @classmethod
+    def get_down_index_info(cls, task_path: str) -> dict:
+        """
+        只读获取任务基本信息(xml存储使用流式装载)
+
+        @param {str} task_path - 任务目录
+
+        @returns {dict} - 基本信息字典
+        """
+        if cls.get_exists_store_type(task_path) == 'xml':
+            return XmlTaskStreamLoader(XmlTaskStore.get_store_file(task_path)).get_info_dict()
+
+        _store = cls.load_exists_store(task_path)
+        try:
+            return _store.get_info_dict()
+        finally:
+            _store.close()
+
+    @classmethod
+    def iter_down_index(cls, task_path: str, with_files: bool = True):
+        """
+        只读逐个卷遍历任务的下载清单(xml存储使用流式装载)
+
+        @param {str} task_path - 任务目录
+        @param {bool} with_files=True - 是否包含文件清单
+
+        @returns {generator} - 每次返回(vol_num, vol_info), vol_info为卷信息字典(包含files文件清单字典)
+        """
+        if cls.get_exists_store_type(task_path) == 'xml':
+            yield from XmlTaskStreamLoader(
+                XmlTaskStore.get_store_file(task_path)
+            ).iter_down_list(with_files=with_files)
+            return
+
+        _store = cls.load_exists_store(task_path)
+        try:
+            yield from _store.iter_down_list(with_files=with_files)
+        finally:
+            _store.close()
+
+    @classmethod
+    def open_store(cls, task_path: str, name: str, url: str = '', store_type: str = '', para_dict: dict = None):
+        """
+        创建或获取任务状态存储对象
+        注：如果指定的存储类型与已存在的存储类型不一致，将自动进行导入或导出转换
+
+        @param {str} task_path - 任务目录(保存目录 + 漫画名)
+        @param {str} name - 漫画名
+        @param {str} url='' - 漫画所在目录索引的url
+        @param {str} store_type='' - 存储类型, xml/sqlite, 不传代表使用已存在的存储类型(新任务默认为xml)
+        @param {dict} para_dict=None - 扩展参数, 任务的执行参数都会传进来
+
+        @returns {BaseTaskStoreFW} - 存储对象
+        """
+        _exists_type = cls.get_exists_store_type(task_path)
+        _store_type = store_type
+        if _store_type == '':
+            _store_type = 'xml' if _exists_type == '' else _exists_type
+
+        if _exists_type != '' and _exists_type != _store_type:
+            # 存储类型转换
+            if _store_type == 'sqlite':
+                _xml_file = XmlTaskStore.get_store_file(task_path)
+                SqliteTaskStore.import_from_xml(_xml_file, SqliteTaskStore.get_store_file(task_path))
+                # 原xml及进度日志已导入, 改为备份避免被当作当前状态读取
+                cls.backup_store_files([_xml_file, TaskProgressJournal.get_journal_file(_xml_file)])
+            else:
+                _db_file = SqliteTaskStore.get_store_file(task_path)
+                SqliteTaskStore.export_to_xml(_db_file, XmlTaskStore.get_store_file(task_path))
+                for _file in (_db_file, _db_file + '-wal', _db_file + '-shm'):
+                    if os.path.exists(_file):
+                        os.remove(_file)
+
+        return cls.get_store_class(_store_type).open_store(
+            task_path, name, url=url, para_dict=para_dict
+        )
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    # 打印版本信息
+    print(('模块名：%s  -  %s\n'
+           '作者：%s\n'
+           '发布日期：%s\n'
+           '版本：%s' % (__MOUDLE__, __DESCRIPT__, __AUTHOR__, __PUBLISH__, __VERSION__)))
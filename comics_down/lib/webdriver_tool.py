@@ -28,6 +28,7 @@ from HiveNetLib.simple_webdriver import SimpleWebDriver
 sys.path.append(os.path.abspath(os.path.join(
     os.path.dirname(__file__), os.path.pardir, os.path.pardir)))
 from comics_down.lib.core import Tools
+from comics_down.lib.page_cache import PageCache
 
 
 __MOUDLE__ = 'webdriver_tool'  # 模块名
@@ -111,6 +112,7 @@ class WebDriverTool(object):
             overtime - 超时时间
             encoding - 网页编码
             connect_retry - 自动重连次数
+            page_cache - 是否使用条件请求缓存(y/n), 缓存保存在path参数目录下的 .page_cache 目录
         @param {dict} headers - 指定网站访问的协议头字典，例如：
             {
                 "User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/66.0.3359.139 Safari/537.36",
@@ -125,14 +127,22 @@ class WebDriverTool(object):
 
         # 设置访问对象
         _url = para_dict['url']
-        if headers is not None:
-            _url = urllib.request.Request(para_dict['url'], headers=headers)
+        if para_dict.get('page_cache', 'n') == 'y':
+            # 通过条件请求缓存获取, 网页未变化时使用缓存的网页代码
+            _html = PageCache(para_dict.get('path', '')).get_web_page_code(
+                _url, headers=headers, timeout=float(para_dict['overtime']),
+                encoding=para_dict['encoding'], retry=int(para_dict['connect_retry']),
+                proxy=_proxy
+            )
+        else:
+            if headers is not None:
+                _url = urllib.request.Request(para_dict['url'], headers=headers)
 
-        _html = NetTool.get_web_page_code(
-            _url, timeout=float(para_dict['overtime']),
-            encoding=para_dict['encoding'], retry=int(para_dict['connect_retry']),
-            proxy=_proxy
-        )
+            _html = NetTool.get_web_page_code(
+                _url, timeout=float(para_dict['overtime']),
+                encoding=para_dict['encoding'], retry=int(para_dict['connect_retry']),
+                proxy=_proxy
+            )
         if para_dict.get('debug_path', '') != '':
             # 记录网页的信息
             _filename = '%s.html' % datetime.datetime.now().strftime('%Y_%m_%d_%H_%M_%S')
@@ -15,7 +15,9 @@
 import os
 import sys
 import copy
+import hashlib
 from urllib.parse import urlparse
+from lxml import etree
 from HiveNetLib.base_tools.net_tool import NetTool
 from HiveNetLib.html_parser import HtmlParser
 # 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
@@ -255,6 +257,56 @@ class CommonDriver(BaseWebSiteDriverFW):
 
         return _files_info
 
+    @classmethod
+    def _get_vol_fingerprint(cls, vol_url: str, last_tran_para: object = None, **para_dict) -> tuple:
+        """
+        获取卷页面(或页面中文件清单相关区域)的指纹
+        注：仅支持静态页面(is_html_code)的配置, 可通过 fingerprint_xpath 配置指定计算指纹的页面区域
+
+        @param {str} vol_url - 浏览该卷漫画的url
+        @param {object} last_tran_para=None - 上一次文件信息获取完成后传递的自定义参数对象
+        @param {dict} para_dict - 扩展参数, 任务的执行参数都会传进来
+
+        @returns {tuple} - (指纹, 传入 _get_file_info 的 last_tran_para), 不支持时指纹返回''
+        """
+        _config = cls._get_config(vol_url, 'file')
+        if _config is None or not _config.get('is_html_code', True):
+            return '', last_tran_para
+
+        if last_tran_para is not None and type(last_tran_para) == dict and \
+                last_tran_para.get('web_obj', None) is not None:
+            # 使用上一个卷传入的页面对象, 无法对应当前卷页面
+            return '', last_tran_para
+
+        _para_dict = copy.copy(para_dict)
+        _para_dict['url'] = vol_url
+        if _config.get('para_dict', '') != '':
+            _para_dict.update(_config['para_dict'])
+
+        _html_code = WebDriverTool.get_web_page_code(
+            _para_dict, headers=_config.get('headers', None)
+        )
+        _web_obj = HtmlParser(_html_code)
+
+        # 计算指纹的页面区域
+        _xpath = _config.get('fingerprint_xpath', '')
+        if _xpath is None or _xpath == '':
+            _region = _html_code.encode('utf-8')
+        else:
+            _region = b''.join([
+                etree.tostring(_el.element, encoding='utf-8')
+                for _el in _web_obj.find_elements([['xpath', _xpath]])
+            ])
+
+        # 获取到的页面对象传给 _get_file_info 使用, 避免重复获取
+        _tran_para = dict() if last_tran_para is None or type(last_tran_para) != dict else dict(last_tran_para)
+        _tran_para['web_obj'] = _web_obj
+        if len(_region) == 0:
+            # 没有匹配到指纹区域(页面改版、xpath配置错误或错误页面), 视为不支持, 由 _get_file_info 解析
+            return '', _tran_para
+
+        return 'sha1:%s' % hashlib.sha1(_region).hexdigest(), _tran_para
+
     #############################
     # 公共函数
     #############################
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+aria2 RPC下载驱动手工测试(使用本地模拟的JSON-RPC服务, 无需安装aria2)
+@module aria2_rpc_driver_test
+@file aria2_rpc_driver_test.py
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import concurrent.futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from comics_down.lib.core import Tools
+from comics_down.down_driver.aria2_rpc_down_driver import Aria2RpcDriver
+
+
+class FakeAria2Handler(BaseHTTPRequestHandler):
+    """
+    模拟aria2的JSON-RPC服务(addUri时直接写入文件, url包含error的下载返回错误)
+    """
+    # 下载状态, key为gid, value为tellStatus的结果
+    downloads = dict()
+    lock = threading.Lock()
+    call_count = dict()  # 每个方法的调用次数
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        _req = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        _result = self._call(_req['method'], _req['params'])
+        _data = json.dumps({'jsonrpc': '2.0', 'id': _req['id'], 'result': _result}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(_data)))
+        self.end_headers()
+        self.wfile.write(_data)
+
+    def _call(self, method, params):
+        with self.lock:
+            self.call_count[method] = self.call_count.get(method, 0) + 1
+
+        if method == 'system.multicall':
+            return [[self._call(_item['methodName'], _item['params'])] for _item in params[0]]
+
+        if method == 'aria2.getVersion':
+            return {'version': 'fake'}
+        elif method == 'aria2.addUri':
+            _uri, _options = params[0][0], params[1]
+            with self.lock:
+                _gid = '%016x' % (len(self.downloads) + 1)
+                if _uri.find('error') >= 0:
+                    self.downloads[_gid] = {
+                        'gid': _gid, 'status': 'error', 'errorCode': '3', 'errorMessage': 'Not Found'
+                    }
+                else:
+                    with open(os.path.join(_options['dir'], _options['out']), 'w') as _f:
+                        _f.write(_uri)
+                    self.downloads[_gid] = {'gid': _gid, 'status': 'complete', 'errorCode': '0'}
+            return _gid
+        elif method == 'aria2.tellStatus':
+            with self.lock:
+                return self.downloads[params[0]]
+        elif method == 'aria2.removeDownloadResult':
+            with self.lock:
+                self.downloads.pop(params[0], None)
+            return 'OK'
+
+        return None
+
+
+class TestAria2RpcDriver(object):
+    """
+    测试aria2 RPC下载驱动
+    """
+    @classmethod
+    def start_fake_server(cls):
+        """
+        启动模拟的aria2 RPC服务
+
+        @returns {ThreadingHTTPServer} - 服务对象
+        """
+        _server = ThreadingHTTPServer(('127.0.0.1', 0), FakeAria2Handler)
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
+
+    @classmethod
+    def test_download(cls, file_num: int):
+        """
+        测试批量下载
+
+        @param {int} file_num - 下载的文件数量
+        """
+        _server = cls.start_fake_server()
+        _path = tempfile.mkdtemp()
+        _para_dict = Tools.get_correct_para_dict({
+            'aria2_rpc_url': 'http://127.0.0.1:%d/jsonrpc' % _server.server_address[1],
+            'aria2_rpc_start': 'n'
+        })
+        _session = Aria2RpcDriver.create_session(**_para_dict)
+        _para_dict['down_session'] = _session
+        try:
+            _start = time.time()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=20) as _pool:
+                _futures = [
+                    _pool.submit(
+                        Aria2RpcDriver.download, 'http://test/%d.jpg' % _i,
+                        os.path.join(_path, '%d.jpg' % _i), **_para_dict
+                    ) for _i in range(file_num)
+                ]
+                for _future in _futures:
+                    _future.result()
+
+            # 下载失败的情况
+            try:
+                Aria2RpcDriver.download('http://test/error.jpg', os.path.join(_path, 'error.jpg'), **_para_dict)
+                print('error download not raise exception')
+            except RuntimeError as _e:
+                print('error download:', str(_e))
+
+            print('download %d files use %.2f seconds, files: %d, calls: %s' % (
+                file_num, time.time() - _start, len(os.listdir(_path)),
+                json.dumps(FakeAria2Handler.call_count)
+            ))
+        finally:
+            Aria2RpcDriver.close_session(_session)
+            _server.shutdown()
+            shutil.rmtree(_path)
+
+
+if __name__ == '__main__':
+    TestAria2RpcDriver.test_download(1000)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+asyncio下载引擎手工测试
+@module async_engine_test
+@file async_engine_test.py
+"""
+
+import sys
+import os
+import time
+import shutil
+import asyncio
+import hashlib
+import tempfile
+import urllib.error
+from urllib.parse import quote
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from HiveNetLib.base_tools.run_tool import RunTool
+from comics_down.lib.core import Tools, DownloadManager
+from comics_down.lib.async_http import AsyncHttpClient
+from comics_down.down_driver.http_down_driver import HttpDownDriver
+from local_http_server import LocalHttpServer
+
+
+class TestAsyncEngine(object):
+    """
+    测试asyncio下载客户端及下载引擎
+    """
+    @classmethod
+    def download(cls, url: str, save_file: str, **kwargs) -> dict:
+        """
+        同步执行AsyncHttpClient的下载
+
+        @param {str} url - 文件url
+        @param {str} save_file - 保存文件
+        @param {dict} kwargs - AsyncHttpClient.download_file的其他参数
+
+        @returns {dict} - 文件完整性信息(size/hash)
+        """
+        return asyncio.get_event_loop().run_until_complete(
+            AsyncHttpClient.download_file(url, save_file, **kwargs)
+        )
+
+    @classmethod
+    def test_client(cls):
+        """
+        测试下载客户端的应答处理
+        """
+        _path = tempfile.mkdtemp()
+        _server = LocalHttpServer().start()
+        _other_server = LocalHttpServer().start()
+        try:
+            _file = os.path.join(_path, 'test.bin')
+            _data = os.urandom(3 * 1024 * 1024 + 123)
+
+            # 普通下载及哈希值
+            _meta = cls.download(_server.add_file('/normal', _data), _file, hash_name='md5')
+            assert _meta == {'size': len(_data), 'hash': 'md5:%s' % hashlib.md5(_data).hexdigest()}
+            with open(_file, 'rb') as _f:
+                assert _f.read() == _data
+
+            # chunked传输
+            _meta = cls.download(_server.add_file('/chunked', _data[0: 12345], chunked=True), _file)
+            assert _meta['size'] == 12345
+            with open(_file, 'rb') as _f:
+                assert _f.read() == _data[0: 12345]
+
+            # 非ASCII的url按utf-8编码后请求
+            _name = '/漫画/第1话 a.jpg'
+            _server.add_file(quote(_name), _data[0: 100])
+            cls.download(_server.get_url(_name, host='localhost') + '?q=中', _file)
+            with open(_file, 'rb') as _f:
+                assert _f.read() == _data[0: 100]
+
+            # 重定向到其他主机时不送出Cookie
+            _server.add_file('/redirect', None, redirect=_other_server.add_file('/target', _data[0: 200]))
+            _server.add_file('/local_redirect', None, redirect='/normal')
+            cls.download(_server.get_url('/redirect'), _file, cookies={'a': 'b'})
+            cls.download(_server.get_url('/local_redirect'), _file, cookies={'a': 'b'})
+            _cookies = [(_path, _headers.get('Cookie', None)) for _path, _headers in _server.requests + _other_server.requests]
+            print('redirect cookies:', [_item for _item in _cookies if 'redirect' in _item[0] or _item[0] == '/target'])
+            assert ('/redirect', 'a=b') in _cookies and ('/target', None) in _cookies
+            assert ('/local_redirect', 'a=b') in _cookies and _cookies.count(('/normal', 'a=b')) == 1
+
+            # 断点续传
+            with open(_file + '.dt', 'wb') as _f:
+                _f.write(_data[0: 1000])
+            _meta = cls.download(_server.get_url('/normal'), _file, is_resume=True)
+            assert _meta['hash'] == 'sha1:%s' % hashlib.sha1(_data).hexdigest()
+            assert _server.requests[-1][1].get('Range', None) == 'bytes=1000-'
+            with open(_file, 'rb') as _f:
+                assert _f.read() == _data
+
+            # 临时文件已完整(416)
+            with open(_file + '.dt', 'wb') as _f:
+                _f.write(_data)
+            _meta = cls.download(_server.get_url('/normal'), _file, is_resume=True)
+            assert _meta['size'] == len(_data) and not os.path.exists(_file + '.dt')
+
+            # 异常状态码及应答中断
+            for _url, _error in (
+                (_server.get_url('/missing'), urllib.error.HTTPError),
+                (_server.add_file('/limit', _data, status=429, headers={'Retry-After': '1'}), urllib.error.HTTPError),
+                (_server.add_file('/truncate', _data, truncate=1), ConnectionError)
+            ):
+                try:
+                    cls.download(_url, _file)
+                    assert False, 'should raise error: %s' % _url
+                except _error as _e:
+                    print('download %s error: %s' % (_url, repr(_e)))
+                    if isinstance(_e, urllib.error.HTTPError) and _e.code == 429:
+                        assert _e.headers['Retry-After'] == '1'
+        finally:
+            _server.stop()
+            _other_server.stop()
+            shutil.rmtree(_path)
+
+    @classmethod
+    def test_engine(cls, engine: str, file_count: int):
+        """
+        测试下载引擎的下载
+
+        @param {str} engine - 下载引擎, thread/async
+        @param {int} file_count - 文件数量
+        """
+        _path = tempfile.mkdtemp()
+        _server = LocalHttpServer().start()
+        try:
+            # down_overtime为0代表不超时
+            _para_dict = Tools.get_correct_para_dict({
+                'name': 'test', 'path': _path, 'down_worker': '10', 'down_engine': engine, 'retry_delay': '10',
+                'down_overtime': '0'
+            })
+            _store = DownloadManager.get_down_task_store(_path, 'test', url='http://test/', para_dict=_para_dict)
+            _vol_num = _store.add_vol('vol', 'http://test/vol', status='downloading')
+            _files = dict()
+            for _i in range(file_count):
+                _files['%d.jpg' % _i] = _server.add_file('/img/%d' % _i, ('/img/%d' % _i).encode() * 500)
+            _files['chunked.jpg'] = _server.add_file('/chunked', b'hello world', chunked=True)
+            _files['redirect.jpg'] = _server.add_file('/redirect', None, redirect='/img/0')
+            _files['busy.jpg'] = _server.add_file('/busy', b'busy', status=[429], headers={'Retry-After': '0'})
+            _files['missing.jpg'] = _server.get_url('/missing')
+            for _i, _name in enumerate(_files.keys()):
+                _store.add_file(_vol_num, 'file_%d' % _i, _name, _files[_name], 'http')
+            _store.set_vol_value(_vol_num, 'file_num', str(len(_files)))
+            _store.set_info('files', str(len(_files)))
+            _store.save()
+
+            _manager = DownloadManager(_store, **_para_dict)
+            _start = time.time()
+            _manager.start_download()
+            print('%s engine download %d files use %.2f seconds: %s' % (
+                engine, len(_files), time.time() - _start, _manager.down_info
+            ))
+            assert _manager.down_info['success'] == len(_files) - 1
+            assert list(_store.get_errors()[_vol_num].values()) == [_files['missing.jpg']]
+            assert _server.hits['/busy'] == 2
+
+            _vol_path = os.path.join(_path, 'test', 'vol')
+            for _name, _url in _files.items():
+                if _name == 'missing.jpg':
+                    continue
+                with open(os.path.join(_vol_path, _name), 'rb') as _f:
+                    _data = _f.read()
+                if _name == 'redirect.jpg':
+                    assert _data == _server.files['/img/0']
+                else:
+                    assert _data == _server.files[_url[_url.index('/', 8):]], _name
+            _store.close()
+        finally:
+            _server.stop()
+            shutil.rmtree(_path)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    RunTool.set_global_var('DOWN_DRIVER_DICT', {'http': HttpDownDriver})
+    RunTool.set_global_var('CONSOLE_PRINT_FUNCTION', lambda *args, **kwargs: None)
+    TestAsyncEngine.test_client()
+    for _engine in ('thread', 'async'):
+        TestAsyncEngine.test_engine(_engine, 200)
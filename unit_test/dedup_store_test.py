@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+下载文件去重存储手工测试
+@module dedup_store_test
+@file dedup_store_test.py
+"""
+
+import sys
+import os
+import shutil
+import hashlib
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from HiveNetLib.base_tools.run_tool import RunTool
+from comics_down.lib.core import Tools, DownloadManager
+from comics_down.lib.dedup_store import DedupStore
+from comics_down.down_driver.http_down_driver import HttpDownDriver
+from local_http_server import LocalHttpServer
+
+
+class TestDedupStore(object):
+    """
+    测试内容寻址的去重存储
+    """
+    @classmethod
+    def get_blob_count(cls, path: str) -> int:
+        """
+        获取去重存储中的文件数量
+
+        @param {str} path - 下载保存目录
+
+        @returns {int} - 文件数量
+        """
+        return sum([
+            len(_files) for _, _, _files in os.walk(os.path.join(DedupStore.get_store_path(path), 'blobs'))
+        ])
+
+    @classmethod
+    def test_store(cls, path: str):
+        """
+        测试存储的登记及按url链接
+
+        @param {str} path - 下载保存目录
+        """
+        _path = os.path.join(path, 'store')
+        os.makedirs(_path)
+        _store = DedupStore(_path, hash_name='md5')
+        try:
+            _files = list()
+            for _i, _data in enumerate((b'same', b'same', b'other')):
+                _file = os.path.join(_path, '%d.jpg' % _i)
+                with open(_file, 'wb') as _f:
+                    _f.write(_data)
+                _files.append(_file)
+
+            # 驱动返回的哈希算法一致时直接使用, 不一致时重新计算
+            _meta = _store.add('http://test/0', _files[0], meta={'size': 4, 'hash': 'sha1:xxx'})
+            assert _meta == {'size': 4, 'hash': 'md5:%s' % hashlib.md5(b'same').hexdigest()}
+            assert _store.add('http://test/1', _files[1], meta=_meta) == _meta
+            _store.add('http://test/2', _files[2])
+
+            # 相同内容的文件共用存储文件
+            assert os.path.samefile(_files[0], _files[1]) and os.stat(_files[0]).st_nlink == 3
+            assert cls.get_blob_count(_path) == 2
+
+            # 按url链接
+            _file = os.path.join(_path, 'link.jpg')
+            assert _store.link_by_url('http://test/not_exists', _file) is None
+            assert _store.link_by_url('http://test/1', _file) == _meta
+            assert os.path.samefile(_file, _files[0])
+
+            # 存储文件丢失时不链接
+            os.remove(_store._get_blob_file(_meta['hash']))
+            assert _store.link_by_url('http://test/1', os.path.join(_path, 'lost.jpg')) is None
+        finally:
+            _store.close()
+
+        # 不支持的哈希算法使用sha1
+        _store = DedupStore(_path, hash_name='xxh64')
+        assert _store.hash_name == 'sha1'
+        _store.close()
+
+    @classmethod
+    def test_download(cls, engine: str, path: str, server: LocalHttpServer):
+        """
+        测试下载管理器使用去重存储
+
+        @param {str} engine - 下载引擎, thread/async
+        @param {str} path - 下载保存目录
+        @param {LocalHttpServer} server - http服务
+        """
+        _path = os.path.join(path, engine)
+        _paths = ['/img/%d' % _i for _i in range(5)] + ['/ad/%d' % _i for _i in range(5)]
+        for _file_path in _paths:
+            server.add_file(_file_path, (b'AD' if _file_path.startswith('/ad') else _file_path.encode()) * 500)
+
+        for _name in ('a', 'b'):
+            _para_dict = Tools.get_correct_para_dict({
+                'name': _name, 'path': _path, 'down_worker': '4', 'down_engine': engine, 'dedup_store': 'y'
+            })
+            _store = DownloadManager.get_down_task_store(_path, _name, url='http://test/', para_dict=_para_dict)
+            _vol_num = _store.add_vol('vol', 'http://test/vol', status='downloading')
+            for _i, _file_path in enumerate(_paths):
+                _store.add_file(_vol_num, 'file_%d' % _i, '%d.jpg' % _i, server.get_url(_file_path), 'http')
+            _store.set_vol_value(_vol_num, 'file_num', str(len(_paths)))
+            _store.set_info('files', str(len(_paths)))
+            _store.save()
+
+            server.requests.clear()
+            _manager = DownloadManager(_store, **_para_dict)
+            _manager.start_download()
+            print('%s engine task %s: success %d, requests %d, blobs %d' % (
+                engine, _name, _manager.down_info['success'], len(server.requests), cls.get_blob_count(_path)
+            ))
+            assert _manager.down_info['success'] == len(_paths)
+            # 第2个任务的文件都已在存储中, 无需访问网络
+            assert len(server.requests) == (len(_paths) if _name == 'a' else 0)
+            assert len(_store.get_files_meta(_vol_num)) == len(_paths)
+            _store.close()
+
+        # 相同内容的文件只保存一份
+        assert cls.get_blob_count(_path) == 6
+        _vol_path = os.path.join(_path, 'b', 'vol')
+        assert os.path.samefile(os.path.join(_vol_path, '5.jpg'), os.path.join(_path, 'a', 'vol', '9.jpg'))
+        assert os.stat(os.path.join(_vol_path, '0.jpg')).st_nlink == 3
+        assert os.stat(os.path.join(_vol_path, '5.jpg')).st_nlink == 11
+        with open(os.path.join(_vol_path, '6.jpg'), 'rb') as _f:
+            assert _f.read() == b'AD' * 500
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    RunTool.set_global_var('DOWN_DRIVER_DICT', {'http': HttpDownDriver})
+    RunTool.set_global_var('CONSOLE_PRINT_FUNCTION', lambda *args, **kwargs: None)
+    _path = tempfile.mkdtemp()
+    _server = LocalHttpServer().start()
+    try:
+        TestDedupStore.test_store(_path)
+        for _engine in ('thread', 'async'):
+            TestDedupStore.test_download(_engine, _path, _server)
+    finally:
+        _server.stop()
+        shutil.rmtree(_path)
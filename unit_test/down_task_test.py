@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+下载队列任务记录手工测试
+@module down_task_test
+@file down_task_test.py
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+import threading
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from HiveNetLib.base_tools.run_tool import RunTool
+import comics_down.lib.core as core
+from comics_down.lib.core import Tools, DownloadManager, BaseDownDriverFW, DownTask, DownTaskQueue
+
+
+# 测试使用的下载扩展信息
+EXTEND_JSON = {'headers': {'Referer': 'http://test/'}}
+
+
+class RetryDownDriver(BaseDownDriverFW):
+    """
+    第一次下载失败(可重试的连接异常)的下载驱动, 记录每次收到的扩展信息
+    """
+    lock = threading.Lock()
+    calls = list()  # 每个元素为(url, extend_json)
+
+    @classmethod
+    def get_down_type(cls):
+        return 'http'
+
+    @classmethod
+    def download(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        with cls.lock:
+            cls.calls.append((file_url, extend_json))
+            _attempts = len([_call for _call in cls.calls if _call[0] == file_url])
+
+        if _attempts == 1:
+            raise ConnectionError('connect error: %s' % file_url)
+
+
+class CountJson(object):
+    """
+    替换core模块的json, 统计扩展信息字符串的解析次数
+    """
+    loads_num = 0
+    text = json.dumps(EXTEND_JSON, ensure_ascii=False)
+
+    @classmethod
+    def loads(cls, s, **kwargs):
+        if s == cls.text:
+            cls.loads_num += 1
+        return json.loads(s, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(json, name)
+
+
+class TestDownTask(object):
+    """
+    测试下载任务记录在队列中的传递及扩展信息只解析一次
+    """
+    @classmethod
+    def test_queue(cls):
+        """
+        测试任务记录经过队列(含延迟队列)后字段不变
+        """
+        _task = DownTask(
+            sys.intern('vol_0'), sys.intern('file_0'), sys.intern('第1话'), '1.jpg', 'http://test/1.jpg',
+            sys.intern('http'), extend_json=EXTEND_JSON
+        )
+        assert not hasattr(_task, '__dict__') and _task.attempts == 0
+        try:
+            _task.other = 1
+            assert False, 'DownTask should not accept other attribute'
+        except AttributeError:
+            pass
+
+        _queue = DownTaskQueue()
+        _queue.put(_task)
+        _get_task = _queue.get(block=False)
+        assert _get_task is _task
+        assert (
+            _get_task.vol_num, _get_task.file_num, _get_task.vol_name, _get_task.file_name,
+            _get_task.url, _get_task.downtype, _get_task.extend_json
+        ) == ('vol_0', 'file_0', '第1话', '1.jpg', 'http://test/1.jpg', 'http', EXTEND_JSON)
+
+        # 重试时下载次数随任务记录传递
+        _get_task.attempts += 1
+        _queue.task_done()
+        _queue.put_delayed(_get_task, 0)
+        _get_task = _queue.get(block=True, timeout=1)
+        assert _get_task is _task and _get_task.attempts == 1
+        _queue.task_done()
+
+    @classmethod
+    def test_extend_json(cls, engine: str, file_count: int):
+        """
+        测试扩展信息在入队前解析一次, 相同内容的任务及重试共用同一个字典
+
+        @param {str} engine - 下载引擎, thread/async
+        @param {int} file_count - 文件数量
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            _para_dict = Tools.get_correct_para_dict({
+                'name': 'test', 'path': _path, 'down_worker': '4', 'down_engine': engine, 'retry_delay': '10'
+            })
+            _store = DownloadManager.get_down_task_store(_path, 'test', url='http://test/', para_dict=_para_dict)
+            _vol_num = _store.add_vol('vol', 'http://test/vol', status='downloading')
+            for _i in range(file_count):
+                _store.add_file(
+                    _vol_num, 'file_%d' % _i, '%d.jpg' % _i, 'http://test/%d.jpg' % _i, 'http',
+                    extend_json=(EXTEND_JSON if _i % 2 == 0 else None)
+                )
+            _store.set_vol_value(_vol_num, 'file_num', str(file_count))
+            _store.set_info('files', str(file_count))
+            _store.save()
+
+            RetryDownDriver.calls.clear()
+            CountJson.loads_num = 0
+            _json = core.json
+            core.json = CountJson()
+            try:
+                _manager = DownloadManager(_store, **_para_dict)
+                _manager.start_download()
+            finally:
+                core.json = _json
+
+            print('%s engine: %d calls, extend_json loads %d times' % (
+                engine, len(RetryDownDriver.calls), CountJson.loads_num
+            ))
+            assert _manager.down_info['success'] == file_count
+            assert len(RetryDownDriver.calls) == file_count * 2
+            assert CountJson.loads_num == 1
+
+            # 所有任务及重试收到的是同一个解析后的字典
+            _extend_jsons = [_extend_json for _url, _extend_json in RetryDownDriver.calls if _extend_json is not None]
+            assert len(_extend_jsons) == file_count and _extend_jsons[0] == EXTEND_JSON
+            assert len(set([id(_extend_json) for _extend_json in _extend_jsons])) == 1
+            _store.close()
+        finally:
+            shutil.rmtree(_path)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    RunTool.set_global_var('DOWN_DRIVER_DICT', {'http': RetryDownDriver})
+    RunTool.set_global_var('CONSOLE_PRINT_FUNCTION', lambda *args, **kwargs: None)
+    TestDownTask.test_queue()
+    for _engine in ('thread', 'async'):
+        TestDownTask.test_extend_json(_engine, 20)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+下载文件完整性检查(大小及哈希值)手工测试
+@module download_meta_test
+@file download_meta_test.py
+"""
+
+import sys
+import os
+import shutil
+import hashlib
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from HiveNetLib.base_tools.run_tool import RunTool
+from comics_down.lib.core import Tools, DownloadManager
+from comics_down.down_driver.http_down_driver import HttpSession, HttpDownDriver
+from local_http_server import LocalHttpServer
+
+
+class TestDownloadMeta(object):
+    """
+    测试边下载边计算文件大小及哈希值
+    """
+    @classmethod
+    def test_hasher(cls):
+        """
+        测试哈希对象的获取
+        """
+        assert Tools.get_hasher('') is None and Tools.get_hasher('none') is None
+        for _name in ('sha1', 'md5', 'sha256'):
+            _hasher = Tools.get_hasher(_name)
+            _hasher.update(b'test')
+            assert _hasher.hexdigest() == hashlib.new(_name, b'test').hexdigest()
+
+        try:
+            import xxhash
+            assert Tools.get_hasher('xxh64').hexdigest() == xxhash.xxh64().hexdigest()
+        except ImportError:
+            try:
+                Tools.get_hasher('xxh64')
+                assert False, 'xxhash not installed, should raise ImportError'
+            except ImportError:
+                pass
+
+        try:
+            Tools.get_hasher('not_exists')
+            assert False, 'unknown hash algorithm should raise ValueError'
+        except ValueError:
+            pass
+
+    @classmethod
+    def test_session(cls, path: str, server: LocalHttpServer):
+        """
+        测试会话下载的大小检查及续传的哈希计算
+
+        @param {str} path - 保存路径
+        @param {LocalHttpServer} server - http服务
+        """
+        _data = os.urandom(300000)
+        _url = server.add_file('/file.bin', _data, truncate=1, truncate_after=1000)
+        _file = os.path.join(path, 'file.bin')
+        _session = HttpSession(**Tools.get_correct_para_dict({'segment_num': '1', 'down_hash': 'md5'}))
+        try:
+            # 应答中断, 保留已写入的部分用于续传(最后一个未读满的数据块会丢弃)
+            try:
+                _session.download(_url, _file)
+                assert False, 'truncated body should raise error'
+            except Exception as _e:
+                print('truncated body error:', repr(_e))
+            _down_size = os.path.getsize(_file + '.dt')
+            assert not os.path.exists(_file) and _down_size <= 1000
+
+            # 续传后的哈希值包括已下载的部分
+            _meta = _session.download(_url, _file)
+            print('resume meta:', _meta)
+            assert _meta == {'size': len(_data), 'hash': 'md5:%s' % hashlib.md5(_data).hexdigest()}
+            _range = server.requests[-1][1].get('Range', None)
+            assert _range == (None if _down_size == 0 else 'bytes=%d-' % _down_size)
+
+            # 临时文件已完整(416)
+            shutil.copyfile(_file, _file + '.dt')
+            assert _session.download(_url, _file) == _meta
+
+            # 临时文件比服务器文件大, 删除临时文件后重新下载
+            with open(_file + '.dt', 'wb') as _f:
+                _f.write(_data + b'more')
+            try:
+                _session.download(_url, _file)
+                assert False, 'temp file size not match should raise error'
+            except ConnectionError as _e:
+                print('temp file size not match:', repr(_e))
+            assert not os.path.exists(_file + '.dt')
+            assert _session.download(_url, _file) == _meta
+        finally:
+            _session.close()
+
+        # 不计算哈希值
+        _session = HttpSession(**Tools.get_correct_para_dict({'segment_num': '1', 'down_hash': 'none'}))
+        assert _session.download(_url, _file) == {'size': len(_data), 'hash': ''}
+        _session.close()
+
+    @classmethod
+    def test_download(cls, engine: str, store_type: str, path: str, server: LocalHttpServer):
+        """
+        测试下载管理器登记文件完整性信息, 应答中断的文件重试后完整
+
+        @param {str} engine - 下载引擎, thread/async
+        @param {str} store_type - 存储类型, xml/sqlite
+        @param {str} path - 保存路径
+        @param {LocalHttpServer} server - http服务
+        """
+        _path = os.path.join(path, '%s_%s' % (engine, store_type))
+        _para_dict = Tools.get_correct_para_dict({
+            'name': 'test', 'path': _path, 'down_worker': '4', 'down_engine': engine, 'retry_delay': '10',
+            'task_store_type': store_type
+        })
+        _store = DownloadManager.get_down_task_store(
+            _path, 'test', url='http://test/', store_type=store_type, para_dict=_para_dict
+        )
+        _vol_num = _store.add_vol('vol', 'http://test/vol', status='downloading')
+        _paths = ['/img/%d' % _i for _i in range(5)] + ['/truncate']
+        for _i, _file_path in enumerate(_paths):
+            server.add_file(_file_path, os.urandom(50000 + _i), truncate=(1 if _file_path == '/truncate' else 0))
+            _store.add_file(_vol_num, 'file_%d' % _i, '%d.jpg' % _i, server.get_url(_file_path), 'http')
+        _store.set_vol_value(_vol_num, 'file_num', str(len(_paths)))
+        _store.set_info('files', str(len(_paths)))
+        _store.save()
+
+        _manager = DownloadManager(_store, **_para_dict)
+        _manager.start_download()
+        assert _manager.down_info['success'] == len(_paths)
+        _store.save()
+        _metas = _store.get_files_meta(_vol_num)
+        print(engine, store_type, 'file_5 meta:', _metas['file_5'])
+        for _i, _file_path in enumerate(_paths):
+            _data = server.files[_file_path]
+            assert _metas['file_%d' % _i] == {
+                'size': len(_data), 'hash': 'sha1:%s' % hashlib.sha1(_data).hexdigest()
+            }, _file_path
+        _store.close()
+
+        # 重新装载后完整性信息不变
+        _store = DownloadManager.get_down_task_store(_path, 'test', store_type=store_type, para_dict=_para_dict)
+        assert _store.get_files_meta(_vol_num) == _metas
+        _store.close()
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    RunTool.set_global_var('DOWN_DRIVER_DICT', {'http': HttpDownDriver})
+    RunTool.set_global_var('CONSOLE_PRINT_FUNCTION', lambda *args, **kwargs: None)
+    TestDownloadMeta.test_hasher()
+    _path = tempfile.mkdtemp()
+    _server = LocalHttpServer().start()
+    try:
+        TestDownloadMeta.test_session(_path, _server)
+        for _engine in ('thread', 'async'):
+            for _store_type in ('xml', 'sqlite'):
+                TestDownloadMeta.test_download(_engine, _store_type, _path, _server)
+    finally:
+        _server.stop()
+        shutil.rmtree(_path)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+按下载主机限速手工测试
+@module host_limiter_test
+@file host_limiter_test.py
+"""
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+import threading
+import urllib.error
+from email.message import Message
+from email.utils import formatdate
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from HiveNetLib.base_tools.run_tool import RunTool
+from comics_down.lib.core import Tools, DownloadManager, BaseDownDriverFW
+from comics_down.lib.host_limiter import HostState, HostRateLimiter
+
+
+class TimeDownDriver(BaseDownDriverFW):
+    """
+    记录每个主机的下载时间及最大并发数的下载驱动
+    """
+    times = dict()
+    running = dict()
+    max_running = dict()
+    lock = threading.Lock()
+
+    @classmethod
+    def get_down_type(cls):
+        return 'http'
+
+    @classmethod
+    def download(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        _host = HostRateLimiter.get_host(file_url)
+        with cls.lock:
+            cls.times.setdefault(_host, list()).append(time.time())
+            cls.running[_host] = cls.running.get(_host, 0) + 1
+            cls.max_running[_host] = max(cls.max_running.get(_host, 0), cls.running[_host])
+
+        time.sleep(0.05)
+        with cls.lock:
+            cls.running[_host] -= 1
+
+
+class TestHostLimiter(object):
+    """
+    测试令牌桶限速、并发连接数限制及限流暂停
+    """
+    @classmethod
+    def get_http_error(cls, code: int, retry_after: str = None) -> urllib.error.HTTPError:
+        """
+        生成http异常对象
+
+        @param {int} code - 状态码
+        @param {str} retry_after=None - Retry-After协议头的值
+
+        @returns {urllib.error.HTTPError} - 异常对象
+        """
+        _headers = Message()
+        if retry_after is not None:
+            _headers['Retry-After'] = retry_after
+        return urllib.error.HTTPError('http://test/', code, 'error', _headers, None)
+
+    @classmethod
+    def test_host_state(cls):
+        """
+        测试单个主机的令牌桶及限流处理(使用指定的时间, 结果确定)
+        """
+        _now = 1000.0
+        _state = HostState(rate=10, burst=2)
+        _state.last_time = _now
+        assert _state.get_wait(_now) == 0 and _state.get_wait(_now) == 0
+        _wait = _state.get_wait(_now)
+        print('token bucket wait:', _wait)
+        assert abs(_wait - 0.1) < 1e-6
+        assert _state.get_wait(_now + 0.1) == 0
+
+        # 令牌不超过桶容量
+        _state.get_wait(_now + 100)
+        assert _state.tokens <= _state.burst
+
+        # 并发连接数
+        _state = HostState(max_conn=2)
+        assert _state.get_wait(_now) == 0 and _state.get_wait(_now) == 0
+        assert _state.get_wait(_now) == HostRateLimiter.CONN_WAIT
+
+        # 限流时暂停并降低速率, 成功后逐步恢复
+        _state = HostState(rate=16)
+        _state.on_throttled(_now, retry_after=5)
+        assert _state.get_wait(_now + 1) == 4 and _state.rate == 8
+        _state.on_throttled(_now)
+        _state.on_throttled(_now)
+        assert _state.pause_until == _now + 5 and _state.rate == 2
+        _state.on_throttled(_now + 10)
+        assert _state.rate == 1 and _state.pause_until == _now + 10 + HostRateLimiter.THROTTLE_BASE_DELAY * 8
+        for _i in range(20):
+            _state.on_success()
+        assert _state.rate == 16 and _state.throttled == 0
+
+    @classmethod
+    def test_retry_after(cls):
+        """
+        测试Retry-After的解析
+        """
+        assert HostRateLimiter.get_retry_after(cls.get_http_error(429, '3')) == 3
+        assert HostRateLimiter.get_retry_after(cls.get_http_error(429, '-1')) == 0
+        assert HostRateLimiter.get_retry_after(cls.get_http_error(429)) is None
+        assert HostRateLimiter.get_retry_after(cls.get_http_error(429, 'abc')) is None
+        assert HostRateLimiter.get_retry_after(RuntimeError()) is None
+        _wait = HostRateLimiter.get_retry_after(cls.get_http_error(503, formatdate(time.time() + 30, usegmt=True)))
+        print('retry after http date:', _wait)
+        assert 28 <= _wait <= 30
+        assert HostRateLimiter.get_retry_after(cls.get_http_error(503, 'Wed, 21 Oct 2015 07:28:00 GMT')) == 0
+
+        # 429及带Retry-After的503暂停主机, 不带Retry-After的503及其他主机不受影响
+        _limiter = HostRateLimiter(host_limits={'Slow.test': {'max_conn': 1}})
+        _limiter.try_acquire('http://a.test/1')
+        _limiter.release('http://a.test/1', error=cls.get_http_error(503))
+        assert _limiter.try_acquire('http://a.test/2') == 0
+        _limiter.release('http://a.test/2', error=cls.get_http_error(503, '2'))
+        assert _limiter.try_acquire('http://a.test/3') > 1.5
+        assert _limiter.try_acquire('http://b.test/1') == 0
+        assert _limiter.try_acquire('http://slow.test/1') == 0
+        assert _limiter.try_acquire('http://slow.test/2') == HostRateLimiter.CONN_WAIT
+
+    @classmethod
+    def test_download(cls):
+        """
+        测试下载管理器按主机限速
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            _para_dict = Tools.get_correct_para_dict({
+                'name': 'test', 'path': _path, 'down_worker': '10', 'host_rate': '20', 'host_burst': '1',
+                'host_max_conn': '3'
+            })
+            _store = DownloadManager.get_down_task_store(_path, 'test', url='http://test/', para_dict=_para_dict)
+            _vol_num = _store.add_vol('vol', 'http://test/vol', status='downloading')
+            for _i in range(40):
+                _store.add_file(
+                    _vol_num, 'file_%d' % _i, '%d.jpg' % _i, 'http://%s.test/%d.jpg' % ('ab'[_i % 2], _i), 'http'
+                )
+            _store.set_vol_value(_vol_num, 'file_num', '40')
+            _store.set_info('files', '40')
+            _store.save()
+
+            _manager = DownloadManager(_store, **_para_dict)
+            _manager.start_download()
+            for _host in ('a.test', 'b.test'):
+                _times = TimeDownDriver.times[_host]
+                _rate = (len(_times) - 1) / (max(_times) - min(_times))
+                print('%s: %d files, %.1f files/second, max running %d' % (
+                    _host, len(_times), _rate, TimeDownDriver.max_running[_host]
+                ))
+                assert _rate <= 22 and TimeDownDriver.max_running[_host] <= 3
+            assert _manager.down_info['success'] == 40
+            _store.close()
+        finally:
+            shutil.rmtree(_path)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    RunTool.set_global_var('DOWN_DRIVER_DICT', {'http': TimeDownDriver})
+    RunTool.set_global_var('CONSOLE_PRINT_FUNCTION', lambda *args, **kwargs: None)
+    TestHostLimiter.test_host_state()
+    TestHostLimiter.test_retry_after()
+    TestHostLimiter.test_download()
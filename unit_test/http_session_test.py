@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+http下载会话(连接重用)手工测试
+@module http_session_test
+@file http_session_test.py
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import asyncio
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from HiveNetLib.base_tools.run_tool import RunTool
+from comics_down.lib.core import Tools, DownloadManager
+from comics_down.down_driver.http_down_driver import HttpDownDriver
+from local_http_server import LocalHttpServer
+
+
+class TestHttpSession(object):
+    """
+    测试下载任务共用http会话
+    """
+    # 加载cookie文件的次数
+    cookie_loads = 0
+
+    @classmethod
+    def count_cookie_loads(cls):
+        """
+        统计Tools.get_cookie_from_file的调用次数
+        """
+        _get_cookie_from_file = Tools.get_cookie_from_file.__func__
+
+        def _count_get_cookie_from_file(tools_cls, file: str, encoding: str = 'utf-8') -> dict:
+            cls.cookie_loads += 1
+            return _get_cookie_from_file(tools_cls, file, encoding=encoding)
+
+        Tools.get_cookie_from_file = classmethod(_count_get_cookie_from_file)
+
+    @classmethod
+    def test_driver_without_session(cls, path: str, server: LocalHttpServer, file_count: int):
+        """
+        测试不送入会话时每个文件都新建连接
+
+        @param {str} path - 保存路径
+        @param {LocalHttpServer} server - http服务
+        @param {int} file_count - 文件数量
+        """
+        _para_dict = Tools.get_correct_para_dict({'name': 'test', 'path': path})
+        server.connections.clear()
+        for _i in range(file_count):
+            HttpDownDriver.download(server.get_url('/img/%d' % _i), os.path.join(path, '%d.jpg' % _i), **_para_dict)
+        print('download %d files without session use %d connections' % (file_count, len(server.connections)))
+        assert len(server.connections) == file_count
+
+    @classmethod
+    def test_download(cls, engine: str, path: str, server: LocalHttpServer, cookie_file: str, file_count: int):
+        """
+        测试下载管理器共用会话下载
+
+        @param {str} engine - 下载引擎, thread/async
+        @param {str} path - 保存路径
+        @param {LocalHttpServer} server - http服务
+        @param {str} cookie_file - cookie文件
+        @param {int} file_count - 文件数量
+        """
+        _path = os.path.join(path, engine)
+        _para_dict = Tools.get_correct_para_dict({
+            'name': 'test', 'path': _path, 'down_worker': '4', 'down_engine': engine,
+            'down_cookie': cookie_file
+        })
+        _store = DownloadManager.get_down_task_store(_path, 'test', url='http://test/', para_dict=_para_dict)
+        _vol_num = _store.add_vol('vol', 'http://test/vol', status='downloading')
+        for _i in range(file_count):
+            _store.add_file(_vol_num, 'file_%d' % _i, '%d.jpg' % _i, server.get_url('/img/%d' % _i), 'http')
+        _store.set_vol_value(_vol_num, 'file_num', str(file_count))
+        _store.set_info('files', str(file_count))
+        _store.save()
+
+        server.connections.clear()
+        server.requests.clear()
+        cls.cookie_loads = 0
+        _manager = DownloadManager(_store, **_para_dict)
+        _start = time.time()
+        _manager.start_download()
+        print('%s engine download %d files use %.2f seconds, %d connections, load cookie %d times' % (
+            engine, file_count, time.time() - _start, len(server.connections), cls.cookie_loads
+        ))
+        assert _manager.down_info['success'] == file_count
+        assert cls.cookie_loads == 1
+        assert set([_headers.get('Cookie', None) for _path, _headers in server.requests]) == set(['sid=test'])
+        # 连接池按下载线程(协程)数保持长连接
+        assert len(server.connections) <= 4
+        _store.close()
+
+    @classmethod
+    def test_async_session(cls, path: str, server: LocalHttpServer, cookie_file: str):
+        """
+        测试直接调用异步下载时送入会话
+
+        @param {str} path - 保存路径
+        @param {LocalHttpServer} server - http服务
+        @param {str} cookie_file - cookie文件
+        """
+        _para_dict = Tools.get_correct_para_dict({'name': 'test', 'path': path, 'down_cookie': cookie_file})
+        cls.cookie_loads = 0
+        server.requests.clear()
+        server.connections.clear()
+        _session = HttpDownDriver.create_session(**_para_dict)
+        try:
+            _loop = asyncio.get_event_loop()
+            for _i in range(10):
+                _loop.run_until_complete(HttpDownDriver.download_async(
+                    server.get_url('/img/%d' % _i), os.path.join(path, 'async_%d.jpg' % _i),
+                    down_session=_session, **_para_dict
+                ))
+        finally:
+            HttpDownDriver.close_session(_session)
+
+        assert cls.cookie_loads == 1 and len(server.requests) == 10
+        # 同一事件循环中顺序下载重用同一个连接
+        assert len(server.connections) == 1
+        assert set([_headers.get('Cookie', None) for _path, _headers in server.requests]) == set(['sid=test'])
+        with open(os.path.join(path, 'async_9.jpg'), 'rb') as _f:
+            assert _f.read() == server.files['/img/9']
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    RunTool.set_global_var('DOWN_DRIVER_DICT', {'http': HttpDownDriver})
+    RunTool.set_global_var('CONSOLE_PRINT_FUNCTION', lambda *args, **kwargs: None)
+    TestHttpSession.count_cookie_loads()
+    _path = tempfile.mkdtemp()
+    _server = LocalHttpServer().start()
+    try:
+        for _i in range(200):
+            _server.add_file('/img/%d' % _i, ('/img/%d' % _i).encode() * 500)
+        _cookie_file = os.path.join(_path, 'cookie.json')
+        with open(_cookie_file, 'w', encoding='utf-8') as _f:
+            _f.write(json.dumps({'sid': 'test'}))
+
+        TestHttpSession.test_driver_without_session(_path, _server, 20)
+        for _engine in ('thread', 'async'):
+            TestHttpSession.test_download(_engine, _path, _server, _cookie_file, 200)
+        TestHttpSession.test_async_session(_path, _server, _cookie_file)
+    finally:
+        _server.stop()
+        shutil.rmtree(_path)
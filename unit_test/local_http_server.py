@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+下载测试使用的本地http服务
+@module local_http_server
+@file local_http_server.py
+"""
+
+import re
+import time
+import hashlib
+import threading
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LocalHttpHandler(BaseHTTPRequestHandler):
+    """
+    本地http服务的请求处理
+    注：按LocalHttpServer中登记的文件及选项应答, 支持Range、条件请求(ETag/Last-Modified)、
+        chunked传输、重定向、指定状态码、限速及应答中断
+    """
+    protocol_version = 'HTTP/1.1'
+
+    # 固定的文件修改时间
+    LAST_MODIFIED = 'Wed, 21 Oct 2015 07:28:00 GMT'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        _server = self.server
+        _path = urlparse(self.path).path
+        with _server.lock:
+            _server.hits[_path] = _server.hits.get(_path, 0) + 1
+            _server.connections.add(self.client_address)
+            _server.requests.append((_path, dict(self.headers.items())))
+            _options = _server.options.get(_path, {})
+
+        if 'redirect' in _options:
+            self.send_head(302, {'Location': _options['redirect'], 'Content-Length': '0'})
+            return
+
+        if 'status' in _options:
+            _status = _options['status']
+            if isinstance(_status, list):
+                # 按顺序返回的状态码, 用完后正常应答
+                with _server.lock:
+                    _status = _status.pop(0) if len(_status) > 0 else None
+            if _status is not None:
+                _headers = dict(_options.get('headers', {}))
+                _headers['Content-Length'] = '0'
+                self.send_head(_status, _headers)
+                return
+
+        _data = _server.files.get(_path, None)
+        if _data is None:
+            self.send_head(404, {'Content-Length': '0'})
+            return
+
+        _etag = '"%s"' % hashlib.sha1(_data).hexdigest()
+        # 有If-None-Match时忽略If-Modified-Since(RFC 7232)
+        _if_none_match = self.headers.get('If-None-Match', None)
+        if _server.support_cache and not _options.get('no_validator', False) and (
+            _if_none_match == _etag
+            or (_if_none_match is None and self.headers.get('If-Modified-Since', None) == self.LAST_MODIFIED)
+        ):
+            self.send_head(304, {'ETag': _etag, 'Content-Length': '0'})
+            return
+
+        _headers = dict() if _options.get('no_validator', False) else {
+            'ETag': _etag, 'Last-Modified': self.LAST_MODIFIED
+        }
+        _start, _end = 0, len(_data) - 1
+        _range = self.headers.get('Range', None)
+        if _range is not None and _server.support_range and not _options.get('no_range', False):
+            _match = re.match(r'bytes=(\d+)-(\d*)', _range)
+            _start = int(_match.group(1))
+            if _start >= len(_data):
+                self.send_head(416, {'Content-Range': 'bytes */%d' % len(_data), 'Content-Length': '0'})
+                return
+            if _match.group(2) != '':
+                _end = min(int(_match.group(2)), _end)
+            _status = 206
+            _headers['Content-Range'] = 'bytes %d-%d/%d' % (_start, _end, len(_data))
+        else:
+            _status = 200
+
+        if _options.get('chunked', False):
+            _headers['Transfer-Encoding'] = 'chunked'
+            self.send_head(_status, _headers)
+            for _pos in range(_start, _end + 1, 1000):
+                _block = _data[_pos: min(_pos + 1000, _end + 1)]
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(_block), _block))
+            self.wfile.write(b'0\r\n\r\n')
+            return
+
+        _headers['Content-Length'] = str(_end - _start + 1)
+        self.send_head(_status, _headers)
+
+        # 应答中断(只发送部分数据后关闭连接)
+        _send_size = _end - _start + 1
+        with _server.lock:
+            if _options.get('truncate', 0) > 0:
+                _options['truncate'] -= 1
+                _send_size = min(_send_size, _options.get('truncate_after', 100))
+
+        _pos = _start
+        _rate = _options.get('rate', 0)
+        try:
+            while _pos < _start + _send_size:
+                _block = _data[_pos: min(_pos + 65536, _start + _send_size)]
+                self.wfile.write(_block)
+                _pos += len(_block)
+                if _rate > 0:
+                    time.sleep(len(_block) / _rate)
+        except OSError:
+            pass
+
+        if _send_size < _end - _start + 1:
+            self.close_connection = True
+
+    def send_head(self, status: int, headers: dict):
+        """
+        发送应答头
+
+        @param {int} status - 状态码
+        @param {dict} headers - 应答头字典
+        """
+        self.send_response(status)
+        for _key, _value in headers.items():
+            self.send_header(_key, _value)
+        self.end_headers()
+
+
+class LocalHttpServer(ThreadingHTTPServer):
+    """
+    下载测试使用的本地http服务(监听127.0.0.1的随机端口)
+    """
+    daemon_threads = True
+
+    def __init__(self, support_range: bool = True, support_cache: bool = True):
+        """
+        构造函数
+
+        @param {bool} support_range=True - 是否支持Range请求
+        @param {bool} support_cache=True - 是否支持条件请求(返回304)
+        """
+        super().__init__(('127.0.0.1', 0), LocalHttpHandler)
+        self.support_range = support_range
+        self.support_cache = support_cache
+        self.lock = threading.Lock()
+        self.files = dict()  # key为路径, value为文件内容
+        self.options = dict()  # key为路径, value为应答选项
+        self.hits = dict()  # 每个路径的请求次数
+        self.connections = set()  # 客户端连接地址
+        self.requests = list()  # 请求清单, 每个元素为(路径, 请求头字典)
+
+    def start(self):
+        """
+        在后台线程启动服务
+
+        @returns {LocalHttpServer} - 返回服务自身
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """
+        停止服务
+        """
+        self.shutdown()
+        self.server_close()
+
+    def get_url(self, path: str, host: str = '127.0.0.1') -> str:
+        """
+        获取路径的访问url
+
+        @param {str} path - 路径
+        @param {str} host='127.0.0.1' - 访问的主机名
+
+        @returns {str} - url
+        """
+        return 'http://%s:%d%s' % (host, self.server_address[1], path)
+
+    def add_file(self, path: str, data: bytes, **options) -> str:
+        """
+        登记可下载的文件
+
+        @param {str} path - 路径
+        @param {bytes} data - 文件内容
+        @param {dict} options - 应答选项
+            redirect {str} - 重定向的地址
+            status {int|list} - 直接返回的状态码, 为list时按顺序返回, 用完后正常应答
+            headers {dict} - 返回状态码时的应答头
+            no_range {bool} - 是否忽略Range请求
+            no_validator {bool} - 是否不返回ETag及Last-Modified(不支持条件请求)
+            chunked {bool} - 是否使用chunked传输
+            truncate {int} - 前几次应答只发送部分数据后关闭连接
+            truncate_after {int} - 应答中断时发送的数据大小, 默认为100
+            rate {int} - 限速, 每秒发送的字节数
+
+        @returns {str} - 文件的访问url
+        """
+        with self.lock:
+            if data is not None:
+                self.files[path] = data
+            self.options[path] = options
+
+        return self.get_url(path)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+m3u8加密分片解密手工测试
+@module m3u8_decrypt_test
+@file m3u8_decrypt_test.py
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from comics_down.lib.core import Tools
+from comics_down.lib.m3u8_downloader import M3u8DownLoader
+from local_http_server import LocalHttpServer
+
+
+class TestM3u8Decrypt(object):
+    """
+    测试AES-128加密分片的解密(秘钥轮换、按媒体序号计算iv)
+    """
+    @classmethod
+    def test_decrypt_file(cls, path: str):
+        """
+        测试流式解密(跨越解密块边界)及填充检查
+
+        @param {str} path - 临时目录
+        """
+        _downloader = M3u8DownLoader('http://test/list.m3u8', os.path.join(path, 'decrypt.ts'))
+        _key, _iv = os.urandom(16), os.urandom(16)
+        _src_file = os.path.join(path, 'src.enc')
+        _dest_file = os.path.join(path, 'dest.ts')
+        _chunk_size = M3u8DownLoader.DECRYPT_CHUNK_SIZE
+        for _size in (0, 15, 16, _chunk_size - 1, _chunk_size, _chunk_size + 1, _chunk_size * 2 + 100):
+            _data = os.urandom(_size)
+            with open(_src_file, 'wb') as _f:
+                _f.write(AES.new(_key, AES.MODE_CBC, iv=_iv).encrypt(pad(_data, 16)))
+            _downloader.decrypt_file(_src_file, _dest_file, _key, _iv)
+            with open(_dest_file, 'rb') as _f:
+                assert _f.read() == _data, 'size %d decrypt error' % _size
+
+        # 填充错误及不完整的加密文件
+        for _file_data in (AES.new(_key, AES.MODE_CBC, iv=_iv).encrypt(b'\x00' * 32), os.urandom(30)):
+            with open(_src_file, 'wb') as _f:
+                _f.write(_file_data)
+            try:
+                _downloader.decrypt_file(_src_file, _dest_file + '.err', _key, _iv)
+                assert False, 'decrypt error should raise RuntimeError'
+            except RuntimeError as _e:
+                print('decrypt error:', _e)
+            assert not os.path.exists(_dest_file + '.err')
+
+    @classmethod
+    def test_download(cls, path: str, server: LocalHttpServer):
+        """
+        测试加密m3u8的下载
+
+        @param {str} path - 保存路径
+        @param {LocalHttpServer} server - http服务
+        """
+        _key_1, _key_2 = os.urandom(16), os.urandom(16)
+        server.add_file('/v/k1.key', _key_1)
+        server.add_file('/k2.key', _key_2)
+        _datas = list()
+        _lines = ['#EXTM3U', '#EXT-X-MEDIA-SEQUENCE:7', '#EXT-X-KEY:METHOD=AES-128,URI="k1.key"']
+        for _i in range(12):
+            _data = os.urandom(1000 + _i * 777)
+            _datas.append(_data)
+            if _i == 6:
+                # 秘钥轮换, 指定iv
+                _lines.append('#EXT-X-KEY:METHOD=AES-128,URI="/k2.key",IV=0x0102')
+            elif _i == 10:
+                _lines.append('#EXT-X-KEY:METHOD=NONE')
+
+            if _i < 6:
+                # 没有指定iv时使用媒体序号作为iv
+                _data = AES.new(_key_1, AES.MODE_CBC, iv=(7 + _i).to_bytes(16, 'big')).encrypt(pad(_data, 16))
+            elif _i < 10:
+                _data = AES.new(_key_2, AES.MODE_CBC, iv=(0x0102).to_bytes(16, 'big')).encrypt(pad(_data, 16))
+            server.add_file('/v/s%d.ts' % _i, _data)
+            _lines += ['#EXTINF:1,', 's%d.ts' % _i]
+        _lines.append('#EXT-X-ENDLIST')
+        _url = server.add_file('/v/list.m3u8', ('\n'.join(_lines) + '\n').encode('utf-8'))
+
+        _para_dict = Tools.get_correct_para_dict({})
+        _para_dict.pop('url', None)
+        _save_file = os.path.join(path, 'video.ts')
+        _downloader = M3u8DownLoader(_url, _save_file, worker_num=4, merge_mode='native', **_para_dict)
+
+        # 解密信息
+        os.makedirs(_downloader._temp_path)
+        _flist, _keys = _downloader.get_playlist()
+        print('segment keys:', _keys[5:7], _keys[10])
+        assert _keys[0] == [server.get_url('/v/k1.key'), '%032x' % 7]
+        assert _keys[5] == [server.get_url('/v/k1.key'), '%032x' % 12]
+        assert _keys[6] == [server.get_url('/k2.key'), '%032x' % 0x0102]
+        assert _keys[10] is None and _keys[11] is None
+
+        _downloader.start_download()
+        with open(_save_file, 'rb') as _f:
+            assert _f.read() == b''.join(_datas)
+
+        # 同一秘钥只获取一次
+        print('key hits:', server.hits['/v/k1.key'], server.hits['/k2.key'])
+        assert server.hits['/v/k1.key'] == 1 and server.hits['/k2.key'] == 1
+        assert not os.path.exists(os.path.join(path, 'video'))
+
+        # 不支持的加密方式
+        server.files['/v/list.m3u8'] = b'#EXTM3U\n#EXT-X-KEY:METHOD=SAMPLE-AES,URI="k1.key"\n#EXTINF:1,\ns0.ts\n'
+        _downloader = M3u8DownLoader(_url, os.path.join(path, 'sample_aes.ts'), merge_mode='native', **_para_dict)
+        os.makedirs(_downloader._temp_path)
+        try:
+            _downloader.get_playlist()
+            assert False, 'SAMPLE-AES should raise RuntimeError'
+        except RuntimeError as _e:
+            print('not support key method:', _e)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    _path = tempfile.mkdtemp()
+    _server = LocalHttpServer().start()
+    try:
+        TestM3u8Decrypt.test_decrypt_file(_path)
+        TestM3u8Decrypt.test_download(_path, _server)
+    finally:
+        _server.stop()
+        shutil.rmtree(_path)
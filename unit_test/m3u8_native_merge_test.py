@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+m3u8分片原生合并手工测试
+@module m3u8_native_merge_test
+@file m3u8_native_merge_test.py
+"""
+
+import sys
+import os
+import io
+import time
+import shutil
+import tempfile
+import contextlib
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from comics_down.lib.core import BaseDownDriverFW
+from comics_down.lib.m3u8_downloader import M3u8DownLoader
+
+
+class FakeM3u8DownDriver(BaseDownDriverFW):
+    """
+    模拟的m3u8下载驱动, 分片内容从datas获取
+    """
+    datas = dict()
+
+    @classmethod
+    def download(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        _name = file_url.rsplit('/', 1)[1]
+        if _name.endswith('.m3u8'):
+            _data = ('#EXTM3U\n' + ''.join([
+                '#EXTINF:1,\n%s\n' % _seg_name for _seg_name in sorted(cls.datas.keys())
+            ]) + '#EXT-X-ENDLIST\n').encode('utf-8')
+        else:
+            _data = cls.datas[_name]
+
+        with open(save_file, 'wb') as _f:
+            _f.write(_data)
+
+
+class TestNativeMerge(object):
+    """
+    测试按播放顺序直接拼接分片(中断后从已拼接的位置继续)
+    """
+    @classmethod
+    def prepare_segments(cls, downloader: M3u8DownLoader, datas: list):
+        """
+        生成已下载完成的分片文件及清单文件
+
+        @param {M3u8DownLoader} downloader - 下载工具
+        @param {list} datas - 分片内容清单
+        """
+        downloader._down_status = downloader._get_down_status(auto_create=True)
+        with open(downloader._list_file, 'w') as _f:
+            for _i, _data in enumerate(datas):
+                _file = os.path.join(downloader._temp_path, 's%d.ts' % _i)
+                with open(_file, 'wb') as _seg_file:
+                    _seg_file.write(_data)
+                _f.write('file %s\r\n' % _file)
+
+    @classmethod
+    def test_append_file(cls, path: str):
+        """
+        测试追加文件(内核复制及普通读写方式)
+
+        @param {str} path - 临时目录
+        """
+        _downloader = M3u8DownLoader('http://test/list.m3u8', os.path.join(path, 'append.ts'), merge_mode='native')
+        _src_file = os.path.join(path, 'src.ts')
+        _data = os.urandom(M3u8DownLoader.MERGE_CHUNK_SIZE * 2 + 100)
+        with open(_src_file, 'wb') as _f:
+            _f.write(_data)
+
+        _dest_file = os.path.join(path, 'dest.ts')
+        with open(_dest_file, 'wb', buffering=0) as _dest:
+            _dest.write(b'head')
+            assert _downloader._append_file(_src_file, _dest) == len(_data)
+            assert _downloader._append_file(_src_file, _dest) == len(_data)
+        with open(_dest_file, 'rb') as _f:
+            assert _f.read() == b'head' + _data + _data
+
+    @classmethod
+    def test_merge_resume(cls, path: str):
+        """
+        测试合并中断后继续合并
+
+        @param {str} path - 临时目录
+        """
+        _save_file = os.path.join(path, 'resume.ts')
+        _downloader = M3u8DownLoader('http://test/list.m3u8', _save_file, merge_mode='native')
+        _datas = [os.urandom(300000 + _i) for _i in range(20)]
+        cls.prepare_segments(_downloader, _datas)
+
+        # 拼接第8个分片时中断, 且输出文件已写入部分数据
+        _append_file = _downloader._append_file
+        _count = [0]
+
+        def _crash_append_file(src_file: str, dest) -> int:
+            _count[0] += 1
+            if _count[0] == 8:
+                dest.write(b'garbage')
+                raise RuntimeError('merge crash')
+            return _append_file(src_file, dest)
+
+        _downloader._append_file = _crash_append_file
+        try:
+            _downloader.merge_file()
+            assert False, 'merge should crash'
+        except RuntimeError:
+            pass
+        _downloader._close_status_log()
+        _seg_files = [_file for _file in os.listdir(_downloader._temp_path) if _file.startswith('s')]
+        print('merge crashed, merge_index %d, left %d segment files' % (
+            _downloader._down_status['merge_index'], len(_seg_files)
+        ))
+        assert _downloader._down_status['merge_index'] == 7 and len(_seg_files) == 13
+        assert not os.path.exists(_save_file)
+
+        # 重新装载进度后从第8个分片继续, 去掉中断时写入的数据
+        _downloader = M3u8DownLoader('http://test/list.m3u8', _save_file, merge_mode='native')
+        _downloader._down_status = _downloader._get_down_status()
+        assert _downloader._down_status['merge_index'] == 7
+        assert _downloader._down_status['merge_size'] == sum([len(_data) for _data in _datas[0: 7]])
+        _start = time.time()
+        _downloader.merge_file()
+        _downloader._close_status_log()
+        print('resume merge use %.3f seconds' % (time.time() - _start))
+        with open(_save_file, 'rb') as _f:
+            assert _f.read() == b''.join(_datas)
+        assert [_file for _file in os.listdir(_downloader._temp_path) if _file.endswith('.ts')] == []
+
+    @classmethod
+    def test_download(cls, path: str):
+        """
+        测试使用原生合并方式下载, 保存文件扩展名不是.ts时打印警告
+
+        @param {str} path - 临时目录
+        """
+        FakeM3u8DownDriver.datas = dict([('s%02d.ts' % _i, os.urandom(10000 + _i)) for _i in range(30)])
+        for _ext, _warning in (('ts', False), ('mp4', True)):
+            _save_file = os.path.join(path, 'video.%s' % _ext)
+            _output = io.StringIO()
+            with contextlib.redirect_stdout(_output):
+                _downloader = M3u8DownLoader(
+                    'http://test/v/list.m3u8', _save_file, worker_num=5, down_driver=FakeM3u8DownDriver,
+                    merge_mode='native'
+                )
+            assert (_output.getvalue().find('Warning') >= 0) == _warning, _output.getvalue()
+
+            _downloader.start_download()
+            with open(_save_file, 'rb') as _f:
+                assert _f.read() == b''.join([
+                    FakeM3u8DownDriver.datas[_name] for _name in sorted(FakeM3u8DownDriver.datas.keys())
+                ])
+            assert not os.path.exists(_downloader._temp_path)
+
+            # 文件已存在无需再次下载
+            assert _downloader.start_download() == {'status': 'existed'}
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    _path = tempfile.mkdtemp()
+    try:
+        TestNativeMerge.test_append_file(_path)
+        TestNativeMerge.test_merge_resume(_path)
+        TestNativeMerge.test_download(_path)
+    finally:
+        shutil.rmtree(_path)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+m3u8边下载边合并手工测试
+@module m3u8_progressive_merge_test
+@file m3u8_progressive_merge_test.py
+"""
+
+import sys
+import os
+import time
+import random
+import shutil
+import tempfile
+import threading
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from comics_down.lib.core import BaseDownDriverFW
+from comics_down.lib.m3u8_downloader import M3u8DownLoader
+
+
+class SlowM3u8DownDriver(BaseDownDriverFW):
+    """
+    模拟的m3u8下载驱动, 分片下载耗时随机(s03.ts特别慢), fail_name对应的分片下载失败
+    """
+    datas = dict()
+    fail_name = ''
+    calls = dict()
+    lock = threading.Lock()
+
+    @classmethod
+    def download(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        _name = file_url.rsplit('/', 1)[1]
+        if _name.endswith('.m3u8'):
+            _data = ('#EXTM3U\n' + ''.join([
+                '#EXTINF:1,\n%s\n' % _seg_name for _seg_name in sorted(cls.datas.keys())
+            ]) + '#EXT-X-ENDLIST\n').encode('utf-8')
+        else:
+            with cls.lock:
+                cls.calls[_name] = cls.calls.get(_name, 0) + 1
+            time.sleep(random.random() * 0.05 + (0.5 if _name == 's03.ts' else 0))
+            if _name == cls.fail_name:
+                raise RuntimeError('download error: %s' % file_url)
+            _data = cls.datas[_name]
+
+        with open(save_file, 'wb') as _f:
+            _f.write(_data)
+
+
+class TestProgressiveMerge(object):
+    """
+    测试分片按播放顺序下载完成即拼接, 临时分片文件数量不超过合并窗口
+    """
+    @classmethod
+    def download(cls, save_file: str, merge_window: int) -> tuple:
+        """
+        执行下载并监控临时分片文件的数量
+
+        @param {str} save_file - 保存文件
+        @param {int} merge_window - 合并窗口大小
+
+        @returns {tuple} - (下载工具, 临时分片文件的最大数量, 下载异常)
+        """
+        _downloader = M3u8DownLoader(
+            'http://test/v/list.m3u8', save_file, worker_num=5, down_driver=SlowM3u8DownDriver,
+            merge_mode='native', merge_window=merge_window
+        )
+        _peak = [0]
+        _stop = [False]
+
+        def _monitor():
+            while not _stop[0]:
+                try:
+                    _peak[0] = max(_peak[0], len([
+                        _file for _file in os.listdir(_downloader._temp_path)
+                        if _file.endswith('.ts') and _file != 'merge.ts'
+                    ]))
+                except FileNotFoundError:
+                    pass
+                time.sleep(0.005)
+
+        _thread = threading.Thread(target=_monitor, daemon=True)
+        _thread.start()
+        _error = None
+        try:
+            _downloader.start_download()
+        except RuntimeError as _e:
+            _error = _e
+        finally:
+            _stop[0] = True
+            _thread.join()
+
+        return _downloader, _peak[0], _error
+
+    @classmethod
+    def check_file(cls, save_file: str):
+        """
+        检查合并后的文件内容
+
+        @param {str} save_file - 保存文件
+        """
+        with open(save_file, 'rb') as _f:
+            assert _f.read() == b''.join([
+                SlowM3u8DownDriver.datas[_name] for _name in sorted(SlowM3u8DownDriver.datas.keys())
+            ])
+
+    @classmethod
+    def test_window(cls, path: str):
+        """
+        测试合并窗口限制临时分片文件的数量
+
+        @param {str} path - 临时目录
+        """
+        for _merge_window in (0, 8):
+            _save_file = os.path.join(path, 'window_%d.ts' % _merge_window)
+            _start = time.time()
+            _downloader, _peak, _error = cls.download(_save_file, _merge_window)
+            print('merge_window %d: peak segment files %d, use %.2f seconds' % (
+                _merge_window, _peak, time.time() - _start
+            ))
+            assert _error is None
+            cls.check_file(_save_file)
+            if _merge_window > 0:
+                assert _peak <= _merge_window
+            else:
+                assert _peak > 8
+
+    @classmethod
+    def test_fail_resume(cls, path: str):
+        """
+        测试分片下载失败时停止处理, 续传时从已合并的位置继续
+
+        @param {str} path - 临时目录
+        """
+        _save_file = os.path.join(path, 'fail.ts')
+        SlowM3u8DownDriver.fail_name = 's20.ts'
+        SlowM3u8DownDriver.calls.clear()
+        _downloader, _peak, _error = cls.download(_save_file, 8)
+        _merge_index = _downloader._down_status['merge_index']
+        print('download error: %s, merge_index %d, done %d, downloaded %d' % (
+            _error, _merge_index, sum(_downloader._done), len(SlowM3u8DownDriver.calls)
+        ))
+        assert _error is not None and not os.path.exists(_save_file)
+        # 停止时正在下载的分片可能未合并
+        assert _merge_index <= 20 and _peak <= 8
+        # 失败后不再下载合并窗口以外的分片
+        assert max(SlowM3u8DownDriver.calls.keys()) < 's28.ts'
+        _pending = sorted(['s%02d.ts' % _i for _i in range(len(_downloader._done)) if not _downloader._done[_i]])
+
+        # 续传只下载未完成的分片
+        SlowM3u8DownDriver.fail_name = ''
+        SlowM3u8DownDriver.calls.clear()
+        _downloader, _peak, _error = cls.download(_save_file, 8)
+        print('resume downloaded %d segments' % len(SlowM3u8DownDriver.calls))
+        assert _error is None and sorted(SlowM3u8DownDriver.calls.keys()) == _pending
+        cls.check_file(_save_file)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    SlowM3u8DownDriver.datas = dict([('s%02d.ts' % _i, os.urandom(10000 + _i)) for _i in range(60)])
+    _path = tempfile.mkdtemp()
+    try:
+        TestProgressiveMerge.test_window(_path)
+        TestProgressiveMerge.test_fail_resume(_path)
+    finally:
+        shutil.rmtree(_path)
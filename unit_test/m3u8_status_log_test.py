@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+m3u8下载进度日志手工测试
+@module m3u8_status_log_test
+@file m3u8_status_log_test.py
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from comics_down.lib.core import BaseDownDriverFW
+from comics_down.lib.m3u8_downloader import M3u8DownLoader
+
+
+class UrlDownDriver(BaseDownDriverFW):
+    """
+    模拟的下载驱动, 文件内容为url, 记录下载过的url, fail_urls中的url下载失败
+    """
+    calls = list()
+    fail_urls = set()
+
+    @classmethod
+    def download(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        if file_url.endswith('.m3u8'):
+            with open(save_file, 'w') as _f:
+                _f.write('#EXTM3U\n' + ''.join(['#EXTINF:1,\ns%d.ts\n' % _i for _i in range(20)]) + '#EXT-X-ENDLIST\n')
+            return
+
+        cls.calls.append(file_url)
+        if file_url in cls.fail_urls:
+            raise RuntimeError('download error: %s' % file_url)
+        with open(save_file, 'wb') as _f:
+            _f.write(file_url.encode('utf-8'))
+
+
+class TestStatusLog(object):
+    """
+    测试分片完成情况登记到追加写入的进度日志(不再每个分片重写down_status.json)
+    """
+    @classmethod
+    def test_old_format(cls, path: str):
+        """
+        测试旧版本以url为key的下载状态文件的转换及续传
+
+        @param {str} path - 临时目录
+        """
+        _temp_path = os.path.join(path, 'old')
+        os.makedirs(_temp_path)
+        _urls = ['http://test/v/s%d.ts' % _i for _i in range(5)]
+        with open(os.path.join(_temp_path, 'down_status.json'), 'w') as _f:
+            _f.write(json.dumps({
+                'status': 'downloading', 'key': '',
+                'files': dict([(_url, 'done' if _i < 2 else 'downloading') for _i, _url in enumerate(_urls)])
+            }))
+        with open(os.path.join(_temp_path, 'list.txt'), 'w') as _f:
+            for _i, _url in enumerate(_urls):
+                _file = os.path.join(_temp_path, 's%d.ts' % _i)
+                _f.write('file %s\r\n' % _file)
+                if _i < 2:
+                    with open(_file, 'wb') as _seg_file:
+                        _seg_file.write(_url.encode('utf-8'))
+
+        UrlDownDriver.calls.clear()
+        _save_file = os.path.join(path, 'old.ts')
+        _downloader = M3u8DownLoader(
+            'http://test/v/list.m3u8', _save_file, down_driver=UrlDownDriver, merge_mode='native'
+        )
+        _downloader.start_download()
+        print('old format resume downloads:', sorted(UrlDownDriver.calls))
+        assert sorted(UrlDownDriver.calls) == _urls[2:]
+        with open(_save_file, 'rb') as _f:
+            assert _f.read() == ''.join(_urls).encode('utf-8')
+
+    @classmethod
+    def test_resume(cls, path: str):
+        """
+        测试下载失败后续传只下载未完成的分片
+
+        @param {str} path - 临时目录
+        """
+        _save_file = os.path.join(path, 'resume.ts')
+        UrlDownDriver.calls.clear()
+        UrlDownDriver.fail_urls = set(['http://test/v/s3.ts', 'http://test/v/s17.ts'])
+        _downloader = M3u8DownLoader(
+            'http://test/v/list.m3u8', _save_file, worker_num=4, down_driver=UrlDownDriver, merge_mode='native'
+        )
+        try:
+            _downloader.start_download()
+            assert False, 'download should not finished'
+        except RuntimeError:
+            pass
+        with open(_downloader._status_log_file, 'r') as _f:
+            assert len(_f.readlines()) == 18
+
+        UrlDownDriver.calls.clear()
+        UrlDownDriver.fail_urls = set()
+        _downloader = M3u8DownLoader(
+            'http://test/v/list.m3u8', _save_file, worker_num=4, down_driver=UrlDownDriver, merge_mode='native'
+        )
+        _downloader.start_download()
+        print('resume downloads:', sorted(UrlDownDriver.calls))
+        assert sorted(UrlDownDriver.calls) == ['http://test/v/s17.ts', 'http://test/v/s3.ts']
+        with open(_save_file, 'rb') as _f:
+            assert _f.read() == ''.join(['http://test/v/s%d.ts' % _i for _i in range(20)]).encode('utf-8')
+
+    @classmethod
+    def test_status_log(cls, path: str, segment_num: int):
+        """
+        测试进度日志的登记及恢复
+
+        @param {str} path - 临时目录
+        @param {int} segment_num - 分片数量
+        """
+        _save_file = os.path.join(path, 'log.ts')
+        _downloader = M3u8DownLoader('http://test/v/list.m3u8', _save_file, down_driver=UrlDownDriver)
+        _downloader._down_status = _downloader._get_down_status(auto_create=True)
+        _downloader._down_status['files'] = ['http://test/v/s%d.ts' % _i for _i in range(segment_num)]
+        _downloader._save_down_status(_downloader._down_status)
+        _status_mtime = os.path.getmtime(_downloader._down_status_file)
+        _downloader._done = bytearray(segment_num)
+
+        _start = time.time()
+        for _i in range(0, segment_num, 2):
+            with _downloader._merge_cond:
+                _downloader._done[_i] = 1
+                _downloader._write_status_log('d %d' % _i)
+        _downloader._close_status_log()
+        print('mark %d segments done use %.3f seconds' % (segment_num // 2, time.time() - _start))
+        assert os.path.getmtime(_downloader._down_status_file) == _status_mtime
+
+        # 中断时未写完整的记录
+        with open(_downloader._status_log_file, 'a') as _f:
+            _f.write('m 3 100\nd 1\nd 3x\nm 5')
+
+        _downloader = M3u8DownLoader('http://test/v/list.m3u8', _save_file, down_driver=UrlDownDriver)
+        _down_status = _downloader._get_down_status()
+        _done = [_i for _i in range(segment_num) if _downloader._done[_i]]
+        assert _done == sorted([1] + list(range(0, segment_num, 2)))
+        assert _down_status['merge_index'] == 3 and _down_status['merge_size'] == 100
+        shutil.rmtree(_downloader._temp_path)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    _path = tempfile.mkdtemp()
+    try:
+        TestStatusLog.test_old_format(_path)
+        TestStatusLog.test_resume(_path)
+        TestStatusLog.test_status_log(_path, 20000)
+    finally:
+        shutil.rmtree(_path)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+m3u8多码率子播放列表选择手工测试
+@module m3u8_variant_test
+@file m3u8_variant_test.py
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from comics_down.lib.core import BaseDownDriverFW
+from comics_down.lib.m3u8_downloader import M3u8DownLoader
+
+
+# 主播放列表
+MASTER_M3U8 = '''#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2"
+v360/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=1400000,RESOLUTION=854x480,CODECS="avc1.4d401f,mp4a.40.2"
+/abs/v480/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=1300000,RESOLUTION=854x480,CODECS="hvc1.1,mp4a.40.2"
+v480h/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=5000000,RESOLUTION=1920x1080,CODECS="avc1.640028,mp4a.40.2"
+https://cdn.test/v1080/index.m3u8
+'''
+
+# 子播放列表
+MEDIA_M3U8 = '''#EXTM3U
+#EXTINF:1,
+s0.ts
+#EXTINF:1,
+../seg/s1.ts
+#EXTINF:1,
+/root/s2.ts
+#EXTINF:1,
+http://other.test/s3.ts?a=1
+#EXT-X-ENDLIST
+'''
+
+
+class PlaylistDownDriver(BaseDownDriverFW):
+    """
+    模拟的下载驱动, master.m3u8返回主播放列表, 其他返回子播放列表
+    """
+    @classmethod
+    def download(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        with open(save_file, 'w') as _f:
+            _f.write(MASTER_M3U8 if file_url.endswith('master.m3u8') else MEDIA_M3U8)
+
+
+class TestVariant(object):
+    """
+    测试按策略选择子播放列表及分片地址的解析
+    """
+    @classmethod
+    def get_playlist(cls, path: str, **kwargs) -> tuple:
+        """
+        按选择策略获取播放文件清单
+
+        @param {str} path - 临时目录
+        @param {dict} kwargs - 下载工具的选择策略参数
+
+        @returns {tuple} - (选中的子播放列表url, 分片文件清单)
+        """
+        _downloader = M3u8DownLoader(
+            'http://test/a/b/master.m3u8', os.path.join(path, 'video.ts'), down_driver=PlaylistDownDriver,
+            **kwargs
+        )
+        os.makedirs(_downloader._temp_path)
+        try:
+            _flist, _keys = _downloader.get_playlist()
+            return _downloader._m3u8_url, _flist
+        finally:
+            shutil.rmtree(_downloader._temp_path)
+
+    @classmethod
+    def test_select(cls, path: str):
+        """
+        测试子播放列表的选择
+
+        @param {str} path - 临时目录
+        """
+        _cases = [
+            ({}, 'http://test/a/b/v360/index.m3u8'),
+            ({'variant_policy': 'max_bandwidth'}, 'https://cdn.test/v1080/index.m3u8'),
+            ({'variant_policy': 'min_bandwidth'}, 'http://test/a/b/v360/index.m3u8'),
+            ({'variant_policy': 'resolution', 'variant_resolution': '480'}, 'http://test/abs/v480/index.m3u8'),
+            ({'variant_policy': 'resolution', 'variant_resolution': '480p'}, 'http://test/abs/v480/index.m3u8'),
+            ({'variant_policy': 'resolution', 'variant_resolution': '720P'}, 'http://test/abs/v480/index.m3u8'),
+            ({'variant_policy': 'resolution', 'variant_resolution': '1920x1080'}, 'https://cdn.test/v1080/index.m3u8'),
+            (
+                {'variant_policy': 'resolution', 'variant_resolution': '854x480', 'variant_codec': 'hvc1'},
+                'http://test/a/b/v480h/index.m3u8'
+            ),
+            # 都超过目标分辨率时选择最低分辨率
+            ({'variant_policy': 'resolution', 'variant_resolution': '240'}, 'http://test/a/b/v360/index.m3u8'),
+            # 没有匹配编码的子播放列表时忽略编码条件
+            ({'variant_policy': 'max_bandwidth', 'variant_codec': 'av01'}, 'https://cdn.test/v1080/index.m3u8')
+        ]
+        for _kwargs, _url in _cases:
+            _m3u8_url, _flist = cls.get_playlist(path, **_kwargs)
+            print(_kwargs, _m3u8_url)
+            assert _m3u8_url == _url, _kwargs
+
+        # 分片地址相对子播放列表的真实地址解析
+        _m3u8_url, _flist = cls.get_playlist(path)
+        assert _flist == [
+            'http://test/a/b/v360/s0.ts', 'http://test/a/b/seg/s1.ts', 'http://test/root/s2.ts',
+            'http://other.test/s3.ts?a=1'
+        ]
+
+    @classmethod
+    def test_error(cls, path: str):
+        """
+        测试不支持的选择策略及目标分辨率格式错误
+
+        @param {str} path - 临时目录
+        """
+        for _kwargs in (
+            {'variant_policy': 'best'},
+            {'variant_policy': 'resolution', 'variant_resolution': ''},
+            {'variant_policy': 'resolution', 'variant_resolution': 'hd'},
+            {'variant_policy': 'resolution', 'variant_resolution': '854x'}
+        ):
+            try:
+                cls.get_playlist(path, **_kwargs)
+                assert False, 'should raise ValueError: %s' % str(_kwargs)
+            except ValueError as _e:
+                print(_kwargs, _e)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    _path = tempfile.mkdtemp()
+    try:
+        TestVariant.test_select(_path)
+        TestVariant.test_error(_path)
+    finally:
+        shutil.rmtree(_path)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+网页条件请求缓存手工测试
+@module page_cache_test
+@file page_cache_test.py
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import urllib.error
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from comics_down.lib.core import Tools
+from comics_down.lib.page_cache import PageCache
+from comics_down.lib.webdriver_tool import WebDriverTool
+from local_http_server import LocalHttpServer
+
+
+class TestPageCache(object):
+    """
+    测试网页的条件请求缓存(服务器返回304时使用缓存)
+    """
+    @classmethod
+    def get_last_request(cls, server: LocalHttpServer) -> tuple:
+        """
+        获取最后一次请求的条件请求头
+
+        @param {LocalHttpServer} server - http服务
+
+        @returns {tuple} - (If-None-Match, If-Modified-Since)
+        """
+        _headers = server.requests[-1][1]
+        return _headers.get('If-None-Match', None), _headers.get('If-Modified-Since', None)
+
+    @classmethod
+    def test_cache(cls, path: str, server: LocalHttpServer):
+        """
+        测试缓存的使用及更新
+
+        @param {str} path - 下载保存目录
+        @param {LocalHttpServer} server - http服务
+        """
+        _cache = PageCache(path)
+        _url = server.add_file('/index.html', '<html>第1话</html>'.encode('utf-8'))
+
+        # 第一次访问不带条件请求头, 保存缓存
+        assert _cache.get_web_page_code(_url) == '<html>第1话</html>'
+        assert cls.get_last_request(server) == (None, None)
+        _key = PageCache.get_cache_key(_url)
+        assert os.path.exists(_cache._get_cache_file(_key))
+
+        # 网页未变化, 服务器返回304
+        assert _cache.get_web_page_code(_url) == '<html>第1话</html>'
+        assert cls.get_last_request(server)[0] == _cache._load(_key)['etag']
+
+        # 网页变化后更新缓存
+        server.files['/index.html'] = '<html>第2话</html>'.encode('utf-8')
+        assert _cache.get_web_page_code(_url) == '<html>第2话</html>'
+        assert _cache._load(_key)['html'] == '<html>第2话</html>'
+        assert _cache.get_web_page_code(_url) == '<html>第2话</html>'
+        print('page cache requests:', [
+            (_path, _headers.get('If-None-Match', None)) for _path, _headers in server.requests
+        ])
+
+        # 请求协议头不同时使用不同的缓存
+        assert PageCache.get_cache_key(_url, {'User-Agent': 'a'}) == PageCache.get_cache_key(_url, {'user-agent': 'a'})
+        assert PageCache.get_cache_key(_url, {'User-Agent': 'a'}) != _key
+        _cache.get_web_page_code(_url, headers={'User-Agent': 'a'})
+        assert cls.get_last_request(server) == (None, None)
+
+        # 缓存文件损坏时重新获取
+        with open(_cache._get_cache_file(_key), 'w', encoding='utf-8') as _f:
+            _f.write('{bad json')
+        assert _cache.get_web_page_code(_url) == '<html>第2话</html>'
+        assert cls.get_last_request(server) == (None, None)
+
+        # 只有Last-Modified的缓存
+        _entry = _cache._load(_key)
+        _entry['etag'] = ''
+        _cache._save(_key, _entry)
+        assert _cache.get_web_page_code(_url) == '<html>第2话</html>'
+        assert cls.get_last_request(server) == (None, server.RequestHandlerClass.LAST_MODIFIED)
+        assert server.requests[-1][0] == '/index.html'
+
+        # 不带ETag及Last-Modified的网页不缓存
+        _url = server.add_file('/no_cache.html', b'<html>no cache</html>', no_validator=True)
+        _cache.get_web_page_code(_url)
+        assert not os.path.exists(_cache._get_cache_file(PageCache.get_cache_key(_url)))
+
+        # 异常状态码
+        try:
+            _cache.get_web_page_code(server.get_url('/missing.html'), retry=1)
+            assert False, 'missing page should raise HTTPError'
+        except urllib.error.HTTPError as _e:
+            assert _e.code == 404 and server.hits['/missing.html'] == 2
+
+    @classmethod
+    def test_webdriver_tool(cls, path: str, server: LocalHttpServer):
+        """
+        测试通过任务参数使用缓存
+
+        @param {str} path - 下载保存目录
+        @param {LocalHttpServer} server - http服务
+        """
+        _url = server.add_file('/list.html', b'<html>list</html>')
+        for _page_cache in ('n', 'y'):
+            _para_dict = Tools.get_correct_para_dict({'path': path, 'url': _url, 'page_cache': _page_cache})
+            server.requests.clear()
+            for _i in range(3):
+                assert WebDriverTool.get_web_page_code(_para_dict) == '<html>list</html>'
+            _conditions = [_headers.get('If-None-Match', None) is not None for _path, _headers in server.requests]
+            print('page_cache=%s conditional requests:' % _page_cache, _conditions)
+            assert _conditions == ([False] * 3 if _page_cache == 'n' else [False, True, True])
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    _path = tempfile.mkdtemp()
+    _server = LocalHttpServer().start()
+    try:
+        TestPageCache.test_cache(_path, _server)
+        TestPageCache.test_webdriver_tool(_path, _server)
+    finally:
+        _server.stop()
+        shutil.rmtree(_path)
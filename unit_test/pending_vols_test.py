@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+未完成卷索引及增量续传手工测试
+@module pending_vols_test
+@file pending_vols_test.py
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import threading
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from HiveNetLib.base_tools.run_tool import RunTool
+from HiveNetLib.simple_xml import SimpleXml, EnumXmlObjType
+from comics_down.lib.core import Tools, DownloadManager, BaseDownDriverFW
+from comics_down.lib.task_store import TaskStoreManager, XmlTaskStore
+
+
+class CountDownDriver(BaseDownDriverFW):
+    """
+    模拟的下载驱动, 记录每个url的下载次数, fail_urls中的url下载失败
+    """
+    fail_urls = set()
+    calls = dict()
+    lock = threading.Lock()
+
+    @classmethod
+    def get_down_type(cls):
+        return 'http'
+
+    @classmethod
+    def download(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        with cls.lock:
+            cls.calls[file_url] = cls.calls.get(file_url, 0) + 1
+
+        if file_url in cls.fail_urls:
+            raise RuntimeError('download error: %s' % file_url)
+
+        with open(save_file, 'w') as _f:
+            _f.write(file_url)
+
+
+class TestPendingVols(object):
+    """
+    测试只处理未完成的卷
+    """
+    @classmethod
+    def test_pending_index(cls, store_type: str):
+        """
+        测试未完成卷索引及待下载文件遍历(包括没有索引的旧版本down.xml)
+
+        @param {str} store_type - 存储类型, xml/sqlite
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            _store = TaskStoreManager.open_store(_path, 'test', store_type=store_type)
+            for _v in range(5):
+                _vol_num = _store.add_vol('vol%d' % _v, 'http://test/v%d' % _v, status='downloading')
+                for _f in range(2):
+                    _store.add_file(_vol_num, 'file_%d' % _f, '%d.jpg' % _f, 'http://test/%d/%d' % (_v, _f), 'http')
+                _store.set_vol_value(_vol_num, 'file_num', '2')
+            _store.set_vol_value('vol_4', 'status', 'listing')
+            _store.save()
+
+            _store.set_file_status('vol_1', 'file_0', 'done')
+            _store.set_file_status('vol_1', 'file_1', 'done')
+            _store.set_vol_status('vol_1', 'done')
+            _store.set_file_status('vol_2', 'file_0', 'done')
+            _store.save()
+
+            _tasks = [(_task[0], _task[2]) for _task in _store.iter_pending_tasks()]
+            print(store_type, 'pending vols:', _store.get_pending_vols(), 'tasks:', _tasks)
+            assert _store.get_pending_vols() == ['vol_0', 'vol_2', 'vol_3', 'vol_4']
+            assert ('vol_2', 'file_0') not in _tasks and ('vol_2', 'file_1') in _tasks
+            assert [_task for _task in _tasks if _task[0] == 'vol_4'] == [('vol_4', None)]
+            _store.close()
+
+            if store_type == 'xml':
+                # 旧版本的down.xml没有待处理卷索引
+                _xml_doc = SimpleXml(
+                    XmlTaskStore.get_store_file(_path), obj_type=EnumXmlObjType.File, encoding='utf-8'
+                )
+                _info_node = _xml_doc.root.find('info')
+                _info_node.remove(_info_node.find('pending_vols'))
+                _xml_doc.save()
+
+            _store = TaskStoreManager.load_exists_store(_path, read_only=False)
+            assert _store.get_pending_vols() == ['vol_0', 'vol_2', 'vol_3', 'vol_4']
+            _store.close()
+        finally:
+            shutil.rmtree(_path)
+
+    @classmethod
+    def test_resume(cls, store_type: str):
+        """
+        测试中断后续传只下载未完成的文件
+
+        @param {str} store_type - 存储类型, xml/sqlite
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            _para_dict = Tools.get_correct_para_dict({
+                'name': 'test', 'path': _path, 'down_worker': '4', 'task_store_type': store_type
+            })
+            _store = DownloadManager.get_down_task_store(
+                _path, 'test', url='http://test/', store_type=store_type, para_dict=_para_dict
+            )
+            for _v in range(20):
+                _vol_num = DownloadManager.add_vol_to_down_task_conf(
+                    _store, 'vol%d' % _v, 'http://test/v%d' % _v, status='downloading'
+                )
+                for _f in range(10):
+                    DownloadManager.add_file_to_down_task_conf(
+                        _store, _vol_num, 'file_%d' % _f, '%d.jpg' % _f, 'http://test/%d/%d' % (_v, _f), 'http'
+                    )
+                _store.set_vol_value(_vol_num, 'file_num', '10')
+            _store.set_info('files', '200')
+            _store.save()
+
+            CountDownDriver.calls.clear()
+            CountDownDriver.fail_urls = set(['http://test/3/5', 'http://test/17/0'])
+            DownloadManager(_store, **_para_dict).start_download()
+            _store.close()
+            _first_calls = sum(CountDownDriver.calls.values())
+
+            # 续传
+            CountDownDriver.calls.clear()
+            CountDownDriver.fail_urls = set()
+            _store = DownloadManager.get_down_task_store(_path, 'test', para_dict=_para_dict)
+            print(store_type, 'pending before resume:', _store.get_pending_vols())
+            assert _store.get_pending_vols() == ['vol_3', 'vol_17']
+            _manager = DownloadManager(_store, **_para_dict)
+            _manager.start_download()
+            print(store_type, 'first run downloads: %d, resume downloads: %s, success: %s' % (
+                _first_calls, sorted(CountDownDriver.calls.keys()), _manager.down_info['success']
+            ))
+            assert sorted(CountDownDriver.calls.keys()) == ['http://test/17/0', 'http://test/3/5']
+            assert _store.get_pending_vols() == []
+            _store.close()
+        finally:
+            shutil.rmtree(_path)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    RunTool.set_global_var('DOWN_DRIVER_DICT', {'http': CountDownDriver})
+    RunTool.set_global_var('CONSOLE_PRINT_FUNCTION', lambda *args, **kwargs: None)
+    for _store_type in ('xml', 'sqlite'):
+        TestPendingVols.test_pending_index(_store_type)
+        TestPendingVols.test_resume(_store_type)
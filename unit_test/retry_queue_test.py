@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+下载失败的延迟重试手工测试
+@module retry_queue_test
+@file retry_queue_test.py
+"""
+
+import sys
+import os
+import time
+import queue
+import shutil
+import tempfile
+import threading
+import urllib.error
+from email.message import Message
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from HiveNetLib.base_tools.run_tool import RunTool
+from comics_down.lib.core import Tools, DownloadManager, DownTaskQueue, BaseDownDriverFW
+
+
+class FlakyDownDriver(BaseDownDriverFW):
+    """
+    模拟的下载驱动, 按url返回不同的异常
+        /busy : 前2次返回503, 之后成功
+        /limit : 第1次返回429(Retry-After: 1), 之后成功
+        /timeout : 一直超时
+        /missing : 返回404
+    """
+    calls = dict()
+    call_times = dict()
+    lock = threading.Lock()
+
+    @classmethod
+    def get_down_type(cls):
+        return 'http'
+
+    @classmethod
+    def download(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        with cls.lock:
+            cls.calls[file_url] = cls.calls.get(file_url, 0) + 1
+            cls.call_times.setdefault(file_url, list()).append(time.time())
+            _num = cls.calls[file_url]
+
+        if file_url.endswith('/busy') and _num <= 2:
+            raise urllib.error.HTTPError(file_url, 503, 'Service Unavailable', Message(), None)
+        elif file_url.endswith('/limit') and _num == 1:
+            _headers = Message()
+            _headers['Retry-After'] = '1'
+            raise urllib.error.HTTPError(file_url, 429, 'Too Many Requests', _headers, None)
+        elif file_url.endswith('/timeout'):
+            raise TimeoutError('timeout: %s' % file_url)
+        elif file_url.endswith('/missing'):
+            raise urllib.error.HTTPError(file_url, 404, 'Not Found', Message(), None)
+
+        with open(save_file, 'w') as _f:
+            _f.write(file_url)
+
+
+class TestRetryQueue(object):
+    """
+    测试延迟任务队列及失败重试
+    """
+    @classmethod
+    def test_delayed_queue(cls):
+        """
+        测试延迟任务按到期时间放回队列
+        """
+        _queue = DownTaskQueue(maxsize=10)
+        _queue.put('now')
+        _queue.put_delayed('late', 0.3)
+        _queue.put_delayed('early', 0.1)
+        assert _queue.delayed_num == 2
+
+        _start = time.time()
+        _items = list()
+        for _i in range(3):
+            _items.append((_queue.get(timeout=1), round(time.time() - _start, 1)))
+            _queue.task_done()
+        print('delayed queue:', _items)
+        assert [_item[0] for _item in _items] == ['now', 'early', 'late']
+        assert _items[2][1] >= 0.3
+
+        # 有延迟任务时队列长度非0, 避免并发池提前结束
+        _queue.put_delayed('retry', 0.1)
+        assert _queue.qsize() > 0 and not _queue.is_all_done()
+        try:
+            _queue.get(block=False)
+            assert False, 'delayed item should not be ready'
+        except queue.Empty:
+            pass
+        assert _queue.get(timeout=1) == 'retry'
+        _queue.task_done()
+        assert _queue.is_all_done()
+
+    @classmethod
+    def test_retryable_error(cls):
+        """
+        测试可重试异常的判断
+        """
+        _errors = [
+            (urllib.error.HTTPError('u', 503, 'x', Message(), None), True),
+            (urllib.error.HTTPError('u', 429, 'x', Message(), None), True),
+            (urllib.error.HTTPError('u', 404, 'x', Message(), None), False),
+            (TimeoutError(), True),
+            (ConnectionResetError(), True),
+            (urllib.error.URLError(ConnectionRefusedError()), True),
+            (RuntimeError(), False)
+        ]
+        for _error, _retryable in _errors:
+            assert DownloadManager.is_retryable_error(_error) == _retryable, repr(_error)
+
+    @classmethod
+    def test_retry_download(cls):
+        """
+        测试下载失败的延迟重试(指数退避, 遵循Retry-After)
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            _para_dict = Tools.get_correct_para_dict({
+                'name': 'test', 'path': _path, 'down_worker': '2', 'retry_delay': '200', 'max_attempts': '3'
+            })
+            _store = DownloadManager.get_down_task_store(_path, 'test', url='http://test/', para_dict=_para_dict)
+            _vol_num = _store.add_vol('vol', 'http://test/vol', status='downloading')
+            _urls = ['http://test/%s' % _name for _name in ('ok', 'busy', 'limit', 'timeout', 'missing')]
+            for _i, _url in enumerate(_urls):
+                _store.add_file(_vol_num, 'file_%d' % _i, '%d.jpg' % _i, _url, 'http')
+            _store.set_vol_value(_vol_num, 'file_num', str(len(_urls)))
+            _store.set_info('files', str(len(_urls)))
+            _store.save()
+
+            FlakyDownDriver.calls.clear()
+            FlakyDownDriver.call_times.clear()
+            _manager = DownloadManager(_store, **_para_dict)
+            _start = time.time()
+            _manager.start_download()
+            print('retry download use %.2f seconds:' % (time.time() - _start), _manager.down_info['success'],
+                  sorted(FlakyDownDriver.calls.items()), _store.get_errors())
+            assert FlakyDownDriver.calls == {
+                'http://test/ok': 1, 'http://test/busy': 3, 'http://test/limit': 2,
+                'http://test/timeout': 3, 'http://test/missing': 1
+            }
+            assert _manager.down_info['success'] == 3
+            assert sorted(_store.get_errors()[_vol_num].values()) == ['http://test/missing', 'http://test/timeout']
+
+            # Retry-After的等待时间优先于退避时间
+            _times = FlakyDownDriver.call_times['http://test/limit']
+            assert _times[1] - _times[0] >= 1.0
+
+            # 退避时间指数增长, 加入随机抖动且不超过最大值
+            for _attempts in range(1, 12):
+                _delay = _manager._get_retry_delay(_attempts)
+                _max = min(0.2 * (2 ** (_attempts - 1)), DownloadManager.RETRY_MAX_DELAY)
+                assert _max / 2 <= _delay <= _max
+            _store.close()
+        finally:
+            shutil.rmtree(_path)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    RunTool.set_global_var('DOWN_DRIVER_DICT', {'http': FlakyDownDriver})
+    RunTool.set_global_var('CONSOLE_PRINT_FUNCTION', lambda *args, **kwargs: None)
+    TestRetryQueue.test_delayed_queue()
+    TestRetryQueue.test_retryable_error()
+    TestRetryQueue.test_retry_download()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+获取卷和文件清单过程中的合并保存手工测试
+@module save_coalescer_test
+@file save_coalescer_test.py
+"""
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from comics_down.lib.core import Tools, DownloadManager, BaseWebSiteDriverFW
+from comics_down.lib.task_store import SaveCoalescer
+
+
+class FakeWebSiteDriver(BaseWebSiteDriverFW):
+    """
+    模拟的网站驱动, 卷清单分页返回, 每页100个卷, 每个卷5个文件
+    """
+    vol_count = 300
+
+    @classmethod
+    def _get_vol_info(cls, index_url: str, **para_dict):
+        _page = int(index_url.split('=')[-1]) if index_url.find('=') >= 0 else 0
+        _vols = dict()
+        for _i in range(_page * 100, min(cls.vol_count, _page * 100 + 100)):
+            _vols['vol%d' % _i] = {'url': 'http://test/vol%d' % _i}
+
+        return {
+            'vols': _vols,
+            'vol_next_url': 'http://test/?p=%d' % (_page + 1) if (_page + 1) * 100 < cls.vol_count else ''
+        }
+
+    @classmethod
+    def _get_file_info(cls, vol_url: str, last_tran_para: object = None, **para_dict):
+        _files = dict()
+        for _i in range(5):
+            _files['%d.jpg' % _i] = {'url': '%s/%d.jpg' % (vol_url, _i), 'downtype': 'http'}
+
+        return {'files': _files}
+
+
+class TestSaveCoalescer(object):
+    """
+    测试保存合并控制
+    """
+    @classmethod
+    def test_coalescer(cls):
+        """
+        测试合并策略
+        """
+        _coalescer = SaveCoalescer(interval=0)
+        assert _coalescer.mark_dirty() and _coalescer.mark_dirty()
+
+        _coalescer = SaveCoalescer(interval=10, batch=3)
+        print('batch:', [_coalescer.mark_dirty() for _i in range(3)], _coalescer.dirty)
+        _coalescer.reset()
+        assert not _coalescer.dirty
+
+        _coalescer = SaveCoalescer(interval=0.1, batch=100)
+        assert not _coalescer.mark_dirty()
+        time.sleep(0.15)
+        assert _coalescer.mark_dirty()
+
+    @classmethod
+    def test_listing(cls, store_type: str, save_interval: str):
+        """
+        测试获取卷和文件清单过程中的保存次数, 结束后全部变更已保存
+
+        @param {str} store_type - 存储类型, xml/sqlite
+        @param {str} save_interval - 保存间隔(毫秒)
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            _para_dict = Tools.get_correct_para_dict({
+                'name': 'test', 'path': _path, 'url': 'http://test/', 'task_store_type': store_type,
+                'save_interval': save_interval
+            })
+            _store = DownloadManager.get_down_task_store(
+                _path, 'test', url='http://test/', store_type=store_type, para_dict=_para_dict
+            )
+
+            # 统计保存次数
+            _save_count = {'num': 0}
+            _save_fun = _store.save
+
+            def _count_save():
+                _save_count['num'] += 1
+                _save_fun()
+
+            _store.save = _count_save
+
+            _start = time.time()
+            FakeWebSiteDriver.update_vol_info(_store, **_para_dict)
+            FakeWebSiteDriver.update_file_info(_store, **_para_dict)
+            print('%s save_interval=%s: saves %d, use %.2f seconds' % (
+                store_type, save_interval, _save_count['num'], time.time() - _start
+            ))
+            _store.close()
+
+            _store = DownloadManager.get_down_task_store(_path, 'test', para_dict=_para_dict)
+            assert _store.get_info('files') == str(FakeWebSiteDriver.vol_count * 5)
+            assert len(_store.get_vol_num_dict()) == FakeWebSiteDriver.vol_count
+            assert len(_store.get_files('vol_%d' % (FakeWebSiteDriver.vol_count - 1))) == 5
+            _store.close()
+        finally:
+            shutil.rmtree(_path)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    TestSaveCoalescer.test_coalescer()
+    for _store_type in ('xml', 'sqlite'):
+        TestSaveCoalescer.test_listing(_store_type, '0')
+        TestSaveCoalescer.test_listing(_store_type, '1000')
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+大文件分段下载手工测试
+@module segment_download_test
+@file segment_download_test.py
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from comics_down.lib.core import Tools
+from comics_down.down_driver.http_down_driver import HttpSession
+from local_http_server import LocalHttpServer
+
+
+class TestSegmentDownload(object):
+    """
+    测试支持Range的大文件分段下载及续传
+    """
+    # 测试文件大小
+    FILE_SIZE = 20 * 1024 * 1024
+
+    @classmethod
+    def get_range_starts(cls, server: LocalHttpServer) -> list:
+        """
+        获取服务收到的Range请求开始位置
+
+        @param {LocalHttpServer} server - http服务
+
+        @returns {list} - 开始位置清单(排序后)
+        """
+        return sorted([
+            int(_headers['Range'][6:].split('-')[0]) for _path, _headers in server.requests if 'Range' in _headers
+        ])
+
+    @classmethod
+    def test_segment_num(cls, path: str, server: LocalHttpServer, url: str):
+        """
+        测试不同分段数的下载
+
+        @param {str} path - 保存路径
+        @param {LocalHttpServer} server - http服务
+        @param {str} url - 文件url
+        """
+        for _segment_num in (1, 4, 8):
+            _session = HttpSession(**Tools.get_correct_para_dict({'segment_num': str(_segment_num)}))
+            _file = os.path.join(path, 'seg_%d.mp4' % _segment_num)
+            server.requests.clear()
+            _start = time.time()
+            _meta = _session.download(url, _file)
+            print('segment_num %d use %.2f seconds, %d requests' % (
+                _segment_num, time.time() - _start, len(server.requests)
+            ))
+            _session.close()
+            with open(_file, 'rb') as _f:
+                assert _f.read() == server.files['/big.mp4']
+            assert _meta['size'] == cls.FILE_SIZE
+            # 探测请求 + 分段请求
+            assert len(server.requests) == (1 if _segment_num == 1 else 1 + _segment_num)
+
+        # 文件小于分段下载的最小大小
+        _session = HttpSession(**Tools.get_correct_para_dict({'segment_min_size': '100'}))
+        server.requests.clear()
+        _meta = _session.download(url, os.path.join(path, 'small.mp4'))
+        _session.close()
+        assert len(server.requests) == 1 and _meta['hash'] != ''
+
+    @classmethod
+    def test_no_range(cls, path: str, url: str):
+        """
+        测试服务器不支持Range时按单连接下载
+
+        @param {str} path - 保存路径
+        @param {str} url - 文件url
+        """
+        _server = LocalHttpServer(support_range=False).start()
+        try:
+            _server.files['/big.mp4'] = os.urandom(cls.FILE_SIZE)
+            _session = HttpSession(**Tools.get_correct_para_dict({}))
+            _file = os.path.join(path, 'no_range.mp4')
+            _meta = _session.download(_server.get_url('/big.mp4'), _file)
+            _session.close()
+            with open(_file, 'rb') as _f:
+                assert _f.read() == _server.files['/big.mp4']
+            assert len(_server.requests) == 1 and _meta['size'] == cls.FILE_SIZE
+        finally:
+            _server.stop()
+
+    @classmethod
+    def test_resume(cls, path: str, server: LocalHttpServer, url: str):
+        """
+        测试分段下载中断后按分段进度续传
+
+        @param {str} path - 保存路径
+        @param {LocalHttpServer} server - http服务
+        @param {str} url - 文件url
+        """
+        _file = os.path.join(path, 'resume.mp4')
+        _session = HttpSession(**Tools.get_correct_para_dict({'segment_num': '4'}))
+
+        # 探测请求及4个分段的应答都只发送2MB数据
+        server.options['/big.mp4'].update({'truncate': 5, 'truncate_after': 2 * 1024 * 1024})
+        try:
+            _session.download(url, _file)
+            assert False, 'download should be interrupted'
+        except Exception as _e:
+            print('download interrupted:', repr(_e))
+
+        with open(_file + '.dt.seg', 'r', encoding='utf-8') as _f:
+            _state = json.loads(_f.read())
+        print('segment state:', _state['segments'])
+        assert _state['size'] == cls.FILE_SIZE
+        assert [_seg[2] for _seg in _state['segments']] == [2 * 1024 * 1024] * 4
+
+        # 续传只请求未下载的部分
+        server.requests.clear()
+        _session.download(url, _file)
+        _session.close()
+        assert cls.get_range_starts(server) == [_seg[0] + _seg[2] for _seg in _state['segments']]
+        assert not os.path.exists(_file + '.dt') and not os.path.exists(_file + '.dt.seg')
+        with open(_file, 'rb') as _f:
+            assert _f.read() == server.files['/big.mp4']
+
+        # 进度文件与临时文件不匹配时重新下载
+        with open(_file + '.dt', 'wb') as _f:
+            _f.write(b'x' * 100)
+        with open(_file + '.dt.seg', 'w', encoding='utf-8') as _f:
+            _f.write(json.dumps(_state))
+        server.requests.clear()
+        _session = HttpSession(**Tools.get_correct_para_dict({'segment_num': '4'}))
+        _session.download(url, _file)
+        _session.close()
+        assert cls.get_range_starts(server) == [0] + [_seg[0] for _seg in _state['segments']]
+        with open(_file, 'rb') as _f:
+            assert _f.read() == server.files['/big.mp4']
+
+    @classmethod
+    def test_restart(cls, path: str, server: LocalHttpServer):
+        """
+        测试某个分段发现文件已变化时其他分段停止下载, 所有分段结束后才删除临时文件
+
+        @param {str} path - 保存路径
+        @param {LocalHttpServer} server - http服务
+        """
+        # 探测请求正常应答, 第一个到达的分段请求返回200(文件已变化), 其他分段限速下载
+        _url = server.add_file(
+            '/change.mp4', os.urandom(cls.FILE_SIZE), status=[None, 200], rate=4 * 1024 * 1024
+        )
+        _file = os.path.join(path, 'change.mp4')
+        _session = HttpSession(**Tools.get_correct_para_dict({'segment_num': '4'}))
+        # 频繁保存分段进度, 检查其他分段停止后不会重新生成进度文件
+        _session.SEGMENT_SAVE_SIZE = 65536
+        _start = time.time()
+        try:
+            _session.download(_url, _file)
+            assert False, 'download should restart'
+        except ConnectionError as _e:
+            print('download restart after %.2f seconds: %s' % (time.time() - _start, _e))
+            assert str(_e).startswith('server not support range or file changed')
+        assert not os.path.exists(_file + '.dt') and not os.path.exists(_file + '.dt.seg')
+
+        # 重新下载
+        server.options['/change.mp4'].pop('rate')
+        _session.download(_url, _file)
+        _session.close()
+        with open(_file, 'rb') as _f:
+            assert _f.read() == server.files['/change.mp4']
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    _path = tempfile.mkdtemp()
+    _server = LocalHttpServer().start()
+    try:
+        # 限速以体现分段并发下载的效果
+        _url = _server.add_file('/big.mp4', os.urandom(TestSegmentDownload.FILE_SIZE), rate=16 * 1024 * 1024)
+        TestSegmentDownload.test_segment_num(_path, _server, _url)
+        TestSegmentDownload.test_no_range(_path, _url)
+        TestSegmentDownload.test_resume(_path, _server, _url)
+        TestSegmentDownload.test_restart(_path, _server)
+    finally:
+        _server.stop()
+        shutil.rmtree(_path)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+下载进度日志(down.progress.log)手工测试
+@module task_journal_test
+@file task_journal_test.py
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from HiveNetLib.simple_xml import SimpleXml, EnumXmlObjType
+from comics_down.lib.task_journal import TaskProgressJournal
+from comics_down.lib.task_store import TaskStoreManager
+
+
+class TestTaskJournal(object):
+    """
+    测试下载进度日志的重放及合并
+    """
+    @classmethod
+    def create_store(cls, path: str, para_dict: dict = None):
+        """
+        创建有1个卷4个文件的xml任务存储
+
+        @param {str} path - 任务目录
+        @param {dict} para_dict=None - 扩展参数
+
+        @returns {XmlTaskStore} - 存储对象
+        """
+        _store = TaskStoreManager.open_store(path, 'test', store_type='xml', para_dict=para_dict)
+        _vol_num = _store.add_vol('vol', 'http://test/vol', status='downloading')
+        for _i in range(4):
+            _store.add_file(_vol_num, 'file_%d' % _i, '%d.jpg' % _i, 'http://test/%d.jpg' % _i, 'http')
+        _store.set_vol_value(_vol_num, 'file_num', '4')
+        _store.set_info('files', '4')
+        _store.save()
+        return _store
+
+    @classmethod
+    def test_replay(cls):
+        """
+        测试中断后重放进度日志(包括写入中断的残缺行)
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            _store = cls.create_store(_path, para_dict={'journal_compact_interval': '0'})
+            _store.set_file_status('vol_0', 'file_0', 'done', meta={'size': 10, 'hash': 'sha1:x'})
+            _store.set_file_status('vol_0', 'file_1', 'done')
+            _store.set_file_status('vol_0', 'file_2', 'err', error_url='http://test/2.jpg')
+            _store.journal.sync()  # 模拟中断: 不合并日志直接退出
+
+            _journal_file = TaskProgressJournal.get_journal_file(_store.xml_doc.file)
+            with open(_journal_file, 'a', encoding='utf-8') as _f:
+                _f.write('["vol_0", "file_3", "do')
+
+            # 中断时down.xml还没有登记进度
+            _xml_doc = SimpleXml(_store.xml_doc.file, obj_type=EnumXmlObjType.File, encoding='utf-8')
+            assert _xml_doc.get_value('/down_task/info/success') == '0'
+            print('journal entries before replay:', len(TaskProgressJournal.load_entries(_journal_file)))
+
+            # 只读装载只在内存中应用日志, 不删除日志
+            _read_store = TaskStoreManager.load_exists_store(_path)
+            assert _read_store.get_info('success') == '2'
+            assert os.path.exists(_journal_file)
+
+            # 重新装载时重放日志并删除
+            _store = TaskStoreManager.load_exists_store(_path, read_only=False)
+            _files = _store.get_files('vol_0')
+            print('replay result:', [_files['file_%d' % _i]['status'] for _i in range(4)],
+                  _store.get_info('success'), _store.get_errors())
+            assert _store.get_info('success') == '2'
+            assert _files['file_3']['status'] == ''
+            assert _store.get_files_meta('vol_0')['file_0'] == {'size': 10, 'hash': 'sha1:x'}
+            assert not os.path.exists(_journal_file)
+            _store.close()
+        finally:
+            shutil.rmtree(_path)
+
+    @classmethod
+    def test_compact(cls):
+        """
+        测试进度日志合并到down.xml
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            _store = cls.create_store(_path)
+            _journal = TaskProgressJournal(_store.xml_doc, sync_batch=2, compact_interval=0)
+            for _i in range(4):
+                _journal.append('vol_0', 'file_%d' % _i, 'done')
+            _journal.append('vol_0', '', 'done')
+            _journal.sync()
+            assert len(TaskProgressJournal.load_entries(_journal.journal_file)) == 5
+
+            _journal.compact()
+            _xml_doc = SimpleXml(_store.xml_doc.file, obj_type=EnumXmlObjType.File, encoding='utf-8')
+            print('compact result:', _xml_doc.get_value('/down_task/info/success'),
+                  _xml_doc.get_value('/down_task/down_list/vol_0/status'),
+                  os.path.exists(_journal.journal_file))
+            assert _xml_doc.get_value('/down_task/info/success') == '4'
+            assert _xml_doc.get_value('/down_task/down_list/vol_0/status') == 'done'
+            assert not os.path.exists(_journal.journal_file)
+
+            # 重复登记完成状态不会重复计数
+            _journal.append('vol_0', 'file_0', 'done')
+            _journal.compact()
+            assert _store.xml_doc.get_value('/down_task/info/success') == '4'
+            _journal.close()
+        finally:
+            shutil.rmtree(_path)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    TestTaskJournal.test_replay()
+    TestTaskJournal.test_compact()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+任务内存模型手工测试
+@module task_model_test
+@file task_model_test.py
+"""
+
+import sys
+import os
+import re
+import json
+import shutil
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from comics_down.lib.task_store import TaskModel, XmlTaskStore
+
+
+class TestTaskModel(object):
+    """
+    测试任务内存模型(卷映射、计数、待处理卷索引)与down.xml保持一致
+    """
+    @classmethod
+    def check_store(cls, store: XmlTaskStore, model: dict):
+        """
+        检查存储的内存模型与期望值一致
+
+        @param {XmlTaskStore} store - 存储对象
+        @param {dict} model - 期望的模型值, 包括vol_num_dict/vol_num/files/vol_file_num/pending_vols
+        """
+        assert store.get_vol_num_dict() == model['vol_num_dict']
+        assert store.get_info('vol_num') == str(model['vol_num'])
+        assert store.get_info('files') == str(model['files'])
+        for _vol_num, _file_num in model['vol_file_num'].items():
+            assert store.get_vol_info(_vol_num)['file_num'] == str(_file_num)
+        assert store.get_pending_vols() == model['pending_vols']
+
+    @classmethod
+    def check_xml(cls, task_path: str, model: dict):
+        """
+        检查保存到down.xml的值与期望值一致
+
+        @param {str} task_path - 任务目录
+        @param {dict} model - 期望的模型值
+        """
+        _xml_doc = XmlTaskStore.load_store(task_path, read_only=True).xml_doc
+        assert json.loads(_xml_doc.get_value('/down_task/info/vol_num_dict')) == model['vol_num_dict']
+        assert _xml_doc.get_value('/down_task/info/vol_num') == str(model['vol_num'])
+        assert _xml_doc.get_value('/down_task/info/files') == str(model['files'])
+        assert json.loads(_xml_doc.get_value('/down_task/info/pending_vols')) == model['pending_vols']
+        for _vol_num, _file_num in model['vol_file_num'].items():
+            assert _xml_doc.get_value('/down_task/down_list/%s/file_num' % _vol_num) == str(_file_num)
+
+    @classmethod
+    def test_model(cls):
+        """
+        测试内存模型的变更标记及待处理卷的排序
+        """
+        _model = TaskModel()
+        assert not _model.dirty
+        _vols = [_model.add_vol('第%d话' % _i) for _i in range(12)]
+        assert _vols[0] == 'vol_0' and _vols[11] == 'vol_11' and _model.vol_num == 12
+        assert _model.info_dirty and _model.pending_dirty and len(_model.dirty_vols) == 12
+
+        # 按卷序号排列, 不按字符串排列
+        assert _model.get_pending_vols() == _vols
+        _model.clear_dirty()
+        assert not _model.dirty
+
+        # 状态没有变化时不标记变更
+        _model.set_vol_pending('vol_2', True)
+        assert not _model.dirty
+        _model.set_vol_pending('vol_2', False)
+        assert _model.pending_dirty and 'vol_2' not in _model.get_pending_vols()
+
+        _model.clear_dirty()
+        _model.set_vol_file_num('vol_3', 5)
+        assert _model.dirty_vols == set(['vol_3']) and not _model.info_dirty
+        _model.set_files(5)
+        assert _model.get_info_values() == {
+            'files': '5', 'vol_num': '12',
+            'vol_num_dict': json.dumps(_model.vol_num_dict, ensure_ascii=False)
+        }
+
+    @classmethod
+    def test_store(cls, path: str):
+        """
+        测试存储操作后内存模型与down.xml一致, 重新装载后模型不变
+
+        @param {str} path - 任务目录
+        """
+        _para_dict = {'journal_compact_interval': '0'}
+        _store = XmlTaskStore.create_store(path, 'test', url='http://test/', para_dict=_para_dict)
+        _model = {'vol_num_dict': dict(), 'vol_num': 0, 'files': 0, 'vol_file_num': dict(), 'pending_vols': []}
+        for _v in range(12):
+            _vol_num = _store.add_vol('第%d话' % _v, 'http://test/v%d' % _v, status='downloading')
+            for _f in range(_v % 3 + 1):
+                _store.add_file(_vol_num, 'file_%d' % _f, '%d.jpg' % _f, 'http://test/%d/%d.jpg' % (_v, _f), 'http')
+            _store.set_vol_value(_vol_num, 'file_num', str(_v % 3 + 1))
+            _model['vol_num_dict']['第%d话' % _v] = _vol_num
+            _model['vol_file_num'][_vol_num] = _v % 3 + 1
+            _model['files'] += _v % 3 + 1
+            _model['pending_vols'].append(_vol_num)
+        _model['vol_num'] = 12
+        _store.set_info('files', str(_model['files']))
+
+        # 未保存前从内存模型获取
+        cls.check_store(_store, _model)
+        assert _store.model.dirty
+        _store.save()
+        assert not _store.model.dirty
+        cls.check_xml(path, _model)
+
+        # 下载完成的卷从待处理卷索引中去掉
+        _store.set_file_status('vol_0', 'file_0', 'done')
+        _store.set_vol_status('vol_0', 'done')
+        for _f in range(3):
+            _store.set_file_status('vol_11', 'file_%d' % _f, 'done')
+        _store.set_vol_value('vol_11', 'status', 'done')
+        _store.set_vol_value('vol_5', 'file_num', '4')
+        _model['pending_vols'] = ['vol_%d' % _v for _v in range(1, 11)]
+        _model['vol_file_num']['vol_5'] = 4
+        cls.check_store(_store, _model)
+        _store.close()
+        cls.check_xml(path, _model)
+
+        # 重新装载
+        _store = XmlTaskStore.load_store(path, para_dict=_para_dict)
+        cls.check_store(_store, _model)
+        assert _store.get_info('success') == '4' and not _store.model.dirty
+        print('pending vols after reload:', _store.get_pending_vols())
+
+        # 只登记到进度日志的卷状态(未保存就中断), 重新装载时合并
+        _store.set_vol_status('vol_1', 'done')
+        _store.journal.close()
+        _store = XmlTaskStore.load_store(path, para_dict=_para_dict)
+        _model['pending_vols'].remove('vol_1')
+        cls.check_store(_store, _model)
+        assert _store.model.pending_dirty
+        _store.close()
+        cls.check_xml(path, _model)
+
+        # 旧版本没有待处理卷索引的配置文件, 装载时遍历建立
+        _xml_file = XmlTaskStore.get_store_file(path)
+        with open(_xml_file, 'r', encoding='utf-8') as _f:
+            _xml = _f.read()
+        with open(_xml_file, 'w', encoding='utf-8') as _f:
+            _f.write(re.sub(r'\s*<pending_vols>.*?</pending_vols>', '', _xml))
+        _store = XmlTaskStore.load_store(path, para_dict=_para_dict)
+        cls.check_store(_store, _model)
+        assert _store.model.pending_dirty
+        _store.close()
+        cls.check_xml(path, _model)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    TestTaskModel.test_model()
+    _path = tempfile.mkdtemp()
+    try:
+        TestTaskModel.test_store(_path)
+    finally:
+        shutil.rmtree(_path)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+任务状态摘要文件(down.status.json)手工测试
+@module task_status_file_test
+@file task_status_file_test.py
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from HiveNetLib.base_tools.run_tool import RunTool
+from comics_down.lib.core import Tools, DownloadManager, JobManager, BaseDownDriverFW
+from comics_down.lib.task_store import TaskStatusFile, TaskStoreManager
+
+
+class FakeDownDriver(BaseDownDriverFW):
+    """
+    模拟的下载驱动, url包含error的文件下载失败
+    """
+    @classmethod
+    def get_down_type(cls):
+        return 'http'
+
+    @classmethod
+    def download(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        if file_url.find('error') >= 0:
+            raise RuntimeError('download error: %s' % file_url)
+
+        with open(save_file, 'w') as _f:
+            _f.write(file_url)
+
+
+class TestTaskStatusFile(object):
+    """
+    测试状态摘要文件与任务存储的一致性
+    """
+    @classmethod
+    def run_task(cls, path: str, store_type: str):
+        """
+        执行一个有1个失败文件的下载任务
+
+        @param {str} path - 保存路径
+        @param {str} store_type - 存储类型, xml/sqlite
+        """
+        _para_dict = Tools.get_correct_para_dict({
+            'name': 'test', 'path': path, 'down_worker': '3', 'task_store_type': store_type
+        })
+        _store = DownloadManager.get_down_task_store(
+            path, 'test', url='http://test/', store_type=store_type, para_dict=_para_dict
+        )
+        for _v in range(2):
+            _vol_num = DownloadManager.add_vol_to_down_task_conf(
+                _store, 'vol%d' % _v, 'http://test/v%d' % _v, status='downloading'
+            )
+            for _f in range(5):
+                DownloadManager.add_file_to_down_task_conf(
+                    _store, _vol_num, 'file_%d' % _f, '%d.jpg' % _f,
+                    'http://test/%d/%s.jpg' % (_v, 'error' if _v == 1 and _f == 4 else str(_f)), 'http'
+                )
+            _store.set_vol_value(_vol_num, 'file_num', '5')
+        _store.set_info('files', '10')
+        _store.save()
+
+        DownloadManager(_store, **_para_dict).start_download()
+        _store.close()
+
+    @classmethod
+    def test_status(cls, store_type: str):
+        """
+        测试下载完成后的状态摘要, 以及摘要文件过期或损坏时从存储获取
+
+        @param {str} store_type - 存储类型, xml/sqlite
+        """
+        _path = tempfile.mkdtemp()
+        _task_path = os.path.join(_path, 'test')
+        try:
+            cls.run_task(_path, store_type)
+            _info = TaskStoreManager.get_down_index_info(_task_path)
+            _status = JobManager.get_down_index_status('test', _path)
+            print(store_type, 'status:', json.dumps(_status, ensure_ascii=False))
+            assert not TaskStatusFile.is_stale(_task_path)
+            for _key in ('url', 'status', 'files', 'success'):
+                assert _status[_key] == _info[_key]
+            assert _status['success'] == '9'
+
+            # 摘要文件比存储文件旧(异常中断或旧版本执行), 从存储获取
+            _file = TaskStatusFile.get_status_file(_task_path)
+            with open(_file, 'w', encoding='utf-8') as _f:
+                _f.write(json.dumps({'url': 'http://test/', 'status': '', 'files': '10', 'success': '0'}))
+            _old_time = time.time() - 60
+            os.utime(_file, (_old_time, _old_time))
+            assert TaskStatusFile.is_stale(_task_path)
+            assert JobManager.get_down_index_status('test', _path)['success'] == '9'
+
+            # 摘要文件损坏, 从存储获取
+            with open(_file, 'w', encoding='utf-8') as _f:
+                _f.write('{"success": ')
+            assert TaskStatusFile.read(_task_path) is None
+            assert JobManager.get_down_index_status('test', _path)['success'] == '9'
+
+            # 摘要文件不存在
+            os.remove(_file)
+            assert TaskStatusFile.is_stale(_task_path)
+            assert JobManager.get_down_index_status('test', _path)['success'] == '9'
+        finally:
+            shutil.rmtree(_path)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    RunTool.set_global_var('DOWN_DRIVER_DICT', {'http': FakeDownDriver})
+    RunTool.set_global_var('CONSOLE_PRINT_FUNCTION', lambda *args, **kwargs: None)
+    for _store_type in ('xml', 'sqlite'):
+        TestTaskStatusFile.test_status(_store_type)
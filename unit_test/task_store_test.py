@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+任务状态存储(xml/sqlite)手工测试
+@module task_store_test
+@file task_store_test.py
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from comics_down.lib.task_store import TaskStoreManager, SqliteTaskStore, XmlTaskStore
+
+
+class TestTaskStore(object):
+    """
+    测试任务状态存储及存储类型转换
+    """
+    @classmethod
+    def fill_store(cls, store):
+        """
+        登记3个卷每卷3个文件, 并设置部分下载结果
+
+        @param {BaseTaskStoreFW} store - 存储对象
+        """
+        for _v in range(3):
+            _vol_num = store.add_vol('第%d话' % _v, 'http://test/vol/%d' % _v, status='downloading')
+            for _f in range(3):
+                store.add_file(
+                    _vol_num, 'file_%d' % _f, '%d.jpg' % _f, "http://test/%d/it's_%d.jpg" % (_v, _f), 'http',
+                    extend_json=({'headers': {'Referer': 'http://test/'}} if _f == 0 else None)
+                )
+            store.set_vol_value(_vol_num, 'file_num', '3')
+            store.set_vol_fingerprint(_vol_num, 'page_%d' % _v, 'files_%d' % _v)
+
+        store.set_info('files', '9')
+        store.save()
+
+        store.set_file_status('vol_0', 'file_0', 'done', meta={'size': 100, 'hash': 'sha1:abc'})
+        store.set_file_status('vol_0', 'file_1', 'done', meta={'size': 200, 'hash': 'sha1:def'})
+        store.set_file_status('vol_1', 'file_2', 'err', error_url="http://test/1/it's_2.jpg")
+        store.set_vol_status('vol_2', 'done')
+        store.save()  # xml存储的文件状态在保存时才从进度日志合并
+
+    @classmethod
+    def dump_store(cls, store) -> dict:
+        """
+        导出存储的全部内容用于比较
+
+        @param {BaseTaskStoreFW} store - 存储对象
+
+        @returns {dict} - 存储内容
+        """
+        _info = store.get_info_dict()
+        _vols = dict()
+        for _vol_num in sorted(store.get_vol_num_dict().values()):
+            _vols[_vol_num] = {
+                'info': store.get_vol_info(_vol_num),
+                'files': store.get_files(_vol_num),
+                'meta': store.get_files_meta(_vol_num),
+                'fingerprint': store.get_vol_fingerprint(_vol_num)
+            }
+
+        return {
+            'info': dict([(_key, _info[_key]) for _key in ('name', 'url', 'files', 'success', 'vol_num_dict')]),
+            'vols': _vols,
+            'errors': store.get_errors(),
+            'pending': store.get_pending_vols()
+        }
+
+    @classmethod
+    def test_store(cls, store_type: str):
+        """
+        测试存储的读写及重新装载
+
+        @param {str} store_type - 存储类型, xml/sqlite
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            _store = TaskStoreManager.open_store(_path, 'test', url='http://test/', store_type=store_type)
+            cls.fill_store(_store)
+            _before = cls.dump_store(_store)
+            _store.close()
+
+            _store = TaskStoreManager.load_exists_store(_path, read_only=False)
+            _after = cls.dump_store(_store)
+            print(store_type, 'store:', type(_store).__name__, _after['info']['success'],
+                  _after['errors'], _after['pending'])
+            assert _before == _after
+            assert _after['info']['success'] == '2'
+            assert _after['pending'] == ['vol_0', 'vol_1']
+            assert _store.find_file_by_url("http://test/1/it's_2.jpg") == ('vol_1', 'file_2')
+            assert _store.find_file_by_url('http://test/none.jpg') is None
+            _store.close()
+        finally:
+            shutil.rmtree(_path)
+
+    @classmethod
+    def test_convert(cls):
+        """
+        测试xml导入sqlite及sqlite导出xml的内容一致, 导入后原down.xml改为备份
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            _store = TaskStoreManager.open_store(_path, 'test', url='http://test/', store_type='xml')
+            cls.fill_store(_store)
+            _xml_dump = cls.dump_store(_store)
+            _store.close()
+
+            # xml -> sqlite
+            _store = TaskStoreManager.open_store(_path, 'test', store_type='sqlite')
+            _db_dump = cls.dump_store(_store)
+            _store.close()
+            print('import to sqlite:', sorted(os.listdir(_path)))
+            assert _xml_dump == _db_dump
+            assert os.path.exists(XmlTaskStore.get_store_file(_path) + TaskStoreManager.BACKUP_EXT)
+            assert TaskStoreManager.get_exists_store_type(_path) == 'sqlite'
+
+            # sqlite -> xml
+            _store = TaskStoreManager.open_store(_path, 'test', store_type='xml')
+            _back_dump = cls.dump_store(_store)
+            _store.close()
+            print('export to xml:', sorted(os.listdir(_path)))
+            assert _xml_dump == _back_dump
+            assert not os.path.exists(SqliteTaskStore.get_store_file(_path))
+
+            # 直接调用导入导出
+            _copy_path = os.path.join(_path, 'copy')
+            os.makedirs(_copy_path)
+            _db_file = os.path.join(_path, 'copy.db')
+            SqliteTaskStore.import_from_xml(XmlTaskStore.get_store_file(_path), _db_file)
+            SqliteTaskStore.export_to_xml(_db_file, XmlTaskStore.get_store_file(_copy_path))
+            _store = XmlTaskStore.load_store(_copy_path, read_only=True)
+            _copy_dump = cls.dump_store(_store)
+            _store.close()
+            print('xml round trip same:', _xml_dump == _copy_dump)
+            assert _xml_dump == _copy_dump
+
+            # 两种存储文件同时存在时以sqlite为准
+            shutil.copy(_db_file, SqliteTaskStore.get_store_file(_path))
+            assert TaskStoreManager.get_exists_store_type(_path) == 'sqlite'
+        finally:
+            shutil.rmtree(_path)
+
+    @classmethod
+    def test_read_only(cls):
+        """
+        测试只读装载sqlite存储(目录名包含URI特殊字符)
+        """
+        _path = os.path.join(tempfile.mkdtemp(), 'a#b?c%20')
+        os.makedirs(_path)
+        try:
+            _store = TaskStoreManager.open_store(_path, 'test', store_type='sqlite')
+            cls.fill_store(_store)
+            _store.close()
+
+            _store = TaskStoreManager.load_exists_store(_path)
+            print('read only:', json.dumps(_store.get_info_dict()['success']), _store.get_vol_info('vol_1')['name'])
+            assert _store.get_vol_info('vol_1')['name'] == '第1话'
+            _store.close()
+        finally:
+            shutil.rmtree(os.path.split(_path)[0])
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    TestTaskStore.test_store('xml')
+    TestTaskStore.test_store('sqlite')
+    TestTaskStore.test_convert()
+    TestTaskStore.test_read_only()
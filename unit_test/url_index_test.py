@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+任务存储的下载url索引手工测试
+@module url_index_test
+@file url_index_test.py
+"""
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from comics_down.lib.core import Tools, DownloadManager, BaseWebSiteDriverFW
+from comics_down.lib.task_store import TaskStoreManager
+
+
+class FakeWebSiteDriver(BaseWebSiteDriverFW):
+    """
+    模拟的网站驱动, 每个卷都包含一个相同url的文件
+    """
+    @classmethod
+    def _get_file_info(cls, vol_url: str, last_tran_para: object = None, **para_dict):
+        _files = dict()
+        for _name in ('a.jpg', 'b.jpg'):
+            _files[_name] = {'url': '%s/%s' % (vol_url, _name), 'downtype': 'http', 'extend_json': None}
+        _files['common.jpg'] = {'url': 'http://test/common.jpg', 'downtype': 'http', 'extend_json': None}
+        return {'next_tran_para': None, 'files': _files}
+
+
+class TestUrlIndex(object):
+    """
+    测试通过url索引查找已登记的文件
+    """
+    @classmethod
+    def test_find_file(cls, store_type: str, file_num: int):
+        """
+        测试按url查找文件及索引的增量更新
+
+        @param {str} store_type - 存储类型, xml/sqlite
+        @param {int} file_num - 性能测试的文件数量
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            _store = TaskStoreManager.open_store(_path, 'test', store_type=store_type)
+            _vol_0 = _store.add_vol('vol0', 'http://test/v0')
+            _vol_1 = _store.add_vol('vol1', 'http://test/v1')
+            _store.add_file(_vol_0, 'file_0', '0.jpg', 'http://test/0.jpg', 'http')
+            assert _store.find_file_by_url('http://test/0.jpg') == (_vol_0, 'file_0')
+            assert _store.find_file_by_url('http://test/0.jpg', vol_num=_vol_1) is None
+
+            # 建立索引后新增的文件也能找到
+            _store.add_file(_vol_1, 'file_0', '0.jpg', 'http://test/0.jpg', 'http')
+            _store.add_file(_vol_1, 'file_1', '1.jpg', "http://test/it's.jpg", 'http')
+            assert _store.find_file_by_url('http://test/0.jpg', vol_num=_vol_1) == (_vol_1, 'file_0')
+            assert _store.find_file_by_url("http://test/it's.jpg") == (_vol_1, 'file_1')
+            assert _store.find_file_by_url('http://test/none.jpg') is None
+            _store.close()
+
+            # 重新装载后查找
+            _store = TaskStoreManager.load_exists_store(_path, read_only=False)
+            assert _store.find_file_by_url("http://test/it's.jpg", vol_num=_vol_1) == (_vol_1, 'file_1')
+
+            _start = time.time()
+            for _i in range(file_num):
+                _store.add_file(_vol_0, 'file_%d' % (_i + 10), 'p.jpg', 'http://test/p/%d.jpg' % _i, 'http')
+                assert _store.find_file_by_url('http://test/p/%d.jpg' % _i) is not None
+            print('%s add and find %d files use %.2f seconds' % (store_type, file_num, time.time() - _start))
+            _store.close()
+        finally:
+            shutil.rmtree(_path)
+
+    @classmethod
+    def test_search_mode(cls, store_type: str):
+        """
+        测试解析文件清单时的重复文件判断(搜索模式判断所有卷, 非搜索模式只判断当前卷)
+
+        @param {str} store_type - 存储类型, xml/sqlite
+        """
+        for _search_mode in ('n', 'y'):
+            _path = tempfile.mkdtemp()
+            try:
+                _para_dict = Tools.get_correct_para_dict({
+                    'name': 'test', 'path': _path, 'task_store_type': store_type, 'search_mode': _search_mode
+                })
+                _store = DownloadManager.get_down_task_store(
+                    _path, 'test', url='http://test/', store_type=store_type, para_dict=_para_dict
+                )
+                for _v in range(2):
+                    DownloadManager.add_vol_to_down_task_conf(_store, 'vol%d' % _v, 'http://test/v%d' % _v)
+                _store.save()
+                FakeWebSiteDriver.update_file_info(_store, **_para_dict)
+
+                # 重复解析不会重复登记(清除卷指纹, 逐个文件检查)
+                for _vol_num in ('vol_0', 'vol_1'):
+                    _store.set_vol_value(_vol_num, 'status', 'listing')
+                    _store.set_vol_fingerprint(_vol_num, '', '')
+                FakeWebSiteDriver.update_file_info(_store, **_para_dict)
+
+                _files = [len(_store.get_files(_vol_num)) for _vol_num in ('vol_0', 'vol_1')]
+                print('%s search_mode=%s files:' % (store_type, _search_mode), _files, _store.get_info('files'))
+                assert _files == ([3, 2] if _search_mode == 'y' else [3, 3])
+                _store.close()
+            finally:
+                shutil.rmtree(_path)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    for _store_type in ('xml', 'sqlite'):
+        TestUrlIndex.test_find_file(_store_type, 3000)
+        TestUrlIndex.test_search_mode(_store_type)
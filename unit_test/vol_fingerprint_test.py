@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+卷指纹(刷新时跳过未变化的卷)手工测试
+@module vol_fingerprint_test
+@file vol_fingerprint_test.py
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from HiveNetLib.base_tools.run_tool import RunTool
+from comics_down.lib.core import Tools, DownloadManager, BaseWebSiteDriverFW
+from comics_down.lib.webdriver_tool import WebDriverTool
+from comics_down.website_driver.common_website_driver import CommonDriver
+
+
+class FakeWebSiteDriver(BaseWebSiteDriverFW):
+    """
+    模拟的网站驱动, 卷的文件清单从pages获取, use_page_fingerprint为True时支持卷页面指纹
+    """
+    pages = dict()
+    calls = {'page': 0, 'file': 0}
+    use_page_fingerprint = False
+
+    @classmethod
+    def _get_vol_fingerprint(cls, vol_url: str, last_tran_para: object = None, **para_dict) -> tuple:
+        if not cls.use_page_fingerprint:
+            return '', last_tran_para
+
+        cls.calls['page'] += 1
+        return 'page:%d' % len(cls.pages[vol_url]), last_tran_para
+
+    @classmethod
+    def _get_file_info(cls, vol_url: str, last_tran_para: object = None, **para_dict):
+        cls.calls['file'] += 1
+        _files = dict()
+        for _name in cls.pages[vol_url]:
+            _files[_name] = {'url': '%s/%s' % (vol_url, _name), 'downtype': 'http', 'extend_json': None}
+        return {'next_tran_para': None, 'files': _files}
+
+
+class TestVolFingerprint(object):
+    """
+    测试通过卷页面指纹及文件清单指纹跳过未变化的卷
+    """
+    @classmethod
+    def refresh(cls, store, para_dict: dict) -> int:
+        """
+        将所有卷设置为待解析后刷新文件清单
+
+        @param {BaseTaskStore} store - 任务存储
+        @param {dict} para_dict - 任务参数
+
+        @returns {int} - 刷新过程中按url查找文件的次数
+        """
+        _find_num = [0]
+        _find_file_by_url = store.find_file_by_url
+
+        def _count_find_file_by_url(*args, **kwargs):
+            _find_num[0] += 1
+            return _find_file_by_url(*args, **kwargs)
+
+        for _vol_num in store.get_vol_num_dict().values():
+            store.set_vol_value(_vol_num, 'status', 'listing')
+
+        store.find_file_by_url = _count_find_file_by_url
+        try:
+            assert FakeWebSiteDriver.update_file_info(store, **para_dict)
+        finally:
+            del store.find_file_by_url
+
+        return _find_num[0]
+
+    @classmethod
+    def test_fingerprint(cls, store_type: str):
+        """
+        测试卷指纹的判断及保存
+
+        @param {str} store_type - 存储类型, xml/sqlite
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            _para_dict = Tools.get_correct_para_dict({'name': 'test', 'path': _path, 'task_store_type': store_type})
+            _store = DownloadManager.get_down_task_store(
+                _path, 'test', url='http://test/', store_type=store_type, para_dict=_para_dict
+            )
+            FakeWebSiteDriver.use_page_fingerprint = False
+            for _v in range(3):
+                FakeWebSiteDriver.pages['http://test/v%d' % _v] = ['a.jpg', 'b.jpg']
+                DownloadManager.add_vol_to_down_task_conf(_store, 'vol%d' % _v, 'http://test/v%d' % _v)
+            _store.save()
+            assert FakeWebSiteDriver.update_file_info(_store, **_para_dict)
+            assert _store.get_info('files') == '6'
+            _fingerprint = _store.get_vol_fingerprint('vol_2')
+            assert _fingerprint['page'] == '' and _fingerprint['files'].startswith('sha1:')
+
+            # 文件清单未变化的卷不逐个检查文件
+            FakeWebSiteDriver.pages['http://test/v1'] = ['a.jpg', 'b.jpg', 'c.jpg']
+            _find_num = cls.refresh(_store, _para_dict)
+            print(store_type, 'files fingerprint: find %d files, %s' % (_find_num, FakeWebSiteDriver.calls))
+            assert _find_num == 3 and _store.get_info('files') == '7'
+            assert _store.get_vol_info('vol_1')['file_num'] == '3'
+            assert _store.get_vol_info('vol_2')['status'] == 'downloading'
+            assert _store.get_vol_fingerprint('vol_2') == _fingerprint
+            assert _store.get_vol_fingerprint('vol_1') != _fingerprint
+            _store.close()
+
+            # 转换存储类型后指纹不变
+            _other_type = 'sqlite' if store_type == 'xml' else 'xml'
+            _store = DownloadManager.get_down_task_store(_path, 'test', store_type=_other_type, para_dict=_para_dict)
+            assert _store.get_vol_fingerprint('vol_2') == _fingerprint
+
+            # 网站驱动支持卷页面指纹, 第一次获取时保存
+            FakeWebSiteDriver.use_page_fingerprint = True
+            cls.refresh(_store, _para_dict)
+            assert _store.get_vol_fingerprint('vol_0')['page'] == 'page:2'
+
+            # 卷页面指纹一致时不再解析文件清单
+            FakeWebSiteDriver.calls.update({'page': 0, 'file': 0})
+            FakeWebSiteDriver.pages['http://test/v0'] = ['a.jpg', 'b.jpg', 'c.jpg', 'd.jpg']
+            _find_num = cls.refresh(_store, _para_dict)
+            print(_other_type, 'page fingerprint: find %d files, %s' % (_find_num, FakeWebSiteDriver.calls))
+            assert FakeWebSiteDriver.calls == {'page': 3, 'file': 1} and _find_num == 4
+            assert _store.get_info('files') == '9' and _store.get_vol_info('vol_0')['file_num'] == '4'
+            for _vol_num in _store.get_vol_num_dict().values():
+                assert _store.get_vol_info(_vol_num)['status'] == 'downloading'
+            _store.close()
+        finally:
+            shutil.rmtree(_path)
+
+    @classmethod
+    def test_common_driver_fingerprint(cls):
+        """
+        测试通用网站驱动按fingerprint_xpath计算卷页面指纹, 没有匹配到指纹区域时视为不支持
+        """
+        _html = '<html><body><div id="list"><a href="1.jpg">1</a></div><p>ad</p></body></html>'
+        _get_config = CommonDriver._get_config
+        _get_web_page_code = WebDriverTool.get_web_page_code
+        _config = {'is_html_code': True, 'fingerprint_xpath': ''}
+        CommonDriver._get_config = classmethod(lambda driver_cls, url, config_type: _config)
+        WebDriverTool.get_web_page_code = classmethod(lambda tool_cls, para_dict, headers=None: _html)
+        try:
+            _fingerprint, _tran_para = CommonDriver._get_vol_fingerprint('http://test/v0')
+            assert _fingerprint.startswith('sha1:') and _tran_para['web_obj'] is not None
+
+            _config['fingerprint_xpath'] = '//div[@id="list"]'
+            _list_fingerprint = CommonDriver._get_vol_fingerprint('http://test/v0')[0]
+            assert _list_fingerprint.startswith('sha1:') and _list_fingerprint != _fingerprint
+
+            # 没有匹配的元素不能生成固定的空区域指纹, 交由 _get_file_info 解析(仍传递已获取的页面对象)
+            _config['fingerprint_xpath'] = '//div[@id="not_exists"]'
+            _fingerprint, _tran_para = CommonDriver._get_vol_fingerprint('http://test/v0')
+            print('fingerprint without matched region: %s' % repr(_fingerprint))
+            assert _fingerprint == '' and _tran_para['web_obj'] is not None
+        finally:
+            CommonDriver._get_config = _get_config
+            WebDriverTool.get_web_page_code = _get_web_page_code
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    RunTool.set_global_var('CONSOLE_PRINT_FUNCTION', lambda *args, **kwargs: None)
+    for _store_type in ('xml', 'sqlite'):
+        TestVolFingerprint.test_fingerprint(_store_type)
+    TestVolFingerprint.test_common_driver_fingerprint()
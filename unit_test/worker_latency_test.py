@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+下载线程调度延迟手工测试(下载线程不再固定等待)
+@module worker_latency_test
+@file worker_latency_test.py
+"""
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from HiveNetLib.base_tools.run_tool import RunTool
+import comics_down.lib.core as core
+from comics_down.lib.core import Tools, DownloadManager, BaseDownDriverFW
+
+
+class NoopDownDriver(BaseDownDriverFW):
+    """
+    不执行实际下载的驱动, 用于测试调度开销
+    """
+    @classmethod
+    def get_down_type(cls):
+        return 'http'
+
+    @classmethod
+    def download(cls, file_url: str, save_file: str, extend_json: dict = None, **para_dict):
+        pass
+
+
+class SleepRecorder(object):
+    """
+    替换core模块的time, 记录下载处理中的time.sleep调用
+    """
+    sleeps = list()
+
+    @classmethod
+    def sleep(cls, seconds: float):
+        cls.sleeps.append(seconds)
+        time.sleep(seconds)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class TestWorkerLatency(object):
+    """
+    测试下载任务的调度开销
+    """
+    @classmethod
+    def test_schedule(cls, engine: str, vol_count: int, file_count: int, down_worker: int):
+        """
+        测试下载大量空文件的耗时
+
+        @param {str} engine - 下载引擎, thread/async
+        @param {int} vol_count - 卷数量
+        @param {int} file_count - 每卷的文件数量
+        @param {int} down_worker - 下载线程数
+
+        @returns {float} - 下载耗时, 单位为秒
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            _para_dict = Tools.get_correct_para_dict({
+                'name': 'test', 'path': _path, 'down_worker': str(down_worker), 'down_engine': engine
+            })
+            _store = DownloadManager.get_down_task_store(_path, 'test', url='http://test/', para_dict=_para_dict)
+            for _v in range(vol_count):
+                _vol_num = _store.add_vol('vol%d' % _v, 'http://test/v%d' % _v, status='downloading')
+                for _f in range(file_count):
+                    _store.add_file(_vol_num, 'file_%d' % _f, '%d.jpg' % _f, 'http://test/%d/%d' % (_v, _f), 'http')
+                _store.set_vol_value(_vol_num, 'file_num', str(file_count))
+            _store.set_info('files', str(vol_count * file_count))
+            _store.save()
+
+            _manager = DownloadManager(_store, **_para_dict)
+            SleepRecorder.sleeps.clear()
+            core.time = SleepRecorder()
+            _start = time.time()
+            try:
+                _manager.start_download()
+            finally:
+                core.time = time
+            _use = time.time() - _start
+            print('%s engine, %d files with %d workers use %.2f seconds, success %d, sleeps %s' % (
+                engine, vol_count * file_count, down_worker, _use, _manager.down_info['success'],
+                SleepRecorder.sleeps
+            ))
+            assert _manager.down_info['success'] == vol_count * file_count
+            # 任务之间没有固定的等待, 所有任务完成后通过事件通知结束
+            assert len([_seconds for _seconds in SleepRecorder.sleeps if _seconds >= 0.1]) == 0
+            assert _manager._down_finished.is_set()
+            _store.close()
+            return _use
+        finally:
+            shutil.rmtree(_path)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    RunTool.set_global_var('DOWN_DRIVER_DICT', {'http': NoopDownDriver})
+    RunTool.set_global_var('CONSOLE_PRINT_FUNCTION', lambda *args, **kwargs: None)
+    for _engine in ('thread', 'async'):
+        TestWorkerLatency.test_schedule(_engine, 1, 1, 5)
+        # 每个文件固定等待1秒时10个线程需要200秒, 以其一半作为上限留出足够的余量
+        assert TestWorkerLatency.test_schedule(_engine, 20, 100, 10) < 100
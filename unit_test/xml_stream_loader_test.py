@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+down.xml流式装载手工测试
+@module xml_stream_loader_test
+@file xml_stream_loader_test.py
+"""
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+# 根据当前文件路径将包路径纳入，在非安装的情况下可以引用到
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from comics_down.lib.task_store import TaskStoreManager, XmlTaskStore, XmlTaskStreamLoader
+from comics_down.lib.task_journal import TaskProgressJournal
+
+
+class TestXmlStreamLoader(object):
+    """
+    测试流式装载与完整装载的结果一致
+    """
+    @classmethod
+    def create_store(cls, path: str, vol_count: int, file_count: int):
+        """
+        创建xml任务存储, 部分文件状态只登记在进度日志中(模拟下载中的任务)
+
+        @param {str} path - 任务目录
+        @param {int} vol_count - 卷数量
+        @param {int} file_count - 每卷的文件数量
+        """
+        _store = TaskStoreManager.open_store(
+            path, 'test', url='http://test/', store_type='xml', para_dict={'journal_compact_interval': '0'}
+        )
+        for _v in range(vol_count):
+            _vol_num = _store.add_vol('第%d话' % _v, 'http://test/v%d' % _v, status='downloading')
+            for _f in range(file_count):
+                _store.add_file(_vol_num, 'file_%d' % _f, '%d.jpg' % _f, 'http://test/%d/%d.jpg' % (_v, _f), 'http')
+            _store.set_vol_value(_vol_num, 'file_num', str(file_count))
+        _store.set_info('files', str(vol_count * file_count))
+
+        # 已合并到down.xml的状态
+        _store.set_file_status('vol_0', 'file_0', 'done')
+        _store.set_vol_status('vol_0', 'done')
+        _store.save()
+
+        # 只在进度日志中的状态
+        _store.set_file_status('vol_1', 'file_0', 'done')
+        _store.set_file_status('vol_1', 'file_1', 'err', error_url='http://test/1/1.jpg')
+        _store.set_vol_status('vol_1', 'done')
+        _store.journal.close()
+
+    @classmethod
+    def test_stream_load(cls, vol_count: int, file_count: int):
+        """
+        比较流式装载与完整装载的结果
+
+        @param {int} vol_count - 卷数量
+        @param {int} file_count - 每卷的文件数量
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            cls.create_store(_path, vol_count, file_count)
+
+            _start = time.time()
+            _loader = XmlTaskStreamLoader(XmlTaskStore.get_store_file(_path))
+            _stream_info = _loader.get_info_dict()
+            _stream_list = dict(_loader.iter_down_list())
+            _stream_time = time.time() - _start
+
+            _start = time.time()
+            _store = XmlTaskStore.load_store(_path, read_only=True)
+            _full_info = _store.get_info_dict()
+            _full_list = _store.get_down_list()
+            _full_time = time.time() - _start
+
+            print('%d files, stream load: %.2f seconds, full load: %.2f seconds' % (
+                vol_count * file_count, _stream_time, _full_time
+            ))
+            print('success:', _stream_info['success'], 'vol_1:', _stream_list['vol_1']['status'],
+                  _stream_list['vol_1']['files']['file_1']['status'])
+            assert _stream_info['success'] == _full_info['success'] == '2'
+            assert _stream_list == _full_list
+
+            # 不包含文件清单
+            _vols = dict(XmlTaskStreamLoader(XmlTaskStore.get_store_file(_path)).iter_down_list(with_files=False))
+            assert len(_vols) == vol_count and 'files' not in _vols['vol_0']
+        finally:
+            shutil.rmtree(_path)
+
+    @classmethod
+    def test_merged_journal(cls):
+        """
+        测试进度日志已合并到down.xml但日志未删除(合并保存后中断)时成功数不重复计算
+        """
+        _path = tempfile.mkdtemp()
+        try:
+            cls.create_store(_path, 3, 5)
+            _xml_file = XmlTaskStore.get_store_file(_path)
+            _journal_file = TaskProgressJournal.get_journal_file(_xml_file)
+            shutil.copyfile(_journal_file, _journal_file + '.bak')
+
+            # 装载时合并进度日志并删除, 再恢复日志文件
+            _store = TaskStoreManager.open_store(_path, 'test', store_type='xml')
+            _store.close()
+            assert not os.path.exists(_journal_file)
+            os.replace(_journal_file + '.bak', _journal_file)
+
+            _stream_info = XmlTaskStreamLoader(_xml_file).get_info_dict()
+            _full_info = XmlTaskStore.load_store(_path, read_only=True).get_info_dict()
+            print('merged journal success:', _stream_info['success'], _full_info['success'])
+            assert _stream_info['success'] == _full_info['success'] == '2'
+        finally:
+            shutil.rmtree(_path)
+
+
+if __name__ == '__main__':
+    # 当程序自己独立运行时执行的操作
+    TestXmlStreamLoader.test_stream_load(10, 5)
+    TestXmlStreamLoader.test_stream_load(500, 100)
+    TestXmlStreamLoader.test_merged_journal()